@@ -1,12 +1,18 @@
+import time
+_imports_started = time.perf_counter()
+
 from flask import Flask, request
 from app.config import Config
 from app.extensions import init_extensions
 from app.api import api_bp
-from app.extensions import jwt
+from app.extensions import jwt, warmup
 from app.jwt_callbacks import check_if_token_revoked
 from app.sockets import chat_events  # Import socket events
 
+_imports_took = round(time.perf_counter() - _imports_started, 4)
+
 def create_app(config_object=None):
+    started = time.perf_counter()
     app = Flask(__name__)
     if config_object:
         app.config.from_object(config_object)
@@ -28,4 +34,6 @@ def create_app(config_object=None):
 
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    warmup.phases["imports"] = _imports_took
+    warmup.record("create_app", started)
     return app
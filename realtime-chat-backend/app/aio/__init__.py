@@ -0,0 +1,12 @@
+"""asyncio server mode: the chat on python-socketio's AsyncServer under an ASGI server.
+
+``asgi.py`` is the entry point (``uvicorn asgi:app``), beside the eventlet
+one in ``run.py``. Socket events are served by app.aio.events with async
+SQLAlchemy sessions; REST routes are the unchanged Flask app, run in a
+thread pool by a2wsgi.
+
+Only the core chat events are served (see AsyncChatEvents), so
+``create_asgi_app`` refuses to start unless ``ASGI_PREVIEW`` is set.
+Handshake admission, outbound backpressure and socket event profiling are
+eventlet-only as well.
+"""
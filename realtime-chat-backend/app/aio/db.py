@@ -0,0 +1,31 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+# asyncio driver used in place of the configured (blocking) one
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(uri):
+    """``SQLALCHEMY_DATABASE_URI`` with its driver swapped for the asyncio one"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+class AsyncDatabase:
+    """Async engine and session factory over the same tables as ``db``.
+
+    The Flask-SQLAlchemy models are ordinary mapped classes, so they work
+    with ``AsyncSession`` as they are. Code shared with the eventlet mode
+    that needs a sync ``Session`` (lazy loads, message encoding) runs
+    through ``session.run_sync``.
+    """
+
+    def __init__(self, uri, **engine_options):
+        self.engine = create_async_engine(async_database_url(uri), **engine_options)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def dispose(self):
+        await self.engine.dispose()
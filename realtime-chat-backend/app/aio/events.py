@@ -0,0 +1,311 @@
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+import orjson
+from flask_jwt_extended import decode_token
+from socketio.exceptions import ConnectionRefusedError
+from sqlalchemy import select
+
+from app.extensions import room_history, session_resume, rate_limiter, socket_auth
+from app.models.channel import Channel
+from app.models.message import Message
+from app.models.private_chat import PrivateChat
+from app.models.private_message import PrivateMessage
+from app.models.sync_event import SyncEvent
+from app.models.chat_read import ChatRead
+from app.models.user import User
+from app.sockets.chat_events import (
+    requested_channel_id, channel_notice, public_notification, public_notification_rooms, unread_notification
+)
+from app.utils.rooms import (
+    public_room, channel_room, remember_message, recent_window, user_recheck_due, forget_presence,
+    release_connection
+)
+from app.utils.message_cache import PUBLIC, PRIVATE
+
+
+class AsyncChatEvents:
+    """The core chat events on python-socketio's ``AsyncServer``.
+
+    Same event names, payloads and room names as app.sockets.chat_events,
+    and the same in-process stores (message cache, room history, session
+    replay buffers, socket auth cache, rate limits) for the events it
+    covers: connect/disconnect, join/leave of the public chat and private
+    chats, and sending public and private messages. Every other event is
+    answered with an ``unsupported`` error, which is why the mode is a
+    preview (``ASGI_PREVIEW``).
+
+    Not in this mode: handshake admission (app.utils.admission), so a
+    reconnect storm reaches the database unthrottled; outbound backpressure
+    (app.utils.backpressure), so a slow client's queue is only bounded by
+    python-socketio; and socket event profiling (app.utils.profiler), which
+    samples green threads. REST routes keep their rate limits and profiling.
+    """
+
+    def __init__(self, sio, flask_app, database):
+        self.sio = sio
+        self.flask_app = flask_app
+        self.database = database
+        self.connected_users = {}
+
+    def register(self):
+        for event in ('connect', 'disconnect', 'join_public', 'leave_public', 'send_public_message',
+                      'join_private', 'leave_private', 'send_private_message'):
+            self.sio.on(event, handler=getattr(self, event))
+        self.sio.on('*', handler=self.unsupported)
+
+    async def emit_logged(self, event, data, room):
+        """Emit to a room and keep the event in its replay buffer (see chat_events.emit_logged)"""
+        seq = session_resume.record(room, event, data)
+        await self.sio.emit(event, (data, {'room': room, 'seq': seq}), to=room)
+
+    async def error(self, sid, message, **extra):
+        await self.sio.emit('error', dict(extra, message=message), to=sid)
+
+    async def rate_limited(self, sid, event, retry_after):
+        await self.sio.emit('rate_limited', {
+            'message': 'Rate limit exceeded', 'event': event, 'retry_after': round(retry_after, 2)
+        }, to=sid)
+
+    def limited(self, event, sid):
+        user_info = self.connected_users.get(sid)
+        return rate_limiter.check(event, sid=sid, user_id=user_info['user_id'] if user_info else None)
+
+    async def deleted(self, sid, user_info):
+        """Close the connection if its user was deleted meanwhile (see rooms.user_recheck_due)"""
+        if not user_recheck_due(user_info) or await self.load_user(user_info['user_id']) is not None:
+            return False
+        print(f"User {user_info['username']} was deleted, closing SID {sid}")
+        await self.sio.disconnect(sid)
+        return True
+
+    async def load_user(self, user_id):
+        async with self.database.session() as session:
+            user = await session.get(User, user_id)
+            return {'id': user.id, 'username': user.username} if user and not user.deleted_at else None
+
+    async def connect(self, sid, environ, auth=None):
+        token = (auth or {}).get('token') or parse_qs(environ.get('QUERY_STRING', '')).get('token', [None])[0]
+        if not token:
+            self.connected_users[sid] = {'user_id': None, 'username': 'Anonymous', 'rooms': set()}
+            await self.sio.emit('connected', {'message': 'Welcome Anonymous!'}, to=sid)
+            return
+
+        user = socket_auth.lookup(token)
+        if user is None:
+            try:
+                with self.flask_app.app_context():
+                    claims = decode_token(token)
+            except Exception as e:
+                print(f"Token decode error: {e}")
+                raise ConnectionRefusedError({'message': 'Invalid token'})
+            user = await self.load_user(int(claims['sub']))
+            if user is None:
+                raise ConnectionRefusedError({'message': 'User not found'})
+            socket_auth.remember(token, claims, user)
+
+        self.connected_users[sid] = {
+            'user_id': user['id'],
+            'username': user['username'],
+            'rooms': set(),
+            'session': session_resume.open(user['id'], sid),
+            'checked_at': time.monotonic()
+        }
+        await self.sio.enter_room(sid, f"user_{user['id']}")
+        await self.sio.emit('connected', {
+            'message': f'Welcome {user["username"]}!',
+            'session': self.connected_users[sid]['session'],
+            'seq': session_resume.seq
+        }, to=sid)
+        print(f"User {user['username']} connected with SID {sid}")
+
+    async def disconnect(self, sid, *args):
+        if sid not in self.connected_users:
+            return
+        release_connection(sid, self.connected_users)
+        user_info = self.connected_users.pop(sid)
+        print(f"User {user_info['username']} disconnected")
+
+    async def join_public(self, sid, data=None):
+        user_info = self.connected_users.get(sid)
+        if user_info is None:
+            return
+
+        await self.sio.enter_room(sid, public_room)
+        user_info['rooms'].add(public_room)
+        await self.sio.emit('user_joined', channel_notice(user_info, Channel.DEFAULT_ID, 'joined'),
+                            to=public_room, skip_sid=sid)
+
+        if data and data.get('history'):
+            await self.sio.emit('public_history', await self.window(public_room, PUBLIC, lambda: (
+                Message.query.filter_by(channel_id=Channel.DEFAULT_ID).order_by(Message.id.desc())
+            )), to=sid)
+
+    async def leave_public(self, sid, data=None):
+        user_info = self.connected_users.get(sid)
+        if user_info is None or public_room not in user_info['rooms']:
+            return
+
+        await self.sio.leave_room(sid, public_room)
+        user_info['rooms'].remove(public_room)
+        forget_presence(sid, {public_room}, self.connected_users)
+        await self.sio.emit('user_left', channel_notice(user_info, Channel.DEFAULT_ID, 'left'),
+                            to=public_room, skip_sid=sid)
+
+    async def window(self, room, kind, query):
+        """Recent messages of a room; a cold room is primed by chat_events.recent_window in a thread"""
+        def load():
+            with self.flask_app.app_context():
+                return recent_window(room, kind, query())
+
+        if room_history.recent(room) is None:
+            return await asyncio.to_thread(load)
+        window = room_history.recent(room) or []
+        return {'messages': [fragment for _, fragment in window], 'before_id': window[0][0] if window else None}
+
+    async def send_public_message(self, sid, data):
+        user_info = self.connected_users.get(sid)
+        if user_info is None:
+            return await self.error(sid, 'Not authenticated')
+        if await self.deleted(sid, user_info):
+            return
+        retry_after = self.limited('send_public_message', sid)
+        if retry_after:
+            return await self.rate_limited(sid, 'send_public_message', retry_after)
+
+        # Only the general channel can be joined in this mode
+        channel_id = requested_channel_id(data)
+        room = channel_room(channel_id)
+        if room not in user_info['rooms']:
+            return await self.error(sid, 'Not in public chat' if room == public_room else 'Not in channel')
+        content = (data or {}).get('content', '').strip()
+        if not content:
+            return await self.error(sid, 'Message content cannot be empty')
+
+        try:
+            async with self.database.session() as session:
+                message = Message(content=content, user_id=user_info['user_id'], channel_id=channel_id)
+                session.add(message)
+                await session.commit()
+                # A new message has no attachments yet; the author is lazy-loaded on the sync side
+                encoded = await session.run_sync(lambda _: remember_message(room, PUBLIC, message, files=[]))
+        except Exception as e:
+            print(f"Error sending public message: {e}")
+            return await self.error(sid, 'Failed to send message')
+
+        await self.emit_logged('new_public_message', orjson.Fragment(encoded), room)
+        notification = public_notification(user_info, message)
+        for other_user_room in public_notification_rooms(self.connected_users, user_info['user_id']):
+            await self.emit_logged('public_message_notification', notification, other_user_room)
+
+    async def join_private(self, sid, data):
+        user_info = self.connected_users.get(sid)
+        if user_info is None:
+            return await self.error(sid, 'Not authenticated')
+        if await self.deleted(sid, user_info):
+            return
+        retry_after = self.limited('join_private', sid)
+        if retry_after:
+            return await self.rate_limited(sid, 'join_private', retry_after)
+        try:
+            other_user_id = int((data or {}).get('other_user_id'))
+        except (TypeError, ValueError):
+            return await self.error(sid, 'Invalid user ID')
+
+        async with self.database.session() as session:
+            other_user = await session.get(User, other_user_id)
+            if not other_user or other_user.deleted_at:
+                return await self.error(sid, 'User not found')
+            chat = await self.private_chat(session, user_info['user_id'], other_user_id)
+            await session.commit()
+
+        room_name = f"private_chat_{chat.id}"
+        await self.sio.enter_room(sid, room_name)
+        user_info['rooms'].add(room_name)
+
+        payload = {'chat_id': chat.id, 'other_user': {'id': other_user.id, 'username': other_user.username}}
+        if data.get('history'):
+            payload.update(await self.window(room_name, PRIVATE, lambda: (
+                PrivateMessage.query.filter_by(chat_id=chat.id).order_by(PrivateMessage.id.desc())
+            )))
+        await self.sio.emit('joined_private', payload, to=sid)
+
+    async def leave_private(self, sid, data):
+        user_info = self.connected_users.get(sid)
+        try:
+            other_user_id = int((data or {}).get('other_user_id'))
+        except (TypeError, ValueError):
+            return
+        if user_info is None:
+            return
+
+        async with self.database.session() as session:
+            chat = (await session.scalars(
+                select(PrivateChat).where(PrivateChat.between_users(user_info['user_id'], other_user_id)).limit(1)
+            )).first()
+        room_name = f"private_chat_{chat.id}" if chat else None
+        if room_name in user_info['rooms']:
+            await self.sio.leave_room(sid, room_name)
+            user_info['rooms'].remove(room_name)
+            forget_presence(sid, {room_name}, self.connected_users)
+
+    async def send_private_message(self, sid, data):
+        user_info = self.connected_users.get(sid)
+        if user_info is None:
+            return await self.error(sid, 'Not authenticated')
+        if await self.deleted(sid, user_info):
+            return
+        retry_after = self.limited('send_private_message', sid)
+        if retry_after:
+            return await self.rate_limited(sid, 'send_private_message', retry_after)
+
+        content = (data or {}).get('content', '').strip()
+        if not data.get('other_user_id') or not content:
+            return await self.error(sid, 'Other user ID and content required')
+        try:
+            other_user_id = int(data['other_user_id'])
+        except (TypeError, ValueError):
+            return await self.error(sid, 'Invalid user ID')
+
+        try:
+            async with self.database.session() as session:
+                other_user = await session.get(User, other_user_id)
+                if not other_user or other_user.deleted_at:
+                    return await self.error(sid, 'User not found')
+                chat = await self.private_chat(session, user_info['user_id'], other_user_id)
+                message = PrivateMessage(content=content, sender_id=user_info['user_id'], chat_id=chat.id)
+                session.add(message)
+                await session.commit()
+
+                unread = await session.execute(ChatRead.unread_query(other_user_id, [chat.id]))
+                unread_count = dict(unread.all()).get(chat.id, 0)
+
+                room_name = f"private_chat_{chat.id}"
+                encoded = await session.run_sync(lambda _: remember_message(room_name, PRIVATE, message, files=[]))
+        except Exception as e:
+            print(f"Error sending private message: {e}")
+            return await self.error(sid, 'Failed to send message')
+
+        if room_name not in user_info['rooms']:
+            await self.sio.enter_room(sid, room_name)
+            user_info['rooms'].add(room_name)
+
+        await self.emit_logged('new_private_message', orjson.Fragment(encoded), room_name)
+        await self.emit_logged('unread_count_update', unread_notification(chat.id, unread_count, user_info),
+                               f"user_{other_user_id}")
+
+    async def private_chat(self, session, user_id, other_user_id):
+        """Async PrivateChat.get_or_create_between_users"""
+        chat = (await session.scalars(
+            select(PrivateChat).where(PrivateChat.between_users(user_id, other_user_id)).limit(1)
+        )).first()
+        if not chat:
+            chat = PrivateChat(user1_id=user_id, user2_id=other_user_id)
+            session.add(chat)
+            await session.flush()
+            session.add_all(SyncEvent.for_chat(chat, SyncEvent.CHAT_CREATED))
+        return chat
+
+    async def unsupported(self, event, sid, *args):
+        await self.error(sid, f'{event} is not available in asyncio mode yet', code='unsupported', event=event)
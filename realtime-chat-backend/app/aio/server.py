@@ -0,0 +1,28 @@
+import socketio
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+from app.aio.db import AsyncDatabase
+from app.aio.events import AsyncChatEvents
+from app.utils import fast_json
+
+
+def create_asgi_app(config_object=None):
+    flask_app = create_app(config_object)
+    flask_app.config.setdefault("ASGI_WSGI_THREADS", 10)
+    if not flask_app.config.get("ASGI_PREVIEW"):
+        raise RuntimeError("asyncio mode only serves the core chat events (app.aio.events); "
+                           "serve run.py, or set ASGI_PREVIEW=true to try it anyway")
+
+    sio = socketio.AsyncServer(async_mode="asgi", json=fast_json, cors_allowed_origins="*")
+    database = AsyncDatabase(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+    events = AsyncChatEvents(sio, flask_app, database)
+    events.register()
+
+    app = socketio.ASGIApp(sio, other_asgi_app=WSGIMiddleware(flask_app, workers=flask_app.config["ASGI_WSGI_THREADS"]))
+    # For tests and the benchmark
+    app.sio = sio
+    app.flask_app = flask_app
+    app.database = database
+    app.events = events
+    return app
@@ -8,12 +8,22 @@ from app.api.auth import auth_bp
 from app.api.users import user_bp
 from app.api.messages import messages_bp
 from app.api.files import files_bp
+from app.api.sync import sync_bp
+from app.api.metrics import metrics_bp
+from app.api.channels import channels_bp
+from app.api.groups import groups_bp
+from app.api.health import health_bp
 
 # Register sub-blueprints
 api_bp.register_blueprint(auth_bp, url_prefix="/auth")
 api_bp.register_blueprint(user_bp, url_prefix="/users")
 api_bp.register_blueprint(messages_bp, url_prefix="")
 api_bp.register_blueprint(files_bp, url_prefix="/files")
+api_bp.register_blueprint(sync_bp, url_prefix="")
+api_bp.register_blueprint(metrics_bp, url_prefix="")
+api_bp.register_blueprint(channels_bp, url_prefix="")
+api_bp.register_blueprint(groups_bp, url_prefix="")
+api_bp.register_blueprint(health_bp, url_prefix="")
 
 @api_bp.route("/", methods=["GET"])
 def index():
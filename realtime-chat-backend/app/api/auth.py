@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt
 from app.models.token_blocklist import TokenBlocklist
-from app.extensions import db
+from app.extensions import db, username_index
 from app.models.user import User
 
 auth_bp = Blueprint("auth", __name__)
@@ -24,6 +24,7 @@ def register():
 
     db.session.add(user)
     db.session.commit()
+    username_index.add(user.id, user.username, user.avatar_url)
 
     return jsonify({ "user": user.to_dict() }), 201
 
@@ -31,11 +32,15 @@ def register():
 def login():
     data = request.get_json()
 
-    user = User.query.filter_by(username=data["username"]).first()
+    user = User.query.filter_by(username=data["username"], deleted_at=None).first()
 
     if not user or not user.check_password(data["password"]):
         return jsonify({"message": "Invalid credentials"}), 401
 
+    # Hashes made with older parameters are replaced while we have the password
+    if user.upgrade_password(data["password"]):
+        db.session.commit()
+
     access_token = create_access_token(identity=str(user.id))
 
     return jsonify({
@@ -0,0 +1,104 @@
+import orjson
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from app.extensions import db, message_cache, query_budget
+from app.models.channel import Channel
+from app.models.channel_read import ChannelRead
+from app.models.message import Message
+from app.models.read_mark import read_up_to
+from app.utils.message_cache import PUBLIC
+from app.utils.rooms import channel_room, remember_message
+from app.api.messages import history_page
+
+channels_bp = Blueprint("channels", __name__)
+
+@channels_bp.route("/channels", methods=["GET"])
+@jwt_required()
+@query_budget.limit(2)
+def get_channels():
+    user_id = int(get_jwt_identity())
+    channels = Channel.query.order_by(Channel.id).all()
+
+    # Messages past each read mark, counted in one grouped query: per channel, a range over (channel_id, id)
+    unread_counts = dict(
+        db.session.query(Channel.id, func.count(Message.id))
+        .outerjoin(ChannelRead, (ChannelRead.channel_id == Channel.id) & (ChannelRead.user_id == user_id))
+        .join(Message, (Message.channel_id == Channel.id)
+              & (Message.id > func.coalesce(ChannelRead.last_read_message_id, 0)))
+        .group_by(Channel.id)
+        .all()
+    )
+
+    return jsonify({"channels": [
+        dict(channel.to_dict(), unread_count=unread_counts.get(channel.id, 0)) for channel in channels
+    ]}), 200
+
+@channels_bp.route("/channels", methods=["POST"])
+@jwt_required()
+def create_channel():
+    data = request.get_json() or {}
+    user_id = int(get_jwt_identity())
+
+    name = (data.get("name") or "").strip().lower()
+    if not name or len(name) > 64:
+        return jsonify({"message": "Channel name must be 1-64 characters"}), 400
+
+    if Channel.query.filter_by(name=name).first():
+        return jsonify({"message": "Channel already exists"}), 409
+
+    channel = Channel(name=name, description=data.get("description"), created_by=user_id)
+    db.session.add(channel)
+    db.session.commit()
+
+    return jsonify(channel.to_dict()), 201
+
+@channels_bp.route("/channels/<int:channel_id>/messages", methods=["GET"])
+@jwt_required()
+@query_budget.limit(4)
+def get_channel_messages(channel_id):
+    if not db.session.get(Channel, channel_id):
+        return jsonify({"message": "Channel not found"}), 404
+
+    messages = history_page(Message.query.filter_by(channel_id=channel_id), Message)
+    return jsonify({"messages": message_cache.get_fragments(PUBLIC, messages)}), 200
+
+@channels_bp.route("/channels/<int:channel_id>/messages", methods=["POST"])
+@jwt_required()
+@query_budget.limit(5)
+def create_channel_message(channel_id):
+    data = request.get_json()
+    user_id = int(get_jwt_identity())
+
+    if not db.session.get(Channel, channel_id):
+        return jsonify({"message": "Channel not found"}), 404
+
+    message = Message(
+        content=data["content"],
+        user_id=user_id,
+        channel_id=channel_id
+    )
+    db.session.add(message)
+    db.session.commit()
+
+    return jsonify(orjson.Fragment(remember_message(channel_room(channel_id), PUBLIC, message))), 201
+
+@channels_bp.route("/channels/<int:channel_id>/read", methods=["POST"])
+@jwt_required()
+@query_budget.limit(3)
+def mark_channel_as_read(channel_id):
+    """Move the user's read mark to the last message, or to ``last_read_message_id`` of the body if earlier"""
+    user_id = int(get_jwt_identity())
+    if not db.session.get(Channel, channel_id):
+        return jsonify({"message": "Channel not found"}), 404
+
+    requested = (request.get_json(silent=True) or {}).get("last_read_message_id")
+    try:
+        last_id = read_up_to(Message.last_id(channel_id), requested)
+    except ValueError:
+        return jsonify({"message": "Invalid last_read_message_id"}), 400
+
+    ChannelRead.advance(last_id, user_id=user_id, channel_id=channel_id)
+    db.session.commit()
+
+    return jsonify({"message": "Channel marked as read", "last_read_message_id": last_id}), 200
@@ -1,52 +1,68 @@
-from flask import Blueprint, request, jsonify
+import re
+from sqlalchemy.exc import IntegrityError
+from flask import Blueprint, request, jsonify, current_app, send_file, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.extensions import db
+from app.extensions import db, message_cache, room_history, storage, query_budget
 from app.models.file import File
+from app.models.upload import Upload
+from app.models.blob import Blob
 from app.models.message import Message
 from app.models.private_message import PrivateMessage
 from app.models.private_chat import PrivateChat
+from app.utils.message_cache import PUBLIC, PRIVATE
+from app.utils.files import descriptor_error, file_values, filename_error, max_file_size, format_size, IMAGE, DOCUMENT
+from app.utils.pagination import cursor_page
+from app.utils.storage import StorageOffsetMismatch, StorageLengthMismatch
+from app.utils.rooms import channel_room
 
 files_bp = Blueprint("files", __name__)
 
-@files_bp.route("/", methods=["POST"])
-@jwt_required()
-def create_file():
-    data = request.get_json()
-    user_id = int(get_jwt_identity())
+def _refresh_cached_message(kind, message_id):
+    """Attachments are part of a message's cached JSON; drop it and re-encode the buffered copy"""
+    message_cache.invalidate(kind, message_id)
 
-    # Validate required fields
-    if not all(k in data for k in ["filename", "file_url", "file_size"]):
-        return jsonify({"message": "Missing required fields: filename, file_url, file_size"}), 400
+    message = db.session.get(Message if kind == PUBLIC else PrivateMessage, message_id)
+    if message:
+        room = channel_room(message.channel_id) if kind == PUBLIC else f"private_chat_{message.chat_id}"
+        room_history.replace(room, message_id, message_cache.get_bytes(kind, message))
 
-    # Validate file size (max 5MB)
-    max_size = 5 * 1024 * 1024  # 5MB in bytes
-    if data["file_size"] > max_size:
-        return jsonify({"message": "File size exceeds 5MB limit"}), 400
-
-    # Validate file type
-    allowed_extensions = {'.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
-    filename = data["filename"].lower()
-    if not any(filename.endswith(ext) for ext in allowed_extensions):
-        return jsonify({"message": "Invalid file type. Allowed: PDF, DOC, DOCX, and image files"}), 400
-
-    # Validate associations (at least one)
+def _association_error(data, user_id):
+    """Check the single association of a file request belongs to the user; returns an error message or None"""
     associations = ["public_message_id", "private_chat_id"]
     provided_associations = [k for k in associations if k in data and data[k] is not None]
     if len(provided_associations) != 1:
-        return jsonify({"message": "Exactly one association required: public_message_id, or private_chat_id"}), 400
+        return "Exactly one association required: public_message_id, or private_chat_id"
 
-    # Validate the association belongs to user
     assoc_type = provided_associations[0]
     assoc_id = data[assoc_type]
 
     if assoc_type == "public_message_id":
         message = db.session.get(Message, assoc_id)
         if not message or message.user_id != user_id:
-            return jsonify({"message": "Invalid public message"}), 400
+            return "Invalid public message"
     elif assoc_type == "private_chat_id":
         chat = db.session.get(PrivateChat, assoc_id)
-        if not chat or (chat.user1_id != user_id and chat.user2_id != user_id):
-            return jsonify({"message": "Invalid private chat"}), 400
+        if not chat or user_id not in chat.member_ids():
+            return "Invalid private chat"
+
+    return None
+
+@files_bp.route("/", methods=["POST"])
+@jwt_required()
+@query_budget.limit(6)
+def create_file():
+    data = request.get_json()
+    user_id = int(get_jwt_identity())
+
+    # Validate required fields, size and type
+    error = descriptor_error(data)
+    if error:
+        return jsonify({"message": error}), 400
+
+    # Validate the association belongs to user
+    error = _association_error(data, user_id)
+    if error:
+        return jsonify({"message": error}), 400
 
     file_record = File(
         filename=data["filename"],
@@ -60,31 +76,96 @@ def create_file():
     db.session.add(file_record)
     db.session.commit()
 
+    if file_record.public_message_id:
+        _refresh_cached_message(PUBLIC, file_record.public_message_id)
+
     return jsonify(file_record.to_dict()), 201
 
+@files_bp.route("/batch", methods=["POST"])
+@jwt_required()
+@query_budget.limit(6)
+def create_files():
+    """Register several files with one shared association in a single INSERT.
+
+    Body: ``{"files": [{filename, file_url, file_size, file_type?}, ...]}``
+    plus ``public_message_id`` or ``private_chat_id``. All descriptors are
+    validated before anything is written; the first invalid one is reported
+    with its ``index``.
+    """
+    data = request.get_json() or {}
+    user_id = int(get_jwt_identity())
+
+    descriptors = data.get("files")
+    max_files = current_app.config.get("FILE_BATCH_MAX", 20)
+    if not isinstance(descriptors, list) or not descriptors:
+        return jsonify({"message": "files must be a non-empty list"}), 400
+    if len(descriptors) > max_files:
+        return jsonify({"message": f"At most {max_files} files per batch"}), 400
+
+    for index, descriptor in enumerate(descriptors):
+        error = descriptor_error(descriptor)
+        if error:
+            return jsonify({"message": error, "index": index}), 400
+
+    error = _association_error(data, user_id)
+    if error:
+        return jsonify({"message": error}), 400
+
+    associations = {
+        "public_message_id": data.get("public_message_id"),
+        "private_chat_id": data.get("private_chat_id")
+    }
+    file_records = File.insert_many([file_values(d, user_id, **associations) for d in descriptors])
+    # Serialized before the commit expires the rows, which would reload them one query per file
+    files = [file_record.to_dict() for file_record in file_records]
+    db.session.commit()
+
+    if associations["public_message_id"]:
+        _refresh_cached_message(PUBLIC, associations["public_message_id"])
+
+    return jsonify({"files": files}), 201
+
+def _file_listing(query):
+    """Apply the ``?type=image|document`` filter and cursor paging, newest first"""
+    category = request.args.get("type")
+    if category is not None:
+        if category not in (IMAGE, DOCUMENT):
+            return None, None
+        query = query.filter(File.category == category)
+    return cursor_page(query, File.id)
+
 @files_bp.route("/", methods=["GET"])
 @jwt_required()
+@query_budget.limit(2)
 def get_files():
     user_id = int(get_jwt_identity())
 
-    files = File.query.filter_by(uploader_id=user_id).order_by(File.uploaded_at.desc()).all()
+    files, next_cursor = _file_listing(File.query.filter_by(uploader_id=user_id))
+    if files is None:
+        return jsonify({"message": "type must be image or document"}), 400
 
-    return jsonify([file.to_dict() for file in files]), 200
+    # The body stays a bare list; the next page's cursor travels in a header
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+    return jsonify([file.to_dict() for file in files]), 200, headers
 
 @files_bp.route("/private/<int:chat_id>", methods=["GET"])
 @jwt_required()
+@query_budget.limit(2)
 def get_files_private(chat_id):
 
-    files = File.query.filter_by(private_chat_id=chat_id).order_by(File.uploaded_at.desc()).all()
+    files, next_cursor = _file_listing(File.query.filter_by(private_chat_id=chat_id))
+    if files is None:
+        return jsonify({"message": "type must be image or document"}), 400
 
-    return jsonify({"files": [file.to_dict() for file in files]}), 200
+    return jsonify({"files": [file.to_dict() for file in files], "next_cursor": next_cursor}), 200
 
 
 @files_bp.route("/public/<int:message_id>", methods=["GET"])
 @jwt_required()
+@query_budget.limit(2)
 def get_files_public(message_id):
 
-    files = File.query.filter_by(public_message_id=message_id).order_by(File.uploaded_at.desc()).all()
+    files = File.query.filter_by(public_message_id=message_id).order_by(File.id.desc()).all()
 
     return jsonify({"files": [file.to_dict() for file in files]}), 200
 
@@ -116,7 +197,264 @@ def delete_file(file_id):
     if file_record.uploader_id != user_id:
         return jsonify({"message": "Access denied"}), 403
 
+    public_message_id = file_record.public_message_id
+    private_message_id = file_record.private_message_id
+    content_hash = file_record.content_hash
+
+    # Other files may share the stored object; the sweeper removes it once none is left
     db.session.delete(file_record)
+    if content_hash:
+        Blob.release(content_hash)
+    db.session.commit()
+
+    if public_message_id:
+        _refresh_cached_message(PUBLIC, public_message_id)
+    if private_message_id:
+        _refresh_cached_message(PRIVATE, private_message_id)
+
+    return jsonify({"message": "File deleted"}), 200
+
+def _can_read(file_record, user_id):
+    """Public attachments are readable by everyone, private ones by the chat's members"""
+    if file_record.uploader_id == user_id or file_record.public_message_id:
+        return True
+    chat = db.session.get(PrivateChat, file_record.private_chat_id) if file_record.private_chat_id else None
+    return bool(chat) and user_id in chat.member_ids()
+
+@files_bp.route("/<int:file_id>/content", methods=["GET"])
+@jwt_required()
+def download_file(file_id):
+    """Stored file contents; Range requests get 206 partial responses.
+
+    send_file hands the open file to the server's ``wsgi.file_wrapper``,
+    which sends it with sendfile(2) where the server supports it. With
+    USE_X_SENDFILE a fronting proxy serves the file instead.
+    """
+    user_id = int(get_jwt_identity())
+    file_record = db.session.get(File, file_id)
+
+    if not file_record or not file_record.content_hash:
+        return jsonify({"message": "File not found"}), 404
+
+    if not _can_read(file_record, user_id):
+        return jsonify({"message": "Access denied"}), 403
+
+    return send_file(
+        storage.path(file_record.content_hash),
+        mimetype=file_record.file_type or "application/octet-stream",
+        download_name=file_record.filename,
+        conditional=True
+    )
+
+# Chunked, resumable uploads
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+def _own_upload(upload_id):
+    upload = db.session.get(Upload, upload_id)
+    if not upload or upload.uploader_id != int(get_jwt_identity()):
+        return None
+    return upload
+
+def _holds_blob(user_id, sha256):
+    """Whether one of the user's own files already points at the blob of ``sha256``"""
+    return db.session.query(
+        File.query.filter(File.content_hash == sha256, File.uploader_id == user_id).exists()
+    ).scalar()
+
+def _known_blob(upload):
+    """The stored blob an upload declared it duplicates (same SHA-256 and size), if any.
+
+    Only a blob the uploader already has a file of counts: knowing a hash is
+    no proof of having its bytes, and the new File would let them read it.
+    Anyone else sends the bytes, which are deduplicated once their digest
+    checks out.
+    """
+    if not upload.sha256:
+        return None
+    blob = db.session.get(Blob, upload.sha256)
+    if not blob or blob.size != upload.file_size or not _holds_blob(upload.uploader_id, blob.sha256):
+        return None
+    return blob
+
+def _upload_offset(upload):
+    """Bytes received; a duplicate of a stored blob counts as fully received"""
+    return upload.file_size if _known_blob(upload) else storage.size(upload.id)
+
+def _reference_blob(upload, sha256):
+    """Point one more File at the blob of ``sha256``, storing the upload as that blob if it is new.
+
+    False when the upload skipped its bytes for a known blob that was swept
+    away meanwhile; the client then has to send them after all.
+    """
+    if Blob.add_reference(sha256):
+        storage.abort(upload.id)
+        return True
+    if storage.size(upload.id) != upload.file_size:
+        return False
+
+    storage.finish(upload.id, sha256)
+    try:
+        with db.session.begin_nested():
+            db.session.add(Blob(sha256=sha256, size=upload.file_size, ref_count=1))
+    except IntegrityError:
+        # Another upload of the same content stored it first
+        Blob.add_reference(sha256)
+    return True
+
+@files_bp.route("/blobs/<sha256>", methods=["GET"])
+@jwt_required()
+def get_blob(sha256):
+    """Whether the caller already has a file of this SHA-256; if so, uploads of it skip the bytes"""
+    blob = db.session.get(Blob, sha256.lower())
+    if not blob or not _holds_blob(int(get_jwt_identity()), blob.sha256):
+        return jsonify({"message": "Not stored"}), 404
+    return jsonify({"sha256": blob.sha256, "size": blob.size}), 200
+
+@files_bp.route("/uploads", methods=["POST"])
+@jwt_required()
+def create_upload():
+    """Start an upload of ``{filename, file_size, file_type?, sha256?}``.
+
+    The client then PUTs the bytes in chunks, each with a ``Content-Range:
+    bytes <start>-<end>/<total>`` header whose start is the current offset
+    and whose total is ``file_size``, and finally POSTs ``/complete``. After an interruption, GET the upload to
+    learn the offset to continue from. If ``sha256`` and ``file_size`` match
+    a blob one of the caller's own files points at, the upload starts at its
+    full size and can be completed right away. Uploads not completed within ``UPLOAD_TTL_HOURS`` are swept
+    away with their bytes (app.utils.sweeper).
+    """
+    data = request.get_json() or {}
+    user_id = int(get_jwt_identity())
+
+    file_size = data.get("file_size")
+    if not data.get("filename") or not isinstance(file_size, int) or file_size <= 0:
+        return jsonify({"message": "Missing required fields: filename, file_size"}), 400
+
+    if file_size > max_file_size():
+        return jsonify({"message": f"File size exceeds {format_size(max_file_size())} limit"}), 413
+
+    error = filename_error(data["filename"])
+    if error:
+        return jsonify({"message": error}), 400
+
+    upload = Upload(
+        uploader_id=user_id,
+        filename=data["filename"],
+        file_type=data.get("file_type"),
+        file_size=file_size,
+        sha256=(data.get("sha256") or "").lower() or None
+    )
+    db.session.add(upload)
+    db.session.commit()
+
+    return jsonify(dict(
+        upload.to_dict(_upload_offset(upload)),
+        chunk_size=current_app.config.get("UPLOAD_CHUNK_SIZE", 1024 * 1024)
+    )), 201
+
+@files_bp.route("/uploads/<upload_id>", methods=["GET"])
+@jwt_required()
+def get_upload(upload_id):
+    upload = _own_upload(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload not found"}), 404
+    return jsonify(upload.to_dict(_upload_offset(upload))), 200
+
+@files_bp.route("/uploads/<upload_id>", methods=["PUT"])
+@jwt_required()
+def upload_chunk(upload_id):
+    """Append one chunk, streamed from the request body straight to storage"""
+    upload = _own_upload(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload not found"}), 404
+
+    match = CONTENT_RANGE.match(request.headers.get("Content-Range", ""))
+    if not match:
+        return jsonify({"message": "Content-Range: bytes <start>-<end>/<total> required"}), 400
+
+    start, end, total = int(match.group(1)), int(match.group(2)), match.group(3)
+    if total != "*" and int(total) != upload.file_size:
+        return jsonify({"message": "Content-Range total does not match the upload size"}), 400
+    if end < start:
+        return jsonify({"message": "Invalid Content-Range"}), 400
+    if end >= upload.file_size:
+        return jsonify({"message": "Upload exceeds its declared size", "offset": storage.size(upload.id)}), 413
+    length = end - start + 1
+    if request.content_length is not None and request.content_length != length:
+        return jsonify({"message": "Body length does not match Content-Range"}), 400
+
+    # The offset check and the write happen under the upload's storage lock
+    try:
+        offset = storage.append(upload.id, request.stream, start, length)
+    except StorageOffsetMismatch as e:
+        return jsonify({"message": "Chunk does not start at the current offset", "offset": e.size}), 409
+    except StorageLengthMismatch:
+        return jsonify({"message": "Body length does not match Content-Range", "offset": start}), 400
+
+    return jsonify(upload.to_dict(offset)), 200
+
+@files_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+@jwt_required()
+def abort_upload(upload_id):
+    upload = _own_upload(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload not found"}), 404
+
+    storage.abort(upload.id)
+    db.session.delete(upload)
     db.session.commit()
+    return jsonify({"message": "Upload aborted"}), 200
+
+@files_bp.route("/uploads/<upload_id>/complete", methods=["POST"])
+@jwt_required()
+def complete_upload(upload_id):
+    """Verify a fully received upload and register it as a File.
 
-    return jsonify({"message": "File deleted"}), 200
\ No newline at end of file
+    Takes the same association as ``POST /api/files/`` and optionally the
+    ``sha256`` of the content, if it was not given when the upload started.
+    """
+    data = request.get_json() or {}
+    user_id = int(get_jwt_identity())
+    upload = _own_upload(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload not found"}), 404
+
+    received = _upload_offset(upload)
+    if received != upload.file_size:
+        return jsonify({"message": "Upload incomplete", "offset": received}), 409
+
+    error = _association_error(data, user_id)
+    if error:
+        return jsonify({"message": error}), 400
+
+    if _known_blob(upload):
+        sha256 = upload.sha256
+    else:
+        sha256 = storage.digest(upload.id)
+        expected = upload.sha256 or (data.get("sha256") or "").lower() or None
+        if expected and sha256 != expected:
+            return jsonify({"message": "Checksum mismatch"}), 400
+
+    if not _reference_blob(upload, sha256):
+        return jsonify({"message": "Upload incomplete", "offset": storage.size(upload.id)}), 409
+    file_record = File(
+        filename=upload.filename,
+        file_url="",
+        file_size=upload.file_size,
+        file_type=upload.file_type,
+        content_hash=sha256,
+        uploader_id=user_id,
+        public_message_id=data.get("public_message_id"),
+        private_chat_id=data.get("private_chat_id")
+    )
+    db.session.add(file_record)
+    db.session.delete(upload)
+    db.session.flush()  # Get the file ID for its URL
+    file_record.file_url = url_for("api.files.download_file", file_id=file_record.id)
+    db.session.commit()
+
+    if file_record.public_message_id:
+        _refresh_cached_message(PUBLIC, file_record.public_message_id)
+
+    return jsonify(file_record.to_dict()), 201
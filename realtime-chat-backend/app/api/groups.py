@@ -0,0 +1,232 @@
+import orjson
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from app.extensions import db, message_cache, room_history, membership, query_budget
+from app.models.private_chat import PrivateChat
+from app.models.private_message import PrivateMessage
+from app.models.chat_member import ChatMember
+from app.models.user import User
+from app.models.sync_event import SyncEvent
+from app.models.read_mark import read_up_to
+from app.utils.message_cache import PRIVATE
+from app.utils.rooms import remember_message, remove_from_room
+from app.api.messages import history_page
+
+groups_bp = Blueprint("groups", __name__)
+
+def _member_group(chat_id, user_id):
+    """The group chat if ``user_id`` is a member of it, else None"""
+    if not ChatMember.is_member(chat_id, user_id):
+        return None
+    return db.session.get(PrivateChat, chat_id)
+
+def _requested_user_ids(data):
+    try:
+        return {int(user_id) for user_id in data.get("member_ids") or []}
+    except (TypeError, ValueError):
+        return None
+
+def _add_members(chat, user_ids, members=frozenset()):
+    """Add users to a group that has ``members``; returns an error response or None"""
+    max_members = current_app.config.get("GROUP_MAX_MEMBERS", 500)
+    if len(members | user_ids) > max_members:
+        return jsonify({"message": f"Groups are limited to {max_members} members"}), 400
+
+    existing = db.session.query(func.count(User.id)).filter(User.id.in_(user_ids)).scalar()
+    if existing != len(user_ids):
+        return jsonify({"message": "User not found"}), 404
+
+    db.session.add_all([ChatMember(chat_id=chat.id, user_id=user_id) for user_id in user_ids])
+    db.session.add_all([
+        SyncEvent(user_id=user_id, event=SyncEvent.CHAT_CREATED, chat_id=chat.id) for user_id in user_ids
+    ])
+    return None
+
+@groups_bp.route("/groups", methods=["GET"])
+@jwt_required()
+@query_budget.limit(3)
+def get_groups():
+    user_id = int(get_jwt_identity())
+    groups = (
+        PrivateChat.query.join(ChatMember, ChatMember.chat_id == PrivateChat.id)
+        .filter(ChatMember.user_id == user_id)
+        .order_by(PrivateChat.id)
+        .all()
+    )
+    chat_ids = [group.id for group in groups]
+    unread_counts = ChatMember.unread_counts(user_id, chat_ids)
+    member_counts = dict(
+        db.session.query(ChatMember.chat_id, func.count(ChatMember.id))
+        .filter(ChatMember.chat_id.in_(chat_ids))
+        .group_by(ChatMember.chat_id)
+        .all()
+    ) if chat_ids else {}
+
+    return jsonify({"groups": [
+        dict(
+            group.to_dict(),
+            member_count=member_counts.get(group.id, 0),
+            unread_count=unread_counts.get(group.id, 0)
+        ) for group in groups
+    ]}), 200
+
+@groups_bp.route("/groups", methods=["POST"])
+@jwt_required()
+def create_group():
+    data = request.get_json() or {}
+    user_id = int(get_jwt_identity())
+
+    name = (data.get("name") or "").strip()
+    if not name or len(name) > 100:
+        return jsonify({"message": "Group name must be 1-100 characters"}), 400
+
+    member_ids = _requested_user_ids(data)
+    if member_ids is None:
+        return jsonify({"message": "Invalid member IDs"}), 400
+
+    chat = PrivateChat(is_group=True, name=name, created_by=user_id)
+    db.session.add(chat)
+    db.session.flush()  # Get the chat ID
+
+    error = _add_members(chat, member_ids | {user_id})
+    if error:
+        db.session.rollback()
+        return error
+    db.session.commit()
+    membership.invalidate(chat.id)
+
+    return jsonify(dict(chat.to_dict(), member_ids=sorted(member_ids | {user_id}))), 201
+
+@groups_bp.route("/groups/<int:chat_id>", methods=["GET"])
+@jwt_required()
+@query_budget.limit(3)
+def get_group(chat_id):
+    user_id = int(get_jwt_identity())
+    chat = _member_group(chat_id, user_id)
+    if not chat:
+        return jsonify({"message": "Group not found"}), 404
+
+    members = (
+        User.query.join(ChatMember, ChatMember.user_id == User.id)
+        .filter(ChatMember.chat_id == chat_id)
+        .order_by(User.id)
+        .all()
+    )
+    return jsonify(dict(chat.to_dict(), members=[member.to_dict() for member in members])), 200
+
+@groups_bp.route("/groups/<int:chat_id>/members", methods=["POST"])
+@jwt_required()
+def add_group_members(chat_id):
+    data = request.get_json() or {}
+    user_id = int(get_jwt_identity())
+    chat = _member_group(chat_id, user_id)
+    if not chat:
+        return jsonify({"message": "Group not found"}), 404
+
+    member_ids = _requested_user_ids(data)
+    if member_ids is None:
+        return jsonify({"message": "Invalid member IDs"}), 400
+
+    members = ChatMember.member_ids(chat_id)
+    error = _add_members(chat, member_ids - members, members)
+    if error:
+        db.session.rollback()
+        return error
+
+    db.session.commit()
+    membership.invalidate(chat_id)
+
+    return jsonify({"member_ids": sorted(members | member_ids)}), 200
+
+@groups_bp.route("/groups/<int:chat_id>/members/<int:member_id>", methods=["DELETE"])
+@jwt_required()
+def remove_group_member(chat_id, member_id):
+    user_id = int(get_jwt_identity())
+    chat = _member_group(chat_id, user_id)
+    if not chat:
+        return jsonify({"message": "Group not found"}), 404
+
+    # Members can leave; only the creator removes others
+    if member_id != user_id and chat.created_by != user_id:
+        return jsonify({"message": "Only the group creator can remove members"}), 403
+
+    removed = ChatMember.query.filter_by(chat_id=chat_id, user_id=member_id).delete()
+    db.session.commit()
+    membership.invalidate(chat_id)
+    remove_from_room(member_id, f"private_chat_{chat_id}")
+
+    if not removed:
+        return jsonify({"message": "Not a member"}), 404
+    return jsonify({"message": "Member removed"}), 200
+
+@groups_bp.route("/groups/<int:chat_id>/messages", methods=["GET"])
+@jwt_required()
+@query_budget.limit(5)
+def get_group_messages(chat_id):
+    user_id = int(get_jwt_identity())
+    if not _member_group(chat_id, user_id):
+        return jsonify({"message": "Group not found"}), 404
+
+    messages = history_page(PrivateMessage.query.filter_by(chat_id=chat_id), PrivateMessage)
+    return jsonify({"messages": message_cache.get_fragments(PRIVATE, messages)}), 200
+
+@groups_bp.route("/groups/<int:chat_id>/messages", methods=["POST"])
+@jwt_required()
+@query_budget.limit(6)
+def create_group_message(chat_id):
+    data = request.get_json()
+    user_id = int(get_jwt_identity())
+    if not _member_group(chat_id, user_id):
+        return jsonify({"message": "Group not found"}), 404
+
+    message = PrivateMessage(
+        content=data["content"],
+        sender_id=user_id,
+        chat_id=chat_id
+    )
+    db.session.add(message)
+    db.session.commit()
+
+    return jsonify(orjson.Fragment(remember_message(f"private_chat_{chat_id}", PRIVATE, message))), 201
+
+@groups_bp.route("/groups/<int:chat_id>/messages/<int:message_id>", methods=["DELETE"])
+@jwt_required()
+def delete_group_message(chat_id, message_id):
+    user_id = int(get_jwt_identity())
+    chat = _member_group(chat_id, user_id)
+    message = db.session.get(PrivateMessage, message_id)
+    if not chat or not message or message.chat_id != chat_id:
+        return jsonify({"message": "Message not found"}), 404
+
+    if message.sender_id != user_id:
+        return jsonify({"message": "You can only delete your own messages"}), 403
+
+    db.session.delete(message)
+    db.session.add_all(SyncEvent.for_chat(chat, SyncEvent.MESSAGE_DELETED, message_id=message_id))
+    db.session.commit()
+    message_cache.invalidate(PRIVATE, message_id)
+    room_history.discard(f"private_chat_{chat_id}", message_id)
+
+    return jsonify({"message": "Message deleted"}), 200
+
+@groups_bp.route("/groups/<int:chat_id>/read", methods=["POST"])
+@jwt_required()
+@query_budget.limit(4)
+def mark_group_as_read(chat_id):
+    """Move the member's read mark to the last message, or to ``last_read_message_id`` of the body if earlier"""
+    user_id = int(get_jwt_identity())
+    if not ChatMember.is_member(chat_id, user_id):
+        return jsonify({"message": "Group not found"}), 404
+
+    requested = (request.get_json(silent=True) or {}).get("last_read_message_id")
+    try:
+        last_id = read_up_to(PrivateMessage.last_id(chat_id), requested)
+    except ValueError:
+        return jsonify({"message": "Invalid last_read_message_id"}), 400
+
+    if ChatMember.advance(last_id, create=False, chat_id=chat_id, user_id=user_id):
+        db.session.add(SyncEvent(user_id=user_id, event=SyncEvent.CHAT_READ, chat_id=chat_id))
+    db.session.commit()
+
+    return jsonify({"message": "Group marked as read", "last_read_message_id": last_id}), 200
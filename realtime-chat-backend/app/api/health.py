@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+from app.extensions import warmup
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/health", methods=["GET"])
+def health():
+    """Liveness: the worker is up and answering"""
+    return jsonify({"status": "ok"}), 200
+
+
+@health_bp.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: 503 while the startup warmup is still running, for rolling deploys to wait on"""
+    if not warmup.ready:
+        return jsonify({"ready": False, "phases": dict(warmup.phases)}), 503
+    return jsonify({"ready": True, "phases": dict(warmup.phases), "error": warmup.error}), 200
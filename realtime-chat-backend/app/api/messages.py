@@ -1,25 +1,47 @@
+import orjson
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.extensions import db
+from sqlalchemy import func
+from app.extensions import db, message_cache, room_history, query_budget
 from app.models.message import Message
+from app.models.channel import Channel
 from app.models.private_message import PrivateMessage
 from app.models.private_chat import PrivateChat
 from app.models.user import User
-from app.models.unread_count import UnreadCount
+from app.models.chat_read import ChatRead
+from app.models.chat_member import ChatMember
+from app.models.read_mark import read_up_to
+from app.models.sync_event import SyncEvent
+from app.utils.message_cache import PUBLIC, PRIVATE
+from app.utils.rooms import public_room, channel_room, remember_message
+
+HISTORY_PAGE_LIMIT = 200
+
+def history_page(query, model):
+    """Apply ``?before_id=&limit=`` paging; without ``before_id`` the full history is returned"""
+    before_id = request.args.get("before_id", type=int)
+    if before_id is None:
+        return query.order_by(model.id).all()
+
+    limit = min(request.args.get("limit", 50, type=int), HISTORY_PAGE_LIMIT)
+    page = query.filter(model.id < before_id).order_by(model.id.desc()).limit(limit).all()
+    return page[::-1]
 
 messages_bp = Blueprint("messages", __name__)
 
 # Public messages
 @messages_bp.route("/messages", methods=["GET"])
 @jwt_required()
+@query_budget.limit(3)
 def get_messages():
-    messages = Message.query.order_by(Message.timestamp).all()
-    return jsonify({"messages": [message.to_dict() for message in messages]}), 200
+    messages = history_page(Message.query.filter_by(channel_id=Channel.DEFAULT_ID), Message)
+    return jsonify({"messages": message_cache.get_fragments(PUBLIC, messages)}), 200
 
 
 
 @messages_bp.route("/messages", methods=["POST"])
 @jwt_required()
+@query_budget.limit(4)
 def create_message():
     data = request.get_json()
     user_id = int(get_jwt_identity())
@@ -31,13 +53,14 @@ def create_message():
     db.session.add(message)
     db.session.commit()
 
-    return jsonify(message.to_dict()), 201
+    return jsonify(orjson.Fragment(remember_message(public_room, PUBLIC, message))), 201
 
 
 
 # Private messages
 @messages_bp.route("/messages/private/<int:other_user_id>", methods=["GET"])
 @jwt_required()
+@query_budget.limit(4)
 def get_private_messages(other_user_id):
     user_id = int(get_jwt_identity())
 
@@ -45,13 +68,14 @@ def get_private_messages(other_user_id):
     if not chat:
         return jsonify({"messages": []}), 200
 
-    messages = PrivateMessage.query.filter_by(chat_id=chat.id).order_by(PrivateMessage.timestamp).all()
-    return jsonify({"messages": [message.to_dict() for message in messages]}), 200
+    messages = history_page(PrivateMessage.query.filter_by(chat_id=chat.id), PrivateMessage)
+    return jsonify({"messages": message_cache.get_fragments(PRIVATE, messages)}), 200
 
 
 
 @messages_bp.route("/messages/private/<int:other_user_id>", methods=["POST"])
 @jwt_required()
+@query_budget.limit(9)
 def create_private_message(other_user_id):
     data = request.get_json()
     user_id = int(get_jwt_identity())
@@ -59,11 +83,7 @@ def create_private_message(other_user_id):
     if user_id == other_user_id:
         return jsonify({"message": "Cannot send message to yourself"}), 400
 
-    chat = PrivateChat.get_chat_between_users(user_id, other_user_id)
-    if not chat:
-        chat = PrivateChat(user1_id=user_id, user2_id=other_user_id)
-        db.session.add(chat)
-        db.session.commit()
+    chat = PrivateChat.get_or_create_between_users(user_id, other_user_id)
 
     message = PrivateMessage(
         content=data["content"],
@@ -71,18 +91,10 @@ def create_private_message(other_user_id):
         chat_id=chat.id
     )
     db.session.add(message)
-
-    # Increment unread count for the other user
-    unread = UnreadCount.query.filter_by(user_id=other_user_id, chat_id=chat.id).first()
-    if not unread:
-        unread = UnreadCount(user_id=other_user_id, chat_id=chat.id, count=1)
-        db.session.add(unread)
-    else:
-        unread.count += 1
-
     db.session.commit()
 
-    return jsonify(message.to_dict()), 201
+    room_name = f"private_chat_{chat.id}"
+    return jsonify(orjson.Fragment(remember_message(room_name, PRIVATE, message))), 201
 
 @messages_bp.route("/messages/<int:message_id>", methods=["DELETE"])
 @jwt_required()
@@ -96,8 +108,13 @@ def delete_message(message_id):
     if message.user_id != user_id:
         return jsonify({"message": "You can only delete your own messages"}), 403
 
+    # Read before the commit: the deleted row cannot be loaded again afterwards
+    room = channel_room(message.channel_id)
     db.session.delete(message)
+    db.session.add(SyncEvent(event=SyncEvent.MESSAGE_DELETED, message_id=message_id))
     db.session.commit()
+    message_cache.invalidate(PUBLIC, message_id)
+    room_history.discard(room, message_id)
 
     return jsonify({"message": "Message deleted"}), 200
 
@@ -120,51 +137,95 @@ def delete_private_message(other_user_id, message_id):
     if not chat or message.chat_id != chat.id:
         return jsonify({"message": "Invalid chat or message"}), 404
 
+    room = f"private_chat_{chat.id}"
     db.session.delete(message)
+    db.session.add_all(SyncEvent.for_chat(chat, SyncEvent.MESSAGE_DELETED, message_id=message_id))
     db.session.commit()
+    message_cache.invalidate(PRIVATE, message_id)
+    room_history.discard(room, message_id)
 
     return jsonify({"message": "Message deleted"}), 200
 
 #get all private chats for the logged in user
 @messages_bp.route("/chats", methods=["GET"])
 @jwt_required()
+@query_budget.limit(6)
 def get_private_chats():
     user_id = int(get_jwt_identity())
     chats = PrivateChat.query.filter(
         (PrivateChat.user1_id == user_id) | (PrivateChat.user2_id == user_id)
     ).all()
+    if not chats:
+        return jsonify({"chats": []}), 200
+
+    # The other users, unread counts and last messages of all chats, a query each
+    chat_ids = [chat.id for chat in chats]
+    other_ids = {chat.user2_id if chat.user1_id == user_id else chat.user1_id for chat in chats}
+    other_users = {user.id: user for user in User.query.filter(User.id.in_(other_ids)).all()}
+    unread_counts = ChatRead.unread_counts(user_id, chat_ids)
+    last_ids = (
+        db.session.query(func.max(PrivateMessage.id))
+        .filter(PrivateMessage.chat_id.in_(chat_ids)).group_by(PrivateMessage.chat_id)
+    )
+    last_messages = PrivateMessage.query.filter(PrivateMessage.id.in_(last_ids.scalar_subquery())).all()
+    last_fragments = dict(zip(
+        (message.chat_id for message in last_messages), message_cache.get_fragments(PRIVATE, last_messages)
+    ))
 
     chat_list = []
     for chat in chats:
-        other_user_id = chat.user2_id if chat.user1_id == user_id else chat.user1_id
-        other_user = db.session.get(User, other_user_id)
-        unread = UnreadCount.query.filter_by(user_id=user_id, chat_id=chat.id).first()
-        unread_count = unread.count if unread else 0
-        
-        # Get the last message
-        last_message = PrivateMessage.query.filter_by(chat_id=chat.id).order_by(PrivateMessage.timestamp.desc()).first()
-        last_message_data = last_message.to_dict() if last_message else None
-        
+        other_user = other_users.get(chat.user2_id if chat.user1_id == user_id else chat.user1_id)
         chat_list.append({
             "chat_id": chat.id,
             "other_user": other_user.to_dict() if other_user else None,
-            "unread_count": unread_count,
-            "last_message": last_message_data
+            "unread_count": unread_counts.get(chat.id, 0),
+            "last_message": last_fragments.get(chat.id)
         })
 
     return jsonify({"chats": chat_list}), 200
 
 @messages_bp.route("/chats/<int:chat_id>/read", methods=["POST"])
 @jwt_required()
+@query_budget.limit(4)
 def mark_chat_as_read(chat_id):
+    """Move the user's read mark to the last message, or to ``last_read_message_id`` of the body if earlier"""
     user_id = int(get_jwt_identity())
     chat = db.session.get(PrivateChat, chat_id)
     if not chat or (chat.user1_id != user_id and chat.user2_id != user_id):
         return jsonify({"message": "Chat not found"}), 404
 
-    unread = UnreadCount.query.filter_by(user_id=user_id, chat_id=chat_id).first()
-    if unread:
-        unread.count = 0
-        db.session.commit()
+    requested = (request.get_json(silent=True) or {}).get("last_read_message_id")
+    try:
+        last_id = read_up_to(PrivateMessage.last_id(chat_id), requested)
+    except ValueError:
+        return jsonify({"message": "Invalid last_read_message_id"}), 400
+
+    if ChatRead.advance(last_id, user_id=user_id, chat_id=chat_id):
+        db.session.add(SyncEvent(user_id=user_id, event=SyncEvent.CHAT_READ, chat_id=chat_id))
+    db.session.commit()
+
+    return jsonify({"message": "Chat marked as read", "last_read_message_id": last_id}), 200
 
-    return jsonify({"message": "Chat marked as read"}), 200
\ No newline at end of file
+@messages_bp.route("/chats/<int:chat_id>/reads", methods=["GET"])
+@jwt_required()
+@query_budget.limit(3)
+def get_chat_reads(chat_id):
+    """Read marks of everyone in a direct or group chat, for read receipts.
+
+    A message has been read by a user once its id is at most their
+    ``last_read_message_id``.
+    """
+    user_id = int(get_jwt_identity())
+    chat = db.session.get(PrivateChat, chat_id)
+    member_ids = chat.member_ids() if chat else set()
+    if user_id not in member_ids:
+        return jsonify({"message": "Chat not found"}), 404
+
+    mark = ChatMember if chat.is_group else ChatRead
+    marks = dict(
+        db.session.query(mark.user_id, mark.last_read_message_id).filter(mark.chat_id == chat_id).all()
+    )
+    return jsonify({"chat_id": chat_id, "reads": [
+        {"user_id": member_id, "last_read_message_id": marks.get(member_id, 0)}
+        for member_id in sorted(member_ids)
+    ]}), 200
\ No newline at end of file
@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.extensions import message_cache, room_history, session_resume, ephemeral, rate_limiter, outbound, broadcast_batcher, membership, username_index, passwords, socket_auth, handshakes, warmup, query_budget, profiler, user_purger, sweeper
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+@jwt_required()
+def metrics():
+    """In-process counters of the caches and socket machinery of this worker.
+
+    ``outbound.deepest`` lists the outbound queue depths of the connections,
+    deepest first, capped by ``?limit=`` (default 50), without their sids.
+    """
+    limit = request.args.get("limit", 50, type=int)
+    if limit < 1:
+        return jsonify({"message": "limit must be positive"}), 400
+
+    return jsonify({
+        "outbound": outbound.stats(limit),
+        "message_cache": message_cache.stats(),
+        "room_history": room_history.stats(),
+        "session_resume": session_resume.stats(),
+        "ephemeral": {"pings": ephemeral.pings, "frames": ephemeral.frames},
+        "broadcast_batcher": broadcast_batcher.stats(),
+        "membership": membership.stats(),
+        "username_index": username_index.stats(),
+        "passwords": passwords.stats(),
+        "socket_auth": socket_auth.stats(),
+        "handshakes": handshakes.stats(),
+        "startup": warmup.stats(),
+        "query_budget": query_budget.stats(),
+        "profiler": profiler.stats(),
+        "user_purger": user_purger.stats(),
+        "sweeper": sweeper.stats(),
+        "rate_limiter": {"rejected": rate_limiter.rejected}
+    }), 200
@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from app.extensions import db, message_cache, query_budget
+from app.models.channel import Channel
+from app.models.channel_read import ChannelRead
+from app.models.message import Message
+from app.models.private_message import PrivateMessage
+from app.models.private_chat import PrivateChat
+from app.models.user import User
+from app.models.chat_read import ChatRead
+from app.models.sync_event import SyncEvent
+from app.models.chat_member import ChatMember
+from app.utils.message_cache import PUBLIC, PRIVATE
+
+sync_bp = Blueprint("sync", __name__)
+
+# Max rows read per source in one sync; clients keep calling while has_more is set
+SYNC_LIMIT = 500
+
+
+def encode_cursor(public_id, private_id, event_id):
+    return f"{public_id}.{private_id}.{event_id}"
+
+
+def decode_cursor(cursor):
+    public_id, private_id, event_id = (int(part) for part in cursor.split("."))
+    if min(public_id, private_id, event_id) < 0:
+        raise ValueError(cursor)
+    return public_id, private_id, event_id
+
+
+def user_chat_ids(user_id):
+    """Select of the ids of the user's direct and group chats"""
+    return db.union(
+        db.select(PrivateChat.id).where((PrivateChat.user1_id == user_id) | (PrivateChat.user2_id == user_id)),
+        db.select(ChatMember.chat_id).where(ChatMember.user_id == user_id),
+    )
+
+
+def followed_channels(user_id):
+    """Messages of the channels the user follows: the default one and those they keep a read mark in"""
+    return (Message.channel_id == Channel.DEFAULT_ID) | Message.channel_id.in_(
+        db.select(ChannelRead.channel_id).where(ChannelRead.user_id == user_id)
+    )
+
+
+def settled(rows, since):
+    """``(cursor, complete)`` after reading ``rows`` (in id order) past the cursor part ``since``.
+
+    Ids are handed out at insert but rows show up at commit, so a row can
+    appear after one with a higher id was read. The cursor stops before
+    the first row younger than ``SYNC_SETTLE`` seconds: those rows are sent
+    again by the next sync (clients keep messages by id), and any row that
+    commits within that time of its insert is still found. ``complete`` is
+    False when rows were held back.
+    """
+    settle = current_app.config.get("SYNC_SETTLE", 10)
+    if not settle:
+        return (rows[-1][0] if rows else since), True
+    cutoff = datetime.utcnow() - timedelta(seconds=settle)
+    cursor = since
+    for row_id, created_at in rows:
+        if created_at > cutoff:
+            return cursor, False
+        cursor = row_id
+    return cursor, True
+
+
+def settled_max(id_column, created_column):
+    """The cursor part of a source for a client that holds all its rows: its max id, minus the unsettled rows"""
+    newest = db.session.query(func.max(id_column)).scalar_subquery()
+    rows = (
+        db.session.query(id_column, created_column)
+        .filter(id_column > newest - SYNC_LIMIT).order_by(id_column).all()
+    )
+    if not rows:
+        return 0
+    return settled(rows, rows[0][0] - 1)[0]
+
+
+def current_cursor():
+    return encode_cursor(
+        settled_max(Message.id, Message.timestamp),
+        settled_max(PrivateMessage.id, PrivateMessage.timestamp),
+        settled_max(SyncEvent.id, SyncEvent.created_at),
+    )
+
+
+@sync_bp.route("/sync", methods=["GET"])
+@jwt_required()
+@query_budget.limit(7)
+def sync():
+    """Everything that changed for the current user since ``?since=<cursor>``.
+
+    Without ``since`` only the current cursor is returned; clients fetch it
+    right after a full history load. Each source is read by an indexed id
+    range, so the cost follows the number of changes, not the history size,
+    and the user's chats are only loaded when some of them changed. Public
+    messages are those of the channels the user follows (``followed_channels``).
+
+    Sync events are kept ``SYNC_RETENTION_DAYS`` (app.utils.sweeper); a
+    cursor from before the oldest one left gets 410 and the client reloads
+    its history and starts over from a fresh cursor.
+    """
+    user_id = int(get_jwt_identity())
+
+    since = request.args.get("since")
+    if not since:
+        return jsonify({"cursor": current_cursor()}), 200
+    try:
+        public_id, private_id, event_id = decode_cursor(since)
+    except ValueError:
+        return jsonify({"message": "Invalid cursor"}), 400
+
+    # Events after the cursor may have been swept: a gap below the oldest event left
+    oldest_event_id = db.session.query(func.min(SyncEvent.id)).scalar()
+    if oldest_event_id is not None and event_id < oldest_event_id - 1:
+        return jsonify({"message": "Cursor is past the sync retention, resync required", "resync": True}), 410
+
+    public_messages = (
+        Message.query.filter(Message.id > public_id, followed_channels(user_id))
+        .order_by(Message.id).limit(SYNC_LIMIT).all()
+    )
+    private_messages = (
+        PrivateMessage.query.filter(
+            PrivateMessage.chat_id.in_(user_chat_ids(user_id)), PrivateMessage.id > private_id
+        ).order_by(PrivateMessage.id).limit(SYNC_LIMIT).all()
+    )
+    events = (
+        SyncEvent.query.filter(
+            SyncEvent.id > event_id,
+            (SyncEvent.user_id == user_id) | (SyncEvent.user_id.is_(None))
+        ).order_by(SyncEvent.id).limit(SYNC_LIMIT).all()
+    )
+
+    has_more = False
+    cursor = []
+    for rows, since_id in ((public_messages, public_id), (private_messages, private_id)):
+        position, complete = settled([(row.id, row.timestamp) for row in rows], since_id)
+        cursor.append(position)
+        has_more |= complete and len(rows) == SYNC_LIMIT
+    position, complete = settled([(event.id, event.created_at) for event in events], event_id)
+    cursor.append(position)
+    has_more |= complete and len(events) == SYNC_LIMIT
+
+    public_deleted = []
+    private_deleted = []
+    deleted_chat_ids = []
+    changed_chat_ids = {message.chat_id for message in private_messages}
+    created_chat_ids = set()
+    for event in events:
+        if event.event == SyncEvent.MESSAGE_DELETED:
+            if event.chat_id is None:
+                public_deleted.append(event.message_id)
+            else:
+                private_deleted.append({"chat_id": event.chat_id, "id": event.message_id})
+        elif event.event == SyncEvent.CHAT_CREATED:
+            created_chat_ids.add(event.chat_id)
+        elif event.event == SyncEvent.CHAT_DELETED:
+            deleted_chat_ids.append(event.chat_id)
+        if event.chat_id is not None:
+            changed_chat_ids.add(event.chat_id)
+
+    chat_list = []
+    chats = {}
+    if changed_chat_ids:
+        # Deleted chats and those the user left drop out here
+        chats = {
+            chat.id: chat for chat in PrivateChat.query.filter(
+                PrivateChat.id.in_(changed_chat_ids), PrivateChat.id.in_(user_chat_ids(user_id))
+            ).all()
+        }
+        changed_chat_ids &= set(chats)
+    if changed_chat_ids:
+        unread_counts = ChatRead.unread_counts(
+            user_id, [chat_id for chat_id in changed_chat_ids if not chats[chat_id].is_group]
+        )
+        unread_counts.update(ChatMember.unread_counts(
+            user_id, [chat_id for chat_id in changed_chat_ids if chats[chat_id].is_group]
+        ))
+        other_ids = {
+            chats[chat_id].user2_id if chats[chat_id].user1_id == user_id else chats[chat_id].user1_id
+            for chat_id in created_chat_ids & changed_chat_ids if not chats[chat_id].is_group
+        }
+        other_users = {user.id: user for user in User.query.filter(User.id.in_(other_ids)).all()} if other_ids else {}
+
+        for chat_id in sorted(changed_chat_ids):
+            chat = chats[chat_id]
+            entry = {"chat_id": chat_id, "unread_count": unread_counts.get(chat_id, 0)}
+            if chat_id in created_chat_ids and chat.is_group:
+                entry["group"] = chat.to_dict()
+            elif chat_id in created_chat_ids:
+                other_user = other_users.get(chat.user2_id if chat.user1_id == user_id else chat.user1_id)
+                entry["other_user"] = other_user.to_dict() if other_user else None
+            chat_list.append(entry)
+
+    return jsonify({
+        "cursor": encode_cursor(*cursor),
+        "has_more": has_more,
+        "public": {
+            "messages": message_cache.get_fragments(PUBLIC, public_messages),
+            "deleted": public_deleted
+        },
+        "private": {
+            "messages": message_cache.get_fragments(PRIVATE, private_messages),
+            "deleted": private_deleted,
+            "deleted_chats": deleted_chat_ids
+        },
+        "chats": chat_list
+    }), 200
@@ -1,15 +1,44 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.user import User
-from app.extensions import db
+from app.models.user_purge import UserPurge
+from app.extensions import db, message_cache, room_history, username_index, socket_auth, query_budget, user_purger
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.utils.pagination import cursor_page
+from app.utils.rooms import disconnect_user
 
 user_bp = Blueprint("user", __name__)
 
 @user_bp.route("/", methods=["GET"])
+@query_budget.limit(1)
 def get_users():
 
-    users = User.query.all()
-    return jsonify({"users": [user.to_dict() for user in users]}), 200
+    users, next_cursor = cursor_page(User.query.filter(User.deleted_at.is_(None)), User.id, descending=False)
+    return jsonify({"users": [user.to_dict() for user in users], "next_cursor": next_cursor}), 200
+
+@user_bp.route("/search", methods=["GET"])
+@jwt_required()
+@query_budget.limit(1)
+def search_users():
+    """Autocomplete: users whose username starts with ``?prefix=``, closest first"""
+    prefix = (request.args.get("prefix") or "").strip()
+    if not prefix or len(prefix) > 80:
+        return jsonify({"message": "prefix must be 1-80 characters"}), 400
+
+    max_limit = current_app.config.get("USER_SEARCH_LIMIT", 20)
+    limit = max(1, min(request.args.get("limit", max_limit, type=int), max_limit))
+
+    if username_index.enabled:
+        if not username_index.loaded:
+            username_index.load(db.session.query(User.id, User.username, User.avatar_url))
+        users = username_index.search(prefix, limit)
+    else:
+        users = User.search_prefix(prefix, limit)
+
+    # Key order puts an exact match first and shorter completions before longer ones
+    return jsonify({"users": [
+        {"id": user_id, "username": username, "avatar_url": avatar_url}
+        for user_id, username, avatar_url in users
+    ]}), 200
 
 @user_bp.route("/auth-user", methods=["GET"])
 @jwt_required()
@@ -41,6 +70,11 @@ def update_auth_user():
         user.avatar_url = data["avatar_url"]
 
     db.session.commit()
+    # Cached messages embed the author's username and avatar
+    message_cache.invalidate_author(user.id)
+    room_history.invalidate_author(user.id)
+    username_index.add(user.id, user.username, user.avatar_url)
+    socket_auth.invalidate_user(user.id)
 
     return jsonify({"message": "User updated successfully",
                     "user": {
@@ -74,20 +108,51 @@ def change_password():
     return jsonify({"message": "Password changed successfully"}), 200
 
 @user_bp.route("/<int:user_id>", methods=["DELETE"])
+@jwt_required()
+@query_budget.limit(4)
 def delete_user(user_id):
+    """Anonymize and lock out the user now; their data is purged in the background (see ``/purge``)"""
+    if int(get_jwt_identity()) != user_id:
+        return jsonify({"message": "You can only delete your own account"}), 403
 
     user = db.session.get(User, user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
-    db.session.delete(user)
-    db.session.commit()
 
-    return jsonify({"message": "User deleted successfully"}), 200
+    if user.deleted_at is None:
+        user.mark_deleted()
+        purge = UserPurge(user_id=user_id)
+        db.session.add(purge)
+        db.session.commit()
+        message_cache.invalidate_author(user_id)
+        room_history.invalidate_author(user_id)
+        username_index.remove(user_id)
+        socket_auth.invalidate_user(user_id)
+        disconnect_user(user_id)
+    else:
+        purge = db.session.get(UserPurge, user_id)
+    user_purger.wake(current_app._get_current_object())
+
+    return jsonify({"message": "User deletion started", "purge": purge.to_dict()}), 202
+
+@user_bp.route("/<int:user_id>/purge", methods=["GET"])
+@jwt_required()
+@query_budget.limit(1)
+def get_user_purge(user_id):
+    """Progress of removing the caller's own data, readable with their tokens after the delete"""
+    if int(get_jwt_identity()) != user_id:
+        return jsonify({"message": "You can only follow your own account's deletion"}), 403
+
+    purge = db.session.get(UserPurge, user_id)
+    if not purge:
+        return jsonify({"message": "User not deleted"}), 404
+    return jsonify({"purge": purge.to_dict()}), 200
 
 @user_bp.route("/<int:user_id>", methods=["GET"])
+@query_budget.limit(1)
 def get_user(user_id):
 
     user = db.session.get(User, user_id)
-    if not user:
+    if not user or user.deleted_at:
         return jsonify({"message": "User not found"}), 404
     return jsonify({"user": user.to_dict()}), 200
\ No newline at end of file
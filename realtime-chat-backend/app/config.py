@@ -5,7 +5,160 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Under eventlet, let psycopg2 wait for Postgres through the hub (app.utils.green_db)
+    # instead of blocking the whole worker on every query
+    DB_GREEN_DRIVER = os.getenv("DB_GREEN_DRIVER", "true").lower() == "true"
+
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "jwt-super-secret-key")
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour in seconds
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = "access"
+
+    # Max number of pre-encoded messages kept by app.utils.message_cache
+    # (per worker, like app.utils.room_history: both are off when Socket.IO uses a message queue)
+    MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", 10000))
+
+    # Recent messages kept in memory per room (app.utils.room_history) and the global cap
+    ROOM_HISTORY_WINDOW = int(os.getenv("ROOM_HISTORY_WINDOW", 50))
+    ROOM_HISTORY_MAX_BYTES = int(os.getenv("ROOM_HISTORY_MAX_BYTES", 32 * 1024 * 1024))
+
+    # Socket session resume (app.utils.session_resume): grace period in seconds and replay buffer size per room
+    SESSION_RESUME_GRACE = int(os.getenv("SESSION_RESUME_GRACE", 120))
+    SESSION_REPLAY_BUFFER = int(os.getenv("SESSION_REPLAY_BUFFER", 200))
+    SESSION_REPLAY_MAX_ROOMS = int(os.getenv("SESSION_REPLAY_MAX_ROOMS", 10000))
+
+    # Typing indicators and presence (app.utils.ephemeral): flush interval and TTLs in seconds
+    EPHEMERAL_INTERVAL = float(os.getenv("EPHEMERAL_INTERVAL", 0.5))
+    TYPING_TTL = float(os.getenv("TYPING_TTL", 5))
+    PRESENCE_TTL = float(os.getenv("PRESENCE_TTL", 60))
+
+    # Token buckets, (tokens per second, burst), keyed by socket event or REST endpoint name.
+    # Socket events are limited per connection and per user, REST routes per user (or IP).
+    # Buckets live in the worker ("memory://") or in Redis ("redis://...", needs the redis package).
+    RATE_LIMIT_STORAGE_URL = os.getenv("RATE_LIMIT_STORAGE_URL", "memory://")
+    RATE_LIMITS = {
+        "send_public_message": (2, 10),
+        "send_private_message": (2, 10),
+        "send_public_file": (0.5, 5),
+        "send_private_file": (0.5, 5),
+        "send_public_files": (0.5, 5),
+        "send_private_files": (0.5, 5),
+        "join_private": (2, 10),
+        "join_channel": (2, 10),
+        "join_group": (2, 10),
+        "send_group_message": (2, 10),
+        "mark_chat_read": (2, 10),
+        "mark_public_read": (2, 10),
+        "resume": (0.2, 3),
+        "profile": (0.2, 3),
+        "typing": (5, 10),
+        "presence_ping": (1, 3),
+        "api.auth.login": (0.2, 5),
+        "api.auth.register": (0.1, 3),
+        "api.messages.create_message": (2, 10),
+        "api.messages.create_private_message": (2, 10),
+        "api.channels.create_channel": (0.1, 3),
+        "api.channels.create_channel_message": (2, 10),
+        "api.groups.create_group": (0.1, 3),
+        "api.groups.create_group_message": (2, 10),
+        "api.files.create_file": (1, 10),
+        "api.files.create_files": (0.5, 5),
+        "api.user.search_users": (5, 20),
+    }
+
+    # Outbound backpressure (app.utils.backpressure), in queued packets per connection
+    OUTBOUND_HIGH_WATERMARK = int(os.getenv("OUTBOUND_HIGH_WATERMARK", 64))
+    OUTBOUND_LOW_WATERMARK = int(os.getenv("OUTBOUND_LOW_WATERMARK", 16))
+    OUTBOUND_HARD_LIMIT = int(os.getenv("OUTBOUND_HARD_LIMIT", 512))
+    OUTBOUND_BATCH_INTERVAL = float(os.getenv("OUTBOUND_BATCH_INTERVAL", 1.0))
+
+    # Micro-batching of busy room broadcasts (app.utils.broadcast_batch): new_public_message
+    # events are gathered for this many seconds and sent as one new_public_messages frame.
+    # 0 sends every message on its own; 0.02-0.05 trades that much latency for far fewer frames.
+    BROADCAST_BATCH_WINDOW = float(os.getenv("BROADCAST_BATCH_WINDOW", 0))
+    BROADCAST_BATCH_MAX = int(os.getenv("BROADCAST_BATCH_MAX", 100))
+
+    # Group chats: member cap, and how many groups' member sets are cached per worker for fan-out
+    # and for how many seconds (other workers' membership changes show up after at most that long)
+    GROUP_MAX_MEMBERS = int(os.getenv("GROUP_MAX_MEMBERS", 500))
+    GROUP_MEMBERSHIP_CACHE_SIZE = int(os.getenv("GROUP_MEMBERSHIP_CACHE_SIZE", 10000))
+    GROUP_MEMBERSHIP_CACHE_TTL = float(os.getenv("GROUP_MEMBERSHIP_CACHE_TTL", 10))
+
+    # Most files accepted by POST /api/files/batch and the send_*_files socket events
+    FILE_BATCH_MAX = int(os.getenv("FILE_BATCH_MAX", 20))
+
+    # File uploads: largest accepted file, enforced while streaming; chunk size suggested to
+    # clients; storage backend ("local") and its directory (default instance/uploads)
+    FILE_MAX_SIZE = int(os.getenv("FILE_MAX_SIZE", 5 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_ROOT = os.getenv("STORAGE_ROOT")
+
+    # GET /api/users/search: most results per query, and whether to answer from an in-memory
+    # trie instead of the username index (only for single-worker deployments)
+    USER_SEARCH_LIMIT = int(os.getenv("USER_SEARCH_LIMIT", 20))
+    USER_SEARCH_TRIE = os.getenv("USER_SEARCH_TRIE", "false").lower() == "true"
+
+    # Password hashing (app.utils.passwords): werkzeug method string, e.g. "scrypt" or
+    # "pbkdf2:sha256:600000", and how many hashes may run at once in eventlet's OS thread pool.
+    # Users hashed with other parameters are re-hashed on their next login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", 4))
+
+    # Socket handshakes: seconds a validated token and its user are cached for reconnects,
+    # and admission control for reconnect storms (concurrent handshakes, how many may queue
+    # and for how long, and the base retry hint in seconds given to refused clients)
+    SOCKET_AUTH_CACHE_TTL = int(os.getenv("SOCKET_AUTH_CACHE_TTL", 60))
+    SOCKET_AUTH_CACHE_SIZE = int(os.getenv("SOCKET_AUTH_CACHE_SIZE", 10000))
+    SOCKET_HANDSHAKE_CONCURRENCY = int(os.getenv("SOCKET_HANDSHAKE_CONCURRENCY", 32))
+    SOCKET_HANDSHAKE_QUEUE = int(os.getenv("SOCKET_HANDSHAKE_QUEUE", 1000))
+    SOCKET_HANDSHAKE_WAIT = float(os.getenv("SOCKET_HANDSHAKE_WAIT", 5.0))
+    SOCKET_HANDSHAKE_RETRY = float(os.getenv("SOCKET_HANDSHAKE_RETRY", 2.0))
+
+    # Startup warmup (app.utils.warmup): before reporting ready on GET /api/ready, fill this many
+    # pooled DB connections and the room history of the most recently active channels and chats
+    WARMUP_ON_START = os.getenv("WARMUP_ON_START", "false").lower() == "true"
+    WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", 5))
+    WARMUP_CHANNELS = int(os.getenv("WARMUP_CHANNELS", 20))
+    WARMUP_PRIVATE_CHATS = int(os.getenv("WARMUP_PRIVATE_CHATS", 200))
+
+    # Query budgets (app.utils.query_budget): "off", "log" or "raise" when a route or socket event
+    # declared with @query_budget.limit(n) runs more than n statements. When on, every REST
+    # response carries X-Query-Count and statements repeated this many times (N+1s) are logged.
+    QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off")
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 3))
+
+    # Sampling profiler (app.utils.profiler): share of REST requests and socket events profiled
+    # into per-handler collapsed-stack files under PROFILE_DIR (default instance/profiles), and a
+    # token that profiles one request on demand (X-Profile header) or a connection's next events
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+
+    # Deleted users (app.utils.user_purge): whether this worker removes their data in the background,
+    # rows per batch, seconds between batches, and how long a worker holds a purge before another
+    # may take it over
+    USER_PURGE_WORKER = os.getenv("USER_PURGE_WORKER", "true").lower() == "true"
+    USER_PURGE_BATCH_SIZE = int(os.getenv("USER_PURGE_BATCH_SIZE", 500))
+    USER_PURGE_PAUSE = float(os.getenv("USER_PURGE_PAUSE", 0.1))
+    USER_PURGE_LEASE = int(os.getenv("USER_PURGE_LEASE", 60))
+
+    # Background sweeps (app.utils.sweeper): whether this worker runs them, seconds between sweeps
+    # and rows deleted per batch
+    SWEEP_WORKER = os.getenv("SWEEP_WORKER", "true").lower() == "true"
+    SWEEP_INTERVAL = int(os.getenv("SWEEP_INTERVAL", 3600))
+    SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", 500))
+
+    # GET /api/sync: days sync events are kept (older cursors are told to resync), and seconds a
+    # new row stays in the overlap re-read by the next sync, to catch rows committed out of id order
+    SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", 30))
+    SYNC_SETTLE = int(os.getenv("SYNC_SETTLE", 10))
+
+    # Chunked uploads not completed within this many hours are removed with their bytes by the sweeper
+    UPLOAD_TTL_HOURS = int(os.getenv("UPLOAD_TTL_HOURS", 24))
+
+    # asyncio mode (asgi.py): threads running the Flask REST routes. It only serves the core chat
+    # events (app.aio.events), so it refuses to start unless ASGI_PREVIEW is set, e.g. to benchmark it
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 10))
+    ASGI_PREVIEW = os.getenv("ASGI_PREVIEW", "false").lower() == "true"
@@ -1,19 +1,81 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO
+from socketio import PubSubManager
 from flask_cors import CORS
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
+from app.utils import fast_json
+from app.utils.message_cache import MessageCache
+from app.utils.room_history import RoomHistory
+from app.utils.session_resume import SessionResume
+from app.utils.ephemeral import EphemeralEvents
+from app.utils.rate_limit import RateLimiter
+from app.utils.backpressure import BackpressureManager
+from app.utils.broadcast_batch import BroadcastBatcher
+from app.utils.membership import MembershipCache
+from app.utils.storage import FileStorage
+from app.utils.username_index import UsernameIndex
+from app.utils.passwords import PasswordHasher
+from app.utils.socket_auth import SocketAuthCache
+from app.utils.admission import HandshakeAdmission
+from app.utils.green_db import init_green_db
+from app.utils.migrations import LazyMigrate
+from app.utils.warmup import Warmup
+from app.utils.query_budget import QueryBudget
+from app.utils.profiler import Profiler
+from app.utils.user_purge import UserPurger
+from app.utils.sweeper import Sweeper
 
 db = SQLAlchemy()
-migrate = Migrate()
+migrate = LazyMigrate()
 jwt = JWTManager()
-socketio = SocketIO(cors_allowed_origins="*", async_mode="eventlet")
+outbound = BackpressureManager()
+socketio = SocketIO(cors_allowed_origins="*", async_mode="eventlet", json=fast_json, client_manager=outbound)
+message_cache = MessageCache()
+room_history = RoomHistory()
+session_resume = SessionResume()
+ephemeral = EphemeralEvents()
+rate_limiter = RateLimiter()
+broadcast_batcher = BroadcastBatcher()
+membership = MembershipCache()
+storage = FileStorage()
+username_index = UsernameIndex()
+passwords = PasswordHasher()
+socket_auth = SocketAuthCache()
+handshakes = HandshakeAdmission()
+warmup = Warmup()
+query_budget = QueryBudget()
+profiler = Profiler()
+user_purger = UserPurger()
+sweeper = Sweeper()
 
 def init_extensions(app):
+    app.json = fast_json.OrjsonProvider(app)
+    init_green_db(app)  # before the first DB connection is made
     db.init_app(app)
     migrate.init_app(app, db) 
     jwt.init_app(app)
     socketio.init_app(app)
+    # Both caches only see this worker's sends, edits and deletes, so they need each room on one
+    # worker (sticky sessions); a message queue spreads rooms over workers and turns them off
+    sticky_rooms = not isinstance(socketio.server.manager, PubSubManager)
+    message_cache.init_app(app, enabled=sticky_rooms)
+    room_history.init_app(app, enabled=sticky_rooms)
+    session_resume.init_app(app)
+    ephemeral.init_app(app, socketio)
+    rate_limiter.init_app(app)
+    outbound.init_app(app)
+    broadcast_batcher.init_app(app, socketio)
+    membership.init_app(app)
+    storage.init_app(app)
+    username_index.init_app(app)
+    passwords.init_app(app)
+    socket_auth.init_app(app)
+    handshakes.init_app(app)
+    warmup.init_app(app)
+    query_budget.init_app(app)
+    profiler.init_app(app)
+    user_purger.init_app(app)
+    sweeper.init_app(app)
     CORS(
         app,
         origins=[
@@ -1,6 +1,17 @@
+from flask import request
 from flask_jwt_extended import get_jwt
+from app.extensions import db
 from app.models.token_blocklist import TokenBlocklist
+from app.models.user import User
 
 def check_if_token_revoked(jwt_header, jwt_payload):
+    """Logged out tokens, and every token of a deleted user, in one query.
+
+    A deleted user's tokens still read the progress of their own purge.
+    """
     jti = jwt_payload["jti"]
-    return TokenBlocklist.query.filter_by(jti=jti).first() is not None
+    logged_out = db.select(TokenBlocklist.id).where(TokenBlocklist.jti == jti)
+    if request.endpoint == "api.user.get_user_purge":
+        return db.session.execute(logged_out).first() is not None
+    deleted = db.select(User.id).where(User.id == int(jwt_payload["sub"]), User.deleted_at.isnot(None))
+    return db.session.execute(logged_out.union_all(deleted).limit(1)).first() is not None
@@ -4,4 +4,11 @@ from .private_chat import PrivateChat
 from .private_message import PrivateMessage
 from .file import File
 from .token_blocklist import TokenBlocklist
-from .unread_count import UnreadCount
+from .chat_read import ChatRead
+from .sync_event import SyncEvent
+from .channel import Channel
+from .channel_read import ChannelRead
+from .chat_member import ChatMember
+from .upload import Upload
+from .blob import Blob
+from .user_purge import UserPurge
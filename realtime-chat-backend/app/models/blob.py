@@ -0,0 +1,36 @@
+from datetime import datetime
+from app.extensions import db
+
+class Blob(db.Model):
+    """One stored object, shared by every File with the same content.
+
+    The SHA-256 of the content is the key, both here and in the storage
+    backend. ``ref_count`` counts the File rows pointing at it. A blob whose
+    last File went stays at 0 until the sweeper (app.utils.sweeper) removes
+    the row and the object together; until then a new upload of the same
+    content simply takes it back.
+    """
+    __tablename__ = "blobs"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @staticmethod
+    def add_reference(sha256):
+        """Count one more File on an existing blob; False when there is no such blob"""
+        updated = db.session.query(Blob).filter_by(sha256=sha256).update(
+            {Blob.ref_count: Blob.ref_count + 1}, synchronize_session=False
+        )
+        return updated == 1
+
+    @staticmethod
+    def release(sha256, count=1):
+        """Drop ``count`` references; the object itself is left to the sweeper"""
+        db.session.query(Blob).filter_by(sha256=sha256).update(
+            {Blob.ref_count: Blob.ref_count - count}, synchronize_session=False
+        )
+
+    def __repr__(self):
+        return f"<Blob {self.sha256[:12]} refs={self.ref_count}>"
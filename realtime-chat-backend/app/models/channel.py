@@ -0,0 +1,37 @@
+from datetime import datetime
+from app.extensions import db
+
+class Channel(db.Model):
+    """A named public channel; each one has its own socket room and message history.
+
+    The ``general`` channel (id 1) is the original public chat. It is created
+    together with the table, keeps the ``public_chat`` room and is the
+    channel of messages sent without a ``channel_id``.
+    """
+    __tablename__ = "channels"
+
+    DEFAULT_ID = 1
+    DEFAULT_NAME = "general"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Channel {self.name}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat()
+        }
+
+@db.event.listens_for(Channel.__table__, "after_create")
+def create_default_channel(target, connection, **kw):
+    # First row of a new table, so it gets id 1 (DEFAULT_ID) without touching the sequence
+    connection.execute(target.insert().values(name=Channel.DEFAULT_NAME, created_at=datetime.utcnow()))
@@ -0,0 +1,21 @@
+from app.extensions import db
+from app.models.read_mark import ReadMark
+
+class ChannelRead(ReadMark, db.Model):
+    """How far a user has read a channel.
+
+    Channel unread counts are ``messages with id > last_read_message_id``,
+    counted on demand over the ``(channel_id, id)`` index, so a new message
+    writes nothing per member no matter how big the channel is.
+    """
+    __tablename__ = "channel_reads"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    channel_id = db.Column(db.Integer, db.ForeignKey("channels.id"), nullable=False)
+    last_read_message_id = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'channel_id', name='unique_user_channel'),)
+
+    def __repr__(self):
+        return f"<ChannelRead user={self.user_id} channel={self.channel_id} last={self.last_read_message_id}>"
@@ -0,0 +1,56 @@
+from datetime import datetime
+from sqlalchemy import func
+from app.extensions import db
+from app.models.read_mark import ReadMark
+
+class ChatMember(ReadMark, db.Model):
+    """Membership of a group chat.
+
+    Unread counts are ``messages with id > last_read_message_id`` not sent by
+    the member, counted on demand over the ``(chat_id, id)`` index of
+    private_messages, so a new group message writes one row however many
+    members the group has.
+    """
+    __tablename__ = "chat_members"
+
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey("private_chats.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_read_message_id = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('chat_id', 'user_id', name='unique_chat_member'),
+        db.Index("ix_chat_members_user_id", "user_id"),
+    )
+
+    @staticmethod
+    def member_ids(chat_id):
+        return {user_id for (user_id,) in db.session.query(ChatMember.user_id).filter_by(chat_id=chat_id)}
+
+    @staticmethod
+    def is_member(chat_id, user_id):
+        """Whether ``user_id`` is in the group, read over the (chat_id, user_id) unique index"""
+        return db.session.query(ChatMember.id).filter_by(chat_id=chat_id, user_id=user_id).first() is not None
+
+    @staticmethod
+    def unread_counts(user_id, chat_ids):
+        """chat id -> unread count of ``user_id`` in the given group chats, in one query"""
+        from app.models.private_message import PrivateMessage
+
+        if not chat_ids:
+            return {}
+        return dict(
+            db.session.query(PrivateMessage.chat_id, func.count(PrivateMessage.id))
+            .join(ChatMember, (ChatMember.chat_id == PrivateMessage.chat_id) & (ChatMember.user_id == user_id))
+            .filter(
+                PrivateMessage.chat_id.in_(chat_ids),
+                PrivateMessage.id > ChatMember.last_read_message_id,
+                PrivateMessage.sender_id != user_id
+            )
+            .group_by(PrivateMessage.chat_id)
+            .all()
+        )
+
+    def __repr__(self):
+        return f"<ChatMember chat={self.chat_id} user={self.user_id}>"
@@ -0,0 +1,52 @@
+from sqlalchemy import func, select
+from app.extensions import db
+from app.models.read_mark import ReadMark
+
+class ChatRead(ReadMark, db.Model):
+    """How far a user has read a direct chat.
+
+    Unread counts are ``messages with id > last_read_message_id`` not sent by
+    the user, counted on demand over the ``(chat_id, id)`` index of
+    private_messages; no row means nothing read yet. A message is read by
+    the other user once its id is at most their mark, which is what read
+    receipts report.
+    """
+    __tablename__ = "chat_reads"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    chat_id = db.Column(db.Integer, db.ForeignKey("private_chats.id"), nullable=False)
+    last_read_message_id = db.Column(db.Integer, default=0, nullable=False)
+
+    # Chat first: read receipts list a chat's marks
+    __table_args__ = (db.UniqueConstraint('chat_id', 'user_id', name='unique_chat_read'),)
+
+    @staticmethod
+    def unread_query(user_id, chat_ids):
+        """Select of (chat id, unread count) of ``user_id`` in the given direct chats; chats with none are left out"""
+        from app.models.private_message import PrivateMessage
+
+        return (
+            select(PrivateMessage.chat_id, func.count(PrivateMessage.id))
+            .outerjoin(ChatRead, (ChatRead.chat_id == PrivateMessage.chat_id) & (ChatRead.user_id == user_id))
+            .where(
+                PrivateMessage.chat_id.in_(chat_ids),
+                PrivateMessage.id > func.coalesce(ChatRead.last_read_message_id, 0),
+                PrivateMessage.sender_id != user_id
+            )
+            .group_by(PrivateMessage.chat_id)
+        )
+
+    @staticmethod
+    def unread_counts(user_id, chat_ids):
+        """chat id -> unread count of ``user_id`` in the given direct chats, in one query"""
+        if not chat_ids:
+            return {}
+        return dict(db.session.execute(ChatRead.unread_query(user_id, chat_ids)).all())
+
+    @staticmethod
+    def unread_count(user_id, chat_id):
+        return ChatRead.unread_counts(user_id, [chat_id]).get(chat_id, 0)
+
+    def __repr__(self):
+        return f"<ChatRead user={self.user_id} chat={self.chat_id} last={self.last_read_message_id}>"
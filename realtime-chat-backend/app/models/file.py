@@ -1,5 +1,11 @@
 from datetime import datetime
 from app.extensions import db
+from app.utils.files import file_category
+
+def _category(context):
+    # A column default so bulk inserts (File.insert_many) get it too
+    params = context.get_current_parameters()
+    return file_category(params["filename"], params.get("file_type"))
 
 class File(db.Model):
     __tablename__ = "files"
@@ -11,17 +17,36 @@ class File(db.Model):
     file_size = db.Column(db.Integer, nullable=False)
     file_type = db.Column(db.String(100), nullable=True)  # e.g., 'image/png', 'application/pdf'
 
+    # 'image' or 'document', derived from file_type / filename; the listings filter on it
+    category = db.Column(db.String(16), nullable=False, default=_category)
+
+    # SHA-256 of files uploaded to our own storage, the key of their shared Blob; NULL for external URLs
+    content_hash = db.Column(db.String(64), db.ForeignKey("blobs.sha256"), nullable=True, index=True)
+
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     uploader_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     # Optional associations
-    public_message_id = db.Column(db.Integer, db.ForeignKey("messages.id"), nullable=True)
-    private_message_id = db.Column(db.Integer, db.ForeignKey("private_messages.id"), nullable=True)
+    public_message_id = db.Column(db.Integer, db.ForeignKey("messages.id"), nullable=True, index=True)
+    private_message_id = db.Column(db.Integer, db.ForeignKey("private_messages.id"), nullable=True, index=True)
     private_chat_id = db.Column(db.Integer, db.ForeignKey("private_chats.id"), nullable=True)
 
     uploader = db.relationship("User")
 
+    # Listings page newest first by id, optionally within one category
+    __table_args__ = (
+        db.Index("ix_files_uploader_id_id", "uploader_id", "id"),
+        db.Index("ix_files_uploader_id_category_id", "uploader_id", "category", "id"),
+        db.Index("ix_files_private_chat_id_id", "private_chat_id", "id"),
+        db.Index("ix_files_private_chat_id_category_id", "private_chat_id", "category", "id"),
+    )
+
+    @staticmethod
+    def insert_many(rows):
+        """Insert File rows from a list of column dicts in one INSERT ... RETURNING statement"""
+        return db.session.scalars(db.insert(File).returning(File), rows).all()
+
     def __repr__(self):
         return f"<File {self.filename}>"
     
@@ -32,6 +57,7 @@ class File(db.Model):
             "file_url": self.file_url,
             "file_size": self.file_size,
             "file_type": self.file_type or 'application/octet-stream',
+            "category": self.category,
             "uploaded_at": self.uploaded_at.isoformat(),
             "uploader": {
                 "id": self.uploader.id,
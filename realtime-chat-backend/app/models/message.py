@@ -1,5 +1,7 @@
 from datetime import datetime
+from sqlalchemy import func
 from app.extensions import db
+from app.models.channel import Channel
 
 class Message(db.Model):
     __tablename__ = "messages"
@@ -10,27 +12,47 @@ class Message(db.Model):
 
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # Indexed for deleting a user's messages (and the foreign key check when a user row goes)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+
+    # Messages sent without a channel go to "general", the original public chat
+    channel_id = db.Column(db.Integer, db.ForeignKey("channels.id"), nullable=False, default=Channel.DEFAULT_ID)
+
+    # Bumped by SQLAlchemy on every UPDATE; part of the serialized-message cache key
+    version = db.Column(db.Integer, nullable=False, default=1)
 
     user = db.relationship("User", back_populates="messages")
 
+    __mapper_args__ = {"version_id_col": version}
+
+    # Channel history is read by id range, newest first
+    __table_args__ = (db.Index("ix_messages_channel_id_id", "channel_id", "id"),)
+
+    @staticmethod
+    def last_id(channel_id):
+        """Id of the newest message of a channel, 0 if it has none (one probe of the (channel_id, id) index)"""
+        return db.session.query(func.max(Message.id)).filter(Message.channel_id == channel_id).scalar() or 0
+
     def __repr__(self):
         return f"<Message {self.id} by User {self.user_id}>"
     
-    def to_dict(self):
+    def to_dict(self, files=None):
         from app.models.file import File
-        
-        # Get associated files if any
-        files = File.query.filter_by(public_message_id=self.id).all()
-        
+
+        # Get associated files if any (callers serializing many messages pass them preloaded)
+        if files is None:
+            files = File.query.filter_by(public_message_id=self.id).all()
+
         return {
             "id": self.id,
             "content": self.content,
             "timestamp": self.timestamp.isoformat(),
+            "channel_id": self.channel_id,
             "user": {
                 "id": self.user.id,
                 "username": self.user.username,
                 'avatar_url': self.user.avatar_url
             },
+            "username": self.user.username,
             "files": [file.to_dict() for file in files] if files else []
         }
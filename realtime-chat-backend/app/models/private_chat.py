@@ -6,17 +6,65 @@ class PrivateChat(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    user1_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    user2_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # Direct chats; both NULL for group chats, whose members are in chat_members
+    user1_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    user2_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+
+    is_group = db.Column(db.Boolean, default=False, nullable=False)
+    name = db.Column(db.String(100), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    # A user's chats are (user1_id = ? OR user2_id = ?) and a direct chat is looked up by its
+    # pair in either order, so each column leads one index
+    __table_args__ = (
+        db.Index("ix_private_chats_user1_id_user2_id", "user1_id", "user2_id"),
+        db.Index("ix_private_chats_user2_id_user1_id", "user2_id", "user1_id"),
+    )
+
+    def member_ids(self):
+        from app.models.chat_member import ChatMember
+
+        if self.is_group:
+            return ChatMember.member_ids(self.id)
+        return {self.user1_id, self.user2_id}
+
     @staticmethod
-    def get_chat_between_users(user1_id, user2_id):
-        return PrivateChat.query.filter(
+    def between_users(user1_id, user2_id):
+        """Filter matching the direct chat of two users, whichever of them started it"""
+        return (
             ((PrivateChat.user1_id == user1_id) & (PrivateChat.user2_id == user2_id)) |
             ((PrivateChat.user1_id == user2_id) & (PrivateChat.user2_id == user1_id))
-        ).first()
+        )
+
+    @staticmethod
+    def get_chat_between_users(user1_id, user2_id):
+        return PrivateChat.query.filter(PrivateChat.between_users(user1_id, user2_id)).first()
+
+    @staticmethod
+    def get_or_create_between_users(user1_id, user2_id):
+        """Existing chat between two users, or a new one (flushed, not committed)"""
+        from app.models.sync_event import SyncEvent
+
+        chat = PrivateChat.get_chat_between_users(user1_id, user2_id)
+        if not chat:
+            chat = PrivateChat(user1_id=user1_id, user2_id=user2_id)
+            db.session.add(chat)
+            db.session.flush()  # Get the chat ID
+            db.session.add_all(SyncEvent.for_chat(chat, SyncEvent.CHAT_CREATED))
+        return chat
+
+    def to_dict(self):
+        return {
+            "chat_id": self.id,
+            "is_group": self.is_group,
+            "name": self.name,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat()
+        }
 
     def __repr__(self):
+        if self.is_group:
+            return f"<PrivateChat group {self.name}>"
         return f"<PrivateChat {self.user1_id}-{self.user2_id}>"
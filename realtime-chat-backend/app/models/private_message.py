@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import func
 from app.extensions import db
 
 class PrivateMessage(db.Model):
@@ -10,22 +11,37 @@ class PrivateMessage(db.Model):
 
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    sender_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # Indexed for deleting a user's messages (and the foreign key check when a user row goes)
+    sender_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
 
     chat_id = db.Column(db.Integer, db.ForeignKey("private_chats.id"), nullable=False)
 
+    # Bumped by SQLAlchemy on every UPDATE; part of the serialized-message cache key
+    version = db.Column(db.Integer, nullable=False, default=1)
+
     sender = db.relationship("User")
     chat = db.relationship("PrivateChat", backref="messages")
 
+    __mapper_args__ = {"version_id_col": version}
+
+    # Chat history and group unread counts are read by id range within a chat
+    __table_args__ = (db.Index("ix_private_messages_chat_id_id", "chat_id", "id"),)
+
+    @staticmethod
+    def last_id(chat_id):
+        """Id of the newest message of a chat, 0 if it has none (one probe of the (chat_id, id) index)"""
+        return db.session.query(func.max(PrivateMessage.id)).filter(PrivateMessage.chat_id == chat_id).scalar() or 0
+
     def __repr__(self):
         return f"<PrivateMessage {self.id} in Chat {self.chat_id}>"
 
-    def to_dict(self):
+    def to_dict(self, files=None):
         from app.models.file import File
-        
-        # Get files associated with this message
-        files = File.query.filter_by(private_message_id=self.id).all()
-        
+
+        # Get files associated with this message (callers serializing many messages pass them preloaded)
+        if files is None:
+            files = File.query.filter_by(private_message_id=self.id).all()
+
         return {
             "id": self.id,
             "content": self.content,
@@ -35,5 +51,7 @@ class PrivateMessage(db.Model):
                 "username": self.sender.username,
                 "avatar_url": self.sender.avatar_url
             },
+            "username": self.sender.username,
+            "chat_id": self.chat_id,
             "files": [file.to_dict() for file in files] if files else []
         }
\ No newline at end of file
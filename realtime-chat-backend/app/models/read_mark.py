@@ -0,0 +1,61 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+class ReadMark:
+    """Mixin of the rows holding how far a user has read a conversation (``last_read_message_id``).
+
+    Unread counts are derived from the mark (messages past it, counted over
+    the conversation's ``(..., id)`` index), so sending a message writes no
+    per-reader state, and marking read is a single pointer write.
+    """
+
+    @classmethod
+    def advance(cls, message_id, create=True, **key):
+        """Move the mark of ``key`` (e.g. ``user_id=, chat_id=``) forward to ``message_id``; True if it moved.
+
+        One conditional write, so concurrent marks never move it backwards:
+        an upsert that also creates the row on the first mark, or with
+        ``create`` false (rows that always exist, like group members) an
+        UPDATE. ``key`` must be the columns of the row's unique constraint.
+        """
+        upsert = UPSERTS.get(db.session.get_bind().dialect.name) if create else None
+        if upsert is not None:
+            insert = upsert(cls).values(last_read_message_id=message_id, **key)
+            insert = insert.on_conflict_do_update(
+                index_elements=list(key),
+                set_={"last_read_message_id": insert.excluded.last_read_message_id},
+                where=cls.last_read_message_id < insert.excluded.last_read_message_id
+            )
+            return db.session.execute(insert).rowcount > 0
+
+        moved = cls.query.filter_by(**key).filter(cls.last_read_message_id < message_id).update(
+            {cls.last_read_message_id: message_id}
+        )
+        if moved or not create or db.session.query(cls.id).filter_by(**key).first():
+            return bool(moved)
+
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(last_read_message_id=message_id, **key))
+        except IntegrityError:
+            # Created by a concurrent mark meanwhile: move that one
+            return cls.advance(message_id, create=False, **key)
+        return True
+
+def read_up_to(last_id, requested=None):
+    """Message id a mark-read moves the mark to.
+
+    The conversation's last message id ``last_id``, or the message the client
+    says it has seen up to (``requested``) when that is earlier, so receipts
+    of a partly scrolled chat stay exact. Raises ValueError for a
+    ``requested`` that is not an integer.
+    """
+    if requested is None:
+        return last_id
+    if isinstance(requested, bool) or not isinstance(requested, (int, str)):
+        raise ValueError(f"Invalid message id {requested!r}")
+    return max(0, min(int(requested), last_id))
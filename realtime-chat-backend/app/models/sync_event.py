@@ -0,0 +1,55 @@
+from datetime import datetime
+from app.extensions import db
+
+class SyncEvent(db.Model):
+    """Change log read by ``GET /api/sync`` for changes that leave no row behind.
+
+    New messages are found by id range on their own tables; this only records
+    deletions (tombstones), read marks and new or deleted chats. ``user_id``
+    is the audience: NULL for public room events, otherwise the user to
+    notify. Ids are plain integers without foreign keys so tombstones outlive
+    the rows they describe.
+    """
+    __tablename__ = "sync_events"
+
+    MESSAGE_DELETED = "message_deleted"
+    CHAT_CREATED = "chat_created"
+    CHAT_READ = "chat_read"
+    CHAT_DELETED = "chat_deleted"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    event = db.Column(db.String(32), nullable=False)
+    chat_id = db.Column(db.Integer, nullable=True)
+    message_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (db.Index("ix_sync_events_user_id_id", "user_id", "id"),)
+
+    @staticmethod
+    def for_chat(chat, event, message_id=None):
+        """One event per participant of a private or group chat"""
+        return [
+            SyncEvent(user_id=user_id, event=event, chat_id=chat.id, message_id=message_id)
+            for user_id in chat.member_ids()
+        ]
+
+    @staticmethod
+    def trim(before, limit):
+        """Delete up to ``limit`` of the events created before ``before``; returns how many.
+
+        The newest event is always kept: the lowest id left tells ``GET
+        /api/sync`` which cursors point into the trimmed range.
+        """
+        newest = db.session.query(db.func.max(SyncEvent.id)).scalar_subquery()
+        ids = [event_id for (event_id,) in (
+            db.session.query(SyncEvent.id)
+            .filter(SyncEvent.created_at < before, SyncEvent.id < newest)
+            .order_by(SyncEvent.id).limit(limit)
+        )]
+        if ids:
+            db.session.query(SyncEvent).filter(SyncEvent.id.in_(ids)).delete(synchronize_session=False)
+        return len(ids)
+
+    def __repr__(self):
+        return f"<SyncEvent {self.id} {self.event} user={self.user_id}>"
@@ -0,0 +1,34 @@
+import secrets
+from datetime import datetime
+from app.extensions import db
+
+class Upload(db.Model):
+    """A chunked upload in progress.
+
+    The bytes live in the storage backend under the upload id; how many have
+    arrived is the size of that partial object, so an upload can be resumed
+    after any interruption. Completing it creates the ``File`` row and
+    deletes this one.
+    """
+    __tablename__ = "uploads"
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: secrets.token_hex(16))
+    # Indexed for purging a deleted user's uploads
+    uploader_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(100), nullable=True)
+    file_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self, offset):
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "file_size": self.file_size,
+            "offset": offset,
+            "created_at": self.created_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f"<Upload {self.id} {self.filename}>"
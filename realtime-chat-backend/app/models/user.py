@@ -1,5 +1,6 @@
-from app.extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+import secrets
+from datetime import datetime
+from app.extensions import db, passwords
 
 class User(db.Model):
     __tablename__ = "users"
@@ -10,8 +11,36 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     avatar_url = db.Column(db.String(255), nullable=True)
 
+    # Set by DELETE /api/users/<id>; the row stays, anonymized, while app.utils.user_purge removes the user's data
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
     messages = db.relationship("Message", back_populates="user", lazy="dynamic")
 
+    # Case-insensitive prefix search; varchar_pattern_ops lets Postgres use it for LIKE 'abc%'
+    __table_args__ = (
+        db.Index("ix_users_username_lower", db.func.lower(username),
+                 postgresql_ops={"lower_1": "varchar_pattern_ops"}),
+    )
+
+    @staticmethod
+    def search_prefix(prefix, limit):
+        """Users whose username starts with ``prefix`` (any case), in username order"""
+        prefix = prefix.lower()
+        username = db.func.lower(User.username)
+        if db.session.get_bind().dialect.name == "postgresql":
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            match = username.like(escaped + "%", escape="\\")
+        else:
+            # SQLite only uses expression indexes for comparisons, so match by range
+            match = db.and_(username >= prefix, username < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return (
+            db.session.query(User.id, User.username, User.avatar_url)
+            .filter(match, User.deleted_at.is_(None))
+            .order_by(username, User.id)
+            .limit(limit)
+            .all()
+        )
+
     def __repr__(self):
         return f"<User {self.username}>"
     
@@ -24,8 +53,25 @@ class User(db.Model):
             "avatar_url": self.avatar_url
         }
     
+    def mark_deleted(self):
+        """Anonymize the account and lock it out; its data is removed later, in batches"""
+        placeholder = f"deleted-{secrets.token_hex(8)}"
+        self.username = placeholder
+        self.email = f"{placeholder}@deleted.invalid"
+        self.password_hash = "!"  # not a hash, so no password matches it
+        self.avatar_url = None
+        self.deleted_at = datetime.utcnow()
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
+
+    def upgrade_password(self, password):
+        """Re-hash with the configured parameters if needed, after ``password`` was verified; True if changed"""
+        if not passwords.needs_rehash(self.password_hash):
+            return False
+        self.set_password(password)
+        passwords.rehashed += 1
+        return True
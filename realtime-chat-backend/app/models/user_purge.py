@@ -0,0 +1,48 @@
+from datetime import datetime
+from app.extensions import db
+
+class UserPurge(db.Model):
+    """Progress of removing a deleted user's data (app.utils.user_purge).
+
+    ``step`` is the step in progress and ``rows_purged`` the rows removed so
+    far; both are committed with every batch, so a purge stopped by a
+    restart goes on from its last batch. ``lease_until`` keeps other
+    workers off a purge while one is running it.
+    """
+    __tablename__ = "user_purges"
+
+    STEPS = ("uploads", "direct_chats", "memberships", "messages", "group_messages", "files", "read_marks")
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    step = db.Column(db.String(32), nullable=False, default=STEPS[0])
+    rows_purged = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # NULL while there is work left; indexed for finding those
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+    lease_until = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def status(self):
+        if self.finished_at is not None:
+            return "done"
+        if self.lease_until is not None and self.lease_until > datetime.utcnow():
+            return "running"
+        return "queued"
+
+    def to_dict(self):
+        finished = self.finished_at is not None
+        return {
+            "user_id": self.user_id,
+            "status": self.status,
+            "step": None if finished else self.step,
+            "steps_done": len(self.STEPS) if finished else self.STEPS.index(self.step),
+            "steps": len(self.STEPS),
+            "rows_purged": self.rows_purged,
+            "started_at": self.started_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if finished else None
+        }
+
+    def __repr__(self):
+        return f"<UserPurge user={self.user_id} step={self.step}>"
@@ -1,54 +1,165 @@
-from flask import request
-from flask_socketio import emit, join_room, leave_room, disconnect
-from flask_jwt_extended import decode_token, verify_jwt_in_request
-from app.extensions import socketio, db
+import orjson
+import functools
+import time
+from flask import request, current_app
+from flask_socketio import emit, join_room, leave_room, disconnect, ConnectionRefusedError
+from flask_jwt_extended import verify_jwt_in_request
+from app.extensions import (
+    socketio, db, session_resume, ephemeral, rate_limiter, broadcast_batcher, socket_auth, handshakes, query_budget,
+    profiler
+)
 from app.models.user import User
 from app.models.message import Message
+from app.models.channel import Channel
 from app.models.private_message import PrivateMessage
 from app.models.private_chat import PrivateChat
-from app.models.unread_count import UnreadCount
-
-# Store connected users and their rooms
-connected_users = {}
-public_room = "public_chat"
+from app.models.chat_member import ChatMember
+from app.models.chat_read import ChatRead
+from app.models.channel_read import ChannelRead
+from app.models.read_mark import read_up_to
+from app.models.sync_event import SyncEvent
+from app.utils.message_cache import PUBLIC, PRIVATE
+from app.utils.files import descriptor_error, file_values
+from app.utils.admission import HandshakeRejected
+from app.utils.rooms import (
+    connected_users, public_room, channel_room, remember_message, channel_window, chat_window, group_members,
+    forget_presence, release_connection, user_recheck_due
+)
+
+def requested_channel_id(data):
+    """``data['channel_id']`` as an int, the general channel when absent, None when malformed"""
+    try:
+        return int((data or {}).get('channel_id') or Channel.DEFAULT_ID)
+    except (TypeError, ValueError):
+        return None
+
+def rate_limited(event):
+    """Check the sender's token buckets (per connection and per user) before the handler runs.
+
+    Over-budget events are answered with a ``rate_limited`` event and never
+    reach the DB. Limits come from ``RATE_LIMITS`` in the config. The
+    connection of a user deleted meanwhile is closed instead.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args):
+            user_info = connected_users.get(request.sid)
+            if user_info and user_recheck_due(user_info) and user_snapshot(user_info['user_id']) is None:
+                print(f"User {user_info['username']} was deleted, closing SID {request.sid}")
+                disconnect()
+                return
+            retry_after = rate_limiter.check(
+                event,
+                sid=request.sid,
+                user_id=user_info['user_id'] if user_info else None
+            )
+            if retry_after:
+                emit('rate_limited', {
+                    'message': 'Rate limit exceeded',
+                    'event': event,
+                    'retry_after': round(retry_after, 2)
+                })
+                return
+            return handler(*args)
+        return wrapper
+    return decorator
+
+def emit_logged(event, data, room):
+    """Emit to a room and keep the event in its replay buffer.
+
+    The room and seq travel as an extra trailing argument; clients report the
+    last seq they saw per room when resuming a session. Events with a batch
+    form (``BROADCAST_BATCH_WINDOW``) join the room's open batch instead;
+    anything else sent to the room flushes that batch first so order holds.
+    """
+    seq = session_resume.record(room, event, data)
+    if broadcast_batcher.add(room, event, data, seq):
+        return
+    broadcast_batcher.flush(room)
+    emit(event, (data, {'room': room, 'seq': seq}), room=room)
+
+def emit_to_room(event, data, room, **kwargs):
+    """Emit an unlogged event to a room (or a list of rooms), after their open batches so order holds"""
+    for r in room if isinstance(room, list) else [room]:
+        broadcast_batcher.flush(r)
+    emit(event, data, to=room, **kwargs)
+
+def public_notification_rooms(users, sender_id):
+    """Personal rooms to notify of a general-channel message: connections not in the room, except the sender's"""
+    return [
+        f"user_{info['user_id']}" for info in users.values()
+        if info['user_id'] != sender_id and public_room not in info['rooms']
+    ]
+
+def public_notification(user_info, message):
+    return {
+        'sender_id': user_info['user_id'],
+        'sender_username': user_info['username'],
+        'content': message.content[:50],  # First 50 chars for preview
+        'timestamp': message.timestamp.isoformat()
+    }
+
+def unread_notification(chat_id, unread_count, user_info):
+    return {
+        'chat_id': chat_id,
+        'unread_count': unread_count,
+        'other_user_id': user_info['user_id'],
+        'other_username': user_info['username']
+    }
+
+def user_snapshot(user_id):
+    """What a connection keeps of its user; None if the user is gone"""
+    user = db.session.get(User, user_id)
+    return {'id': user.id, 'username': user.username} if user and not user.deleted_at else None
 
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection with JWT authentication"""
+@profiler.socket_event
+@query_budget.limit(1)
+def handle_connect(auth=None):
+    """Handle client connection with JWT authentication, within the handshake budget"""
     try:
-        # Get token from query parameters
-        token = request.args.get('token')
+        with handshakes.admit():
+            return connect_client(request.args.get('token'))
+    except HandshakeRejected as e:
+        print(f"Handshake refused for SID {request.sid}, retry in {e.retry_after}s")
+        raise ConnectionRefusedError({'message': 'Server busy', 'code': 'busy', 'retry_after': e.retry_after})
 
+def connect_client(token):
+    try:
         if token:
-            # Try to authenticate with token
+            # Try to authenticate with token; recently seen tokens skip the decode and the user query
             try:
-                payload = decode_token(token)
-                user_id = payload['sub']
+                user = socket_auth.authenticate(token, user_snapshot)
             except Exception as e:
                 print(f"Token decode error: {e}")
                 disconnect()
                 return False
 
             # Verify user exists
-            user = db.session.get(User, int(user_id))
             if not user:
                 disconnect()
                 return False
 
             # Store user connection info
             connected_users[request.sid] = {
-                'user_id': user.id,
-                'username': user.username,
-                'rooms': set()
+                'user_id': user['id'],
+                'username': user['username'],
+                'rooms': set(),
+                'session': session_resume.open(user['id'], request.sid),
+                'checked_at': time.monotonic()
             }
 
             # Join user to a personal notification room (for notifications not tied to chat rooms)
-            user_room = f"user_{user.id}"
+            user_room = f"user_{user['id']}"
             join_room(user_room, sid=request.sid)
 
-            print(f"User {user.username} connected with SID {request.sid}")
-            print(f"User {user.username} joined personal room: {user_room}")
-            emit('connected', {'message': f'Welcome {user.username}!'})
+            print(f"User {user['username']} connected with SID {request.sid}")
+            print(f"User {user['username']} joined personal room: {user_room}")
+            emit('connected', {
+                'message': f'Welcome {user["username"]}!',
+                'session': connected_users[request.sid]['session'],
+                'seq': session_resume.seq
+            })
         else:
             # Allow anonymous connection for testing
             connected_users[request.sid] = {
@@ -65,10 +176,12 @@ def handle_connect():
         return False
 
 @socketio.on('disconnect')
+@profiler.socket_event
 def handle_disconnect():
     """Handle client disconnection"""
     if request.sid in connected_users:
         user_info = connected_users[request.sid]
+        release_connection(request.sid)
 
         # Leave all rooms
         for room in user_info['rooms'].copy():
@@ -78,45 +191,178 @@ def handle_disconnect():
         print(f"User {user_info['username']} disconnected")
         del connected_users[request.sid]
 
+@socketio.on('resume')
+@profiler.socket_event
+@rate_limited('resume')
+@query_budget.limit(0)
+def handle_resume(data=None):
+    """Resume a dropped session: rejoin its rooms and replay the events missed meanwhile"""
+    if request.sid not in connected_users or connected_users[request.sid]['user_id'] is None:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    user_info = connected_users[request.sid]
+    token = (data or {}).get('session')
+    cursors = (data or {}).get('cursors') or {}
+
+    session = session_resume.resume(token, user_info['user_id'], request.sid) if token else None
+    if not session:
+        emit('resume_failed', {'message': 'Session expired, resync required'})
+        return
+
+    # Adopt the old session instead of the one opened for this connection
+    session_resume.discard(user_info['session'])
+    user_info['session'] = token
+
+    for room in session['rooms']:
+        join_room(room, sid=request.sid)
+        user_info['rooms'].add(room)
+
+    resync = []
+    replayed = 0
+    for room in sorted(session['rooms'] | {f"user_{user_info['user_id']}"}):
+        try:
+            cursor = int(cursors.get(room, session['seq']))
+        except (TypeError, ValueError):
+            cursor = session['seq']
+
+        events = session_resume.since(room, cursor)
+        if events is None:
+            resync.append(room)
+            continue
+        for seq, event, args in events:
+            emit(event, (*args, {'room': room, 'seq': seq}))
+        replayed += len(events)
+
+    emit('resumed', {
+        'rooms': sorted(session['rooms']),
+        'resync': resync,
+        'replayed': replayed,
+        'seq': session_resume.seq
+    })
+    print(f"User {user_info['username']} resumed session, replayed {replayed} events")
+
+@socketio.on('profile')
+@profiler.socket_event
+@rate_limited('profile')
+def handle_profile(data=None):
+    """Profile the next events of this connection on demand (needs PROFILE_TOKEN)"""
+    if request.sid not in connected_users:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    try:
+        events = profiler.arm(request.sid, (data or {}).get('token'), (data or {}).get('events', 1))
+    except (TypeError, ValueError):
+        emit('error', {'message': 'Invalid event count'})
+        return
+    if not events:
+        emit('error', {'message': 'Profiling not allowed'})
+        return
+    emit('profile_armed', {'events': events})
+
+def channel_notice(user_info, channel_id, action):
+    """Payload of ``user_joined`` / ``user_left`` (``action`` 'joined' or 'left')"""
+    return {
+        'username': user_info['username'],
+        'channel_id': channel_id,
+        'message': f'{user_info["username"]} {action} the chat'
+    }
+
+def enter_channel(user_info, channel_id):
+    """Join a channel's room and tell its members"""
+    room = channel_room(channel_id)
+    join_room(room, sid=request.sid)
+    user_info['rooms'].add(room)
+
+    # Notify others in the room
+    emit_to_room('user_joined', channel_notice(user_info, channel_id, 'joined'), room, skip_sid=request.sid)
+    return room
+
+def exit_channel(user_info, channel_id):
+    """Leave a channel's room and tell its members; False when not in it"""
+    room = channel_room(channel_id)
+    if room not in user_info['rooms']:
+        return False
+
+    leave_room(room, sid=request.sid)
+    user_info['rooms'].remove(room)
+    forget_presence(request.sid, {room})
+
+    # Notify others in the room
+    emit_to_room('user_left', channel_notice(user_info, channel_id, 'left'), room, skip_sid=request.sid)
+    return True
+
 @socketio.on('join_public')
-def handle_join_public():
-    """Join the public chat room"""
+@profiler.socket_event
+@query_budget.limit(3)  # a cold window: messages, their files and authors
+def handle_join_public(data=None):
+    """Join the public chat room, optionally replying with its recent messages"""
     if request.sid not in connected_users:
         return
 
     user_info = connected_users[request.sid]
-    join_room(public_room, sid=request.sid)
-    user_info['rooms'].add(public_room)
+    enter_channel(user_info, Channel.DEFAULT_ID)
 
-    # Notify others in the room
-    emit('user_joined', {
-        'username': user_info['username'],
-        'message': f'{user_info["username"]} joined the chat'
-    }, room=public_room, skip_sid=request.sid)
+    if data and data.get('history'):
+        emit('public_history', channel_window(Channel.DEFAULT_ID))
 
     print(f"User {user_info['username']} joined public chat")
 
 @socketio.on('leave_public')
+@profiler.socket_event
 def handle_leave_public():
     """Leave the public chat room"""
     if request.sid not in connected_users:
         return
 
     user_info = connected_users[request.sid]
-    if public_room in user_info['rooms']:
-        leave_room(public_room, sid=request.sid)
-        user_info['rooms'].remove(public_room)
+    if exit_channel(user_info, Channel.DEFAULT_ID):
+        print(f"User {user_info['username']} left public chat")
+
+@socketio.on('join_channel')
+@profiler.socket_event
+@rate_limited('join_channel')
+@query_budget.limit(4)
+def handle_join_channel(data=None):
+    """Join a public channel, optionally including its recent messages"""
+    if request.sid not in connected_users:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    user_info = connected_users[request.sid]
+    channel_id = requested_channel_id(data)
+    channel = db.session.get(Channel, channel_id) if channel_id else None
+    if not channel:
+        emit('error', {'message': 'Channel not found'})
+        return
 
-        # Notify others in the room
-        emit('user_left', {
-            'username': user_info['username'],
-            'message': f'{user_info["username"]} left the chat'
-        }, room=public_room, skip_sid=request.sid)
+    enter_channel(user_info, channel.id)
 
-        print(f"User {user_info['username']} left public chat")
+    payload = {'channel': channel.to_dict()}
+    if (data or {}).get('history'):
+        payload.update(channel_window(channel.id))
+    emit('joined_channel', payload)
+
+    print(f"User {user_info['username']} joined channel {channel.name}")
+
+@socketio.on('leave_channel')
+@profiler.socket_event
+def handle_leave_channel(data=None):
+    """Leave a public channel"""
+    if request.sid not in connected_users:
+        return
+
+    user_info = connected_users[request.sid]
+    channel_id = requested_channel_id(data)
+    if channel_id and exit_channel(user_info, channel_id):
+        print(f"User {user_info['username']} left channel {channel_id}")
 
 @socketio.on('send_public_message')
-def handle_send_public_message(data):
+@profiler.socket_event
+@rate_limited('send_public_message')
+@query_budget.limit(4)
+def handle_send_public_message(data=None):
     """Handle sending a public message"""
     if request.sid not in connected_users:
         emit('error', {'message': 'Not authenticated'})
@@ -124,11 +370,14 @@ def handle_send_public_message(data):
 
     user_info = connected_users[request.sid]
 
-    if public_room not in user_info['rooms']:
-        emit('error', {'message': 'Not in public chat'})
+    # Joining checked that the channel exists
+    channel_id = requested_channel_id(data)
+    room = channel_room(channel_id)
+    if room not in user_info['rooms']:
+        emit('error', {'message': 'Not in public chat' if room == public_room else 'Not in channel'})
         return
 
-    content = data.get('content', '').strip()
+    content = (data or {}).get('content', '').strip()
     if not content:
         emit('error', {'message': 'Message content cannot be empty'})
         return
@@ -136,28 +385,27 @@ def handle_send_public_message(data):
     try:
         message = Message(
             content=content,
-            user_id=user_info['user_id']
+            user_id=user_info['user_id'],
+            channel_id=channel_id
         )
         db.session.add(message)
         db.session.commit()
 
-        message_data = message.to_dict()
-        message_data['username'] = user_info['username']
+        # Encoded once and shared with history responses
+        message_data = orjson.Fragment(remember_message(room, PUBLIC, message))
+
+        # Broadcast to all in the channel's room
+        emit_logged('new_public_message', message_data, room=room)
+
+        # Other channels are not announced to everyone; their unread counts come from GET /api/channels
+        if room != public_room:
+            print(f"Channel {channel_id} message from {user_info['username']}: {content}")
+            return
 
-        # Broadcast to all in public room
-        emit('new_public_message', message_data, room=public_room)
-        
         # Emit unread count notification only to users NOT in the public room
-        for sid, other_user_info in connected_users.items():
-            # Only notify users who are NOT in the public room and are not the sender
-            if other_user_info['user_id'] != user_info['user_id'] and public_room not in other_user_info['rooms']:
-                other_user_room = f"user_{other_user_info['user_id']}"
-                emit('public_message_notification', {
-                    'sender_id': user_info['user_id'],
-                    'sender_username': user_info['username'],
-                    'content': content[:50],  # First 50 chars for preview
-                    'timestamp': message_data['timestamp']
-                }, room=other_user_room)
+        notification = public_notification(user_info, message)
+        for other_user_room in public_notification_rooms(connected_users, user_info['user_id']):
+            emit_logged('public_message_notification', notification, room=other_user_room)
 
         print(f"Public message from {user_info['username']}: {content}")
 
@@ -167,14 +415,17 @@ def handle_send_public_message(data):
         print(f"Error sending public message: {e}")
 
 @socketio.on('join_private')
-def handle_join_private(data):
-    """Join a private chat room"""
+@profiler.socket_event
+@rate_limited('join_private')
+@query_budget.limit(7)
+def handle_join_private(data=None):
+    """Join a private chat room, optionally including its recent messages"""
     if request.sid not in connected_users:
         emit('error', {'message': 'Not authenticated'})
         return
 
     user_info = connected_users[request.sid]
-    other_user_id = data.get('other_user_id')
+    other_user_id = (data or {}).get('other_user_id')
 
     if not other_user_id:
         emit('error', {'message': 'Other user ID required'})
@@ -188,39 +439,41 @@ def handle_join_private(data):
 
     # Verify other user exists
     other_user = db.session.get(User, other_user_id)
-    if not other_user:
+    if not other_user or other_user.deleted_at:
         emit('error', {'message': 'User not found'})
         return
 
     # Get or create private chat
-    chat = PrivateChat.get_chat_between_users(user_info['user_id'], other_user_id)
-    if not chat:
-        chat = PrivateChat(user1_id=user_info['user_id'], user2_id=other_user_id)
-        db.session.add(chat)
-        db.session.commit()
+    chat = PrivateChat.get_or_create_between_users(user_info['user_id'], other_user_id)
+    db.session.commit()
 
     room_name = f"private_chat_{chat.id}"
     join_room(room_name, sid=request.sid)
     user_info['rooms'].add(room_name)
 
-    emit('joined_private', {
+    payload = {
         'chat_id': chat.id,
         'other_user': {
             'id': other_user.id,
             'username': other_user.username
         }
-    })
+    }
+    if (data or {}).get('history'):
+        payload.update(chat_window(chat.id))
+
+    emit('joined_private', payload)
 
     print(f"User {user_info['username']} joined private chat with {other_user.username}")
 
 @socketio.on('leave_private')
-def handle_leave_private(data):
+@profiler.socket_event
+def handle_leave_private(data=None):
     """Leave a private chat room"""
     if request.sid not in connected_users:
         return
 
     user_info = connected_users[request.sid]
-    other_user_id = data.get('other_user_id')
+    other_user_id = (data or {}).get('other_user_id')
 
     if not other_user_id:
         return
@@ -237,18 +490,22 @@ def handle_leave_private(data):
         if room_name in user_info['rooms']:
             leave_room(room_name, sid=request.sid)
             user_info['rooms'].remove(room_name)
+            forget_presence(request.sid, {room_name})
             print(f"User {user_info['username']} left private chat")
 
 @socketio.on('send_private_message')
-def handle_send_private_message(data):
+@profiler.socket_event
+@rate_limited('send_private_message')
+@query_budget.limit(11)
+def handle_send_private_message(data=None):
     """Handle sending a private message"""
     if request.sid not in connected_users:
         emit('error', {'message': 'Not authenticated'})
         return
 
     user_info = connected_users[request.sid]
-    other_user_id = data.get('other_user_id')
-    content = data.get('content', '').strip()
+    other_user_id = (data or {}).get('other_user_id')
+    content = (data or {}).get('content', '').strip()
 
     if not other_user_id or not content:
         emit('error', {'message': 'Other user ID and content required'})
@@ -260,14 +517,13 @@ def handle_send_private_message(data):
         emit('error', {'message': 'Invalid user ID'})
         return
 
+    other_user = db.session.get(User, other_user_id)
+    if not other_user or other_user.deleted_at:
+        emit('error', {'message': 'User not found'})
+        return
+
     # Get or create the chat
-    chat = PrivateChat.get_chat_between_users(user_info['user_id'], other_user_id)
-    if not chat:
-        # Create new chat if it doesn't exist
-        chat = PrivateChat(user1_id=user_info['user_id'], user2_id=other_user_id)
-        db.session.add(chat)
-        db.session.flush()  # Get the chat ID
-        print(f"Created new chat between {user_info['user_id']} and {other_user_id}: chat_id={chat.id}")
+    chat = PrivateChat.get_or_create_between_users(user_info['user_id'], other_user_id)
 
     room_name = f"private_chat_{chat.id}"
     
@@ -284,33 +540,20 @@ def handle_send_private_message(data):
             chat_id=chat.id
         )
         db.session.add(message)
-        
-        # Increment unread count for the other user
-        unread = UnreadCount.query.filter_by(user_id=other_user_id, chat_id=chat.id).first()
-        if not unread:
-            unread = UnreadCount(user_id=other_user_id, chat_id=chat.id, count=1)
-            db.session.add(unread)
-        else:
-            unread.count += 1
-        
         db.session.commit()
 
-        # Get message with sender info
-        message_data = message.to_dict()
-        message_data['username'] = user_info['username']
-        message_data['chat_id'] = chat.id
+        # Get message with sender info, encoded once and shared with history responses
+        message_data = orjson.Fragment(remember_message(room_name, PRIVATE, message))
 
         # Send to both users in the chat room
-        emit('new_private_message', message_data, room=room_name)
+        emit_logged('new_private_message', message_data, room=room_name)
         
-        # Emit unread count update to the receiving user's personal room (even if they're not in the chat room yet)
+        # Emit unread count update to the receiving user's personal room (even if they're not in the chat room yet),
+        # counted past their read mark
         receiving_user_room = f"user_{other_user_id}"
-        emit('unread_count_update', {
-            'chat_id': chat.id,
-            'unread_count': unread.count,
-            'other_user_id': user_info['user_id'],
-            'other_username': user_info['username']
-        }, room=receiving_user_room)
+        unread_count = ChatRead.unread_count(other_user_id, chat.id)
+        emit_logged('unread_count_update', unread_notification(chat.id, unread_count, user_info),
+                    room=receiving_user_room)
 
         print(f"Private message from {user_info['username']} to chat {chat.id}: {content}")
         print(f"Emitted unread_count_update to room {receiving_user_room}")
@@ -320,7 +563,171 @@ def handle_send_private_message(data):
         emit('error', {'message': 'Failed to send message'})
         print(f"Error sending private message: {e}")
 
+def notify_group_members(members, room, payload):
+    """One emit reaching every given member that is not looking at the chat's room.
+
+    Members without a connection are skipped by the emit itself; they pick up
+    unread counts from ``GET /api/groups``.
+    """
+    present = {
+        connected_users[sid]['user_id']
+        for sid, _ in socketio.server.manager.get_participants('/', room)
+        if sid in connected_users
+    }
+    rooms = [f"user_{user_id}" for user_id in members - present]
+    if rooms:
+        emit_to_room('group_message_notification', payload, rooms)
+
+def requested_group(user_info, data):
+    """Group chat id from ``data`` if the user is a member of it, else None with an error emitted"""
+    try:
+        chat_id = int((data or {}).get('chat_id'))
+    except (TypeError, ValueError):
+        emit('error', {'message': 'Chat ID required'})
+        return None
+
+    if not ChatMember.is_member(chat_id, user_info['user_id']):
+        emit('error', {'message': 'Not a member of this group'})
+        return None
+    return chat_id
+
+@socketio.on('join_group')
+@profiler.socket_event
+@rate_limited('join_group')
+@query_budget.limit(6)
+def handle_join_group(data=None):
+    """Join a group chat room, optionally including its recent messages"""
+    if request.sid not in connected_users:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    user_info = connected_users[request.sid]
+    chat_id = requested_group(user_info, data)
+    if not chat_id:
+        return
+
+    room_name = f"private_chat_{chat_id}"
+    join_room(room_name, sid=request.sid)
+    user_info['rooms'].add(room_name)
+
+    payload = {
+        'chat': db.session.get(PrivateChat, chat_id).to_dict(),
+        'member_count': len(group_members(chat_id))
+    }
+    if (data or {}).get('history'):
+        payload.update(chat_window(chat_id))
+    emit('joined_group', payload)
+
+    print(f"User {user_info['username']} joined group chat {chat_id}")
+
+@socketio.on('leave_group')
+@profiler.socket_event
+def handle_leave_group(data=None):
+    """Leave a group chat room (membership is unchanged)"""
+    if request.sid not in connected_users:
+        return
+
+    user_info = connected_users[request.sid]
+    room_name = f"private_chat_{(data or {}).get('chat_id')}"
+    if room_name in user_info['rooms']:
+        leave_room(room_name, sid=request.sid)
+        user_info['rooms'].remove(room_name)
+        forget_presence(request.sid, {room_name})
+        print(f"User {user_info['username']} left {room_name}")
+
+@socketio.on('send_group_message')
+@profiler.socket_event
+@rate_limited('send_group_message')
+@query_budget.limit(6)
+def handle_send_group_message(data=None):
+    """Send a group message: one row, one room emit and one notification emit for the rest"""
+    if request.sid not in connected_users:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    user_info = connected_users[request.sid]
+    content = (data or {}).get('content', '').strip()
+    if not content:
+        emit('error', {'message': 'Message content cannot be empty'})
+        return
+
+    chat_id = requested_group(user_info, data)
+    if not chat_id:
+        return
+
+    room_name = f"private_chat_{chat_id}"
+    if room_name not in user_info['rooms']:
+        join_room(room_name, sid=request.sid)
+        user_info['rooms'].add(room_name)
+
+    try:
+        message = PrivateMessage(
+            content=content,
+            sender_id=user_info['user_id'],
+            chat_id=chat_id
+        )
+        db.session.add(message)
+        db.session.commit()
+
+        message_data = orjson.Fragment(remember_message(room_name, PRIVATE, message))
+        emit_logged('new_group_message', message_data, room=room_name)
+
+        notify_group_members(group_members(chat_id) - {user_info['user_id']}, room_name, {
+            'chat_id': chat_id,
+            'message_id': message.id,
+            'sender_id': user_info['user_id'],
+            'sender_username': user_info['username'],
+            'content': content[:50]
+        })
+
+        print(f"Group message from {user_info['username']} to chat {chat_id}: {content}")
+
+    except Exception as e:
+        db.session.rollback()
+        emit('error', {'message': 'Failed to send message'})
+        print(f"Error sending group message: {e}")
+
+def ephemeral_room(user_info, data):
+    """Room a typing/presence ping refers to, or None when the sender is not in it"""
+    chat_id = (data or {}).get('chat_id')
+    room = f"private_chat_{chat_id}" if chat_id else channel_room(requested_channel_id(data))
+    return room if room in user_info['rooms'] else None
+
+@socketio.on('typing')
+@profiler.socket_event
+@rate_limited('typing')
+def handle_typing(data=None):
+    """Typing indicator ping, coalesced into at most one 'typing' frame per room and interval"""
+    user_info = connected_users.get(request.sid)
+    if not user_info or user_info['user_id'] is None:
+        return
+
+    # Pings for rooms the user already left are stale; drop them
+    room = ephemeral_room(user_info, data)
+    if not room:
+        return
+
+    ephemeral.update('typing', room, {
+        'id': user_info['user_id'],
+        'username': user_info['username']
+    }, active=(data or {}).get('typing', True))
+
+@socketio.on('presence_ping')
+@profiler.socket_event
+@rate_limited('presence_ping')
+def handle_presence_ping(data=None):
+    """Presence ping for the public room, coalesced like typing indicators"""
+    user_info = connected_users.get(request.sid)
+    if not user_info or user_info['user_id'] is None or public_room not in user_info['rooms']:
+        return
+
+    ephemeral.update('presence', public_room, {
+        'id': user_info['user_id'],
+        'username': user_info['username']
+    })
+
 @socketio.on('get_online_users')
+@profiler.socket_event
 def handle_get_online_users():
     """Get list of currently online users"""
     if request.sid not in connected_users:
@@ -337,14 +744,17 @@ def handle_get_online_users():
     emit('online_users', {'users': online_users})
 
 @socketio.on('mark_chat_read')
-def handle_mark_chat_read(data):
-    """Mark a chat as read and reset unread count"""
+@profiler.socket_event
+@rate_limited('mark_chat_read')
+@query_budget.limit(6)
+def handle_mark_chat_read(data=None):
+    """Move the reader's mark in a direct or group chat (to ``last_read_message_id`` if given) and send read receipts"""
     if request.sid not in connected_users:
         emit('error', {'message': 'Not authenticated'})
         return
 
     user_info = connected_users[request.sid]
-    chat_id = data.get('chat_id')
+    chat_id = (data or {}).get('chat_id')
 
     if not chat_id:
         emit('error', {'message': 'Chat ID required'})
@@ -352,73 +762,100 @@ def handle_mark_chat_read(data):
 
     try:
         chat_id = int(chat_id)
-        
-        # Reset unread count for this user and chat
-        unread = UnreadCount.query.filter_by(user_id=user_info['user_id'], chat_id=chat_id).first()
-        had_unread_messages = unread and unread.count > 0
-        
-        if unread:
-            unread.count = 0
+        chat = db.session.get(PrivateChat, chat_id)
+        user_id = user_info['user_id']
+        member = chat is not None and (
+            ChatMember.is_member(chat_id, user_id) if chat.is_group else user_id in chat.member_ids()
+        )
+        if not member:
+            emit('error', {'message': 'Chat not found'})
+            return
+
+        last_id = read_up_to(PrivateMessage.last_id(chat_id), data.get('last_read_message_id'))
+        mark = ChatMember if chat.is_group else ChatRead
+        if mark.advance(last_id, create=not chat.is_group, user_id=user_info['user_id'], chat_id=chat_id):
+            db.session.add(SyncEvent(user_id=user_info['user_id'], event=SyncEvent.CHAT_READ, chat_id=chat_id))
             db.session.commit()
-            print(f"User {user_info['username']} marked chat {chat_id} as read")
-        
-        # Only send read receipt if there were unread messages
-        if had_unread_messages:
-            # Get the chat to find the other user
-            chat = db.session.get(PrivateChat, chat_id)
-            if chat:
+            print(f"User {user_info['username']} marked chat {chat_id} as read up to {last_id}")
+
+            # Read receipt: every message up to last_read_message_id has been seen by the reader
+            receipt = {
+                'chat_id': chat_id,
+                'reader_username': user_info['username'],
+                'reader_id': user_info['user_id'],
+                'last_read_message_id': last_id
+            }
+            if chat.is_group:
+                emit_logged('message_read_receipt', receipt, room=f"private_chat_{chat_id}")
+            else:
                 other_user_id = chat.user1_id if chat.user2_id == user_info['user_id'] else chat.user2_id
-                
-                # Notify the other user that their message was seen
-                other_user_room = f"user_{other_user_id}"
-                emit('message_read_receipt', {
-                    'chat_id': chat_id,
-                    'reader_username': user_info['username'],
-                    'reader_id': user_info['user_id']
-                }, room=other_user_room)
-        
-        emit('chat_marked_read', {'chat_id': chat_id})
-        
+                emit_logged('message_read_receipt', receipt, room=f"user_{other_user_id}")
+
+        emit('chat_marked_read', {'chat_id': chat_id, 'last_read_message_id': last_id})
+
     except Exception as e:
         db.session.rollback()
         emit('error', {'message': 'Failed to mark chat as read'})
         print(f"Error marking chat as read: {e}")
 
 @socketio.on('mark_public_read')
-def handle_mark_public_read():
-    """Mark public chat as read for the current user"""
+@profiler.socket_event
+@rate_limited('mark_public_read')
+@query_budget.limit(4)
+def handle_mark_public_read(data=None):
+    """Move the user's read mark in a channel (the general one by default), as POST /api/channels/<id>/read does"""
     if request.sid not in connected_users:
         return
 
     user_info = connected_users[request.sid]
-    print(f"User {user_info['username']} marked public chat as read")
-    emit('public_chat_marked_read')
+    channel_id = requested_channel_id(data)
+    if channel_id is None or not db.session.get(Channel, channel_id):
+        emit('error', {'message': 'Channel not found'})
+        return
+
+    try:
+        last_id = read_up_to(Message.last_id(channel_id), (data or {}).get('last_read_message_id'))
+        ChannelRead.advance(last_id, user_id=user_info['user_id'], channel_id=channel_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        emit('error', {'message': 'Failed to mark chat as read'})
+        print(f"Error marking channel as read: {e}")
+        return
+
+    print(f"User {user_info['username']} marked channel {channel_id} as read up to {last_id}")
+    emit('public_chat_marked_read', {'channel_id': channel_id, 'last_read_message_id': last_id})
 
 @socketio.on('send_public_file')
-def handle_send_public_file(data):
+@profiler.socket_event
+@rate_limited('send_public_file')
+@query_budget.limit(5)
+def handle_send_public_file(data=None):
     if request.sid not in connected_users:
         emit('error', {'message': 'Not authenticated'})
         return
 
     user_info = connected_users[request.sid]
-    filename = data.get('filename', '').strip()
-    file_url = data.get('file_url', '').strip()
-    file_size = data.get('file_size')
-    file_type = data.get('file_type', '').strip()
+    filename = (data or {}).get('filename', '').strip()
+    file_url = (data or {}).get('file_url', '').strip()
+    file_size = (data or {}).get('file_size')
+    file_type = (data or {}).get('file_type', '').strip()
 
     if not all([filename, file_url, file_size]):
         emit('error', {'message': 'Filename, file_url, and file_size required'})
         return
 
-    if public_room not in user_info['rooms']:
-        emit('error', {'message': 'Not in public chat'})
+    channel_id = requested_channel_id(data)
+    room = channel_room(channel_id)
+    if room not in user_info['rooms']:
+        emit('error', {'message': 'Not in public chat' if room == public_room else 'Not in channel'})
         return
 
     try:
         from app.models.file import File
         
         # Create message first (empty content for file messages)
-        message = Message(content='', user_id=user_info['user_id'])
+        message = Message(content='', user_id=user_info['user_id'], channel_id=channel_id)
         db.session.add(message)
         db.session.flush()  # Get message ID
 
@@ -435,11 +872,13 @@ def handle_send_public_file(data):
         db.session.commit()
 
         # Prepare message data with file info
-        message_data = message.to_dict()
+        # The new message has exactly this one attachment, no need to query for it
+        remember_message(room, PUBLIC, message, files=[file_record])
+        message_data = message.to_dict(files=[file_record])
         message_data['file'] = file_record.to_dict()
 
-        # Broadcast to all users in public chat
-        emit('new_public_file_message', message_data, room=public_room)
+        # Broadcast to all users in the channel
+        emit_logged('new_public_file_message', message_data, room=room)
 
         print(f"Public file from {user_info['username']}: {filename}")
 
@@ -450,18 +889,21 @@ def handle_send_public_file(data):
 
 
 @socketio.on('send_private_file')
-def handle_send_private_file(data):
+@profiler.socket_event
+@rate_limited('send_private_file')
+@query_budget.limit(12)
+def handle_send_private_file(data=None):
     """Handle sending a private file message"""
     if request.sid not in connected_users:
         emit('error', {'message': 'Not authenticated'})
         return
 
     user_info = connected_users[request.sid]
-    other_user_id = data.get('other_user_id')
-    filename = data.get('filename', '').strip()
-    file_url = data.get('file_url', '').strip()
-    file_size = data.get('file_size')
-    file_type = data.get('file_type', '').strip()
+    other_user_id = (data or {}).get('other_user_id')
+    filename = (data or {}).get('filename', '').strip()
+    file_url = (data or {}).get('file_url', '').strip()
+    file_size = (data or {}).get('file_size')
+    file_type = (data or {}).get('file_type', '').strip()
 
     if not all([other_user_id, filename, file_url, file_size]):
         emit('error', {'message': 'Other user ID, filename, file_url, and file_size required'})
@@ -473,14 +915,13 @@ def handle_send_private_file(data):
         emit('error', {'message': 'Invalid user ID'})
         return
 
+    other_user = db.session.get(User, other_user_id)
+    if not other_user or other_user.deleted_at:
+        emit('error', {'message': 'User not found'})
+        return
+
     # Get or create the chat
-    chat = PrivateChat.get_chat_between_users(user_info['user_id'], other_user_id)
-    if not chat:
-        # Create new chat if it doesn't exist
-        chat = PrivateChat(user1_id=user_info['user_id'], user2_id=other_user_id)
-        db.session.add(chat)
-        db.session.flush()  # Get the chat ID
-        print(f"Created new chat between {user_info['user_id']} and {other_user_id}: chat_id={chat.id}")
+    chat = PrivateChat.get_or_create_between_users(user_info['user_id'], other_user_id)
 
     room_name = f"private_chat_{chat.id}"
     
@@ -513,38 +954,159 @@ def handle_send_private_file(data):
             private_chat_id=chat.id
         )
         db.session.add(file_record)
-        
-        # Increment unread count for the other user
-        unread = UnreadCount.query.filter_by(user_id=other_user_id, chat_id=chat.id).first()
-        if not unread:
-            unread = UnreadCount(user_id=other_user_id, chat_id=chat.id, count=1)
-            db.session.add(unread)
-        else:
-            unread.count += 1
-        
         db.session.commit()
 
         # Get message with sender info and file info
-        message_data = message.to_dict()
-        message_data['username'] = user_info['username']
-        message_data['chat_id'] = chat.id
+        remember_message(room_name, PRIVATE, message, files=[file_record])
+        message_data = message.to_dict(files=[file_record])
         message_data['file'] = file_record.to_dict()
 
         # Send to both users in the chat room
-        emit('new_private_file_message', message_data, room=room_name)
+        emit_logged('new_private_file_message', message_data, room=room_name)
         
         # Emit unread count update to the receiving user's personal room
         receiving_user_room = f"user_{other_user_id}"
-        emit('unread_count_update', {
-            'chat_id': chat.id,
-            'unread_count': unread.count,
-            'other_user_id': user_info['user_id'],
-            'other_username': user_info['username']
-        }, room=receiving_user_room)
+        unread_count = ChatRead.unread_count(other_user_id, chat.id)
+        emit_logged('unread_count_update', unread_notification(chat.id, unread_count, user_info),
+                    room=receiving_user_room)
 
         print(f"Private file from {user_info['username']} to chat {chat.id}: {filename}")
 
     except Exception as e:
         db.session.rollback()
         emit('error', {'message': 'Failed to send file'})
-        print(f"Error sending private file: {e}")
\ No newline at end of file
+        print(f"Error sending private file: {e}")
+
+def requested_files(data):
+    """Validated file descriptors of a send_*_files event, or None with an error emitted"""
+    descriptors = (data or {}).get('files')
+    max_files = current_app.config.get('FILE_BATCH_MAX', 20)
+    if not isinstance(descriptors, list) or not descriptors or len(descriptors) > max_files:
+        emit('error', {'message': f'Between 1 and {max_files} files required'})
+        return None
+
+    for index, descriptor in enumerate(descriptors):
+        error = descriptor_error(descriptor)
+        if error:
+            emit('error', {'message': error, 'index': index})
+            return None
+    return descriptors
+
+@socketio.on('send_public_files')
+@profiler.socket_event
+@rate_limited('send_public_files')
+@query_budget.limit(6)
+def handle_send_public_files(data=None):
+    """Send one public message carrying several attachments"""
+    if request.sid not in connected_users:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    user_info = connected_users[request.sid]
+    descriptors = requested_files(data)
+    if not descriptors:
+        return
+
+    channel_id = requested_channel_id(data)
+    room = channel_room(channel_id)
+    if room not in user_info['rooms']:
+        emit('error', {'message': 'Not in public chat' if room == public_room else 'Not in channel'})
+        return
+
+    try:
+        from app.models.file import File
+
+        message = Message(content=(data.get('content') or '').strip(), user_id=user_info['user_id'], channel_id=channel_id)
+        db.session.add(message)
+        db.session.flush()  # Get message ID
+
+        # All attachments in one INSERT
+        file_records = File.insert_many([
+            file_values(descriptor, user_info['user_id'], public_message_id=message.id)
+            for descriptor in descriptors
+        ])
+        db.session.commit()
+
+        remember_message(room, PUBLIC, message, files=file_records)
+        message_data = message.to_dict(files=file_records)
+        message_data['file'] = message_data['files'][0]
+
+        emit_logged('new_public_file_message', message_data, room=room)
+
+        print(f"Public message with {len(file_records)} files from {user_info['username']}")
+
+    except Exception as e:
+        db.session.rollback()
+        emit('error', {'message': 'Failed to send files'})
+        print(f"Error sending public files: {e}")
+
+@socketio.on('send_private_files')
+@profiler.socket_event
+@rate_limited('send_private_files')
+@query_budget.limit(11)
+def handle_send_private_files(data=None):
+    """Send one private message carrying several attachments"""
+    if request.sid not in connected_users:
+        emit('error', {'message': 'Not authenticated'})
+        return
+
+    user_info = connected_users[request.sid]
+    descriptors = requested_files(data)
+    if not descriptors:
+        return
+
+    try:
+        other_user_id = int(data.get('other_user_id'))
+    except (TypeError, ValueError):
+        emit('error', {'message': 'Invalid user ID'})
+        return
+
+    # Verify other user exists
+    other_user = db.session.get(User, other_user_id)
+    if not other_user or other_user.deleted_at:
+        emit('error', {'message': 'User not found'})
+        return
+
+    try:
+        from app.models.file import File
+
+        # Get or create the chat
+        chat = PrivateChat.get_or_create_between_users(user_info['user_id'], other_user_id)
+
+        room_name = f"private_chat_{chat.id}"
+        if room_name not in user_info['rooms']:
+            join_room(room_name, sid=request.sid)
+            user_info['rooms'].add(room_name)
+
+        message = PrivateMessage(
+            content=(data.get('content') or '').strip(),
+            sender_id=user_info['user_id'],
+            chat_id=chat.id
+        )
+        db.session.add(message)
+        db.session.flush()  # Get message ID
+
+        # All attachments in one INSERT
+        file_records = File.insert_many([
+            file_values(descriptor, user_info['user_id'], private_message_id=message.id, private_chat_id=chat.id)
+            for descriptor in descriptors
+        ])
+
+        db.session.commit()
+
+        remember_message(room_name, PRIVATE, message, files=file_records)
+        message_data = message.to_dict(files=file_records)
+        message_data['file'] = message_data['files'][0]
+
+        emit_logged('new_private_file_message', message_data, room=room_name)
+
+        unread_count = ChatRead.unread_count(other_user_id, chat.id)
+        emit_logged('unread_count_update', unread_notification(chat.id, unread_count, user_info),
+                    room=f"user_{other_user_id}")
+
+        print(f"Private message with {len(file_records)} files from {user_info['username']} to chat {chat.id}")
+
+    except Exception as e:
+        db.session.rollback()
+        emit('error', {'message': 'Failed to send files'})
+        print(f"Error sending private files: {e}")
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class HandshakeRejected(Exception):
+    """No handshake slot; the client should come back after ``retry_after`` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class HandshakeAdmission:
+    """Caps how many socket handshakes are authenticated at once.
+
+    After a deploy or a network blip every client reconnects together. At
+    most ``concurrency`` handshakes run; up to ``max_queue`` more wait (at
+    most ``max_wait`` seconds) for a slot, and the rest are refused with a
+    ``retry_after`` hint. The hint grows with the backlog and is jittered so
+    refused clients do not all come back in the same instant.
+    """
+
+    def __init__(self, concurrency=32, max_queue=1000, max_wait=5.0, retry_after=2.0, samples=1000):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=samples)  # seconds from arrival to handshake done
+        self._waits = deque(maxlen=samples)  # seconds spent queued
+        self.admitted = 0
+        self.rejected = 0
+        self.max_waiting = 0
+
+    def init_app(self, app):
+        app.config.setdefault("SOCKET_HANDSHAKE_CONCURRENCY", 32)
+        app.config.setdefault("SOCKET_HANDSHAKE_QUEUE", 1000)
+        app.config.setdefault("SOCKET_HANDSHAKE_WAIT", 5.0)
+        app.config.setdefault("SOCKET_HANDSHAKE_RETRY", 2.0)
+        self.concurrency = app.config["SOCKET_HANDSHAKE_CONCURRENCY"]
+        self.max_queue = app.config["SOCKET_HANDSHAKE_QUEUE"]
+        self.max_wait = app.config["SOCKET_HANDSHAKE_WAIT"]
+        self.retry_after = app.config["SOCKET_HANDSHAKE_RETRY"]
+        self._cond = threading.Condition()
+        self.active = self.waiting = 0
+        self.admitted = self.rejected = self.max_waiting = 0
+        self._latencies.clear()
+        self._waits.clear()
+        app.extensions["handshake_admission"] = self
+
+    @contextmanager
+    def admit(self):
+        """Hold a handshake slot for the ``with`` block; raises HandshakeRejected"""
+        arrived = time.monotonic()
+        with self._cond:
+            if self.active >= self.concurrency:
+                if self.waiting >= self.max_queue:
+                    raise self._reject()
+                self.waiting += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+                deadline = arrived + self.max_wait
+                try:
+                    while self.active >= self.concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject()
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+        self._waits.append(time.monotonic() - arrived)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify()
+            self._latencies.append(time.monotonic() - arrived)
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "latency_p50": _percentile(self._latencies, 0.5),
+            "latency_p99": _percentile(self._latencies, 0.99),
+            "wait_p99": _percentile(self._waits, 0.99),
+        }
+
+    def _reject(self):
+        # Called with the lock held
+        self.rejected += 1
+        backlog = (self.active + self.waiting) / max(self.concurrency, 1)
+        return HandshakeRejected(round(self.retry_after * max(backlog, 1) * random.uniform(0.5, 1.5), 2))
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)], 4)
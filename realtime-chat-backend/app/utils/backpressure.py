@@ -0,0 +1,178 @@
+import threading
+
+import socketio
+
+
+class BackpressureManager(socketio.Manager):
+    """Socket.IO client manager that watches each connection's outbound queue.
+
+    Every emit is checked against the recipient's Engine.IO send queue:
+
+    - below ``high_watermark`` packets are sent as usual;
+    - at or above it the connection is marked slow until it drains back to
+      ``low_watermark``. Slow connections lose non-essential events
+      (``droppable``) and have the rest coalesced into one ``batch`` frame
+      per ``batch_interval``;
+    - past ``hard_limit`` queued packets (or pending batched events) the
+      client is disconnected.
+
+    Whatever is delivered goes out through ``socketio.Manager.emit``,
+    skipping the connections held back, so packets are still encoded once
+    per emit. The one thing read from python-engineio beyond its public
+    calls is each socket's ``queue`` (``queue_depth``);
+    tests/test_backpressure.py fails if an upgrade moves it.
+    """
+
+    DROPPABLE = frozenset({
+        'user_joined', 'user_left', 'public_message_notification', 'typing', 'presence'
+    })
+
+    def __init__(self, high_watermark=64, low_watermark=16, hard_limit=512,
+                 batch_interval=1.0, droppable=DROPPABLE):
+        super().__init__()
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.hard_limit = hard_limit
+        self.batch_interval = batch_interval
+        self.droppable = droppable
+        self._slow = set()
+        self._pending = {}  # sid -> (namespace, eio_sid, [[event, *args], ...])
+        self._lock = threading.Lock()
+        self._task = None
+        self.dropped = 0
+        self.batched = 0
+        self.disconnected = 0
+
+    def init_app(self, app):
+        app.config.setdefault("OUTBOUND_HIGH_WATERMARK", 64)
+        app.config.setdefault("OUTBOUND_LOW_WATERMARK", 16)
+        app.config.setdefault("OUTBOUND_HARD_LIMIT", 512)
+        app.config.setdefault("OUTBOUND_BATCH_INTERVAL", 1.0)
+        self.high_watermark = app.config["OUTBOUND_HIGH_WATERMARK"]
+        self.low_watermark = app.config["OUTBOUND_LOW_WATERMARK"]
+        self.hard_limit = app.config["OUTBOUND_HARD_LIMIT"]
+        self.batch_interval = app.config["OUTBOUND_BATCH_INTERVAL"]
+        with self._lock:
+            self._slow.clear()
+            self._pending.clear()
+        self.dropped = self.batched = self.disconnected = 0
+        app.extensions["backpressure"] = self
+
+    def queue_depth(self, eio_sid):
+        """Packets waiting in the Engine.IO queue of a connection"""
+        sock = self.server.eio.sockets.get(eio_sid) if self.server else None
+        return sock.queue.qsize() if sock is not None else 0
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None,
+             callback=None, to=None, **kwargs):
+        if callback or namespace not in self.rooms:
+            return super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                                callback=callback, to=to, **kwargs)
+
+        skip = list(skip_sid) if isinstance(skip_sid, list) else [skip_sid]
+        args = list(data) if isinstance(data, tuple) else [] if data is None else [data]
+        overloaded = []
+        for sid, eio_sid in list(self.get_participants(namespace, to or room)):
+            if sid in skip:
+                continue
+
+            depth = self.queue_depth(eio_sid)
+            if depth >= self.hard_limit:
+                overloaded.append(sid)
+                skip.append(sid)
+                continue
+
+            with self._lock:
+                if depth >= self.high_watermark:
+                    self._slow.add(sid)
+                elif depth <= self.low_watermark and sid in self._slow:
+                    self._slow.discard(sid)
+                slow = sid in self._slow
+
+            if slow:
+                skip.append(sid)
+                if event in self.droppable:
+                    self.dropped += 1
+                elif self._defer(sid, namespace, eio_sid, [event] + args):
+                    overloaded.append(sid)
+                continue
+
+            # Recovered: deliver anything held back first so order is kept
+            self._send_pending(sid)
+
+        super().emit(event, data, namespace, room=room, skip_sid=skip, to=to, **kwargs)
+        for sid in overloaded:
+            self._drop_connection(sid, namespace)
+
+    def flush_pending(self):
+        """Send each slow connection its held-back events as one ``batch`` frame"""
+        with self._lock:
+            sids = list(self._pending)
+        for sid in sids:
+            self._send_pending(sid)
+
+    def stats(self, limit=50):
+        """Queue depth per connection (deepest first, without the sids) and downgrade counters"""
+        depths = []
+        for namespace in self.get_namespaces():
+            for sid, eio_sid in self.get_participants(namespace, None):
+                depths.append({
+                    'depth': self.queue_depth(eio_sid),
+                    'slow': sid in self._slow,
+                    'pending': len(self._pending.get(sid, (None, None, ()))[2])
+                })
+        depths.sort(key=lambda c: c['depth'], reverse=True)
+        return {
+            'connections': len(depths),
+            'slow': len(self._slow),
+            'dropped': self.dropped,
+            'batched': self.batched,
+            'disconnected': self.disconnected,
+            'deepest': depths[:limit]
+        }
+
+    def _defer(self, sid, namespace, eio_sid, event):
+        """Hold an event for the next batch; True when the backlog passed the hard limit"""
+        with self._lock:
+            pending = self._pending.setdefault(sid, (namespace, eio_sid, []))[2]
+            pending.append(event)
+            too_many = len(pending) >= self.hard_limit
+        self._ensure_flusher()
+        return too_many
+
+    def _send_pending(self, sid):
+        with self._lock:
+            entry = self._pending.pop(sid, None)
+        if not entry:
+            return
+        namespace, eio_sid, events = entry
+        if not self.is_connected(sid, namespace):
+            return
+        self.batched += len(events)
+        super().emit('batch', {'events': events}, namespace, to=sid)
+
+    def _drop_connection(self, sid, namespace):
+        with self._lock:
+            self._slow.discard(sid)
+            self._pending.pop(sid, None)
+        self.disconnected += 1
+        self.server.logger.warning('%s: outbound queue over hard limit, disconnecting', sid)
+        self.server.disconnect(sid, namespace=namespace)
+
+    def disconnect(self, sid, namespace, **kwargs):
+        with self._lock:
+            self._slow.discard(sid)
+            self._pending.pop(sid, None)
+        return super().disconnect(sid, namespace, **kwargs)
+
+    def _ensure_flusher(self):
+        if self._task is None:
+            self._task = self.server.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.server.sleep(self.batch_interval)
+            try:
+                self.flush_pending()
+            except Exception as e:
+                print(f"Outbound batch flush error: {e}")
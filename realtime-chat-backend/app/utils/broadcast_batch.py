@@ -0,0 +1,103 @@
+import itertools
+import threading
+
+
+class BroadcastBatcher:
+    """Gathers room broadcasts over a short window and sends them as one frame.
+
+    With ``window`` > 0, events listed in ``events`` (e.g.
+    ``new_public_message`` -> ``new_public_messages``) are held per room for
+    up to ``window`` seconds, or until ``max_batch`` of them are waiting, and
+    then go out as a single ``(items, {'room', 'seq', 'count'})`` frame under
+    the batch event name. Frames, packet encodes and socket writes then grow
+    with the number of windows instead of the number of messages, at the cost
+    of up to ``window`` seconds of added latency. ``window`` = 0 disables
+    batching.
+    """
+
+    def __init__(self, window=0, max_batch=100, events=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.events = events or {"new_public_message": "new_public_messages"}
+        self._pending = {}  # room -> (batch_id, batch_event, [items], last_seq)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._socketio = None
+        self.messages = 0
+        self.frames = 0
+
+    def init_app(self, app, socketio=None):
+        app.config.setdefault("BROADCAST_BATCH_WINDOW", 0)
+        app.config.setdefault("BROADCAST_BATCH_MAX", 100)
+        self.window = app.config["BROADCAST_BATCH_WINDOW"]
+        self.max_batch = app.config["BROADCAST_BATCH_MAX"]
+        self._socketio = socketio
+        self.clear()
+        app.extensions["broadcast_batcher"] = self
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self.messages = 0
+            self.frames = 0
+
+    def add(self, room, event, data, seq=None):
+        """Queue ``data`` for the room's next batch; False when ``event`` is sent unbatched"""
+        batch_event = self.events.get(event)
+        if not self.window or batch_event is None:
+            return False
+
+        # A batch holds one kind of event; close a different open one first
+        pending = self._pending.get(room)
+        if pending is not None and pending[1] != batch_event:
+            self.flush(room)
+
+        with self._lock:
+            self.messages += 1
+            pending = self._pending.get(room)
+            if pending is None:
+                batch_id = next(self._ids)
+                self._pending[room] = (batch_id, batch_event, [data], seq)
+                full = self.max_batch <= 1
+            else:
+                batch_id, _, items, _ = pending
+                items.append(data)
+                self._pending[room] = (batch_id, batch_event, items, seq)
+                full = len(items) >= self.max_batch
+
+        if full:
+            self.flush(room)
+        elif pending is None:
+            self._socketio.start_background_task(self._flush_later, room, batch_id)
+        return True
+
+    def flush(self, room=None, emit=None):
+        """Send the open batch of ``room`` (all rooms when None) now; returns the frame count"""
+        emit = emit or self._socketio.emit
+        with self._lock:
+            rooms = list(self._pending) if room is None else [room]
+            batches = [(r, self._pending.pop(r)) for r in rooms if r in self._pending]
+            self.frames += len(batches)
+
+        for r, (_, batch_event, items, seq) in batches:
+            emit(batch_event, (items, {'room': r, 'seq': seq, 'count': len(items)}), to=r)
+        return len(batches)
+
+    def stats(self):
+        return {
+            "window": self.window,
+            "messages": self.messages,
+            "frames": self.frames,
+            "pending_rooms": len(self._pending),
+        }
+
+    def _flush_later(self, room, batch_id):
+        self._socketio.sleep(self.window)
+        pending = self._pending.get(room)
+        # The batch may already have gone out because it filled up
+        if pending is None or pending[0] != batch_id:
+            return
+        try:
+            self.flush(room)
+        except Exception as e:
+            print(f"Broadcast batch flush error: {e}")
@@ -0,0 +1,116 @@
+import threading
+import time
+
+
+class EphemeralEvents:
+    """Coalesced, in-memory only state for typing indicators and presence.
+
+    Clients ping as often as they like; a ping only refreshes the user's entry
+    in ``(kind, room)`` state. A flusher runs every ``interval`` seconds,
+    drops entries whose TTL ran out and emits one frame per room whose set of
+    active users changed since the last flush. Nothing here touches the DB,
+    and a room sees at most one frame per kind per interval no matter how many
+    users are typing in it.
+    """
+
+    def __init__(self, interval=0.5, ttls=None, max_listed=10, clock=time.monotonic):
+        self.interval = interval
+        self.ttls = ttls or {"typing": 5.0, "presence": 60.0}
+        self.max_listed = max_listed
+        self.clock = clock
+        self._state = {}  # (kind, room) -> {user_id: (user, expires_at)}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._socketio = None
+        self._task = None
+        self.pings = 0
+        self.frames = 0
+
+    def init_app(self, app, socketio=None):
+        app.config.setdefault("EPHEMERAL_INTERVAL", 0.5)
+        app.config.setdefault("TYPING_TTL", 5.0)
+        app.config.setdefault("PRESENCE_TTL", 60.0)
+        self.interval = app.config["EPHEMERAL_INTERVAL"]
+        self.ttls = {"typing": app.config["TYPING_TTL"], "presence": app.config["PRESENCE_TTL"]}
+        self._socketio = socketio
+        self.clear()
+        app.extensions["ephemeral"] = self
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
+            self._dirty.clear()
+            self.pings = 0
+            self.frames = 0
+
+    def update(self, kind, room, user, active=True, now=None):
+        """Record a ping (``active``) or an explicit stop for ``user`` in ``room``"""
+        now = self.clock() if now is None else now
+        key = (kind, room)
+        with self._lock:
+            self.pings += 1
+            users = self._state.setdefault(key, {})
+            if active:
+                if user["id"] not in users:
+                    self._dirty.add(key)
+                users[user["id"]] = (user, now + self.ttls[kind])
+            elif users.pop(user["id"], None) is not None:
+                self._dirty.add(key)
+        self._ensure_flusher()
+
+    def forget_user(self, user_id, rooms=None):
+        """Drop a user's state (left the room or disconnected)"""
+        with self._lock:
+            for key, users in self._state.items():
+                if (rooms is None or key[1] in rooms) and users.pop(user_id, None) is not None:
+                    self._dirty.add(key)
+
+    def active(self, kind, room, now=None):
+        now = self.clock() if now is None else now
+        with self._lock:
+            return [user for user, expires in self._state.get((kind, room), {}).values() if expires > now]
+
+    def flush(self, emit=None, now=None):
+        """Expire stale entries and emit one frame per changed room; returns the frame count"""
+        now = self.clock() if now is None else now
+        emit = emit or self._socketio.emit
+
+        with self._lock:
+            for key, users in list(self._state.items()):
+                expired = [user_id for user_id, (_, expires) in users.items() if expires <= now]
+                for user_id in expired:
+                    del users[user_id]
+                if expired:
+                    self._dirty.add(key)
+                if not users and key not in self._dirty:
+                    del self._state[key]
+
+            frames = []
+            for kind, room in self._dirty:
+                users = [user for user, _ in self._state.get((kind, room), {}).values()]
+                frames.append((kind, room, {
+                    'room': room,
+                    'count': len(users),
+                    'users': users[:self.max_listed]
+                }))
+                if not users:
+                    self._state.pop((kind, room), None)
+            self._dirty.clear()
+            self.frames += len(frames)
+
+        for kind, room, payload in frames:
+            emit(kind, payload, to=room)
+        return len(frames)
+
+    def _ensure_flusher(self):
+        if self._task is not None or self._socketio is None:
+            return
+        self._task = self._socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self._socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ephemeral flush error: {e}")
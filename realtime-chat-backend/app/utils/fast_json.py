@@ -0,0 +1,44 @@
+import orjson
+from flask.json.provider import JSONProvider
+
+# Non-string dict keys show up in a few socket payloads (e.g. unread counts keyed by chat id)
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, **kwargs):
+    """json.dumps compatible encoder used for Socket.IO packets"""
+    return orjson.dumps(obj, default=_default, option=OPTIONS).decode()
+
+
+def loads(s, **kwargs):
+    """json.loads compatible decoder used for Socket.IO packets"""
+    return orjson.loads(s)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Pre-encoded ``orjson.Fragment`` values (see ``app.utils.message_cache``)
+    are embedded into responses as-is instead of being re-serialized.
+    """
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=OPTIONS)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,58 @@
+from flask import current_app
+
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes, the default FILE_MAX_SIZE
+ALLOWED_EXTENSIONS = {'.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+
+# Values of File.category, the ?type= filter of the file listings
+IMAGE = "image"
+DOCUMENT = "document"
+
+
+def descriptor_error(data):
+    """Why a ``{filename, file_url, file_size, file_type?}`` descriptor is invalid, or None"""
+    if not isinstance(data, dict) or not all(k in data for k in ["filename", "file_url", "file_size"]):
+        return "Missing required fields: filename, file_url, file_size"
+
+    if not isinstance(data["file_size"], int) or data["file_size"] < 0:
+        return "Invalid file size"
+
+    if data["file_size"] > max_file_size():
+        return f"File size exceeds {format_size(max_file_size())} limit"
+
+    return filename_error(data["filename"])
+
+
+def filename_error(filename):
+    if not any(str(filename).lower().endswith(ext) for ext in ALLOWED_EXTENSIONS):
+        return "Invalid file type. Allowed: PDF, DOC, DOCX, and image files"
+    return None
+
+
+def file_category(filename, file_type=None):
+    """IMAGE or DOCUMENT, from the MIME type when there is one, else the extension"""
+    if file_type:
+        return IMAGE if file_type.lower().startswith("image/") else DOCUMENT
+    return IMAGE if any(str(filename).lower().endswith(ext) for ext in IMAGE_EXTENSIONS) else DOCUMENT
+
+
+def max_file_size():
+    return current_app.config.get("FILE_MAX_SIZE", MAX_FILE_SIZE)
+
+
+def format_size(size):
+    if size % (1024 * 1024) == 0:
+        return f"{size // (1024 * 1024)}MB"
+    return f"{size} bytes"
+
+
+def file_values(data, uploader_id, **associations):
+    """Column values of a File row for a validated descriptor"""
+    return dict(
+        filename=data["filename"].strip(),
+        file_url=data["file_url"].strip(),
+        file_size=data["file_size"],
+        file_type=(data.get("file_type") or "").strip() or None,
+        uploader_id=uploader_id,
+        **associations
+    )
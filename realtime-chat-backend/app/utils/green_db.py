@@ -0,0 +1,80 @@
+from eventlet import patcher
+from eventlet.hubs import trampoline
+from sqlalchemy.engine import make_url
+
+
+def eventlet_wait_callback(conn, timeout=-1):
+    """psycopg2 wait callback: wait for the server through the eventlet hub.
+
+    With it installed psycopg2 runs libpq in non-blocking mode and calls
+    this whenever it would block, so a query only suspends its own green
+    thread instead of the whole worker.
+    """
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def make_psycopg_green():
+    """Install the eventlet wait callback in psycopg2; False when psycopg2 is not installed"""
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    extensions.set_wait_callback(eventlet_wait_callback)
+    return True
+
+
+def psycopg_is_green():
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    return extensions.get_wait_callback() is not None
+
+
+def blocking_driver(uri):
+    """Why the database driver of ``uri`` would block the eventlet hub, or None if it yields"""
+    if not uri:
+        return None
+    url = make_url(uri)
+    if url.get_backend_name() != "postgresql":
+        return None
+
+    driver = url.get_driver_name()
+    if driver == "psycopg2":
+        return None if psycopg_is_green() else "psycopg2 without the eventlet wait callback"
+    if driver == "pg8000":
+        # Pure Python over the (monkey-patched) socket module
+        return None
+    return f"{driver} makes blocking calls in C"
+
+
+def init_green_db(app):
+    """Make the DB driver cooperative under eventlet and warn at startup when it is not.
+
+    Only acts when the process is monkey patched (run.py). ``DB_GREEN_DRIVER``
+    (default on) installs the psycopg2 wait callback; ``postgresql+pg8000://``
+    URLs are green as they are.
+    """
+    app.config.setdefault("DB_GREEN_DRIVER", True)
+    if not patcher.is_monkey_patched("socket"):
+        return
+
+    if app.config["DB_GREEN_DRIVER"]:
+        make_psycopg_green()
+
+    reason = blocking_driver(app.config.get("SQLALCHEMY_DATABASE_URI"))
+    if reason:
+        print(f"WARNING: the database driver blocks the eventlet hub ({reason}); every query stalls "
+              f"all sockets on this worker. Use postgresql+psycopg2:// with DB_GREEN_DRIVER=true, "
+              f"or postgresql+pg8000://.")
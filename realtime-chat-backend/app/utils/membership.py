@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class MembershipCache:
+    """Bounded LRU of group chat member sets, so fan-out skips the membership query.
+
+    ``members(chat_id, load)`` returns the cached ``frozenset`` of user ids,
+    calling ``load()`` (the ``chat_members`` query) on a miss or once the
+    entry is ``ttl`` seconds old. Every change to a group's membership must
+    call ``invalidate(chat_id)``, which only reaches this worker: the others
+    notice within ``ttl``. Only who gets a group's events is read from here;
+    whether a user may read or write a group is checked against the table.
+    """
+
+    def __init__(self, max_chats=10000, ttl=10):
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self._members = OrderedDict()  # chat_id -> (loaded_at, frozenset of user ids)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault("GROUP_MEMBERSHIP_CACHE_SIZE", 10000)
+        app.config.setdefault("GROUP_MEMBERSHIP_CACHE_TTL", 10)
+        self.max_chats = app.config["GROUP_MEMBERSHIP_CACHE_SIZE"]
+        self.ttl = app.config["GROUP_MEMBERSHIP_CACHE_TTL"]
+        self.clear()
+        app.extensions["membership"] = self
+
+    def clear(self):
+        with self._lock:
+            self._members.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def members(self, chat_id, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._members.get(chat_id)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._members.move_to_end(chat_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        members = frozenset(load())
+        with self._lock:
+            self._members[chat_id] = (now, members)
+            self._members.move_to_end(chat_id)
+            while len(self._members) > self.max_chats:
+                self._members.popitem(last=False)
+        return members
+
+    def invalidate(self, chat_id):
+        with self._lock:
+            self._members.pop(chat_id, None)
+
+    def stats(self):
+        return {
+            "chats": len(self._members),
+            "max_chats": self.max_chats,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,141 @@
+import threading
+from collections import OrderedDict
+
+import orjson
+
+from app.utils.fast_json import OPTIONS
+
+PUBLIC = "public"
+PRIVATE = "private"
+
+
+def author_id(kind, message):
+    return message.user_id if kind == PUBLIC else message.sender_id
+
+
+class MessageCache:
+    """Bounded LRU of pre-encoded message JSON.
+
+    Entries are keyed by ``(kind, message id)`` and tagged with the row's
+    ``version``; a lookup with a different version is treated as a miss.
+    The encoded bytes are handed out as ``orjson.Fragment`` objects so that
+    history responses, socket broadcasts and chat previews embed them
+    without serializing the message again.
+
+    Entries are dropped by this worker's own edits and profile changes, so
+    the cache assumes each room is served by a single worker (sticky
+    sessions). With ``enabled`` off (a message queue spreads rooms over
+    workers) every message is encoded on each use and nothing is kept.
+    """
+
+    def __init__(self, max_entries=10000, enabled=True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()  # (kind, id) -> (version, author_id, bytes)
+        self._by_author = {}  # author_id -> set of (kind, id)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app, enabled=True):
+        app.config.setdefault("MESSAGE_CACHE_SIZE", 10000)
+        self.max_entries = app.config["MESSAGE_CACHE_SIZE"]
+        self.enabled = enabled
+        self.clear()
+        app.extensions["message_cache"] = self
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_author.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_bytes(self, kind, message, files=None):
+        """Return the encoded JSON for ``message``, encoding it on a miss"""
+        key = (kind, message.id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == message.version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        encoded = orjson.dumps(message.to_dict(files=files), option=OPTIONS)
+        self._store(key, message.version, author_id(kind, message), encoded)
+        return encoded
+
+    def get_fragment(self, kind, message):
+        return orjson.Fragment(self.get_bytes(kind, message))
+
+    def get_many_bytes(self, kind, messages):
+        """Encoded JSON for a list of messages, in order.
+
+        Attachments for all cache misses are loaded with a single query
+        instead of one query per message.
+        """
+        with self._lock:
+            missing = [
+                m.id for m in messages
+                if (entry := self._entries.get((kind, m.id))) is None or entry[0] != m.version
+            ]
+
+        files_by_message = self._load_files(kind, missing) if missing else {}
+        return [self.get_bytes(kind, m, files=files_by_message.get(m.id, [])) for m in messages]
+
+    def get_fragments(self, kind, messages):
+        return [orjson.Fragment(encoded) for encoded in self.get_many_bytes(kind, messages)]
+
+    def invalidate(self, kind, message_id):
+        with self._lock:
+            entry = self._entries.pop((kind, message_id), None)
+            if entry is not None:
+                keys = self._by_author.get(entry[1])
+                if keys is not None:
+                    keys.discard((kind, message_id))
+
+    def invalidate_author(self, user_id):
+        """Drop every cached message written by ``user_id`` (profile changed)"""
+        with self._lock:
+            for key in self._by_author.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _store(self, key, version, author_id, encoded):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (version, author_id, encoded)
+            self._entries.move_to_end(key)
+            self._by_author.setdefault(author_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                old_key, (_, old_author, _) = self._entries.popitem(last=False)
+                keys = self._by_author.get(old_author)
+                if keys is not None:
+                    keys.discard(old_key)
+                    if not keys:
+                        del self._by_author[old_author]
+
+    @staticmethod
+    def _load_files(kind, message_ids):
+        from app.models.file import File
+
+        column = File.public_message_id if kind == PUBLIC else File.private_message_id
+        files_by_message = {}
+        for file in File.query.filter(column.in_(message_ids)).all():
+            message_id = file.public_message_id if kind == PUBLIC else file.private_message_id
+            files_by_message.setdefault(message_id, []).append(file)
+        return files_by_message
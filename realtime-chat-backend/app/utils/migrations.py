@@ -0,0 +1,43 @@
+import click
+
+
+class LazyMigrate:
+    """Flask-Migrate, imported only when a ``flask db`` command runs.
+
+    Importing flask_migrate pulls in all of alembic, which only the
+    migration commands need but every worker would pay for at startup.
+    ``init_app`` registers a stand-in ``db`` command group; the first time
+    one of its commands is looked up, the real ``Migrate`` is set up on the
+    app and the lookup is answered by Flask-Migrate's own group.
+    """
+
+    def __init__(self, directory="migrations"):
+        self.directory = directory
+        self.db = None
+
+    def init_app(self, app, db):
+        self.db = db
+
+        def commands():
+            from flask_migrate.cli import db as commands
+
+            self.load(app)
+            return commands
+
+        app.cli.add_command(_DeferredGroup("db", commands, help="Perform database migrations."))
+
+    def load(self, app):
+        """Set up Flask-Migrate on ``app``; call it before using flask_migrate's Python API (``upgrade()``...)"""
+        from flask_migrate import Migrate
+
+        if "migrate" not in app.extensions:
+            Migrate(app, self.db, directory=self.directory)
+
+
+class _DeferredGroup(click.Group):
+    def __init__(self, name, load, **kwargs):
+        super().__init__(name, **kwargs)
+        self._load = load
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        return self._load().make_context(info_name, args, parent=parent, **extra)
@@ -0,0 +1,25 @@
+from flask import request
+
+PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+def cursor_page(query, column, descending=True):
+    """One ``?cursor=&limit=`` page of ``query`` ordered by the unique ``column``.
+
+    The cursor is the ``column`` value of the last row already seen, so a
+    page is a range scan from there (no OFFSET) and stays stable while rows
+    are added. Returns ``(items, next_cursor)``; ``next_cursor`` is None on
+    the last page.
+    """
+    limit = max(1, min(request.args.get("limit", PAGE_LIMIT, type=int), MAX_PAGE_LIMIT))
+    cursor = request.args.get("cursor", type=int)
+
+    if cursor is not None:
+        query = query.filter(column < cursor if descending else column > cursor)
+    # One extra row tells whether there is a next page
+    items = query.order_by(column.desc() if descending else column).limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, getattr(items[-1], column.key)
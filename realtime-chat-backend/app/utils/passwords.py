@@ -0,0 +1,72 @@
+import threading
+from functools import lru_cache
+
+from eventlet import patcher, tpool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+@lru_cache(maxsize=8)
+def method_prefix(method):
+    """The ``method:params`` part werkzeug writes for ``method``, defaults filled in ("scrypt" -> "scrypt:32768:8:1")"""
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+class PasswordHasher:
+    """Password hashing that does not stall the eventlet hub.
+
+    scrypt and PBKDF2 are pure CPU work; run inline they block every green
+    thread of the worker (and so every socket on it) for the whole hash.
+    Under eventlet monkey patching the hash runs in a real OS thread through
+    ``eventlet.tpool`` instead, with at most ``PASSWORD_HASH_CONCURRENCY``
+    hashes in flight so a login burst cannot take over all the cores. In
+    unpatched processes (tests, scripts) it simply runs inline.
+
+    ``PASSWORD_HASH_METHOD`` is any werkzeug method string, e.g. ``scrypt``
+    or ``pbkdf2:sha256:600000``; ``needs_rehash`` reports hashes made with
+    other parameters so login can upgrade them.
+    """
+
+    def __init__(self, method="scrypt", concurrency=4):
+        self.method = method
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_HASH_METHOD", "scrypt")
+        app.config.setdefault("PASSWORD_HASH_CONCURRENCY", 4)
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        self.concurrency = app.config["PASSWORD_HASH_CONCURRENCY"]
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self.hashed = self.verified = self.rehashed = 0
+        app.extensions["passwords"] = self
+
+    def hash(self, password):
+        self.hashed += 1
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def verify(self, pwhash, password):
+        self.verified += 1
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether ``pwhash`` was made with another method or other parameters than configured"""
+        return pwhash.split("$", 1)[0] != method_prefix(self.method)
+
+    def stats(self):
+        return {
+            "method": self.method,
+            "concurrency": self.concurrency,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+        }
+
+    def _run(self, func, *args, **kwargs):
+        if not patcher.is_monkey_patched("thread"):
+            return func(*args, **kwargs)
+        # Patched, this semaphore is green: waiting for a slot yields to other green threads
+        with self._slots:
+            return tpool.execute(func, *args, **kwargs)
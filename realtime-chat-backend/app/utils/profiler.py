@@ -0,0 +1,289 @@
+import functools
+import hmac
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+from eventlet import patcher
+from flask import Flask, g, request
+from flask_socketio import emit
+from greenlet import getcurrent
+
+# The sampler must be a real OS thread: under monkey patching a green one would only get to
+# run when the handler it is meant to watch yields, never in the middle of its CPU work.
+_threading = patcher.original("threading")
+_time = patcher.original("time")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_labels = {}  # code object -> "function (file:line)"
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(PROJECT_ROOT):
+            filename = os.path.relpath(filename, PROJECT_ROOT)
+        else:
+            filename = filename.rsplit(f"site-packages{os.sep}", 1)[-1]
+        label = _labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def _dispatch_frame():
+    """Frame of the ``Flask.full_dispatch_request`` running the current request, or None"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code is not Flask.full_dispatch_request.__code__:
+        frame = frame.f_back
+    return frame
+
+
+class Profile:
+    """Stack samples of one REST request or socket event.
+
+    ``root`` is the frame the handler runs under; samples keep only the
+    frames from it inwards. When the handler's green thread is switched out
+    (waiting on the database, a socket or the hub) its suspended stack is
+    sampled instead, so the profile shows wall-clock time, waits included.
+    """
+
+    def __init__(self, name, root, on_demand=False):
+        self.name = name
+        self.root = root
+        self.on_demand = on_demand
+        self.thread_id = _threading.get_ident()
+        self.greenlet = getcurrent()
+        self.stacks = Counter()  # "outer;...;inner" -> samples
+        self.started = time.perf_counter()
+
+    def sample(self, frames):
+        stack = self._stack(frames.get(self.thread_id))
+        if stack is None:
+            stack = self._stack(self.greenlet.gr_frame)
+        if stack:
+            self.stacks[stack] += 1
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(_label(frame.f_code))
+            if frame is self.root:
+                break
+            frame = frame.f_back
+        else:
+            if self.root is not None:
+                return None  # another green thread's stack
+        return ";".join(reversed(labels))
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+
+class Profiler:
+    """Opt-in sampling profiler of REST requests and socket events.
+
+    ``PROFILE_SAMPLE_RATE`` of requests and events (0 to 1, default 0) are
+    profiled and their samples added up per handler, in a collapsed-stack
+    file per handler under ``PROFILE_DIR`` (``api.messages.get_messages.folded``,
+    ``socket.send_public_message.folded``): one ``outer;...;inner count``
+    line per stack, ready for flamegraph.pl, speedscope or inferno.
+
+    With ``PROFILE_TOKEN`` set, one request is profiled on demand by sending
+    the token in an ``X-Profile`` header, and the next events of a socket
+    connection by sending it in a ``profile`` event. On-demand profiles are
+    written to a file of their own, named in the ``X-Profile-File`` header
+    or the ``profiled`` event, and are left out of the per-handler totals.
+
+    Socket events are profiled by handlers decorated with ``socket_event``
+    under their ``@socketio.on``.
+
+    Stacks are sampled every ``PROFILE_INTERVAL`` seconds by one OS thread,
+    started on the first profile, which also rewrites the per-handler files
+    of finished profiles at most every ``FLUSH_INTERVAL`` seconds (``flush``
+    writes them at once). With neither setting the profiler is off and costs
+    socket events an attribute check. The asyncio mode's socket events
+    (app.aio) are not profiled.
+    """
+
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.interval = 0.005
+        self.directory = "profiles"
+        self.token = None
+        self.enabled = False
+        self.handlers = {}  # handler -> Counter of sampled stacks
+        self.profiled = 0
+        self._active = set()
+        self._armed = {}  # sid -> events left to profile on demand
+        self._dirty = set()  # handlers whose totals changed since the last flush
+        self._lock = _threading.Lock()
+        self._flush_lock = _threading.Lock()
+        self._wake = _threading.Event()
+        self._sampler = None
+
+    def init_app(self, app):
+        app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+        app.config.setdefault("PROFILE_INTERVAL", 0.005)
+        app.config.setdefault("PROFILE_TOKEN", None)
+        if not app.config.get("PROFILE_DIR"):
+            app.config["PROFILE_DIR"] = os.path.join(app.instance_path, "profiles")
+        self.sample_rate = app.config["PROFILE_SAMPLE_RATE"]
+        self.interval = app.config["PROFILE_INTERVAL"]
+        self.token = app.config["PROFILE_TOKEN"]
+        self.directory = app.config["PROFILE_DIR"]
+        self.enabled = self.sample_rate > 0 or bool(self.token)
+        self.handlers = {}
+        self.profiled = 0
+        self._armed.clear()
+        self._dirty.clear()
+        if self.enabled:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            app.teardown_request(self._teardown_request)
+        app.extensions["profiler"] = self
+
+    def arm(self, sid, token, events=1):
+        """Profile the next ``events`` events of connection ``sid``; how many, or 0 for a wrong token"""
+        if not self.token or not isinstance(token, str) or not hmac.compare_digest(token, self.token):
+            return 0
+        events = max(1, min(int(events), 100))
+        self._armed[sid] = events
+        return events
+
+    def start(self, name, root, on_demand=False):
+        profile = Profile(name, root, on_demand)
+        with self._lock:
+            self._active.add(profile)
+            if self._sampler is None:
+                self._sampler = _threading.Thread(target=self._sample_forever, name="profiler", daemon=True)
+                self._sampler.start()
+        self._wake.set()
+        return profile
+
+    def finish(self, profile):
+        """Stop sampling ``profile``; the path written for on-demand profiles.
+
+        Sampled profiles are added to their handler's totals, which the
+        sampler thread writes out in the background.
+        """
+        with self._lock:
+            self._active.discard(profile)
+            if not profile.on_demand:
+                self.handlers.setdefault(profile.name, Counter()).update(profile.stacks)
+                self._dirty.add(profile.name)
+        self.profiled += 1
+        if not profile.on_demand:
+            self._wake.set()
+            return None
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self._write(f"{profile.name}-{stamp}-{id(profile):x}", profile.stacks)
+        took = (time.perf_counter() - profile.started) * 1000
+        print(f"Profiled {profile.name}: {profile.samples} samples in {took:.1f} ms -> {path}")
+        return path
+
+    def flush(self):
+        """Write the per-handler files whose totals changed since the last flush"""
+        with self._flush_lock:
+            with self._lock:
+                changed = {name: dict(self.handlers[name]) for name in self._dirty}
+                self._dirty.clear()
+            for name, stacks in changed.items():
+                self._write(name, stacks)
+
+    def _sample_forever(self):
+        flushed = _time.monotonic()
+        while True:
+            self._wake.wait()
+            with self._lock:
+                sampling = bool(self._active)
+                if not sampling:
+                    self._wake.clear()
+                frames = sys._current_frames()
+                for profile in self._active:
+                    profile.sample(frames)
+                del frames
+            if not sampling or _time.monotonic() - flushed >= self.FLUSH_INTERVAL:
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Profile flush failed: {e}")
+                flushed = _time.monotonic()
+            if sampling:
+                _time.sleep(self.interval)
+
+    def _write(self, name, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, re.sub(r"[^\w.-]", "_", name) + ".folded")
+        with open(f"{path}.tmp", "w") as out:
+            out.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _on_demand_request(self):
+        token = request.headers.get("X-Profile")
+        return bool(self.token and token) and hmac.compare_digest(token, self.token)
+
+    def _start_request(self):
+        on_demand = self._on_demand_request()
+        if on_demand or self._sampled():
+            g.profile = self.start(request.endpoint or "unmatched", _dispatch_frame(), on_demand)
+
+    def _finish_request(self, response):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            path = self.finish(profile)
+            if path:
+                response.headers["X-Profile-File"] = os.path.basename(path)
+        return response
+
+    def _teardown_request(self, exc):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            self.finish(profile)
+
+    def socket_event(self, handler):
+        """Decorator profiling a socket event handler when sampled or armed; goes right under ``@socketio.on``"""
+        @functools.wraps(handler)
+        def wrapper(*args):
+            if not self.enabled:
+                return handler(*args)
+            message, sid = request.event["message"], request.sid
+            if message == "disconnect":
+                self._armed.pop(sid, None)
+
+            on_demand = sid in self._armed and message != "profile"
+            if on_demand:
+                self._armed[sid] -= 1
+                if not self._armed[sid]:
+                    del self._armed[sid]
+            elif not self._sampled():
+                return handler(*args)
+
+            profile = self.start(f"socket.{message}", sys._getframe(), on_demand)
+            try:
+                return handler(*args)
+            finally:
+                path = self.finish(profile)
+                if path:
+                    emit("profiled", {"event": message, "file": os.path.basename(path)}, to=sid)
+        wrapper.profiled = True
+        return wrapper
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "profiled": self.profiled,
+            "active": len(self._active),
+            "handlers": {name: sum(stacks.values()) for name, stacks in self.handlers.items()},
+        }
@@ -0,0 +1,170 @@
+import functools
+import os
+import sys
+import threading
+from collections import Counter
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(APP_ROOT)
+
+_active = threading.local()  # .counters: the QueryCounters open in this (green) thread
+_listening = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _call_site():
+    """``file:line in function`` of the innermost app frame that led to a statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and filename != __file__:
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    counters = getattr(_active, "counters", None)
+    if counters:
+        site = _call_site()
+        for counter in counters:
+            counter.statements.append((statement, site))
+
+
+def listen():
+    """Hook the statement listener on every engine (once per process)"""
+    global _listening
+    if not _listening:
+        event.listen(Engine, "before_cursor_execute", _record)
+        _listening = True
+
+
+class QueryCounter:
+    """Statements run by this (green) thread, on any engine, while the counter is open.
+
+    A context manager; counters nest, and each sees every statement run
+    while it is open::
+
+        with QueryCounter() as queries:
+            client.get('/api/chats', headers=headers)
+        assert queries.count <= 4, queries.report()
+    """
+
+    def __init__(self):
+        self.statements = []  # (statement, call site)
+
+    def __enter__(self):
+        listen()
+        if not hasattr(_active, "counters"):
+            _active.counters = []
+        _active.counters.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active.counters.remove(self)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold=2):
+        """``(statement, times, call sites)`` of SELECTs run at least ``threshold`` times, most first.
+
+        The same SELECT run again and again with other parameters is the mark
+        of an N+1: a query per row of an earlier result.
+        """
+        times = Counter(statement for statement, _ in self.statements if statement.lstrip().startswith("SELECT"))
+        return [
+            (statement, n, sorted({site for s, site in self.statements if s == statement}))
+            for statement, n in times.most_common() if n >= threshold
+        ]
+
+    def report(self, threshold=2):
+        lines = [f"{self.count} queries"]
+        for statement, times, sites in self.repeated(threshold):
+            lines.append(f"  {times}x {' '.join(statement.split())[:200]}")
+            lines.extend(f"      at {site}" for site in sites)
+        return "\n".join(lines)
+
+
+class QueryBudget:
+    """Query budgets of REST routes and socket events, and a per-request query counter.
+
+    ``QUERY_BUDGET_MODE`` is ``off`` (default), ``log`` or ``raise``. When on,
+    handlers decorated with ``limit(n)`` count their statements and log, or
+    raise ``QueryBudgetExceeded``, when they run more than ``n``; and every
+    REST request is counted as a whole, answers with an ``X-Query-Count``
+    header and logs statements repeated ``QUERY_REPEAT_THRESHOLD`` times or
+    more, with their call sites. The test suite runs in ``raise`` mode.
+    """
+
+    def __init__(self):
+        self.mode = "off"
+        self.repeat_threshold = 3
+        self.exceeded = 0
+
+    def init_app(self, app):
+        app.config.setdefault("QUERY_BUDGET_MODE", "off")
+        app.config.setdefault("QUERY_REPEAT_THRESHOLD", 3)
+        self.mode = app.config["QUERY_BUDGET_MODE"]
+        self.repeat_threshold = app.config["QUERY_REPEAT_THRESHOLD"]
+        self.exceeded = 0
+        if self.mode not in ("off", "log", "raise"):
+            raise ValueError(f"Unknown QUERY_BUDGET_MODE {self.mode!r}")
+        if self.mode != "off":
+            listen()
+            app.before_request(self._open_request)
+            app.after_request(self._close_request)
+            app.teardown_request(self._teardown_request)
+        app.extensions["query_budget"] = self
+
+    def limit(self, budget):
+        """Decorator declaring that a view or socket handler runs at most ``budget`` statements"""
+        def decorator(handler):
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                if self.mode == "off":
+                    return handler(*args, **kwargs)
+                with QueryCounter() as queries:
+                    result = handler(*args, **kwargs)
+                if queries.count > budget:
+                    self._exceeded(handler.__name__, budget, queries)
+                return result
+            wrapper.query_budget = budget
+            return wrapper
+        return decorator
+
+    def _exceeded(self, name, budget, queries):
+        self.exceeded += 1
+        message = f"{name} exceeded its query budget of {budget}: {queries.report()}"
+        if self.mode == "raise":
+            raise QueryBudgetExceeded(message)
+        print(f"WARNING: {message}")
+
+    def _open_request(self):
+        g.query_counter = QueryCounter().__enter__()
+
+    def _close_request(self, response):
+        queries = g.pop("query_counter", None)
+        if queries is None:
+            return response
+        queries.__exit__(None, None, None)
+        response.headers["X-Query-Count"] = str(queries.count)
+        if queries.repeated(self.repeat_threshold):
+            print(f"Repeated queries in {request.method} {request.path}: {queries.report(self.repeat_threshold)}")
+        return response
+
+    def _teardown_request(self, exc):
+        queries = g.pop("query_counter", None)
+        if queries is not None:
+            queries.__exit__(None, None, None)
+
+    def stats(self):
+        return {"mode": self.mode, "exceeded": self.exceeded}
@@ -0,0 +1,169 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, jsonify
+
+
+class LocalBucketStore:
+    """In-process token buckets; the stand-in for the shared backend.
+
+    One dict entry of ``(tokens, updated_at)`` per key, so a check is O(1).
+    Keys are kept in LRU order and the oldest are dropped past ``max_keys``;
+    a dropped bucket simply starts full again.
+    """
+
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, keys, rate, burst, cost=1):
+        """Take ``cost`` tokens from every bucket of ``keys``, or from none.
+
+        Returns 0 if they were taken, else the seconds until every bucket
+        would have them.
+        """
+        now = self.clock()
+        with self._lock:
+            levels = []
+            for key in keys:
+                tokens, updated_at = self._buckets.get(key, (burst, now))
+                levels.append(min(burst, tokens + (now - updated_at) * rate))
+            retry_after = max([(cost - tokens) / rate for tokens in levels if tokens < cost], default=0)
+
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens if retry_after else tokens - cost, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """Token buckets shared by all workers, one Redis hash per key.
+
+    The refill-and-take step runs as a Lua script so concurrent workers
+    cannot double spend, on the Redis server's clock (``TIME``) so workers
+    with skewed clocks agree on the refill. Idle keys expire once they
+    would be full again.
+    """
+
+    SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local levels = {}
+    local retry_after = 0
+    for i, key in ipairs(KEYS) do
+        local tokens = tonumber(redis.call('HGET', key, 't'))
+        local updated = tonumber(redis.call('HGET', key, 'u'))
+        if tokens == nil then tokens = burst; updated = now end
+        tokens = math.min(burst, tokens + (now - updated) * rate)
+        if tokens < cost then retry_after = math.max(retry_after, (cost - tokens) / rate) end
+        levels[i] = tokens
+    end
+    for i, key in ipairs(KEYS) do
+        if retry_after == 0 then levels[i] = levels[i] - cost end
+        redis.call('HSET', key, 't', levels[i], 'u', now)
+        redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+    end
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url, prefix="ratelimit:"):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    def consume(self, keys, rate, burst, cost=1):
+        return float(self._script(keys=[self.prefix + key for key in keys], args=[rate, burst, cost]))
+
+    def clear(self):
+        for key in self._redis.scan_iter(self.prefix + "*"):
+            self._redis.delete(key)
+
+
+class RateLimiter:
+    """Per-connection and per-user token buckets for socket events and REST routes.
+
+    ``RATE_LIMITS`` maps a socket event name or a REST endpoint name
+    (``request.endpoint``, e.g. ``api.auth.login``) to ``(tokens per second,
+    burst)``. Names without an entry are not limited. ``RATE_LIMIT_STORAGE_URL``
+    selects the bucket store: ``memory://`` (default, per worker) or a
+    ``redis://`` URL shared by every worker.
+    """
+
+    def __init__(self):
+        self.limits = {}
+        self.store = LocalBucketStore()
+        self.rejected = 0
+
+    def init_app(self, app):
+        app.config.setdefault("RATE_LIMITS", {})
+        app.config.setdefault("RATE_LIMIT_STORAGE_URL", "memory://")
+        self.limits = dict(app.config["RATE_LIMITS"])
+        url = app.config["RATE_LIMIT_STORAGE_URL"]
+        self.store = LocalBucketStore() if url.startswith("memory://") else RedisBucketStore(url)
+        self.rejected = 0
+        app.before_request(self._check_request)
+        app.extensions["rate_limiter"] = self
+
+    def check(self, name, **scopes):
+        """Charge one token to every scope (e.g. ``sid=...``, ``user_id=...``) of ``name``.
+
+        Returns 0 when allowed, otherwise the number of seconds to wait. A
+        rejected call spends nothing, so one scope running dry does not
+        drain the others. Scopes whose value is None are skipped.
+        """
+        limit = self.limits.get(name)
+        keys = [f"{name}:{scope}:{value}" for scope, value in scopes.items() if value is not None]
+        if limit is None or not keys:
+            return 0
+
+        rate, burst = limit
+        retry_after = self.store.consume(keys, rate, burst)
+
+        if retry_after:
+            self.rejected += 1
+        return retry_after
+
+    def _check_request(self):
+        """REST limits run before the view, so a rejected request costs no DB work"""
+        if request.endpoint not in self.limits:
+            return None
+
+        user_id = _request_user_id()
+        retry_after = self.check(
+            request.endpoint,
+            user_id=user_id,
+            ip=request.remote_addr if user_id is None else None
+        )
+        if not retry_after:
+            return None
+
+        response = jsonify({"message": "Too many requests", "retry_after": round(retry_after, 2)})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(math.ceil(retry_after))
+        return response
+
+
+def _request_user_id():
+    """User id from the bearer token, verified but without the blocklist lookup"""
+    from flask_jwt_extended import decode_token
+
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    try:
+        return decode_token(header[7:])["sub"]
+    except Exception:
+        return None
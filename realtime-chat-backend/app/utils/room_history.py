@@ -0,0 +1,178 @@
+import threading
+from collections import OrderedDict, deque
+
+import orjson
+
+
+class RoomHistory:
+    """Per-room ring buffer of the most recent encoded messages.
+
+    Each buffer is a contiguous suffix of the room's history: entries are
+    only appended by the send handlers (or primed from the DB once when a
+    room is cold) and are dropped from the middle only when the message
+    itself is deleted. Rooms are kept in LRU order and the least recently
+    used ones are evicted once the global byte budget is exceeded.
+
+    Only the sends and deletes handled by this worker reach the buffers, so
+    they are correct only while each room is served by a single worker
+    (sticky sessions). With ``enabled`` off (a message queue spreads rooms
+    over workers) every room stays cold and windows come from the DB.
+    """
+
+    def __init__(self, window=50, max_bytes=32 * 1024 * 1024, enabled=True):
+        self.window = window
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._rooms = OrderedDict()  # room -> deque of (message_id, author_id, bytes)
+        self._priming = set()  # rooms collecting appends while their DB prime is in flight
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, enabled=True):
+        app.config.setdefault("ROOM_HISTORY_WINDOW", 50)
+        app.config.setdefault("ROOM_HISTORY_MAX_BYTES", 32 * 1024 * 1024)
+        self.window = app.config["ROOM_HISTORY_WINDOW"]
+        self.max_bytes = app.config["ROOM_HISTORY_MAX_BYTES"]
+        self.enabled = enabled
+        self.clear()
+        app.extensions["room_history"] = self
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+            self._priming.clear()
+            self._bytes = 0
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def __contains__(self, room):
+        return room in self._rooms and room not in self._priming
+
+    def append(self, room, message_id, author_id, encoded):
+        """Record a freshly sent message. Cold rooms stay cold until a join primes them."""
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                return
+            self._push(buffer, (message_id, author_id, encoded))
+            self._rooms.move_to_end(room)
+            self._evict(keep=room)
+
+    def prime(self, room, entries):
+        """Fill a cold room from the DB; ``entries`` are oldest first.
+
+        Messages appended while the DB query was running are merged in by id.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                buffer = self._rooms[room] = deque()
+            merged = {entry[0]: entry for entry in entries}
+            merged.update((entry[0], entry) for entry in buffer)
+            self._bytes -= sum(len(entry[2]) for entry in buffer)
+            buffer.clear()
+            for message_id in sorted(merged)[-self.window:]:
+                self._push(buffer, merged[message_id])
+            self._priming.discard(room)
+            self._rooms.move_to_end(room)
+            self._evict(keep=room)
+
+    def recent(self, room):
+        """Encoded fragments for the room's window (oldest first), or None if cold.
+
+        A cold room starts collecting appends right away so that messages sent
+        while the caller loads the window from the DB are not lost; the caller
+        is expected to follow up with ``prime``, or ``abandon`` if loading failed.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                self._rooms[room] = deque()
+                self._priming.add(room)
+                return None
+            if room in self._priming:
+                return None
+            self._rooms.move_to_end(room)
+            return [(entry[0], orjson.Fragment(entry[2])) for entry in buffer]
+
+    def abandon(self, room):
+        """Give up priming a cold room (its DB query failed); the next ``recent`` starts over"""
+        with self._lock:
+            if room in self._priming:
+                self._priming.discard(room)
+                buffer = self._rooms.pop(room, None)
+                if buffer:
+                    self._bytes -= sum(len(entry[2]) for entry in buffer)
+
+    def discard(self, room, message_id):
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                return
+            for entry in buffer:
+                if entry[0] == message_id:
+                    buffer.remove(entry)
+                    self._bytes -= len(entry[2])
+                    break
+
+    def replace(self, room, message_id, encoded):
+        """Swap in a re-encoded message (e.g. after its attachments changed) if it is buffered"""
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                return
+            for i, entry in enumerate(buffer):
+                if entry[0] == message_id:
+                    buffer[i] = (message_id, entry[1], encoded)
+                    self._bytes += len(encoded) - len(entry[2])
+                    break
+
+    def invalidate_author(self, user_id):
+        """Drop buffered entries up to the newest one written by ``user_id``.
+
+        Cached bytes embed the author's profile, so anything at or before their
+        last buffered message is stale. Truncating from the old end keeps the
+        buffer a contiguous suffix; older pages come from the DB again.
+        """
+        with self._lock:
+            for room, buffer in list(self._rooms.items()):
+                last = max((i for i, entry in enumerate(buffer) if entry[1] == user_id), default=None)
+                if last is None:
+                    continue
+                for _ in range(last + 1):
+                    self._bytes -= len(buffer.popleft()[2])
+                if not buffer and room not in self._priming:
+                    # Nothing left to serve; let the next join prime it again
+                    del self._rooms[room]
+
+    def stats(self):
+        return {
+            "rooms": len(self._rooms),
+            "priming": len(self._priming),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "window": self.window,
+            "enabled": self.enabled,
+        }
+
+    def _push(self, buffer, entry):
+        buffer.append(entry)
+        self._bytes += len(entry[2])
+        while len(buffer) > self.window:
+            self._bytes -= len(buffer.popleft()[2])
+
+    def _evict(self, keep):
+        while self._bytes > self.max_bytes and len(self._rooms) > 1:
+            room = next(iter(self._rooms))
+            if room == keep:
+                self._rooms.move_to_end(room)
+                room = next(iter(self._rooms))
+            buffer = self._rooms.pop(room)
+            self._priming.discard(room)
+            self._bytes -= sum(len(entry[2]) for entry in buffer)
@@ -0,0 +1,123 @@
+import time
+
+import orjson
+
+from app.extensions import socketio, message_cache, room_history, membership, ephemeral, socket_auth, session_resume
+from app.models.channel import Channel
+from app.models.chat_member import ChatMember
+from app.models.message import Message
+from app.models.private_message import PrivateMessage
+from app.utils.message_cache import PUBLIC, PRIVATE, author_id
+
+# Socket rooms and recent windows shared by the REST routes (app.api) and the socket handlers
+# (app.sockets, app.aio). Connections of this worker: sid -> user id, username, rooms, session
+connected_users = {}
+public_room = "public_chat"
+
+
+def channel_room(channel_id):
+    """Socket room of a public channel; the general channel keeps the original public room"""
+    return public_room if channel_id == Channel.DEFAULT_ID else f"channel_{channel_id}"
+
+
+def remember_message(room, kind, message, files=None):
+    """Encode a new message once, record it in the room's recent window and return the bytes"""
+    encoded = message_cache.get_bytes(kind, message, files=files)
+    room_history.append(room, message.id, author_id(kind, message), encoded)
+    return encoded
+
+
+def recent_window(room, kind, query):
+    """Recent messages of a room from memory, primed from the DB only when the room is cold.
+
+    ``query`` must be ordered newest first. Older pages are fetched over REST
+    with ``before_id``.
+    """
+    window = room_history.recent(room)
+    if window is None:
+        primed = False
+        try:
+            messages = query.limit(room_history.window).all()[::-1]
+            encoded = message_cache.get_many_bytes(kind, messages)
+            room_history.prime(room, [
+                (message.id, author_id(kind, message), data) for message, data in zip(messages, encoded)
+            ])
+            primed = True
+        finally:
+            if not primed:
+                room_history.abandon(room)
+        if room_history.enabled:
+            window = room_history.recent(room) or []
+        else:
+            window = [(message.id, orjson.Fragment(data)) for message, data in zip(messages, encoded)]
+
+    return {
+        'messages': [fragment for _, fragment in window],
+        'before_id': window[0][0] if window else None
+    }
+
+
+def channel_window(channel_id):
+    return recent_window(
+        channel_room(channel_id), PUBLIC,
+        Message.query.filter_by(channel_id=channel_id).order_by(Message.id.desc())
+    )
+
+
+def chat_window(chat_id):
+    return recent_window(
+        f"private_chat_{chat_id}", PRIVATE,
+        PrivateMessage.query.filter_by(chat_id=chat_id).order_by(PrivateMessage.id.desc())
+    )
+
+
+def group_members(chat_id):
+    """Member ids of a group chat, from the membership cache (empty for unknown or direct chats)"""
+    return membership.members(chat_id, lambda: ChatMember.member_ids(chat_id))
+
+
+def remove_from_room(user_id, room):
+    """Take every connection of a user out of a room, e.g. after leaving a group"""
+    for sid, user_info in list(connected_users.items()):
+        if user_info['user_id'] == user_id and room in user_info['rooms']:
+            socketio.server.leave_room(sid, room)
+            user_info['rooms'].discard(room)
+
+
+def forget_presence(sid, rooms, connections=connected_users):
+    """Drop the typing and presence state of ``sid``'s user in the ``rooms`` none of their other connections is in"""
+    user_id = connections[sid]['user_id']
+    kept = set()
+    for other_sid, info in connections.items():
+        if other_sid != sid and info['user_id'] == user_id:
+            kept |= info['rooms']
+    ephemeral.forget_user(user_id, set(rooms) - kept)
+
+
+def release_connection(sid, connections=connected_users):
+    """What a closing connection leaves behind, in either server mode: its session stays resumable for
+    the grace period, and typing and presence go with the user's last connection to each room"""
+    user_info = connections[sid]
+    if user_info.get('session'):
+        session_resume.suspend(user_info['session'], user_info['rooms'])
+    forget_presence(sid, user_info['rooms'], connections)
+
+
+def disconnect_user(user_id):
+    """Close this worker's connections of ``user_id`` (account deleted); see ``user_recheck_due`` for the others"""
+    for sid in [sid for sid, info in connected_users.items() if info['user_id'] == user_id]:
+        socketio.server.disconnect(sid, namespace='/')
+
+
+def user_recheck_due(user_info):
+    """Whether a connection's user should be read again, to find out they were deleted.
+
+    ``DELETE /api/users/<id>`` only closes the connections of the worker that
+    served it. Those of other workers, and of the asyncio mode, read their
+    user again on their next rate-limited event, at most every
+    ``SOCKET_AUTH_CACHE_TTL`` seconds: as stale as a cached handshake may be.
+    """
+    if user_info['user_id'] is None or time.monotonic() < user_info['checked_at'] + socket_auth.ttl:
+        return False
+    user_info['checked_at'] = time.monotonic()
+    return True
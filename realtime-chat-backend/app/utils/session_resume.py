@@ -0,0 +1,135 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SessionResume:
+    """Replay buffers and resumable sessions for short socket disconnects.
+
+    Every logged emit gets a sequence number from one global counter, so the
+    events of any room (a user's personal ``user_<id>`` room, a private chat
+    or the public room) carry increasing seqs. Each room keeps its last
+    ``buffer_size`` events. A client that drops keeps its session token; if
+    it comes back within ``grace`` seconds it sends the last seq it saw per
+    room and gets exactly the events it missed, or is told which rooms need a
+    full resync because their buffer already rolled past its cursor.
+    """
+
+    def __init__(self, grace=120, buffer_size=200, max_rooms=10000):
+        self.grace = grace
+        self.buffer_size = buffer_size
+        self.max_rooms = max_rooms
+        self._seq = 0
+        self._rooms = OrderedDict()  # room -> [dropped_seq, deque of (seq, event, args)]
+        self._evicted_floor = 0  # newest seq of any room evicted as a whole
+        self._sessions = {}  # token -> session dict
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault("SESSION_RESUME_GRACE", 120)
+        app.config.setdefault("SESSION_REPLAY_BUFFER", 200)
+        app.config.setdefault("SESSION_REPLAY_MAX_ROOMS", 10000)
+        self.grace = app.config["SESSION_RESUME_GRACE"]
+        self.buffer_size = app.config["SESSION_REPLAY_BUFFER"]
+        self.max_rooms = app.config["SESSION_REPLAY_MAX_ROOMS"]
+        self.clear()
+        app.extensions["session_resume"] = self
+
+    def clear(self):
+        with self._lock:
+            self._seq = 0
+            self._rooms.clear()
+            self._evicted_floor = 0
+            self._sessions.clear()
+
+    # Event log
+
+    def record(self, room, event, *args):
+        """Append an event to the room's replay buffer and return its seq"""
+        with self._lock:
+            self._seq += 1
+            log = self._rooms.get(room)
+            if log is None:
+                log = self._rooms[room] = [0, deque()]
+            buffer = log[1]
+            buffer.append((self._seq, event, args))
+            if len(buffer) > self.buffer_size:
+                log[0] = buffer.popleft()[0]
+            self._rooms.move_to_end(room)
+
+            while len(self._rooms) > self.max_rooms:
+                _, (_, old_buffer) = self._rooms.popitem(last=False)
+                if old_buffer:
+                    self._evicted_floor = max(self._evicted_floor, old_buffer[-1][0])
+            return self._seq
+
+    def since(self, room, seq):
+        """Events of ``room`` after ``seq``, or None if some were already dropped"""
+        with self._lock:
+            log = self._rooms.get(room)
+            if log is None:
+                return None if seq < self._evicted_floor else []
+            if seq < log[0]:
+                return None
+            return [entry for entry in log[1] if entry[0] > seq]
+
+    @property
+    def seq(self):
+        return self._seq
+
+    # Sessions
+
+    def open(self, user_id, sid):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._expire()
+            self._sessions[token] = {
+                "user_id": user_id,
+                "sid": sid,
+                "rooms": set(),
+                "seq": self._seq,
+                "disconnected_at": None,
+            }
+        return token
+
+    def suspend(self, token, rooms):
+        """Remember a dropped connection's rooms and where its stream stopped"""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None:
+                session["rooms"] = set(rooms)
+                session["seq"] = self._seq
+                session["disconnected_at"] = time.monotonic()
+
+    def resume(self, token, user_id, sid):
+        """Hand a suspended session over to a new connection of the same user"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(token)
+            if session is None or session["user_id"] != user_id or session["disconnected_at"] is None:
+                return None
+            session["sid"] = sid
+            session["disconnected_at"] = None
+            return session
+
+    def discard(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def stats(self):
+        return {
+            "seq": self._seq,
+            "rooms": len(self._rooms),
+            "sessions": len(self._sessions),
+            "suspended": sum(1 for s in self._sessions.values() if s["disconnected_at"] is not None),
+        }
+
+    def _expire(self):
+        deadline = time.monotonic() - self.grace
+        expired = [
+            token for token, session in self._sessions.items()
+            if session["disconnected_at"] is not None and session["disconnected_at"] < deadline
+        ]
+        for token in expired:
+            del self._sessions[token]
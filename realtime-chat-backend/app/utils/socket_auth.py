@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_jwt_extended import decode_token
+
+
+class SocketAuthCache:
+    """Short-lived cache of authenticated socket tokens.
+
+    ``authenticate(token, load_user)`` decodes the JWT and calls
+    ``load_user(user_id)`` for a ``{'id', 'username'}`` snapshot only on a
+    miss; a client reconnecting with the same token within ``ttl`` seconds
+    (a network blip, a flapping mobile connection, several tabs) skips both.
+    Entries never outlive the token's own expiry. Profile changes and
+    deletes must call ``invalidate_user``.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token -> (expires_at, snapshot)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault("SOCKET_AUTH_CACHE_TTL", 60)
+        app.config.setdefault("SOCKET_AUTH_CACHE_SIZE", 10000)
+        self.ttl = app.config["SOCKET_AUTH_CACHE_TTL"]
+        self.max_entries = app.config["SOCKET_AUTH_CACHE_SIZE"]
+        self.clear()
+        app.extensions["socket_auth"] = self
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def authenticate(self, token, load_user):
+        """User snapshot for ``token``, None if its user is gone; invalid tokens raise"""
+        snapshot = self.lookup(token)
+        if snapshot is not None:
+            return snapshot
+
+        claims = decode_token(token)
+        snapshot = load_user(int(claims["sub"]))
+        if snapshot is not None:
+            self.remember(token, claims, snapshot)
+        return snapshot
+
+    def lookup(self, token):
+        """The cached snapshot of ``token``, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def remember(self, token, claims, snapshot):
+        """Cache the snapshot of a token that decoded to ``claims``"""
+        if not self.ttl:
+            return
+        now = time.time()
+        expires_at = min(now + self.ttl, claims.get("exp", now + self.ttl))
+        with self._lock:
+            self._entries[token] = (expires_at, snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in [t for t, (_, snapshot) in self._entries.items() if snapshot["id"] == user_id]:
+                del self._entries[token]
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
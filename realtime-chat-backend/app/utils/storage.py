@@ -0,0 +1,138 @@
+import fcntl
+import hashlib
+import os
+import time
+
+
+class StorageOffsetMismatch(Exception):
+    """A chunk does not start where its upload currently ends"""
+
+    def __init__(self, upload_id, size):
+        super().__init__(upload_id, size)
+        self.size = size
+
+
+class StorageLengthMismatch(Exception):
+    """A chunk stream held more or fewer bytes than it declared"""
+
+
+class LocalStorage:
+    """Stored files on the local disk.
+
+    Uploads in progress are appended to ``<root>/partial/<upload_id>``; a
+    finished upload is moved to ``<root>/objects/<key[:2]>/<key>``. Data is
+    always copied in ``block_size`` pieces, so memory use does not depend on
+    the file size.
+    """
+
+    def __init__(self, root, block_size=64 * 1024):
+        self.root = root
+        self.block_size = block_size
+
+    def _partial(self, upload_id):
+        return os.path.join(self.root, "partial", upload_id)
+
+    def path(self, key):
+        return os.path.join(self.root, "objects", key[:2], key)
+
+    def size(self, upload_id):
+        """Bytes received so far for an upload"""
+        try:
+            return os.path.getsize(self._partial(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, upload_id, stream, offset, length):
+        """Copy the ``length`` bytes of ``stream`` to the end of an upload; returns the new size.
+
+        Writers of one upload take turns on an exclusive lock of its partial
+        file, and the size is checked under that lock: a chunk that does not
+        start at ``offset`` raises StorageOffsetMismatch. A stream longer or
+        shorter than ``length`` raises StorageLengthMismatch after cutting
+        the upload back to ``offset``, so a refused chunk stores nothing.
+        """
+        path = self._partial(upload_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as out:
+            fcntl.flock(out, fcntl.LOCK_EX)
+            size = out.seek(0, os.SEEK_END)
+            if size != offset:
+                raise StorageOffsetMismatch(upload_id, size)
+
+            remaining = length
+            while remaining:
+                block = stream.read(min(self.block_size, remaining))
+                if not block:
+                    break
+                out.write(block)
+                remaining -= len(block)
+            if remaining or stream.read(1):
+                out.truncate(offset)
+                raise StorageLengthMismatch(upload_id)
+        return offset + length
+
+    def stale_partials(self, max_age, limit):
+        """Ids of up to ``limit`` uploads whose partial file was last written over ``max_age`` seconds ago"""
+        before = time.time() - max_age
+        stale = []
+        try:
+            with os.scandir(os.path.join(self.root, "partial")) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.stat().st_mtime < before:
+                        stale.append(entry.name)
+                        if len(stale) >= limit:
+                            break
+        except FileNotFoundError:
+            pass
+        return stale
+
+    def digest(self, upload_id):
+        """SHA-256 hex digest of the bytes received for an upload"""
+        sha256 = hashlib.sha256()
+        with open(self._partial(upload_id), "rb") as f:
+            for block in iter(lambda: f.read(self.block_size), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def finish(self, upload_id, key):
+        """Turn a complete upload into the stored object ``key``"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self._partial(upload_id), path)
+
+    def abort(self, upload_id):
+        try:
+            os.remove(self._partial(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class FileStorage:
+    """The configured storage backend.
+
+    ``STORAGE_BACKEND`` picks the backend (only ``local`` for now) and
+    ``STORAGE_ROOT`` its location, by default ``instance/uploads``. Calls
+    are forwarded to the backend.
+    """
+
+    BACKENDS = {"local": LocalStorage}
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        app.config.setdefault("STORAGE_BACKEND", "local")
+        if not app.config.get("STORAGE_ROOT"):
+            app.config["STORAGE_ROOT"] = os.path.join(app.instance_path, "uploads")
+        backend = self.BACKENDS[app.config["STORAGE_BACKEND"]]
+        self.backend = backend(app.config["STORAGE_ROOT"])
+        app.extensions["storage"] = self
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
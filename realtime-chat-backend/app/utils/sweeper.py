@@ -0,0 +1,151 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+
+class Sweeper:
+    """Removes rows the app no longer needs, in a background (green) thread.
+
+    Every ``SWEEP_INTERVAL`` seconds each task of ``TASKS`` is run in
+    batches of up to ``SWEEP_BATCH_SIZE`` rows, one commit per batch, until
+    it finds nothing left; partial uploads are only removed once their
+    rows are committed. Tasks only delete what is past its retention,
+    so several workers sweeping at once just race to the same deletes.
+    With ``SWEEP_WORKER`` off nothing runs in the background and
+    ``run_once`` is left to the caller.
+    """
+
+    def __init__(self):
+        self.background = True
+        self.interval = 3600
+        self.batch_size = 500
+        self.runs = 0
+        self.swept = {}  # task -> rows removed
+        self.failures = 0
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault("SWEEP_WORKER", True)
+        app.config.setdefault("SWEEP_INTERVAL", 3600)
+        app.config.setdefault("SWEEP_BATCH_SIZE", 500)
+        app.config.setdefault("SYNC_RETENTION_DAYS", 30)
+        app.config.setdefault("UPLOAD_TTL_HOURS", 24)
+        self.background = bool(app.config["SWEEP_WORKER"])
+        self.interval = app.config["SWEEP_INTERVAL"]
+        self.batch_size = app.config["SWEEP_BATCH_SIZE"]
+        self.runs = 0
+        self.swept = {}
+        self.failures = 0
+        app.extensions["sweeper"] = self
+
+    def start(self, app):
+        if not self.background or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_forever, args=(app,), name="sweeper", daemon=True)
+        self._thread.start()
+
+    def _run_forever(self, app):
+        from app.extensions import db
+
+        while True:
+            with app.app_context():
+                try:
+                    self.run_once(app.config)
+                except Exception as e:
+                    self.failures += 1
+                    print(f"Sweep failed: {e}")
+                finally:
+                    db.session.remove()
+            time.sleep(self.interval)
+
+    def run_once(self, config):
+        """Run every task to the end; returns the rows removed per task"""
+        from app.extensions import db
+
+        swept = {}
+        for name, task in TASKS.items():
+            swept[name] = 0
+            while True:
+                after_commit = []
+                rows = task(config, self.batch_size, after_commit)
+                db.session.commit()
+                for action in after_commit:
+                    action()
+                swept[name] += rows
+                if rows < self.batch_size:
+                    break
+            self.swept[name] = self.swept.get(name, 0) + swept[name]
+        self.runs += 1
+        return swept
+
+    def stats(self):
+        return {
+            "worker": self.background,
+            "runs": self.runs,
+            "swept": dict(self.swept),
+            "failures": self.failures,
+        }
+
+
+def sweep_sync_events(config, limit, after_commit):
+    """Sync events older than ``SYNC_RETENTION_DAYS``; cursors from before them get a resync answer"""
+    from app.models.sync_event import SyncEvent
+
+    return SyncEvent.trim(datetime.utcnow() - timedelta(days=config["SYNC_RETENTION_DAYS"]), limit)
+
+
+def sweep_uploads(config, limit, after_commit):
+    """Uploads not completed within ``UPLOAD_TTL_HOURS``, and their partial objects"""
+    from app.extensions import db, storage
+    from app.models.upload import Upload
+
+    before = datetime.utcnow() - timedelta(hours=config["UPLOAD_TTL_HOURS"])
+    upload_ids = [upload_id for (upload_id,) in (
+        db.session.query(Upload.id).filter(Upload.created_at < before).order_by(Upload.created_at).limit(limit)
+    )]
+    if upload_ids:
+        db.session.query(Upload).filter(Upload.id.in_(upload_ids)).delete(synchronize_session=False)
+        after_commit.extend(partial(storage.abort, upload_id) for upload_id in upload_ids)
+    return len(upload_ids)
+
+
+def sweep_partials(config, limit, after_commit):
+    """Partial objects older than ``UPLOAD_TTL_HOURS`` left without an upload row, e.g. by a crash"""
+    from app.extensions import db, storage
+    from app.models.upload import Upload
+
+    stale = storage.stale_partials(config["UPLOAD_TTL_HOURS"] * 3600, limit)
+    if not stale:
+        return 0
+    known = {upload_id for (upload_id,) in db.session.query(Upload.id).filter(Upload.id.in_(stale))}
+    orphans = [upload_id for upload_id in stale if upload_id not in known]
+    after_commit.extend(partial(storage.abort, upload_id) for upload_id in orphans)
+    return len(orphans)
+
+
+def sweep_blobs(config, limit, after_commit):
+    """Stored objects no File points at any more, with their blob rows.
+
+    Each row is deleted first and its object removed before the commit,
+    while the row is still locked: an upload of the same content that
+    calls ``Blob.add_reference`` meanwhile waits for the commit, finds no
+    blob and stores the content again, instead of pointing at an object
+    that is about to go. A blob taken back before the sweep is left alone.
+    """
+    from app.extensions import db, storage
+    from app.models.blob import Blob
+
+    hashes = [sha256 for (sha256,) in db.session.query(Blob.sha256).filter(Blob.ref_count <= 0).limit(limit)]
+    for sha256 in hashes:
+        if db.session.query(Blob).filter(Blob.sha256 == sha256, Blob.ref_count <= 0).delete(synchronize_session=False):
+            storage.delete(sha256)
+    return len(hashes)
+
+
+TASKS = {
+    "sync_events": sweep_sync_events,
+    "uploads": sweep_uploads,
+    "partials": sweep_partials,
+    "blobs": sweep_blobs,
+}
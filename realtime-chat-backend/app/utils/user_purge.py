@@ -0,0 +1,366 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+
+
+class UserPurger:
+    """Removes deleted users' data in the background, in bounded batches.
+
+    ``DELETE /api/users/<id>`` only anonymizes the user, locks them out and
+    queues a ``UserPurge``. The purger works through its steps in order:
+
+    - ``uploads``: chunked uploads in progress, and their partial objects
+    - ``direct_chats``: the user's direct chats with both sides' messages,
+      files and read marks; the other user gets a ``chat_deleted`` sync event
+    - ``memberships``: group memberships
+    - ``messages``: public messages and their files, with a tombstone each
+    - ``group_messages``: group messages and their files, with a tombstone
+      per member of the group
+    - ``files``: the rest of the user's files
+    - ``read_marks``: channel read marks and the sync events of the user
+
+    Each batch touches at most ``USER_PURGE_BATCH_SIZE`` rows of one table
+    (plus their attachments and tombstones) over an index on the user, and
+    is committed together with the purge's progress, so no transaction
+    holds locks for long and a restarted worker goes on from the last
+    committed batch. Workers sleep ``USER_PURGE_PAUSE`` seconds between
+    batches to leave the database to live traffic.
+
+    A worker claims a purge for ``USER_PURGE_LEASE`` seconds and renews the
+    lease with every batch; the purge of a worker that died is picked up
+    once its lease runs out. With ``USER_PURGE_WORKER`` off nothing runs in
+    the background and ``run_pending`` is left to the caller.
+    """
+
+    def __init__(self):
+        self.background = True
+        self.batch_size = 500
+        self.pause = 0.1
+        self.lease = 60
+        self.batches = 0
+        self.rows = 0
+        self.finished = 0
+        self.failures = 0
+        self._thread = None
+        self._wake = threading.Event()
+
+    def init_app(self, app):
+        app.config.setdefault("USER_PURGE_WORKER", True)
+        app.config.setdefault("USER_PURGE_BATCH_SIZE", 500)
+        app.config.setdefault("USER_PURGE_PAUSE", 0.1)
+        app.config.setdefault("USER_PURGE_LEASE", 60)
+        self.background = bool(app.config["USER_PURGE_WORKER"])
+        self.batch_size = app.config["USER_PURGE_BATCH_SIZE"]
+        self.pause = app.config["USER_PURGE_PAUSE"]
+        self.lease = app.config["USER_PURGE_LEASE"]
+        self.batches = 0
+        self.rows = 0
+        self.finished = 0
+        self.failures = 0
+        app.extensions["user_purger"] = self
+
+    def start(self, app):
+        """Run queued purges, those left unfinished by a restart first, in a background (green) thread"""
+        if not self.background or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_forever, args=(app,), name="user-purge", daemon=True)
+        self._thread.start()
+
+    def wake(self, app):
+        """A purge was queued: have the background thread pick it up now"""
+        self.start(app)
+        self._wake.set()
+
+    def _run_forever(self, app):
+        from app.extensions import db
+
+        while True:
+            self._wake.clear()
+            with app.app_context():
+                try:
+                    self.run_pending()
+                except Exception as e:
+                    self.failures += 1
+                    print(f"User purge failed: {e}")
+                finally:
+                    db.session.remove()
+            # Also looks again for purges whose worker died, once their lease ran out
+            self._wake.wait(self.lease)
+
+    def run_pending(self, max_batches=None):
+        """Run every unfinished purge not leased by another worker; returns the batches run.
+
+        ``max_batches`` stops early, leaving the rest to a later call.
+        """
+        from app.extensions import db
+        from app.models.user_purge import UserPurge
+
+        user_ids = [user_id for (user_id,) in (
+            db.session.query(UserPurge.user_id).filter(UserPurge.finished_at.is_(None)).order_by(UserPurge.user_id)
+        )]
+        batches = 0
+        for user_id in user_ids:
+            if max_batches is not None and batches >= max_batches:
+                break
+            if not self._claim(user_id):
+                continue
+            purge = db.session.get(UserPurge, user_id)
+            try:
+                while purge.finished_at is None and (max_batches is None or batches < max_batches):
+                    if batches and self.pause:
+                        time.sleep(self.pause)
+                    self.run_batch(purge)
+                    batches += 1
+            finally:
+                if purge.finished_at is None:
+                    self._release(user_id)
+        return batches
+
+    def _claim(self, user_id):
+        from app.extensions import db
+        from app.models.user_purge import UserPurge
+
+        now = datetime.utcnow()
+        claimed = db.session.query(UserPurge).filter(
+            UserPurge.user_id == user_id,
+            UserPurge.finished_at.is_(None),
+            UserPurge.lease_until.is_(None) | (UserPurge.lease_until < now)
+        ).update({UserPurge.lease_until: now + timedelta(seconds=self.lease)}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _release(self, user_id):
+        from app.extensions import db
+        from app.models.user_purge import UserPurge
+
+        db.session.rollback()
+        db.session.query(UserPurge).filter_by(user_id=user_id).update(
+            {UserPurge.lease_until: None}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def run_batch(self, purge):
+        """One batch of ``purge``'s current step, committed with its progress; steps found done are skipped"""
+        from app.extensions import db
+        from app.models.user_purge import UserPurge
+
+        after_commit = []
+        rows = 0
+        while not rows and purge.finished_at is None:
+            rows = STEPS[purge.step](purge.user_id, self.batch_size, after_commit)
+            if not rows:
+                following = UserPurge.STEPS.index(purge.step) + 1
+                if following < len(UserPurge.STEPS):
+                    purge.step = UserPurge.STEPS[following]
+                else:
+                    purge.finished_at = datetime.utcnow()
+
+        now = datetime.utcnow()
+        purge.rows_purged += rows
+        purge.updated_at = now
+        purge.lease_until = None if purge.finished_at else now + timedelta(seconds=self.lease)
+        db.session.commit()
+
+        self.batches += 1
+        self.rows += rows
+        if purge.finished_at:
+            self.finished += 1
+            print(f"Purged user {purge.user_id}: {purge.rows_purged} rows")
+        # Stored objects and caches are only dropped once the rows are gone for good
+        for action in after_commit:
+            action()
+        return rows
+
+    def stats(self):
+        return {
+            "worker": self.background,
+            "batches": self.batches,
+            "rows": self.rows,
+            "finished": self.finished,
+            "failures": self.failures,
+        }
+
+
+def _delete_files(condition, limit, after_commit):
+    """Delete up to ``limit`` (None: all) files matching ``condition`` and release their blobs"""
+    from app.extensions import db
+    from app.models.blob import Blob
+    from app.models.file import File
+
+    query = db.session.query(File.id, File.content_hash).filter(condition).order_by(File.id)
+    files = query.limit(limit).all() if limit else query.all()
+    if not files:
+        return 0
+    db.session.query(File).filter(File.id.in_([file_id for file_id, _ in files])).delete(synchronize_session=False)
+    for sha256, count in Counter(sha256 for _, sha256 in files if sha256).items():
+        Blob.release(sha256, count)
+    return len(files)
+
+
+def _forget_messages(kind, messages):
+    """Drop deleted (message id, room) pairs from the message cache and room histories"""
+    from app.extensions import message_cache, room_history
+
+    for message_id, room in messages:
+        message_cache.invalidate(kind, message_id)
+        room_history.discard(room, message_id)
+
+
+def purge_uploads(user_id, limit, after_commit):
+    from app.extensions import db, storage
+    from app.models.upload import Upload
+
+    upload_ids = [upload_id for (upload_id,) in (
+        db.session.query(Upload.id).filter(Upload.uploader_id == user_id).limit(limit)
+    )]
+    if not upload_ids:
+        return 0
+    db.session.query(Upload).filter(Upload.id.in_(upload_ids)).delete(synchronize_session=False)
+    after_commit.extend(partial(storage.abort, upload_id) for upload_id in upload_ids)
+    return len(upload_ids)
+
+
+def purge_direct_chats(user_id, limit, after_commit):
+    """A batch of the files, then of the messages, of one direct chat; the chat itself once they are gone"""
+    from app.extensions import db
+    from app.models.chat_read import ChatRead
+    from app.models.file import File
+    from app.models.private_chat import PrivateChat
+    from app.models.private_message import PrivateMessage
+    from app.models.sync_event import SyncEvent
+    from app.utils.message_cache import PRIVATE
+
+    chat = db.session.query(PrivateChat).filter(
+        (PrivateChat.user1_id == user_id) | (PrivateChat.user2_id == user_id)
+    ).first()
+    if not chat:
+        return 0
+    room = f"private_chat_{chat.id}"
+
+    rows = _delete_files(File.private_chat_id == chat.id, limit, after_commit)
+    if rows:
+        return rows
+
+    message_ids = [message_id for (message_id,) in (
+        db.session.query(PrivateMessage.id).filter(PrivateMessage.chat_id == chat.id)
+        .order_by(PrivateMessage.id).limit(limit)
+    )]
+    if message_ids:
+        db.session.query(PrivateMessage).filter(PrivateMessage.id.in_(message_ids)).delete(synchronize_session=False)
+        after_commit.append(partial(_forget_messages, PRIVATE, [(message_id, room) for message_id in message_ids]))
+        return len(message_ids)
+
+    rows = db.session.query(ChatRead).filter(ChatRead.chat_id == chat.id).delete(synchronize_session=False)
+    other_user_id = chat.user2_id if chat.user1_id == user_id else chat.user1_id
+    if other_user_id != user_id:
+        db.session.add(SyncEvent(user_id=other_user_id, event=SyncEvent.CHAT_DELETED, chat_id=chat.id))
+    db.session.query(PrivateChat).filter(PrivateChat.id == chat.id).delete(synchronize_session=False)
+    return rows + 1
+
+
+def purge_memberships(user_id, limit, after_commit):
+    from app.extensions import db, membership
+    from app.models.chat_member import ChatMember
+
+    members = (
+        db.session.query(ChatMember.id, ChatMember.chat_id).filter(ChatMember.user_id == user_id)
+        .order_by(ChatMember.id).limit(limit).all()
+    )
+    if not members:
+        return 0
+    db.session.query(ChatMember).filter(ChatMember.id.in_([member_id for member_id, _ in members])).delete(
+        synchronize_session=False
+    )
+    after_commit.extend(partial(membership.invalidate, chat_id) for _, chat_id in members)
+    return len(members)
+
+
+def purge_messages(user_id, limit, after_commit):
+    from app.extensions import db
+    from app.models.file import File
+    from app.models.message import Message
+    from app.models.sync_event import SyncEvent
+    from app.utils.rooms import channel_room
+    from app.utils.message_cache import PUBLIC
+
+    messages = (
+        db.session.query(Message.id, Message.channel_id).filter(Message.user_id == user_id)
+        .order_by(Message.id).limit(limit).all()
+    )
+    if not messages:
+        return 0
+    message_ids = [message_id for message_id, _ in messages]
+    rows = _delete_files(File.public_message_id.in_(message_ids), None, after_commit)
+    db.session.query(Message).filter(Message.id.in_(message_ids)).delete(synchronize_session=False)
+    db.session.add_all(SyncEvent(event=SyncEvent.MESSAGE_DELETED, message_id=message_id) for message_id in message_ids)
+    after_commit.append(partial(_forget_messages, PUBLIC, [
+        (message_id, channel_room(channel_id)) for message_id, channel_id in messages
+    ]))
+    return rows + len(messages)
+
+
+def purge_group_messages(user_id, limit, after_commit):
+    """A batch of the user's group messages (direct chats are gone by now), tombstoned for every member"""
+    from app.extensions import db
+    from app.models.chat_member import ChatMember
+    from app.models.file import File
+    from app.models.private_message import PrivateMessage
+    from app.models.sync_event import SyncEvent
+    from app.utils.message_cache import PRIVATE
+
+    messages = (
+        db.session.query(PrivateMessage.id, PrivateMessage.chat_id).filter(PrivateMessage.sender_id == user_id)
+        .order_by(PrivateMessage.id).limit(limit).all()
+    )
+    if not messages:
+        return 0
+    message_ids = [message_id for message_id, _ in messages]
+    members = {}
+    for chat_id, member_id in db.session.query(ChatMember.chat_id, ChatMember.user_id).filter(
+        ChatMember.chat_id.in_({chat_id for _, chat_id in messages})
+    ):
+        members.setdefault(chat_id, []).append(member_id)
+
+    rows = _delete_files(File.private_message_id.in_(message_ids), None, after_commit)
+    db.session.query(PrivateMessage).filter(PrivateMessage.id.in_(message_ids)).delete(synchronize_session=False)
+    db.session.add_all(
+        SyncEvent(user_id=member_id, event=SyncEvent.MESSAGE_DELETED, chat_id=chat_id, message_id=message_id)
+        for message_id, chat_id in messages for member_id in members.get(chat_id, ())
+    )
+    after_commit.append(partial(_forget_messages, PRIVATE, [
+        (message_id, f"private_chat_{chat_id}") for message_id, chat_id in messages
+    ]))
+    return rows + len(messages)
+
+
+def purge_files(user_id, limit, after_commit):
+    from app.models.file import File
+
+    return _delete_files(File.uploader_id == user_id, limit, after_commit)
+
+
+def purge_read_marks(user_id, limit, after_commit):
+    from app.extensions import db
+    from app.models.channel_read import ChannelRead
+    from app.models.sync_event import SyncEvent
+
+    for model in (ChannelRead, SyncEvent):
+        row_ids = [row_id for (row_id,) in (
+            db.session.query(model.id).filter(model.user_id == user_id).limit(limit)
+        )]
+        if row_ids:
+            return db.session.query(model).filter(model.id.in_(row_ids)).delete(synchronize_session=False)
+    return 0
+
+
+STEPS = {
+    "uploads": purge_uploads,
+    "direct_chats": purge_direct_chats,
+    "memberships": purge_memberships,
+    "messages": purge_messages,
+    "group_messages": purge_group_messages,
+    "files": purge_files,
+    "read_marks": purge_read_marks,
+}
@@ -0,0 +1,106 @@
+import threading
+
+
+class UsernameIndex:
+    """In-memory trie of usernames for ``GET /api/users/search``.
+
+    Off unless ``USER_SEARCH_TRIE`` is set. It is filled from the users
+    table on the first search and then kept current by ``add`` / ``remove``
+    calls from register, profile update and delete, so it only suits a
+    single worker process: users changed by other workers stay stale here.
+    Lookups walk the prefix and then the subtree in key order, stopping as
+    soon as ``limit`` users are found.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.loaded = False
+        self._root = {}
+        self._entries = {}  # user_id -> (username, avatar_url)
+        self._lock = threading.Lock()
+        self.searches = 0
+
+    def init_app(self, app):
+        app.config.setdefault("USER_SEARCH_TRIE", False)
+        self.enabled = bool(app.config["USER_SEARCH_TRIE"])
+        self.clear()
+        app.extensions["username_index"] = self
+
+    def clear(self):
+        with self._lock:
+            self._root = {}
+            self._entries.clear()
+            self.loaded = False
+            self.searches = 0
+
+    def load(self, rows):
+        """Replace the contents with ``(id, username, avatar_url)`` rows"""
+        with self._lock:
+            self._root = {}
+            self._entries.clear()
+            for user_id, username, avatar_url in rows:
+                self._insert(user_id, username, avatar_url)
+            self.loaded = True
+
+    def add(self, user_id, username, avatar_url=None):
+        """Insert a user, or move it after a username / avatar change"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._delete(user_id)
+            self._insert(user_id, username, avatar_url)
+
+    def remove(self, user_id):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._delete(user_id)
+
+    def search(self, prefix, limit):
+        """Up to ``limit`` ``(id, username, avatar_url)`` whose username starts with ``prefix``"""
+        with self._lock:
+            self.searches += 1
+            node = self._root
+            for char in prefix.lower():
+                node = node.get(char)
+                if node is None:
+                    return []
+
+            found = []
+            stack = [node]
+            while stack and len(found) < limit:
+                node = stack.pop()
+                # Users are stored under the None key of the node ending their username
+                for user_id in sorted(node.get(None, ())):
+                    found.append((user_id, *self._entries[user_id]))
+                # Reversed so the smallest key is popped first
+                stack.extend(node[key] for key in sorted((k for k in node if k is not None), reverse=True))
+            return found[:limit]
+
+    def stats(self):
+        return {"enabled": self.enabled, "loaded": self.loaded, "users": len(self._entries),
+                "searches": self.searches}
+
+    def _insert(self, user_id, username, avatar_url):
+        node = self._root
+        for char in username.lower():
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(user_id)
+        self._entries[user_id] = (username, avatar_url)
+
+    def _delete(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        name = entry[0].lower()
+        path = [self._root]
+        for char in name:
+            path.append(path[-1][char])
+        path[-1][None].discard(user_id)
+        if not path[-1][None]:
+            del path[-1][None]
+        # Prune nodes left without users or children
+        for depth in range(len(name), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][name[depth - 1]]
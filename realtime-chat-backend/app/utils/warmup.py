@@ -0,0 +1,147 @@
+import threading
+import time
+
+from sqlalchemy import func
+
+
+def prewarm_pool(engine, connections):
+    """Open up to ``connections`` DB connections at once, then hand them all back to the pool"""
+    size = getattr(engine.pool, "size", None)
+    if size is not None:
+        connections = min(connections, size())
+
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+class Warmup:
+    """Startup timings and readiness of this worker.
+
+    ``create_app`` records how long its imports and setup took. With
+    ``WARMUP_ON_START`` the worker is not ready until ``run`` has filled the
+    DB connection pool and the hot caches: the room history (and with it the
+    encoded messages and their authors' profiles) of the most recently
+    active public channels and private chats, the member sets of those
+    chats that are groups and, when it is on, the username trie.
+    ``GET /api/ready`` answers 503 until then, so rolling deploys can wait
+    for it. A failed warmup is logged and the worker goes ready cold.
+    Without ``WARMUP_ON_START`` the worker is ready at once.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.ready = True
+        self.phases = {}  # phase -> seconds
+        self.warmed = {}  # phase -> rows, rooms or connections warmed
+        self.error = None
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault("WARMUP_ON_START", False)
+        app.config.setdefault("WARMUP_POOL_CONNECTIONS", 5)
+        app.config.setdefault("WARMUP_CHANNELS", 20)
+        app.config.setdefault("WARMUP_PRIVATE_CHATS", 200)
+        self.enabled = bool(app.config["WARMUP_ON_START"])
+        self.ready = not self.enabled
+        self.phases = {}
+        self.warmed = {}
+        self.error = None
+        self._thread = None
+        app.extensions["warmup"] = self
+
+    def record(self, phase, started):
+        self.phases[phase] = round(time.perf_counter() - started, 4)
+
+    def start(self, app):
+        """Run the warmup in a background (green) thread, so the worker can answer liveness meanwhile"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, args=(app,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def run(self, app):
+        from app.extensions import db, username_index
+
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                self._phase("pool", prewarm_pool, db.engine, app.config["WARMUP_POOL_CONNECTIONS"])
+                self._phase("channels", warm_channels, app.config["WARMUP_CHANNELS"])
+                self._phase("private_chats", warm_private_chats, app.config["WARMUP_PRIVATE_CHATS"])
+                if username_index.enabled:
+                    self._phase("username_index", warm_username_index)
+                db.session.remove()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Warmup failed, serving cold: {e}")
+        finally:
+            self.record("warmup", started)
+            self.ready = True
+
+    def _phase(self, phase, warm, *args):
+        started = time.perf_counter()
+        self.warmed[phase] = warm(*args)
+        self.record(phase, started)
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "warmup": self.enabled,
+            "phases": dict(self.phases),
+            "warmed": dict(self.warmed),
+            "error": self.error,
+        }
+
+
+def warm_channels(limit):
+    """Prime the room history of the ``limit`` public channels with the latest messages"""
+    from app.extensions import db
+    from app.models.message import Message
+    from app.utils.rooms import channel_window
+
+    latest = func.max(Message.id)
+    channel_ids = [channel_id for (channel_id,) in (
+        db.session.query(Message.channel_id).group_by(Message.channel_id).order_by(latest.desc()).limit(limit)
+    )]
+    for channel_id in channel_ids:
+        channel_window(channel_id)
+    return len(channel_ids)
+
+
+def warm_private_chats(limit):
+    """Prime the room history of the ``limit`` most recently active private chats, and group member sets"""
+    from app.extensions import db
+    from app.models.private_chat import PrivateChat
+    from app.models.private_message import PrivateMessage
+    from app.utils.rooms import chat_window, group_members
+
+    latest = func.max(PrivateMessage.id)
+    chats = (
+        db.session.query(PrivateChat.id, PrivateChat.is_group)
+        .join(PrivateMessage, PrivateMessage.chat_id == PrivateChat.id)
+        .group_by(PrivateChat.id, PrivateChat.is_group)
+        .order_by(latest.desc())
+        .limit(limit)
+        .all()
+    )
+    for chat_id, is_group in chats:
+        chat_window(chat_id)
+        if is_group:
+            group_members(chat_id)
+    return len(chats)
+
+
+def warm_username_index():
+    from app.extensions import db, username_index
+    from app.models.user import User
+
+    username_index.load(db.session.query(User.id, User.username, User.avatar_url))
+    return username_index.stats()["users"]
@@ -0,0 +1,15 @@
+# asyncio mode, an alternative to the eventlet entry point in run.py:
+#     ASGI_PREVIEW=true uvicorn asgi:app --host 0.0.0.0 --port 5000
+# A preview: only the core chat events are served, and it refuses to start without ASGI_PREVIEW.
+# Needs the asyncio DB driver of the configured database (asyncpg or aiosqlite).
+# Handshake admission, outbound backpressure and socket event profiling only run under eventlet.
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.aio.server import create_asgi_app
+from app.extensions import warmup, user_purger, sweeper
+
+app = create_asgi_app()
+warmup.start(app.flask_app)
+user_purger.start(app.flask_app)
+sweeper.start(app.flask_app)
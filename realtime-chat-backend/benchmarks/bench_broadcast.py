@@ -0,0 +1,139 @@
+"""Frames, writes and latency of public room broadcasts with and without micro-batching.
+
+Run from realtime-chat-backend/:
+
+    python -m benchmarks.bench_broadcast [--members 500] [--rate 200] [--seconds 10] [--windows 0 0.02 0.05]
+
+Messages arrive at ``--rate`` per second (Poisson) in a room of ``--members``
+connections. A window of 0 is the per-message ``new_public_message`` emit;
+other windows group arrivals the way app.utils.broadcast_batch does (a batch
+opens on its first message and closes after the window or at ``--max``
+messages). Each frame is really encoded as a Socket.IO packet and written
+once per member to an in-memory sink, so the CPU column covers encoding and
+per-recipient fan-out. Added latency is the time a message waited for its
+batch to close.
+"""
+import argparse
+import io
+import random
+import time
+from datetime import datetime, timezone
+
+import orjson
+from engineio import packet as eio_packet
+from socketio import packet
+
+from app.utils import fast_json
+
+
+class Packet(packet.Packet):
+    json = fast_json
+
+
+# WebSocket frame header for payloads between 126 and 65535 bytes
+WS_HEADER = 4
+
+
+def arrivals(rate, seconds, seed=0):
+    rng = random.Random(seed)
+    t, times = 0.0, []
+    while True:
+        t += rng.expovariate(rate)
+        if t >= seconds:
+            return times
+        times.append(t)
+
+
+def message(message_id):
+    return orjson.Fragment(orjson.dumps({
+        "id": message_id,
+        "content": f"message number {message_id} in the public room",
+        "timestamp": datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat(),
+        "user_id": message_id % 97,
+        "username": f"user{message_id % 97}",
+        "user": {"id": message_id % 97, "username": f"user{message_id % 97}"},
+        "files": [],
+        "file_count": 0,
+    }))
+
+
+def batches(times, window, max_batch):
+    """Group arrival times into (closed_at, [indexes]) the way the batcher does"""
+    if not window:
+        return [(t, [i]) for i, t in enumerate(times)]
+    result, opened, current = [], None, []
+    for i, t in enumerate(times):
+        if current and t >= opened + window:
+            result.append((opened + window, current))
+            current = []
+        if not current:
+            opened = t
+        current.append(i)
+        if len(current) >= max_batch:
+            result.append((t, current))
+            current = []
+    if current:
+        result.append((opened + window, current))
+    return result
+
+
+def run(times, members, window, max_batch):
+    payloads = [message(i) for i in range(len(times))]
+    sink = io.StringIO()
+    frames = writes = sent_bytes = 0
+    waits = []
+
+    started = time.perf_counter()
+    for seq, (closed_at, indexes) in enumerate(batches(times, window, max_batch), 1):
+        if window:
+            data = ["new_public_messages", [payloads[i] for i in indexes],
+                    {"room": "public_chat", "seq": seq, "count": len(indexes)}]
+        else:
+            data = ["new_public_message", payloads[indexes[0]], {"room": "public_chat", "seq": seq}]
+        encoded = eio_packet.Packet(eio_packet.MESSAGE, Packet(packet.EVENT, data=data).encode()).encode()
+        for _ in range(members):
+            sink.write(encoded)
+        sink.seek(0)
+        frames += 1
+        writes += members
+        sent_bytes += (len(encoded) + WS_HEADER) * members
+        waits.extend(closed_at - times[i] for i in indexes)
+    elapsed = time.perf_counter() - started
+
+    waits.sort()
+    return {
+        "frames": frames,
+        "writes": writes,
+        "bytes": sent_bytes,
+        "cpu": elapsed,
+        "mean_wait": sum(waits) / len(waits) if waits else 0,
+        "p99_wait": waits[int(len(waits) * 0.99)] if waits else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200, help="messages per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--max", type=int, default=100, help="BROADCAST_BATCH_MAX")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 0.02, 0.05])
+    args = parser.parse_args()
+
+    times = arrivals(args.rate, args.seconds)
+    print(f"{len(times):,} messages at ~{args.rate:.0f}/s to {args.members} members over {args.seconds:.0f}s")
+    print(f"{'window':>8} {'frames':>9} {'writes':>12} {'MB sent':>9} {'CPU s':>7} "
+          f"{'frames/s':>9} {'mean wait':>10} {'p99 wait':>9}")
+    baseline = None
+    for window in args.windows:
+        result = run(times, args.members, window, args.max)
+        baseline = baseline or result
+        print(f"{window * 1000:>6.0f}ms {result['frames']:>9,} {result['writes']:>12,} "
+              f"{result['bytes'] / 1e6:>9.1f} {result['cpu']:>7.2f} {result['frames'] / args.seconds:>9,.0f} "
+              f"{result['mean_wait'] * 1000:>8.1f}ms {result['p99_wait'] * 1000:>7.1f}ms"
+              f"   ({baseline['writes'] / result['writes']:.1f}x fewer writes, "
+              f"{baseline['cpu'] / result['cpu']:.1f}x less CPU)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Broadcast volume of typing indicators: naive per-ping emits vs app.utils.ephemeral.
+
+Run from realtime-chat-backend/:
+
+    python -m benchmarks.bench_ephemeral [--users 1000] [--seconds 30] [--interval 0.5]
+
+Every user types in bursts (pinging every ``--ping`` seconds while typing)
+and idles in between. The naive strategy emits one frame per ping to the
+whole room; the ephemeral subsystem emits at most one frame per room and
+flush interval, and only when the set of typists changed.
+"""
+import argparse
+import random
+import time
+
+from app.utils.ephemeral import EphemeralEvents
+
+
+class Counter:
+    def __init__(self, members):
+        self.members = members
+        self.frames = 0
+        self.deliveries = 0
+        self.bytes = 0
+
+    def __call__(self, event, payload, to):
+        self.frames += 1
+        self.deliveries += self.members[to]
+        self.bytes += len(str(payload)) * self.members[to]
+
+
+def simulate(users, rooms, seconds, interval, ping, seed=0):
+    rng = random.Random(seed)
+    room_of = {user_id: f"room_{user_id % rooms}" for user_id in range(users)}
+    members = {}
+    for room in room_of.values():
+        members[room] = members.get(room, 0) + 1
+
+    # Each user alternates typing/idle bursts of 2-6 seconds with a random phase
+    schedules = {}
+    for user_id in range(users):
+        t, typing, spans = -rng.uniform(0, 6), rng.random() < 0.5, []
+        while t < seconds:
+            length = rng.uniform(2, 6)
+            if typing:
+                spans.append((t, t + length))
+            t += length
+            typing = not typing
+        schedules[user_id] = spans
+
+    naive = Counter(members)
+    coalesced = Counter(members)
+    events = EphemeralEvents(interval=interval)
+
+    started = time.perf_counter()
+    pings = 0
+    step = ping
+    now = 0.0
+    next_flush = interval
+    while now < seconds:
+        for user_id, spans in schedules.items():
+            if any(start <= now < end for start, end in spans):
+                user = {"id": user_id, "username": f"user{user_id}"}
+                room = room_of[user_id]
+                pings += 1
+                naive("typing", {"room": room, "users": [user]}, room)
+                events.update("typing", room, user, now=now)
+        now += step
+        while next_flush <= now:
+            events.flush(coalesced, now=next_flush)
+            next_flush += interval
+    elapsed = time.perf_counter() - started
+
+    return pings, naive, coalesced, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--ping", type=float, default=0.3)
+    args = parser.parse_args()
+
+    for label, rooms in (("one public room", 1), ("direct chats", args.users // 2)):
+        pings, naive, coalesced, elapsed = simulate(args.users, rooms, args.seconds, args.interval, args.ping)
+        print(f"{args.users} typing users, {label} ({rooms} rooms), {args.seconds:.0f}s, flush every {args.interval}s")
+        print(f"  pings received         {pings:>14,}")
+        print(f"  frames   naive         {naive.frames:>14,}   coalesced {coalesced.frames:>12,}")
+        print(f"  delivered naive        {naive.deliveries:>14,}   coalesced {coalesced.deliveries:>12,}"
+              f"   ({naive.deliveries / max(coalesced.deliveries, 1):,.0f}x fewer)")
+        print(f"  delivered bytes naive  {naive.bytes:>14,}   coalesced {coalesced.bytes:>12,}")
+        print(f"  per-second frames      {naive.frames / args.seconds:>14,.0f}   coalesced "
+              f"{coalesced.frames / args.seconds:>12,.0f}")
+        print(f"  simulation time        {elapsed:>13.2f}s")
+        print()
+
+
+if __name__ == "__main__":
+    main()
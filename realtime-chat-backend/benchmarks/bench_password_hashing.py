@@ -0,0 +1,85 @@
+"""Socket latency on an eventlet worker during a login storm, inline vs offloaded hashing.
+
+Run from realtime-chat-backend/:
+
+    python -m benchmarks.bench_password_hashing [--logins 200] [--clients 50] [--method scrypt]
+
+``--clients`` green threads verify ``--logins`` passwords between them while a
+"socket" green thread wakes every ``--tick`` seconds, as a connection waiting
+for its next frame would. Its lateness is how long any socket on the worker
+would wait for the hub. ``inline`` is the old check_password_hash call;
+``offloaded`` goes through app.utils.passwords (eventlet.tpool, at most
+``--concurrency`` hashes at once).
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+import time  # noqa: E402
+
+from werkzeug.security import check_password_hash, generate_password_hash  # noqa: E402
+
+from app.utils.passwords import PasswordHasher  # noqa: E402
+
+
+def storm(verify, pwhash, logins, clients, tick):
+    lags = []
+    done = eventlet.event.Event()
+
+    def socket():
+        while not done.ready():
+            expected = time.perf_counter() + tick
+            eventlet.sleep(tick)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    remaining = [logins]
+
+    def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            verify(pwhash, "password123")
+            eventlet.sleep(0)  # the rest of the request: reading it, writing the response
+
+    ticker = eventlet.spawn(socket)
+    eventlet.sleep(tick * 2)
+    started = time.perf_counter()
+    pool = eventlet.GreenPool(clients)
+    for _ in range(clients):
+        pool.spawn(client)
+    pool.waitall()
+    elapsed = time.perf_counter() - started
+    done.send()
+    ticker.wait()
+
+    lags.sort()
+    return {
+        "logins_per_s": logins / elapsed,
+        "p50": lags[len(lags) // 2],
+        "p99": lags[int(len(lags) * 0.99)],
+        "max": lags[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4, help="PASSWORD_HASH_CONCURRENCY")
+    parser.add_argument("--method", default="scrypt", help="PASSWORD_HASH_METHOD")
+    parser.add_argument("--tick", type=float, default=0.01)
+    args = parser.parse_args()
+
+    pwhash = generate_password_hash("password123", method=args.method)
+    hasher = PasswordHasher(args.method, args.concurrency)
+
+    print(f"{args.logins} logins from {args.clients} clients, {pwhash.split('$')[0]}, "
+          f"socket tick {args.tick * 1000:.0f}ms")
+    print(f"{'hashing':>10} {'logins/s':>9} {'p50 lag':>9} {'p99 lag':>9} {'max lag':>9}")
+    for label, verify in (("inline", check_password_hash), ("offloaded", hasher.verify)):
+        result = storm(verify, pwhash, args.logins, args.clients, args.tick)
+        print(f"{label:>10} {result['logins_per_s']:>9.1f} {result['p50'] * 1000:>7.1f}ms "
+              f"{result['p99'] * 1000:>7.1f}ms {result['max'] * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
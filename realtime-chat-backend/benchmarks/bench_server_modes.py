@@ -0,0 +1,151 @@
+"""Connection capacity and send latency: eventlet mode (run.py) vs asyncio mode (asgi.py).
+
+Run from realtime-chat-backend/ (needs aiohttp for the socket clients):
+
+    python -m benchmarks.bench_server_modes [--clients 500] [--messages 200] [--modes eventlet asyncio]
+
+Each mode is started as a real server on a scratch SQLite database:
+run.py's app under eventlet's WSGI server and ``uvicorn asgi:app``, one
+process each.
+``--clients`` users connect at once over WebSocket and join the public
+room; the report shows how many were connected within ``--connect-timeout``
+and how long that took. Then ``--messages`` public messages are sent from
+rotating clients, and the send-to-receive latency is measured at a client
+that did not send them (so it includes the DB insert and the room fan-out).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import socketio
+
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+
+SERVERS = {
+    "eventlet": [sys.executable, "-c", "import run; run.socketio.run(run.app, host='127.0.0.1', port={port}, "
+                                       "log_output=False)"],
+    "asyncio": ["uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", "{port}", "--log-level", "warning"],
+}
+
+
+def prepare_database(path, users, env):
+    """Create the tables and ``users`` users; returns one access token per user"""
+    from flask_jwt_extended import create_access_token
+
+    class BenchConfig:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        JWT_SECRET_KEY = env["JWT_SECRET_KEY"]
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@example.com", "password_hash": "x"} for i in range(users)
+        ])
+        db.session.commit()
+        return [create_access_token(identity=str(user_id)) for (user_id,) in db.session.query(User.id).order_by(User.id)]
+
+
+async def wait_for_port(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def connect(url, token, timeout):
+    client = socketio.AsyncClient(reconnection=False)
+    joined = asyncio.Event()
+    client.on("connected", lambda data: joined.set())
+    try:
+        await client.connect(f"{url}?token={token}", transports=["websocket"], wait_timeout=timeout)
+        await asyncio.wait_for(joined.wait(), timeout)
+        await client.emit("join_public", {})
+        return client
+    except Exception:
+        return None
+
+
+async def run_mode(mode, port, tokens, args):
+    url = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    clients = await asyncio.gather(*(connect(url, token, args.connect_timeout) for token in tokens))
+    connect_time = time.monotonic() - started
+    clients = [c for c in clients if c is not None]
+    result = {"connected": len(clients), "connect_s": connect_time, "p50": None, "p99": None}
+    if len(clients) < 2:
+        return result
+
+    observer, senders = clients[0], clients[1:]
+    pending = {}
+    latencies = []
+
+    def on_message(message, meta=None):
+        sent_at = pending.pop(message.get("content"), None)
+        if sent_at is not None:
+            latencies.append(time.monotonic() - sent_at)
+
+    observer.on("new_public_message", on_message)
+    await asyncio.sleep(0.5)
+    for i in range(args.messages):
+        content = f"{mode} message {i}"
+        pending[content] = time.monotonic()
+        # Rotate senders so the per-user rate limit is never hit
+        await senders[i % len(senders)].emit("send_public_message", {"content": content})
+        await asyncio.sleep(args.interval)
+    await asyncio.sleep(1)
+
+    latencies.sort()
+    if latencies:
+        result["p50"] = latencies[len(latencies) // 2]
+        result["p99"] = latencies[int(len(latencies) * 0.99)]
+    result["received"] = len(latencies)
+    await asyncio.gather(*(c.disconnect() for c in clients), return_exceptions=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between sends")
+    parser.add_argument("--connect-timeout", type=float, default=30)
+    parser.add_argument("--modes", nargs="+", default=list(SERVERS), choices=list(SERVERS))
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.messages} public messages")
+    print(f"{'mode':>9} {'connected':>10} {'connect s':>10} {'received':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as scratch:
+            path = os.path.join(scratch, "bench.db")
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", JWT_SECRET_KEY="bench",
+                       SOCKET_HANDSHAKE_CONCURRENCY=str(args.clients), ASGI_PREVIEW="true")
+            tokens = prepare_database(path, args.clients, env)
+            command = [part.format(port=args.port) for part in SERVERS[mode]]
+            server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                asyncio.run(wait_for_port(args.port))
+                result = asyncio.run(run_mode(mode, args.port, tokens, args))
+            finally:
+                server.terminate()
+                server.wait()
+
+        latency = (lambda value: f"{value * 1000:>8.1f}" if value is not None else f"{'-':>8}")
+        print(f"{mode:>9} {result['connected']:>10} {result['connect_s']:>10.2f} {result.get('received', 0):>9} "
+              f"{latency(result['p50'])} {latency(result['p99'])}")
+
+
+if __name__ == "__main__":
+    main()
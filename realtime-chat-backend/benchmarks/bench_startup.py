@@ -0,0 +1,75 @@
+"""Worker startup profile: import time by package and the create_app phases.
+
+Run from realtime-chat-backend/:
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 15] [--entry run]
+
+Each run starts a fresh interpreter with ``-X importtime`` importing the
+entry module (``run`` for eventlet mode, ``asgi`` for asyncio mode) against
+a scratch SQLite database. Self import times are summed per top-level
+package (so ``alembic`` shows up as one line, whoever imported it) and the
+median over the runs is reported, followed by the slowest ``app.*`` modules
+and the phases recorded by app.utils.warmup (``imports``, ``create_app``).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+PROBE = ("import json, {entry}; from app.extensions import warmup; "
+         "print('PHASES ' + json.dumps(warmup.phases))")
+
+
+def profile_once(entry, env):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(entry=entry)],
+                            capture_output=True, text=True, env=env)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+
+    packages = defaultdict(int)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us)
+        if name == "app" or name.startswith("app."):
+            modules[name] = int(cumulative_us)
+    phases = json.loads(result.stdout.split("PHASES ", 1)[1])
+    return packages, modules, phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--entry", default="run", choices=["run", "asgi"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}", ASGI_PREVIEW="true")
+        runs = [profile_once(args.entry, env) for _ in range(args.runs)]
+
+    median = lambda values: statistics.median(values) / 1000
+    packages = {name: median([run[0].get(name, 0) for run in runs]) for name in runs[0][0]}
+    modules = {name: median([run[1].get(name, 0) for run in runs]) for name in runs[0][1]}
+
+    print(f"import {args.entry}: {sum(packages.values()):.1f} ms of imports (median of {args.runs} runs)")
+    print(f"\n{'package':<28} {'self ms':>8}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28} {ms:>8.1f}")
+    print(f"\n{'app module':<36} {'cumulative ms':>13}")
+    for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<36} {ms:>13.1f}")
+    print(f"\n{'phase':<12} {'ms':>8}")
+    for phase in runs[0][2]:
+        print(f"{phase:<12} {statistics.median([run[2][phase] for run in runs]) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Latency of username autocomplete: full user list vs the username index vs the trie.
+
+Run from realtime-chat-backend/:
+
+    python -m benchmarks.bench_user_search [--users 100000] [--queries 2000] [--limit 20]
+
+Fills an in-memory SQLite database with ``--users`` random usernames and
+times ``--queries`` lookups of 1-4 character prefixes taken from them:
+
+- ``full list``: what the frontend relied on before, ``User.query.all()``
+  and filtering in Python (run ``--full-queries`` times only, it is slow);
+- ``index``: ``User.search_prefix``, a range scan of ``ix_users_username_lower``;
+- ``trie``: ``app.utils.username_index`` (USER_SEARCH_TRIE), after a one-off load.
+"""
+import argparse
+import random
+import string
+import time
+
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+from app.utils.username_index import UsernameIndex
+
+
+class BenchConfig:
+    SECRET_KEY = "bench"
+    JWT_SECRET_KEY = "bench"
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+
+def usernames(count, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        names.add(name.capitalize() if rng.random() < 0.2 else name)
+    return sorted(names)
+
+
+def timed(search, prefixes):
+    latencies = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        search(prefix)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--full-queries", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        names = usernames(args.users)
+        db.session.execute(db.insert(User), [
+            {"username": name, "email": f"user{i}@example.com", "password_hash": "x"} for i, name in enumerate(names)
+        ])
+        db.session.commit()
+
+        rng = random.Random(1)
+        prefixes = [rng.choice(names)[:rng.randint(1, 4)] for _ in range(args.queries)]
+
+        def full_list(prefix):
+            prefix = prefix.lower()
+            matches = [user for user in User.query.all() if user.username.lower().startswith(prefix)]
+            db.session.expunge_all()
+            return matches[:args.limit]
+
+        trie = UsernameIndex()
+        started = time.perf_counter()
+        trie.load(db.session.query(User.id, User.username, User.avatar_url))
+        load_time = time.perf_counter() - started
+
+        print(f"{args.users:,} users, prefixes of 1-4 characters, limit {args.limit}")
+        print(f"{'strategy':>10} {'queries':>8} {'p50 ms':>9} {'p99 ms':>9}")
+        for label, search, queries in (
+            ("full list", full_list, prefixes[:args.full_queries]),
+            ("index", lambda prefix: User.search_prefix(prefix, args.limit), prefixes),
+            ("trie", lambda prefix: trie.search(prefix, args.limit), prefixes),
+        ):
+            p50, p99 = timed(search, queries)
+            print(f"{label:>10} {len(queries):>8,} {p50 * 1000:>9.3f} {p99 * 1000:>9.3f}")
+        print(f"trie load: {load_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""message versions
+
+Public and private messages get a version counter (SQLAlchemy's
+version_id_col), which the message cache keys its encoded JSON by. Existing
+messages start at version 1.
+
+Revision ID: 0001_01
+Revises: 0001
+Create Date: 2026-10-19 10:31:24.802117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_01'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['messages', 'private_messages']
+
+
+def upgrade():
+    for table in TABLES:
+        # Filled in for existing rows through a server default, dropped again once they have it
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('version', existing_type=sa.Integer(), server_default=None)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
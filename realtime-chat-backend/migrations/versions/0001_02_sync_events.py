@@ -0,0 +1,40 @@
+"""sync events
+
+The change log read by GET /api/sync for changes that leave no row behind:
+deleted messages, read marks and new or deleted chats.
+
+Revision ID: 0001_02
+Revises: 0001_01
+Create Date: 2026-10-19 10:31:29.417630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_02'
+down_revision = '0001_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('event', sa.String(length=32), nullable=False),
+    sa.Column('chat_id', sa.Integer(), nullable=True),
+    sa.Column('message_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sync_events', schema=None) as batch_op:
+        batch_op.create_index('ix_sync_events_user_id_id', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sync_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_sync_events_user_id_id')
+
+    op.drop_table('sync_events')
@@ -0,0 +1,65 @@
+"""channels
+
+Named public channels with their own history and read marks. The general
+channel (Channel.DEFAULT_ID) is created with the table, like Channel's
+after_create hook does, and every existing public message moves into it.
+
+Revision ID: 0001_03
+Revises: 0001_02
+Create Date: 2026-10-19 10:31:34.096248
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_03'
+down_revision = '0001_02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('channels',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    # First row of the new table, so it gets id 1 (Channel.DEFAULT_ID)
+    channels = sa.table('channels', sa.column('name', sa.String), sa.column('created_at', sa.DateTime))
+    op.bulk_insert(channels, [{'name': 'general', 'created_at': datetime.utcnow()}])
+    op.create_table('channel_reads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('channel_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'channel_id', name='unique_user_channel')
+    )
+    # Existing messages go to the general channel through a server default, dropped again afterwards
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('channel_id', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.create_foreign_key('messages_channel_id_fkey', 'channels', ['channel_id'], ['id'])
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.alter_column('channel_id', existing_type=sa.Integer(), server_default=None)
+        batch_op.create_index('ix_messages_channel_id_id', ['channel_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_messages_channel_id_id')
+        batch_op.drop_constraint('messages_channel_id_fkey', type_='foreignkey')
+        batch_op.drop_column('channel_id')
+
+    op.drop_table('channel_reads')
+    op.drop_table('channels')
@@ -0,0 +1,84 @@
+"""group chats
+
+Group chats are private_chats rows with is_group set, a name and a creator,
+and no user1_id/user2_id; their members are chat_members rows, which also
+hold each member's read mark. Existing chats are direct chats.
+
+Revision ID: 0001_04
+Revises: 0001_03
+Create Date: 2026-10-19 10:31:38.650913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_04'
+down_revision = '0001_03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_members',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('joined_at', sa.DateTime(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chat_id'], ['private_chats.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('chat_id', 'user_id', name='unique_chat_member')
+    )
+    with op.batch_alter_table('chat_members', schema=None) as batch_op:
+        batch_op.create_index('ix_chat_members_user_id', ['user_id'], unique=False)
+
+    # is_group is filled in for existing chats through a server default, dropped again afterwards
+    with op.batch_alter_table('private_chats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_group', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.add_column(sa.Column('name', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('created_by', sa.Integer(), nullable=True))
+        batch_op.alter_column('user1_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+        batch_op.alter_column('user2_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+        batch_op.create_foreign_key('private_chats_created_by_fkey', 'users', ['created_by'], ['id'])
+    with op.batch_alter_table('private_chats', schema=None) as batch_op:
+        batch_op.alter_column('is_group', existing_type=sa.Boolean(), server_default=None)
+
+    with op.batch_alter_table('private_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_private_messages_chat_id_id', ['chat_id', 'id'], unique=False)
+
+
+def downgrade():
+    # Direct chats only: groups and their messages, files and counters cannot be kept
+    private_chats = sa.table('private_chats', sa.column('id', sa.Integer), sa.column('is_group', sa.Boolean))
+    groups = sa.select(private_chats.c.id).where(private_chats.c.is_group == sa.true())
+    for table in ('files', 'private_messages', 'unread_counts', 'chat_members', 'sync_events'):
+        chat_id = sa.column('private_chat_id' if table == 'files' else 'chat_id', sa.Integer)
+        op.execute(sa.table(table, chat_id).delete().where(chat_id.in_(groups)))
+    op.execute(private_chats.delete().where(private_chats.c.is_group == sa.true()))
+
+    with op.batch_alter_table('private_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_private_messages_chat_id_id')
+
+    with op.batch_alter_table('private_chats', schema=None) as batch_op:
+        batch_op.drop_constraint('private_chats_created_by_fkey', type_='foreignkey')
+        batch_op.alter_column('user2_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+        batch_op.alter_column('user1_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+        batch_op.drop_column('created_by')
+        batch_op.drop_column('name')
+        batch_op.drop_column('is_group')
+
+    with op.batch_alter_table('chat_members', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_members_user_id')
+
+    op.drop_table('chat_members')
@@ -0,0 +1,62 @@
+"""uploads and blobs
+
+Chunked uploads in progress (uploads) and the stored objects they end up as
+(blobs), shared by every file with the same content: files.content_hash is
+the SHA-256 key of a file's blob, NULL for files that only have a URL, which
+all existing files are.
+
+The storage_key column files briefly had between the two features is not
+reproduced; no database needs it.
+
+Revision ID: 0001_05
+Revises: 0001_04
+Create Date: 2026-10-19 10:31:43.284551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_05'
+down_revision = '0001_04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('uploads',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('uploader_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('file_type', sa.String(length=100), nullable=True),
+    sa.Column('file_size', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['uploader_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_files_content_hash'), ['content_hash'], unique=False)
+        batch_op.create_foreign_key('files_content_hash_fkey', 'blobs', ['content_hash'], ['sha256'])
+
+
+def downgrade():
+    # Files stored by us have nothing left to serve them once blobs are gone
+    files = sa.table('files', sa.column('content_hash', sa.String))
+    op.execute(files.delete().where(files.c.content_hash.isnot(None)))
+    with op.batch_alter_table('files', schema=None) as batch_op:
+        batch_op.drop_constraint('files_content_hash_fkey', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_files_content_hash'))
+        batch_op.drop_column('content_hash')
+
+    op.drop_table('blobs')
+    op.drop_table('uploads')
@@ -0,0 +1,60 @@
+"""file categories
+
+files.category ('image' or 'document') for the ?type= filter of the file
+listings, and the indexes they page by, newest first by id. Existing files
+are categorized like app.utils.files.file_category does: by MIME type when
+they have one, else by extension.
+
+Revision ID: 0001_06
+Revises: 0001_05
+Create Date: 2026-10-19 10:31:47.930772
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_06'
+down_revision = '0001_05'
+branch_labels = None
+depends_on = None
+
+
+# app.utils.files.IMAGE_EXTENSIONS when this revision was written
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']
+
+
+def upgrade():
+    with op.batch_alter_table('files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=16), nullable=True))
+
+    files = sa.table('files', sa.column('filename', sa.String), sa.column('file_type', sa.String),
+                     sa.column('category', sa.String))
+    file_type = sa.func.lower(files.c.file_type)
+    filename = sa.func.lower(files.c.filename)
+    op.execute(files.update().values(category=sa.case(
+        (sa.func.coalesce(files.c.file_type, '') != '',
+         sa.case((file_type.like('image/%'), 'image'), else_='document')),
+        (sa.or_(*[filename.like(f'%{ext}') for ext in IMAGE_EXTENSIONS]), 'image'),
+        else_='document',
+    )))
+
+    with op.batch_alter_table('files', schema=None) as batch_op:
+        batch_op.alter_column('category', existing_type=sa.String(length=16), nullable=False)
+        batch_op.create_index('ix_files_private_chat_id_category_id', ['private_chat_id', 'category', 'id'],
+                              unique=False)
+        batch_op.create_index('ix_files_private_chat_id_id', ['private_chat_id', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_files_public_message_id'), ['public_message_id'], unique=False)
+        batch_op.create_index('ix_files_uploader_id_category_id', ['uploader_id', 'category', 'id'], unique=False)
+        batch_op.create_index('ix_files_uploader_id_id', ['uploader_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('files', schema=None) as batch_op:
+        batch_op.drop_index('ix_files_uploader_id_id')
+        batch_op.drop_index('ix_files_uploader_id_category_id')
+        batch_op.drop_index(batch_op.f('ix_files_public_message_id'))
+        batch_op.drop_index('ix_files_private_chat_id_id')
+        batch_op.drop_index('ix_files_private_chat_id_category_id')
+        batch_op.drop_column('category')
@@ -0,0 +1,33 @@
+"""username prefix index
+
+Case-insensitive username prefix search (GET /api/users/search) runs on an
+index of lower(username); on Postgres with varchar_pattern_ops, so LIKE
+'prefix%' can use it whatever the database collation. Built CONCURRENTLY
+on Postgres, so the upgrade does not block signups while it runs.
+
+Revision ID: 0001_07
+Revises: 0001_06
+Create Date: 2026-10-19 10:31:50.517394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_07'
+down_revision = '0001_06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_username_lower', 'users', [sa.text('lower(username)')], unique=False,
+                        postgresql_ops={'lower(username)': 'varchar_pattern_ops'}, if_not_exists=True,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_username_lower', table_name='users', if_exists=True, postgresql_concurrently=True)
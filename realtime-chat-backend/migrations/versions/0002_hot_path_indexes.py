@@ -0,0 +1,50 @@
+"""hot path indexes
+
+Indexes for the lookups of app/api and app/sockets that had none: a user's
+direct chats and the chat of two users (private_chats by either member),
+attachments of a private message, and a user's messages (deleting a user,
+and the foreign key checks Postgres makes on it). Chat and channel history
+are read by id over the existing (chat_id, id) / (channel_id, id) indexes,
+so timestamp gets none. tests/test_query_plans.py checks the plans.
+
+On Postgres the indexes are built CONCURRENTLY, so the upgrade does not
+block writes to these tables while it runs.
+
+Revision ID: 0002
+Revises: 0001_07
+Create Date: 2026-10-19 10:31:52.968862
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001_07'
+branch_labels = None
+depends_on = None
+
+
+# (index, table, columns)
+INDEXES = [
+    ('ix_private_chats_user1_id_user2_id', 'private_chats', ['user1_id', 'user2_id']),
+    ('ix_private_chats_user2_id_user1_id', 'private_chats', ['user2_id', 'user1_id']),
+    ('ix_files_private_message_id', 'files', ['private_message_id']),
+    ('ix_messages_user_id', 'messages', ['user_id']),
+    ('ix_private_messages_sender_id', 'private_messages', ['sender_id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. IF NOT EXISTS covers databases
+    # made by db.create_all() with models that already had them, stamped at an earlier revision.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
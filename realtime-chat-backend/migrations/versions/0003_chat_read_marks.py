@@ -0,0 +1,82 @@
+"""chat read marks
+
+Direct chats keep how far each user has read (chat_reads.last_read_message_id)
+instead of a counter bumped on every message (unread_counts.count): unread
+counts are derived from the mark over the (chat_id, id) index, as channels
+and groups already do, so sending no longer reads and rewrites a counter.
+
+Each counter becomes the mark that leaves the same number of the other
+user's messages unread: just below the count-th newest of them, or the
+chat's last message when the count is 0. The downgrade counts them back
+for both users of every direct chat (no mark: nothing read).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:08:41.512230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_reads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chat_id'], ['private_chats.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('chat_id', 'user_id', name='unique_chat_read')
+    )
+    op.execute("""
+        INSERT INTO chat_reads (user_id, chat_id, last_read_message_id)
+        SELECT uc.user_id, uc.chat_id, COALESCE(
+            MIN(CASE WHEN ranked.sender_id != uc.user_id AND ranked.newest <= uc.count THEN ranked.id END) - 1,
+            MAX(ranked.id),
+            0
+        )
+        FROM unread_counts uc
+        LEFT JOIN (
+            SELECT pm.id, pm.chat_id, pm.sender_id,
+                   ROW_NUMBER() OVER (PARTITION BY pm.chat_id, pm.sender_id ORDER BY pm.id DESC) AS newest
+            FROM private_messages pm
+        ) ranked ON ranked.chat_id = uc.chat_id
+        GROUP BY uc.id, uc.user_id, uc.chat_id
+    """)
+    op.drop_table('unread_counts')
+
+
+def downgrade():
+    op.create_table('unread_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chat_id'], ['private_chats.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'chat_id', name='unique_user_chat')
+    )
+    op.execute("""
+        INSERT INTO unread_counts (user_id, chat_id, count)
+        SELECT member.user_id, member.chat_id, (
+            SELECT COUNT(pm.id) FROM private_messages pm
+            WHERE pm.chat_id = member.chat_id AND pm.sender_id != member.user_id AND pm.id > COALESCE(
+                (SELECT cr.last_read_message_id FROM chat_reads cr
+                 WHERE cr.user_id = member.user_id AND cr.chat_id = member.chat_id), 0)
+        )
+        FROM (
+            SELECT id AS chat_id, user1_id AS user_id FROM private_chats WHERE NOT is_group
+            UNION SELECT id, user2_id FROM private_chats WHERE NOT is_group
+        ) member
+    """)
+    op.drop_table('chat_reads')
@@ -0,0 +1,50 @@
+"""user purges
+
+Deleting a user marks the row (users.deleted_at) and queues a user_purges
+row tracking the background removal of their data (app.utils.user_purge).
+The column is nullable with no default, so adding it does not rewrite the
+users table on Postgres. uploads.uploader_id gets the index the purge looks
+up a user's uploads by, built CONCURRENTLY on Postgres like those of 0002.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 15:42:17.304518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_table('user_purges',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('step', sa.String(length=32), nullable=False),
+    sa.Column('rows_purged', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('lease_until', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_user_purges_finished_at', 'user_purges', ['finished_at'], unique=False)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_uploads_uploader_id', 'uploads', ['uploader_id'], unique=False, if_not_exists=True,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_uploads_uploader_id', table_name='uploads', if_exists=True, postgresql_concurrently=True)
+    op.drop_index('ix_user_purges_finished_at', table_name='user_purges')
+    op.drop_table('user_purges')
+    # A plain DROP COLUMN (SQLite 3.35+): a batch table copy would lose the expression index on users
+    op.drop_column('users', 'deleted_at')
@@ -5,9 +5,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app import create_app
-from app.extensions import socketio
+from app.extensions import socketio, warmup, user_purger, sweeper
 
 app = create_app()
+warmup.start(app)
+user_purger.start(app)
+sweeper.start(app)
 
 # if __name__ == "__main__":
 #     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,72 @@
+-- The schema db.create_all() made on SQLite before migrations were kept, as migrations/versions/0001 describes it
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    username VARCHAR(80) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    avatar_url VARCHAR(255),
+    PRIMARY KEY (id),
+    UNIQUE (username),
+    UNIQUE (email)
+);
+CREATE TABLE token_blocklist (
+    id INTEGER NOT NULL,
+    jti VARCHAR(36) NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_token_blocklist_jti ON token_blocklist (jti);
+CREATE TABLE messages (
+    id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    timestamp DATETIME NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE TABLE private_chats (
+    id INTEGER NOT NULL,
+    user1_id INTEGER NOT NULL,
+    user2_id INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user1_id) REFERENCES users (id),
+    FOREIGN KEY(user2_id) REFERENCES users (id)
+);
+CREATE TABLE private_messages (
+    id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    timestamp DATETIME NOT NULL,
+    sender_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(sender_id) REFERENCES users (id),
+    FOREIGN KEY(chat_id) REFERENCES private_chats (id)
+);
+CREATE TABLE unread_counts (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT unique_user_chat UNIQUE (user_id, chat_id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(chat_id) REFERENCES private_chats (id)
+);
+CREATE TABLE files (
+    id INTEGER NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    file_url TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_type VARCHAR(100),
+    uploaded_at DATETIME NOT NULL,
+    uploader_id INTEGER NOT NULL,
+    public_message_id INTEGER,
+    private_message_id INTEGER,
+    private_chat_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(uploader_id) REFERENCES users (id),
+    FOREIGN KEY(public_message_id) REFERENCES messages (id),
+    FOREIGN KEY(private_message_id) REFERENCES private_messages (id),
+    FOREIGN KEY(private_chat_id) REFERENCES private_chats (id)
+);
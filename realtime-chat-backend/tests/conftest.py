@@ -1,7 +1,7 @@
 import pytest
 import os
 from app import create_app
-from app.extensions import db
+from app.extensions import db, socketio
 from app.models.user import User
 
 class TestConfig:
@@ -12,6 +12,11 @@ class TestConfig:
     JWT_ACCESS_TOKEN_EXPIRES = 3600
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = "access"
+    QUERY_BUDGET_MODE = "raise"
+    USER_PURGE_WORKER = False  # tests run purges with user_purger.run_pending()
+    USER_PURGE_PAUSE = 0
+    SWEEP_WORKER = False  # tests sweep with sweeper.run_once()
+    SYNC_SETTLE = 0
 
 @pytest.fixture
 def app():
@@ -44,6 +49,19 @@ def auth_headers(client):
     token = response.get_json()['access_token']
     return {'Authorization': f'Bearer {token}'}
 
+@pytest.fixture
+def register(client):
+    """Registers and logs in another user; returns their id and auth headers"""
+    def register(username, client=client):
+        client.post('/api/auth/register', json={
+            'username': username,
+            'email': f'{username.lower()}@example.com',
+            'password': 'password123'
+        })
+        data = client.post('/api/auth/login', json={'username': username, 'password': 'password123'}).get_json()
+        return data['user']['id'], {'Authorization': f"Bearer {data['access_token']}"}
+    return register
+
 @pytest.fixture
 def test_user(app):
     with app.app_context():
@@ -51,4 +69,13 @@ def test_user(app):
         user.set_password('password123')
         db.session.add(user)
         db.session.commit()
-        return user
\ No newline at end of file
+        return user
+
+@pytest.fixture
+def socket_client(app, client, auth_headers):
+    token = auth_headers['Authorization'].split()[1]
+    socket_client = socketio.test_client(app, flask_test_client=client, query_string=f'token={token}')
+    socket_client.get_received()  # drop the 'connected' greeting
+    yield socket_client
+    if socket_client.is_connected():
+        socket_client.disconnect()
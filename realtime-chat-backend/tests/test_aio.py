@@ -0,0 +1,175 @@
+import asyncio
+import orjson
+import pytest
+from app import create_app
+from app.extensions import db, socket_auth
+from app.aio.db import async_database_url
+from app.models.message import Message
+from app.models.private_chat import PrivateChat
+from app.models.user import User
+from tests.conftest import TestConfig
+
+def test_async_database_url():
+    assert str(async_database_url("sqlite:///chat.db")) == "sqlite+aiosqlite:///chat.db"
+    assert str(async_database_url("postgresql+psycopg2://u@db/chat")) == "postgresql+asyncpg://u@db/chat"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u@db/chat")
+
+class FakeServer:
+    """Records what AsyncChatEvents asks of python-socketio's AsyncServer"""
+
+    def __init__(self):
+        self.emitted = []
+        self.rooms = {}
+        self.disconnected = []
+
+    def on(self, event, handler=None):
+        pass
+
+    async def emit(self, event, data=None, to=None, skip_sid=None):
+        self.emitted.append((event, data, to))
+
+    async def enter_room(self, sid, room):
+        self.rooms.setdefault(room, set()).add(sid)
+
+    async def leave_room(self, sid, room):
+        self.rooms.get(room, set()).discard(sid)
+
+    async def disconnect(self, sid):
+        self.disconnected.append(sid)
+
+    def events(self, name):
+        return [(data, to) for event, data, to in self.emitted if event == name]
+
+@pytest.fixture
+def app(tmp_path):
+    pytest.importorskip("aiosqlite")
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'chat.db'}"
+
+    app = create_app(FileConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def events(app):
+    from app.aio.db import AsyncDatabase
+    from app.aio.events import AsyncChatEvents
+
+    database = AsyncDatabase(app.config["SQLALCHEMY_DATABASE_URI"])
+    yield AsyncChatEvents(FakeServer(), app, database)
+    asyncio.run(database.dispose())
+
+def _token(auth_headers):
+    return auth_headers['Authorization'].split()[1]
+
+def test_public_message_in_asyncio_mode(app, client, auth_headers, events):
+    async def scenario():
+        await events.connect('sid1', {'QUERY_STRING': f'token={_token(auth_headers)}'})
+        await events.join_public('sid1', {})
+        await events.send_public_message('sid1', {'content': 'hello from asyncio'})
+        await events.send_public_message('sid1', {'content': '   '})
+
+    asyncio.run(scenario())
+    sio = events.sio
+    assert sio.events('connected')[0][0]['message'] == 'Welcome testuser!'
+    assert sio.rooms['public_chat'] == {'sid1'}
+
+    (payload, meta), room = sio.events('new_public_message')[0]
+    assert room == 'public_chat' and meta['room'] == 'public_chat'
+    sent = orjson.loads(orjson.dumps(payload))
+    assert sent['content'] == 'hello from asyncio'
+    assert sio.events('error')[0][0]['message'] == 'Message content cannot be empty'
+
+    # Same row and same JSON as the eventlet mode serves over REST
+    message = Message.query.one()
+    history = client.get('/api/messages', headers=auth_headers).get_json()['messages']
+    assert history == [sent] and message.content == 'hello from asyncio'
+
+def test_private_message_in_asyncio_mode(app, client, auth_headers, events, register):
+    other_id, _ = register('other')
+
+    async def scenario():
+        await events.connect('sid1', {'QUERY_STRING': f'token={_token(auth_headers)}'})
+        await events.send_private_message('sid1', {'other_user_id': other_id, 'content': 'hi'})
+        await events.send_private_message('sid1', {'other_user_id': other_id, 'content': 'again'})
+
+    asyncio.run(scenario())
+    sio = events.sio
+    updates = sio.events('unread_count_update')
+    assert [data[0]['unread_count'] for data, _ in updates] == [1, 2]
+    assert updates[0][1] == f'user_{other_id}'
+    chat_id = updates[0][0][0]['chat_id']
+    assert sio.rooms[f'private_chat_{chat_id}'] == {'sid1'}
+
+def test_private_message_to_unknown_user_in_asyncio_mode(app, auth_headers, events):
+    async def scenario():
+        await events.connect('sid1', {'QUERY_STRING': f'token={_token(auth_headers)}'})
+        await events.send_private_message('sid1', {'other_user_id': 12345, 'content': 'hi'})
+
+    asyncio.run(scenario())
+    assert [data['message'] for data, _ in events.sio.events('error')] == ['User not found']
+    assert PrivateChat.query.count() == 0
+
+def test_deleted_user_cannot_be_joined_in_asyncio_mode(app, auth_headers, register, events):
+    bob_id, _ = register('bob')
+    User.query.filter_by(id=bob_id).one().mark_deleted()
+    db.session.commit()
+
+    async def scenario():
+        await events.connect('sid1', {'QUERY_STRING': f'token={_token(auth_headers)}'})
+        await events.join_private('sid1', {'other_user_id': bob_id})
+
+    asyncio.run(scenario())
+    assert [data['message'] for data, _ in events.sio.events('error')] == ['User not found']
+    assert PrivateChat.query.count() == 0
+
+def test_deleted_user_closed_on_next_event_in_asyncio_mode(app, auth_headers, events, monkeypatch):
+    async def scenario():
+        await events.connect('sid1', {'QUERY_STRING': f'token={_token(auth_headers)}'})
+        await events.join_public('sid1')
+        User.query.filter_by(username='testuser').one().mark_deleted()
+        db.session.commit()
+        monkeypatch.setattr(socket_auth, 'ttl', 0)
+        await events.send_public_message('sid1', {'content': 'too late'})
+
+    asyncio.run(scenario())
+    assert events.sio.disconnected == ['sid1']
+    assert Message.query.count() == 0
+
+def test_invalid_token_refused_in_asyncio_mode(events):
+    from socketio.exceptions import ConnectionRefusedError
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(events.connect('sid1', {'QUERY_STRING': 'token=garbage'}))
+
+def test_unsupported_event(events):
+    asyncio.run(events.unsupported('send_group_message', 'sid1', {}))
+    assert events.sio.events('error')[0][0]['code'] == 'unsupported'
+
+def test_disconnect_forgets_presence_in_asyncio_mode(app, auth_headers, events):
+    from app.extensions import ephemeral, session_resume
+
+    async def scenario():
+        for sid in ('sid1', 'sid2'):
+            await events.connect(sid, {'QUERY_STRING': f'token={_token(auth_headers)}'})
+            await events.join_public(sid, {})
+        user = {'id': events.connected_users['sid1']['user_id'], 'username': 'testuser'}
+        ephemeral.update('presence', 'public_chat', user)
+        await events.disconnect('sid1')
+        assert [u['username'] for u in ephemeral.active('presence', 'public_chat')] == ['testuser']
+        await events.disconnect('sid2')
+
+    asyncio.run(scenario())
+    assert ephemeral.active('presence', 'public_chat') == []
+    assert session_resume.stats()['suspended'] == 2
+
+def test_asgi_entry_point_refuses_to_start():
+    from app.aio.server import create_asgi_app
+
+    with pytest.raises(RuntimeError, match='ASGI_PREVIEW'):
+        create_asgi_app(TestConfig)
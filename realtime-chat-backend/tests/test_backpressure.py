@@ -0,0 +1,106 @@
+import engineio
+import pytest
+import socketio as python_socketio
+from app.extensions import socketio, outbound
+from app.utils.backpressure import BackpressureManager
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Pretend every connection has ``queue['depth']`` packets waiting"""
+    queue = {'depth': 0}
+    monkeypatch.setattr(outbound, 'queue_depth', lambda eio_sid: queue['depth'])
+    return queue
+
+@pytest.fixture
+def public_client(socket_client):
+    socket_client.emit('join_public')
+    socket_client.get_received()
+    return socket_client
+
+def names(received):
+    return [packet['name'] for packet in received]
+
+def test_fast_consumer_gets_events_as_usual(public_client, queue):
+    socketio.emit('user_joined', {'username': 'bob'}, to='public_chat')
+    socketio.emit('new_public_message', {'id': 1}, to='public_chat')
+    assert names(public_client.get_received()) == ['user_joined', 'new_public_message']
+
+def test_slow_consumer_drops_noise_and_batches_messages(public_client, queue):
+    queue['depth'] = outbound.high_watermark
+    socketio.emit('user_joined', {'username': 'bob'}, to='public_chat')
+    for message_id in range(3):
+        socketio.emit('new_public_message', {'id': message_id}, to='public_chat')
+    assert public_client.get_received() == []
+
+    outbound.flush_pending()
+    received = public_client.get_received()
+    assert names(received) == ['batch']
+    assert received[0]['args'][0]['events'] == [
+        ['new_public_message', {'id': message_id}] for message_id in range(3)
+    ]
+    assert outbound.dropped == 1
+    assert outbound.batched == 3
+
+def test_recovered_consumer_gets_pending_events_first(public_client, queue):
+    queue['depth'] = outbound.high_watermark
+    socketio.emit('new_public_message', {'id': 1}, to='public_chat')
+
+    # Between the watermarks the connection stays slow
+    queue['depth'] = outbound.low_watermark + 1
+    socketio.emit('new_public_message', {'id': 2}, to='public_chat')
+    assert public_client.get_received() == []
+
+    queue['depth'] = outbound.low_watermark
+    socketio.emit('new_public_message', {'id': 3}, to='public_chat')
+    received = public_client.get_received()
+    assert names(received) == ['batch', 'new_public_message']
+    assert len(received[0]['args'][0]['events']) == 2
+    assert outbound.stats()['slow'] == 0
+
+def test_consumer_past_hard_limit_is_disconnected(public_client, queue):
+    queue['depth'] = outbound.hard_limit
+    socketio.emit('new_public_message', {'id': 1}, to='public_chat')
+    assert not public_client.is_connected()
+    assert outbound.disconnected == 1
+
+def test_metrics_report_queue_depth(client, auth_headers, public_client, queue):
+    queue['depth'] = 7
+    response = client.get('/api/metrics?limit=1', headers=auth_headers)
+    assert response.status_code == 200
+    stats = response.get_json()['outbound']
+    assert stats['connections'] == 1
+    assert stats['deepest'][0] == {'depth': 7, 'slow': False, 'pending': 0}
+    assert 'hits' in response.get_json()['message_cache']
+
+def test_queue_depth_reads_the_engineio_socket_queue():
+    """queue_depth is the one read past python-engineio's public calls; an upgrade that moves it fails here"""
+    manager = BackpressureManager()
+    server = python_socketio.Server(async_mode='threading', client_manager=manager)
+    sock = engineio.socket.Socket(server.eio, 'eio-1')
+    server.eio.sockets['eio-1'] = sock
+    assert manager.queue_depth('eio-1') == 0
+    sock.queue.put(engineio.packet.Packet(engineio.packet.MESSAGE, data='x'))
+    assert manager.queue_depth('eio-1') == 1
+    assert manager.queue_depth('gone') == 0
+
+
+def test_held_back_connections_are_skipped_by_the_stock_emit(monkeypatch):
+    """Delivery goes through socketio.Manager.emit, encoding once for everyone not held back"""
+    manager = BackpressureManager(high_watermark=2, low_watermark=1)
+    server = python_socketio.Server(async_mode='threading', client_manager=manager)
+    sent = []
+    monkeypatch.setattr(server.eio, 'send_packet', lambda eio_sid, pkt: sent.append((eio_sid, pkt.data)))
+    monkeypatch.setattr(manager, '_ensure_flusher', lambda: None)
+    depth = {'eio-1': 0, 'eio-2': 5}
+    monkeypatch.setattr(manager, 'queue_depth', lambda eio_sid: depth[eio_sid])
+    manager.connect('eio-1', '/')
+    slow_sid = manager.connect('eio-2', '/')
+
+    manager.emit('message', {'n': 1}, '/')
+    assert [eio_sid for eio_sid, _ in sent] == ['eio-1']
+
+    depth['eio-2'] = 0
+    manager.emit('message', {'n': 2}, '/')
+    assert [eio_sid for eio_sid, _ in sent] == ['eio-1', 'eio-2', 'eio-1', 'eio-2']
+    assert '"batch"' in sent[1][1] and manager.batched == 1
+    assert manager.is_connected(slow_sid, '/')
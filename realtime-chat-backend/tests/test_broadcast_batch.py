@@ -0,0 +1,106 @@
+import pytest
+from app import create_app
+from app.extensions import db, socketio, broadcast_batcher, session_resume
+from app.utils.broadcast_batch import BroadcastBatcher
+from tests.conftest import TestConfig
+
+class BatchedConfig(TestConfig):
+    BROADCAST_BATCH_WINDOW = 0.05
+    BROADCAST_BATCH_MAX = 3
+
+@pytest.fixture
+def app():
+    app = create_app(BatchedConfig)
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+class NoTimer:
+    """Stands in for socketio; the window timer never fires, tests flush by hand"""
+    def start_background_task(self, *args):
+        pass
+
+class Recorder:
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, event, args, to):
+        self.frames.append((event, to, args))
+
+def test_disabled_batcher_leaves_events_alone():
+    batcher = BroadcastBatcher(window=0)
+    assert not batcher.add('room', 'new_public_message', {'id': 1})
+    assert batcher.flush(emit=Recorder()) == 0
+
+def test_unlisted_events_are_not_batched():
+    batcher = BroadcastBatcher(window=0.05)
+    assert not batcher.add('room', 'user_joined', {'username': 'bob'})
+
+def test_window_is_sent_as_one_frame():
+    batcher = BroadcastBatcher(window=0.05)
+    batcher._socketio = NoTimer()
+    for seq in range(1, 5):
+        batcher.add('room', 'new_public_message', {'id': seq}, seq=seq)
+
+    emit = Recorder()
+    assert batcher.flush(emit=emit) == 1
+    event, room, (items, meta) = emit.frames[0]
+    assert (event, room) == ('new_public_messages', 'room')
+    assert items == [{'id': seq} for seq in range(1, 5)]
+    assert meta == {'room': 'room', 'seq': 4, 'count': 4}
+    assert batcher.stats()['frames'] == 1
+
+def send(socket_client, content):
+    socket_client.emit('send_public_message', {'content': content})
+
+def test_public_messages_are_batched_over_socket(socket_client):
+    socket_client.emit('join_public')
+    socket_client.get_received()
+
+    send(socket_client, 'one')
+    send(socket_client, 'two')
+    assert socket_client.get_received() == []
+
+    broadcast_batcher.flush()
+    received = socket_client.get_received()
+    assert [packet['name'] for packet in received] == ['new_public_messages']
+    messages, meta = received[0]['args']
+    assert [m['content'] for m in messages] == ['one', 'two']
+    assert meta['seq'] == session_resume.seq
+
+def test_full_batch_is_sent_without_waiting(socket_client):
+    socket_client.emit('join_public')
+    socket_client.get_received()
+
+    for content in ('a', 'b', 'c'):
+        send(socket_client, content)
+    received = socket_client.get_received()
+    assert [packet['name'] for packet in received] == ['new_public_messages']
+    assert received[0]['args'][1]['count'] == 3
+
+def test_other_room_events_flush_the_open_batch_first(socket_client):
+    socket_client.emit('join_public')
+    socket_client.get_received()
+
+    send(socket_client, 'hello')
+    socket_client.emit('send_public_file', {
+        'filename': 'a.txt', 'file_url': 'http://x/a.txt', 'file_size': 3, 'file_type': 'text/plain'
+    })
+    names = [packet['name'] for packet in socket_client.get_received()]
+    assert names == ['new_public_messages', 'new_public_file_message']
+
+def test_unlogged_broadcasts_flush_the_open_batch_first(app, client, socket_client, register):
+    _, headers = register('late')
+    token = headers['Authorization'].split()[1]
+    late = socketio.test_client(app, flask_test_client=client, query_string=f'token={token}')
+
+    socket_client.emit('join_public')
+    socket_client.get_received()
+    send(socket_client, 'hello')
+    late.emit('join_public')
+
+    names = [packet['name'] for packet in socket_client.get_received()]
+    assert names == ['new_public_messages', 'user_joined']
@@ -0,0 +1,90 @@
+import pytest
+from app.extensions import room_history
+
+def _received(socket_client, name):
+    return [event['args'][0] for event in socket_client.get_received() if event['name'] == name]
+
+def _create_channel(client, auth_headers, name='random'):
+    response = client.post('/api/channels', json={'name': name, 'description': 'off topic'}, headers=auth_headers)
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+def test_general_channel_exists(client, auth_headers):
+    response = client.get('/api/channels', headers=auth_headers)
+    assert response.status_code == 200
+    channels = response.get_json()['channels']
+    assert [(c['id'], c['name']) for c in channels] == [(1, 'general')]
+
+def test_create_channel_rejects_duplicates(client, auth_headers):
+    _create_channel(client, auth_headers, 'Random')
+    response = client.post('/api/channels', json={'name': 'random'}, headers=auth_headers)
+    assert response.status_code == 409
+    response = client.post('/api/channels', json={'name': '  '}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_channel_history_is_separate(client, auth_headers):
+    channel_id = _create_channel(client, auth_headers)
+    client.post('/api/messages', json={'content': 'in general'}, headers=auth_headers)
+    response = client.post(f'/api/channels/{channel_id}/messages', json={'content': 'in random'}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.get_json()['channel_id'] == channel_id
+
+    general = client.get('/api/messages', headers=auth_headers).get_json()['messages']
+    random = client.get(f'/api/channels/{channel_id}/messages', headers=auth_headers).get_json()['messages']
+    assert [m['content'] for m in general] == ['in general']
+    assert [m['content'] for m in random] == ['in random']
+    assert client.get('/api/channels/99/messages', headers=auth_headers).status_code == 404
+
+def test_channel_unread_counts(client, auth_headers):
+    channel_id = _create_channel(client, auth_headers)
+    for i in range(3):
+        client.post(f'/api/channels/{channel_id}/messages', json={'content': f'm{i}'}, headers=auth_headers)
+
+    unread = {c['id']: c['unread_count'] for c in client.get('/api/channels', headers=auth_headers).get_json()['channels']}
+    assert unread == {1: 0, channel_id: 3}
+
+    response = client.post(f'/api/channels/{channel_id}/read', headers=auth_headers)
+    assert response.status_code == 200
+    client.post(f'/api/channels/{channel_id}/messages', json={'content': 'later'}, headers=auth_headers)
+
+    unread = {c['id']: c['unread_count'] for c in client.get('/api/channels', headers=auth_headers).get_json()['channels']}
+    assert unread[channel_id] == 1
+
+def test_channel_messages_stay_in_their_room(client, auth_headers, socket_client):
+    channel_id = _create_channel(client, auth_headers)
+    client.post(f'/api/channels/{channel_id}/messages', json={'content': 'earlier'}, headers=auth_headers)
+
+    socket_client.emit('join_channel', {'channel_id': channel_id, 'history': True})
+    joined = _received(socket_client, 'joined_channel')[0]
+    assert joined['channel']['name'] == 'random'
+    assert [m['content'] for m in joined['messages']] == ['earlier']
+
+    socket_client.emit('send_public_message', {'content': 'general only'})
+    assert _received(socket_client, 'error')[0]['message'] == 'Not in public chat'
+
+    socket_client.emit('send_public_message', {'content': 'hello', 'channel_id': channel_id})
+    message = _received(socket_client, 'new_public_message')[0]
+    assert (message['content'], message['channel_id']) == ('hello', channel_id)
+    assert [m_id for m_id, _ in room_history.recent(f'channel_{channel_id}')][-1] == message['id']
+
+    socket_client.emit('leave_channel', {'channel_id': channel_id})
+    socket_client.emit('send_public_message', {'content': 'gone', 'channel_id': channel_id})
+    assert _received(socket_client, 'error')[0]['message'] == 'Not in channel'
+
+def test_join_unknown_channel(socket_client):
+    socket_client.emit('join_channel', {'channel_id': 42})
+    assert _received(socket_client, 'error')[0]['message'] == 'Channel not found'
+
+def test_join_channel_without_payload_joins_general(socket_client):
+    socket_client.emit('join_channel')
+    assert _received(socket_client, 'joined_channel')[0]['channel']['name'] == 'general'
+
+@pytest.mark.parametrize('event', [
+    'resume', 'profile', 'join_public', 'leave_public', 'join_channel', 'leave_channel', 'send_public_message',
+    'join_private', 'leave_private', 'send_private_message', 'join_group', 'leave_group', 'send_group_message',
+    'typing', 'presence_ping', 'get_online_users', 'mark_chat_read', 'mark_public_read', 'send_public_file',
+    'send_private_file', 'send_public_files', 'send_private_files',
+])
+def test_events_without_payload_are_answered(socket_client, event):
+    socket_client.emit(event)
+    assert socket_client.is_connected()
@@ -0,0 +1,88 @@
+import pytest
+from app.extensions import socketio, ephemeral
+from app.utils.ephemeral import EphemeralEvents
+
+ALICE = {'id': 1, 'username': 'alice'}
+BOB = {'id': 2, 'username': 'bob'}
+
+class Recorder:
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, event, payload, to):
+        self.frames.append((event, to, payload))
+
+def test_bursts_are_coalesced_into_one_frame():
+    events = EphemeralEvents(interval=0.5)
+    emit = Recorder()
+    for i in range(20):
+        events.update('typing', 'room', ALICE, now=i * 0.01)
+        events.update('typing', 'room', BOB, now=i * 0.01)
+
+    assert events.flush(emit, now=0.5) == 1
+    event, room, payload = emit.frames[0]
+    assert (event, room, payload['count']) == ('typing', 'room', 2)
+
+    # Still typing, nothing changed: no frame
+    events.update('typing', 'room', ALICE, now=0.6)
+    assert events.flush(emit, now=1.0) == 0
+
+def test_entries_expire_and_stop_is_broadcast():
+    events = EphemeralEvents(ttls={'typing': 2.0})
+    emit = Recorder()
+    events.update('typing', 'room', ALICE, now=0)
+    events.update('typing', 'room', BOB, now=0)
+    events.flush(emit, now=0.5)
+
+    events.update('typing', 'room', BOB, active=False, now=1)
+    events.flush(emit, now=1.5)
+    assert emit.frames[-1][2]['users'] == [ALICE]
+
+    events.flush(emit, now=3)
+    assert emit.frames[-1][2]['count'] == 0
+    assert events.active('typing', 'room', now=3) == []
+
+def test_frame_lists_a_bounded_number_of_users():
+    events = EphemeralEvents(max_listed=3)
+    emit = Recorder()
+    for user_id in range(50):
+        events.update('typing', 'room', {'id': user_id, 'username': f'u{user_id}'}, now=0)
+    events.flush(emit, now=0.1)
+    payload = emit.frames[0][2]
+    assert payload['count'] == 50
+    assert len(payload['users']) == 3
+
+def test_typing_over_socket(app, client, auth_headers, socket_client, register):
+    _, headers = register('watcher')
+    token = headers['Authorization'].split()[1]
+    watcher = socketio.test_client(app, flask_test_client=client, query_string=f'token={token}')
+
+    socket_client.emit('join_public')
+    watcher.emit('join_public')
+    watcher.get_received()
+
+    for _ in range(10):
+        socket_client.emit('typing', {})
+    ephemeral.flush()
+
+    frames = [event['args'][0] for event in watcher.get_received() if event['name'] == 'typing']
+    assert len(frames) == 1
+    assert frames[0]['users'][0]['username'] == 'testuser'
+
+def test_typing_ignored_outside_room(socket_client):
+    socket_client.emit('typing', {'chat_id': 12345})
+    assert ephemeral.active('typing', 'private_chat_12345') == []
+
+def test_closing_one_tab_keeps_typing_of_the_other(app, client, auth_headers, socket_client):
+    token = auth_headers['Authorization'].split()[1]
+    second_tab = socketio.test_client(app, flask_test_client=client, query_string=f'token={token}')
+    socket_client.emit('join_public')
+    second_tab.emit('join_public')
+    second_tab.emit('typing', {})
+    assert [user['username'] for user in ephemeral.active('typing', 'public_chat')] == ['testuser']
+
+    socket_client.disconnect()
+    assert [user['username'] for user in ephemeral.active('typing', 'public_chat')] == ['testuser']
+
+    second_tab.disconnect()
+    assert ephemeral.active('typing', 'public_chat') == []
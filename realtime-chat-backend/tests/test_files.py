@@ -1,4 +1,5 @@
 import pytest
+from sqlalchemy import event
 from app.models.file import File
 from app.models.message import Message
 from app.models.private_chat import PrivateChat
@@ -59,13 +60,9 @@ def test_create_file_invalid_type(client, auth_headers):
     assert response.status_code == 400
     assert 'Invalid file type' in response.get_json()['message']
 
-def test_create_file_private_chat(client, auth_headers):
+def test_create_file_private_chat(client, auth_headers, register):
     # Create another user and chat
-    client.post('/api/auth/register', json={
-        'username': 'friend',
-        'email': 'friend@example.com',
-        'password': 'password123'
-    })
+    register('friend')
     
     with client.application.app_context():
         from app.models.user import User
@@ -171,4 +168,124 @@ def test_get_files_by_message(client, auth_headers):
     assert response.status_code == 200
     data = response.get_json()
     assert 'files' in data
-    assert len(data['files']) >= 1
\ No newline at end of file
+    assert len(data['files']) >= 1
+
+@pytest.fixture
+def file_inserts(app):
+    """INSERT INTO files statements run while the test runs"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO files'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+def test_create_files_batch(client, auth_headers, file_inserts):
+    message_id = client.post('/api/messages', json={'content': 'Album'}, headers=auth_headers).get_json()['id']
+
+    response = client.post('/api/files/batch', json={
+        'public_message_id': message_id,
+        'files': [
+            {'filename': f'photo{i}.jpg', 'file_url': f'http://example.com/photo{i}.jpg',
+             'file_size': 1000 + i, 'file_type': 'image/jpeg'}
+            for i in range(4)
+        ]
+    }, headers=auth_headers)
+    assert response.status_code == 201
+    files = response.get_json()['files']
+    assert [f['filename'] for f in files] == [f'photo{i}.jpg' for i in range(4)]
+    assert all(f['public_message_id'] == message_id and f['file_type'] == 'image/jpeg' for f in files)
+    assert len(file_inserts) == 1
+
+    # The cached message picks up its attachments
+    messages = client.get('/api/messages', headers=auth_headers).get_json()['messages']
+    assert len(messages[0]['files']) == 4
+
+def test_create_files_batch_is_all_or_nothing(client, auth_headers):
+    message_id = client.post('/api/messages', json={'content': 'Album'}, headers=auth_headers).get_json()['id']
+    response = client.post('/api/files/batch', json={
+        'public_message_id': message_id,
+        'files': [
+            {'filename': 'ok.png', 'file_url': 'http://example.com/ok.png', 'file_size': 10},
+            {'filename': 'bad.exe', 'file_url': 'http://example.com/bad.exe', 'file_size': 10}
+        ]
+    }, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+    assert client.get('/api/files/', headers=auth_headers).get_json() == []
+
+    response = client.post('/api/files/batch', json={'files': [
+        {'filename': 'ok.png', 'file_url': 'http://example.com/ok.png', 'file_size': 10}
+    ]}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_send_public_files_creates_one_message(socket_client):
+    socket_client.emit('join_public')
+    socket_client.get_received()
+    socket_client.emit('send_public_files', {'content': 'two pics', 'files': [
+        {'filename': 'a.png', 'file_url': 'http://example.com/a.png', 'file_size': 10},
+        {'filename': 'b.png', 'file_url': 'http://example.com/b.png', 'file_size': 20}
+    ]})
+    received = [e for e in socket_client.get_received() if e['name'] == 'new_public_file_message']
+    assert len(received) == 1
+    message = received[0]['args'][0]
+    assert message['content'] == 'two pics'
+    assert [f['filename'] for f in message['files']] == ['a.png', 'b.png']
+    assert {f['public_message_id'] for f in message['files']} == {message['id']}
+
+def _register_files(client, auth_headers, names, **association):
+    return client.post('/api/files/batch', json=dict({'files': [
+        {'filename': name, 'file_url': f'http://example.com/{name}', 'file_size': 1024} for name in names
+    ]}, **association), headers=auth_headers).get_json()['files']
+
+def test_file_listing_cursor_pages(client, auth_headers):
+    message_id = client.post('/api/messages', json={'content': 'm'}, headers=auth_headers).get_json()['id']
+    created = _register_files(client, auth_headers, [f'f{i}.pdf' for i in range(5)], public_message_id=message_id)
+
+    first = client.get('/api/files/?limit=2', headers=auth_headers)
+    assert [f['id'] for f in first.get_json()] == [created[4]['id'], created[3]['id']]
+    cursor = first.headers['X-Next-Cursor']
+
+    seen = [f['id'] for f in first.get_json()]
+    while cursor:
+        page = client.get(f'/api/files/?limit=2&cursor={cursor}', headers=auth_headers)
+        seen += [f['id'] for f in page.get_json()]
+        cursor = page.headers.get('X-Next-Cursor')
+    assert seen == [f['id'] for f in reversed(created)]
+
+def test_private_file_listing_type_filter(client, auth_headers, register):
+    other_id, _ = register('other')
+    chat_id = client.post(f'/api/messages/private/{other_id}', json={'content': 'hi'},
+                          headers=auth_headers).get_json()['chat_id']
+    _register_files(client, auth_headers, ['a.png', 'b.pdf', 'c.JPG', 'd.docx'], private_chat_id=chat_id)
+
+    images = client.get(f'/api/files/private/{chat_id}?type=image', headers=auth_headers).get_json()
+    assert [f['filename'] for f in images['files']] == ['c.JPG', 'a.png']
+    assert images['next_cursor'] is None
+    documents = client.get(f'/api/files/private/{chat_id}?type=document&limit=1', headers=auth_headers).get_json()
+    assert [f['filename'] for f in documents['files']] == ['d.docx']
+    assert documents['next_cursor'] is not None
+    assert client.get(f'/api/files/private/{chat_id}?type=video', headers=auth_headers).status_code == 400
+
+@pytest.mark.parametrize('event, payload', [
+    ('send_private_message', {'content': 'hi'}),
+    ('send_private_file', {'filename': 'a.png', 'file_url': 'http://example.com/a.png', 'file_size': 10}),
+    ('send_private_files', {'files': [{'filename': 'a.png', 'file_url': 'http://example.com/a.png', 'file_size': 10}]}),
+])
+def test_private_sends_to_unknown_user_are_refused(socket_client, event, payload):
+    socket_client.emit(event, dict(payload, other_user_id=12345))
+
+    errors = [e['args'][0]['message'] for e in socket_client.get_received() if e['name'] == 'error']
+    assert errors == ['User not found']
+    assert PrivateChat.query.count() == 0
+
+def test_empty_file_is_accepted(client, auth_headers):
+    message_id = client.post('/api/messages', json={'content': 'Empty'}, headers=auth_headers).get_json()['id']
+    response = client.post('/api/files/', json={
+        'filename': 'empty.pdf', 'file_url': 'http://example.com/empty.pdf', 'file_size': 0,
+        'public_message_id': message_id
+    }, headers=auth_headers)
+    assert response.status_code == 201
@@ -0,0 +1,93 @@
+import os
+import select
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import eventlet
+import pytest
+from psycopg2 import extensions
+from app.utils import green_db
+
+@pytest.fixture
+def no_wait_callback():
+    extensions.set_wait_callback(None)
+    yield
+    extensions.set_wait_callback(None)
+
+class SlowConnection:
+    """Stands in for a psycopg2 connection whose server answers after ``delay`` seconds"""
+
+    def __init__(self, delay):
+        self.client, self.server = socket.socketpair()
+        eventlet.spawn_after(delay, self.server.send, b"x")
+
+    def fileno(self):
+        return self.client.fileno()
+
+    def poll(self):
+        readable, _, _ = select.select([self.client], [], [], 0)
+        return extensions.POLL_OK if readable else extensions.POLL_READ
+
+def test_wait_callback_lets_slow_queries_overlap():
+    started = time.monotonic()
+    waits = [eventlet.spawn(green_db.eventlet_wait_callback, SlowConnection(0.3)) for _ in range(2)]
+    for wait in waits:
+        wait.wait()
+    # Serialized they would take 0.6s
+    assert time.monotonic() - started < 0.5
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL")
+def test_concurrent_pg_sleeps_overlap():
+    script = textwrap.dedent("""
+        import eventlet
+        eventlet.monkey_patch()
+        import sys, time, psycopg2
+        from app.utils.green_db import make_psycopg_green
+
+        if sys.argv[2] == "green":
+            make_psycopg_green()
+
+        def slow_query():
+            with psycopg2.connect(sys.argv[1]) as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT pg_sleep(0.5)")
+
+        pool = eventlet.GreenPool()
+        started = time.monotonic()
+        for _ in range(2):
+            pool.spawn(slow_query)
+        pool.waitall()
+        print(time.monotonic() - started)
+    """)
+
+    def elapsed(mode):
+        result = subprocess.run([sys.executable, "-c", script, os.environ["TEST_POSTGRES_URL"], mode],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(__file__)))
+        return float(result.stdout.strip().splitlines()[-1])
+
+    assert elapsed("blocking") >= 1.0
+    assert elapsed("green") < 0.9
+
+def test_blocking_driver(no_wait_callback):
+    assert green_db.blocking_driver("sqlite:///:memory:") is None
+    assert green_db.blocking_driver("postgresql+pg8000://u@db/chat") is None
+    assert green_db.blocking_driver("postgresql+psycopg://u@db/chat")
+    assert green_db.blocking_driver("postgresql+psycopg2://u@db/chat")
+
+    green_db.make_psycopg_green()
+    assert green_db.blocking_driver("postgresql+psycopg2://u@db/chat") is None
+
+def test_startup_warns_when_driver_blocks(app, monkeypatch, capsys, no_wait_callback):
+    monkeypatch.setattr(green_db.patcher, "is_monkey_patched", lambda module: True)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql+psycopg2://u@db/chat"
+
+    app.config["DB_GREEN_DRIVER"] = False
+    green_db.init_green_db(app)
+    assert "WARNING: the database driver blocks the eventlet hub" in capsys.readouterr().out
+
+    app.config["DB_GREEN_DRIVER"] = True
+    green_db.init_green_db(app)
+    assert "WARNING" not in capsys.readouterr().out
+    assert green_db.psycopg_is_green()
@@ -0,0 +1,134 @@
+import pytest
+from app.extensions import socketio, membership
+
+def _connect(app, client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'password123'
+    })
+    data = client.post('/api/auth/login', json={'username': username, 'password': 'password123'}).get_json()
+    socket_client = socketio.test_client(app, flask_test_client=client,
+                                         query_string=f"token={data['access_token']}")
+    socket_client.get_received()
+    return data, socket_client
+
+def _headers(data):
+    return {'Authorization': f"Bearer {data['access_token']}"}
+
+def _events(socket_client, name):
+    return [event['args'][0] for event in socket_client.get_received() if event['name'] == name]
+
+@pytest.fixture
+def group(app, client):
+    """A group of alice (creator), bob and carol, all connected"""
+    users = {name: _connect(app, client, name) for name in ('alice', 'bob', 'carol')}
+    member_ids = [users[name][0]['user']['id'] for name in ('bob', 'carol')]
+    response = client.post('/api/groups', json={'name': 'Team', 'member_ids': member_ids},
+                           headers=_headers(users['alice'][0]))
+    assert response.status_code == 201
+    yield response.get_json()['chat_id'], users
+    for _, socket_client in users.values():
+        if socket_client.is_connected():
+            socket_client.disconnect()
+
+def test_create_group_validates_members(client, auth_headers):
+    response = client.post('/api/groups', json={'name': 'Ghosts', 'member_ids': [999]}, headers=auth_headers)
+    assert response.status_code == 404
+    response = client.post('/api/groups', json={'name': ''}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_group_message_fan_out(group):
+    chat_id, users = group
+    alice, bob, carol = (users[name][1] for name in ('alice', 'bob', 'carol'))
+
+    alice.emit('join_group', {'chat_id': chat_id})
+    bob.emit('join_group', {'chat_id': chat_id})
+    assert _events(bob, 'joined_group')[0]['member_count'] == 3
+    alice.get_received()
+
+    alice.emit('send_group_message', {'chat_id': chat_id, 'content': 'hi team'})
+
+    # Members in the room get the message, the others a notification
+    assert _events(bob, 'new_group_message')[0]['content'] == 'hi team'
+    assert _events(alice, 'new_group_message')[0]['chat_id'] == chat_id
+    received = carol.get_received()
+    assert [event['name'] for event in received] == ['group_message_notification']
+    assert received[0]['args'][0]['content'] == 'hi team'
+
+def test_membership_is_cached(group):
+    chat_id, users = group
+    alice = users['alice'][1]
+    alice.emit('send_group_message', {'chat_id': chat_id, 'content': 'one'})
+    misses = membership.misses
+    for i in range(5):
+        alice.emit('send_group_message', {'chat_id': chat_id, 'content': f'again {i}'})
+    assert membership.misses == misses
+
+def test_member_removed_on_another_worker_is_refused_at_once(client, group, monkeypatch):
+    from app.extensions import db
+    from app.models.chat_member import ChatMember
+
+    chat_id, users = group
+    carol_data, carol = users['carol']
+    carol.emit('send_group_message', {'chat_id': chat_id, 'content': 'one'})
+    assert chat_id in membership._members
+
+    # Removed elsewhere: this worker's cache still lists carol, the checks read the table
+    ChatMember.query.filter_by(chat_id=chat_id, user_id=carol_data['user']['id']).delete()
+    db.session.commit()
+    carol.get_received()
+    carol.emit('send_group_message', {'chat_id': chat_id, 'content': 'two'})
+    assert _events(carol, 'error')[0]['message'] == 'Not a member of this group'
+    assert client.get(f'/api/groups/{chat_id}/messages', headers=_headers(carol_data)).status_code == 404
+
+    # Fan-out catches up once the entry expires
+    assert carol_data['user']['id'] in membership.members(chat_id, lambda: set())
+    monkeypatch.setattr(membership, 'ttl', 0)
+    assert carol_data['user']['id'] not in membership.members(chat_id, lambda: ChatMember.member_ids(chat_id))
+
+def test_non_member_cannot_send(app, client, group):
+    chat_id, _ = group
+    _, mallory = _connect(app, client, 'mallory')
+    mallory.emit('send_group_message', {'chat_id': chat_id, 'content': 'let me in'})
+    assert _events(mallory, 'error')[0]['message'] == 'Not a member of this group'
+
+    data = client.post('/api/auth/login', json={'username': 'mallory', 'password': 'password123'}).get_json()
+    assert client.get(f'/api/groups/{chat_id}/messages', headers=_headers(data)).status_code == 404
+
+def test_group_unread_counts_per_member(client, group):
+    chat_id, users = group
+    alice, bob = users['alice'][0], users['bob'][0]
+    for i in range(3):
+        client.post(f'/api/groups/{chat_id}/messages', json={'content': f'm{i}'}, headers=_headers(alice))
+
+    groups = client.get('/api/groups', headers=_headers(bob)).get_json()['groups']
+    assert [(g['chat_id'], g['member_count'], g['unread_count']) for g in groups] == [(chat_id, 3, 3)]
+    # Own messages are never unread
+    assert client.get('/api/groups', headers=_headers(alice)).get_json()['groups'][0]['unread_count'] == 0
+
+    client.post(f'/api/groups/{chat_id}/read', headers=_headers(bob))
+    assert client.get('/api/groups', headers=_headers(bob)).get_json()['groups'][0]['unread_count'] == 0
+
+def test_removed_member_stops_receiving(client, group):
+    chat_id, users = group
+    alice, carol = users['alice'], users['carol']
+    carol[1].emit('join_group', {'chat_id': chat_id})
+    carol[1].get_received()
+
+    response = client.delete(f"/api/groups/{chat_id}/members/{carol[0]['user']['id']}", headers=_headers(alice[0]))
+    assert response.status_code == 200
+
+    alice[1].emit('send_group_message', {'chat_id': chat_id, 'content': 'after'})
+    assert carol[1].get_received() == []
+    assert len(client.get(f'/api/groups/{chat_id}', headers=_headers(alice[0])).get_json()['members']) == 2
+
+def test_group_appears_in_sync(client, group):
+    chat_id, users = group
+    bob = users['bob'][0]
+    client.post(f'/api/groups/{chat_id}/messages', json={'content': 'sync me'}, headers=_headers(users['alice'][0]))
+
+    data = client.get('/api/sync?since=0.0.0', headers=_headers(bob)).get_json()
+    assert [m['content'] for m in data['private']['messages']] == ['sync me']
+    entry = data['chats'][0]
+    assert (entry['chat_id'], entry['unread_count'], entry['group']['name']) == (chat_id, 1, 'Team')
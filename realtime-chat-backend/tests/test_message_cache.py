@@ -0,0 +1,62 @@
+import pytest
+from app.extensions import message_cache
+from app.utils.fast_json import OrjsonProvider
+
+def test_orjson_provider_registered(app):
+    assert isinstance(app.json, OrjsonProvider)
+
+def test_history_reuses_cached_fragments(client, auth_headers):
+    client.post('/api/messages', json={'content': 'first'}, headers=auth_headers)
+    client.post('/api/messages', json={'content': 'second'}, headers=auth_headers)
+
+    response = client.get('/api/messages', headers=auth_headers)
+    assert [m['content'] for m in response.get_json()['messages']] == ['first', 'second']
+
+    hits = message_cache.hits
+    response = client.get('/api/messages', headers=auth_headers)
+    assert [m['content'] for m in response.get_json()['messages']] == ['first', 'second']
+    assert message_cache.hits == hits + 2
+
+def test_delete_invalidates_cached_message(client, auth_headers):
+    response = client.post('/api/messages', json={'content': 'gone soon'}, headers=auth_headers)
+    message_id = response.get_json()['id']
+    assert len(message_cache) == 1
+
+    client.delete(f'/api/messages/{message_id}', headers=auth_headers)
+    assert len(message_cache) == 0
+
+    response = client.get('/api/messages', headers=auth_headers)
+    assert response.get_json()['messages'] == []
+
+def test_profile_change_invalidates_author_messages(client, auth_headers):
+    client.post('/api/messages', json={'content': 'hello'}, headers=auth_headers)
+    client.get('/api/messages', headers=auth_headers)
+
+    client.put('/api/users/auth-user', json={'username': 'renamed'}, headers=auth_headers)
+    assert len(message_cache) == 0
+
+    response = client.get('/api/messages', headers=auth_headers)
+    message = response.get_json()['messages'][0]
+    assert message['user']['username'] == 'renamed'
+
+def test_attaching_file_refreshes_cached_message(client, auth_headers):
+    response = client.post('/api/messages', json={'content': 'with file'}, headers=auth_headers)
+    message_id = response.get_json()['id']
+
+    client.post('/api/files/',
+                json={
+                    'filename': 'photo.png',
+                    'file_url': 'http://example.com/photo.png',
+                    'file_size': 1024,
+                    'public_message_id': message_id
+                },
+                headers=auth_headers)
+
+    response = client.get('/api/messages', headers=auth_headers)
+    assert len(response.get_json()['messages'][0]['files']) == 1
+
+def test_cache_is_bounded(app, client, auth_headers):
+    message_cache.max_entries = 3
+    for i in range(5):
+        client.post('/api/messages', json={'content': f'msg {i}'}, headers=auth_headers)
+    assert len(message_cache) == 3
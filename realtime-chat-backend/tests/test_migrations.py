@@ -0,0 +1,141 @@
+import os
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import upgrade, downgrade, stamp
+from sqlalchemy import inspect, text
+from app import create_app
+from app.extensions import db, migrate
+from app.models.channel import Channel
+from app.models.chat_read import ChatRead
+from app.models.file import File
+from app.models.message import Message
+from app.models.private_chat import PrivateChat
+from tests.conftest import TestConfig
+
+@pytest.fixture
+def app(tmp_path):
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path}/migrations.db"
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        migrate.load(app)
+        yield app
+        db.session.remove()
+
+def _schema_diff():
+    with db.engine.connect() as conn:
+        return compare_metadata(MigrationContext.configure(conn), db.metadata)
+
+def test_migrations_build_the_model_schema(app):
+    upgrade()
+    assert _schema_diff() == []
+    assert db.session.get(Channel, Channel.DEFAULT_ID).name == Channel.DEFAULT_NAME
+
+def test_downgrade_to_base_drops_everything(app):
+    upgrade()
+    downgrade(revision="base")
+    assert inspect(db.engine).get_table_names() == ["alembic_version"]
+
+def _baseline_schema():
+    """What db.create_all() made before migrations were kept, with no alembic_version"""
+    with open(os.path.join(os.path.dirname(__file__), "baseline_schema.sql")) as f:
+        statements = [statement for statement in f.read().split(";") if statement.strip()]
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+def _shape():
+    """Tables with their columns, indexes, unique constraints and foreign keys, as the database reports them"""
+    inspector = inspect(db.engine)
+    return {table: (
+        [(c["name"], str(c["type"]), c["nullable"]) for c in inspector.get_columns(table)],
+        sorted((i["name"], tuple(i["column_names"])) for i in inspector.get_indexes(table)),
+        sorted(tuple(u["column_names"]) for u in inspector.get_unique_constraints(table)),
+        sorted((tuple(k["constrained_columns"]), k["referred_table"]) for k in inspector.get_foreign_keys(table)),
+    ) for table in inspector.get_table_names() if table != "alembic_version"}
+
+def test_initial_schema_is_the_baseline(app):
+    upgrade(revision="0001")
+    migrated = _shape()
+    downgrade(revision="base")
+
+    _baseline_schema()
+    assert _shape() == migrated
+
+def test_baseline_database_stamped_at_initial_schema_upgrades(app):
+    _baseline_schema()
+    baseline = _shape()
+    db.session.execute(text("""
+        INSERT INTO users (id, username, email, password_hash) VALUES
+            (1, 'alice', 'alice@example.com', 'x'), (2, 'bob', 'bob@example.com', 'x')
+    """))
+    db.session.execute(text(
+        "INSERT INTO messages (id, content, timestamp, user_id) VALUES (1, 'hi', CURRENT_TIMESTAMP, 1)"
+    ))
+    db.session.execute(text(
+        "INSERT INTO private_chats (id, user1_id, user2_id, created_at) VALUES (1, 1, 2, CURRENT_TIMESTAMP)"
+    ))
+    db.session.execute(text(
+        "INSERT INTO private_messages (id, content, timestamp, sender_id, chat_id) "
+        "VALUES (1, 'psst', CURRENT_TIMESTAMP, 1, 1)"
+    ))
+    db.session.execute(text("INSERT INTO unread_counts (user_id, chat_id, count) VALUES (2, 1, 1)"))
+    for file_id, filename, file_type in [(1, 'a.png', 'image/png'), (2, 'b.JPG', None), (3, 'c.pdf', None),
+                                         (4, 'd.png', 'application/pdf')]:
+        db.session.execute(text(
+            "INSERT INTO files (id, filename, file_url, file_size, file_type, uploaded_at, uploader_id, "
+            "public_message_id) VALUES (:id, :filename, 'http://example.com/f', 1, :file_type, CURRENT_TIMESTAMP, 1, 1)"
+        ), {"id": file_id, "filename": filename, "file_type": file_type})
+    db.session.commit()
+
+    stamp(revision="0001")
+    upgrade()
+    assert _schema_diff() == []
+    indexes = {index["name"] for index in inspect(db.engine).get_indexes("private_chats")}
+    assert {"ix_private_chats_user1_id_user2_id", "ix_private_chats_user2_id_user1_id"} <= indexes
+
+    message = db.session.get(Message, 1)
+    assert (message.channel_id, message.version) == (Channel.DEFAULT_ID, 1)
+    assert db.session.get(Channel, Channel.DEFAULT_ID).name == Channel.DEFAULT_NAME
+    assert db.session.get(PrivateChat, 1).is_group is False
+    assert ChatRead.unread_counts(2, [1]) == {1: 1}
+    assert [f.category for f in File.query.order_by(File.id)] == ['image', 'image', 'document', 'document']
+
+    downgrade(revision="0001")
+    assert _shape() == baseline
+
+def test_unread_counters_become_read_marks_and_back(app):
+    upgrade(revision="0002")
+    db.session.execute(text("""
+        INSERT INTO users (id, username, email, password_hash) VALUES
+            (1, 'alice', 'alice@example.com', 'x'), (2, 'bob', 'bob@example.com', 'x'),
+            (3, 'carol', 'carol@example.com', 'x')
+    """))
+    db.session.execute(text("""
+        INSERT INTO private_chats (id, user1_id, user2_id, is_group, created_at) VALUES
+            (1, 1, 2, false, CURRENT_TIMESTAMP), (2, 1, 3, false, CURRENT_TIMESTAMP)
+    """))
+    # Chat 1: alice 10, bob 11, alice 12, alice 13, bob 14; chat 2: carol 20
+    for message_id, sender_id, chat_id in [(10, 1, 1), (11, 2, 1), (12, 1, 1), (13, 1, 1), (14, 2, 1), (20, 3, 2)]:
+        db.session.execute(text(
+            "INSERT INTO private_messages (id, content, timestamp, sender_id, chat_id, version) "
+            "VALUES (:id, 'hi', CURRENT_TIMESTAMP, :sender_id, :chat_id, 1)"
+        ), {"id": message_id, "sender_id": sender_id, "chat_id": chat_id})
+    # bob has 2 of alice's messages unread, alice none of bob's; alice has carol's one unread
+    db.session.execute(text(
+        "INSERT INTO unread_counts (user_id, chat_id, count) VALUES (2, 1, 2), (1, 1, 0), (1, 2, 1)"
+    ))
+    db.session.commit()
+
+    upgrade()
+    marks = {(read.user_id, read.chat_id): read.last_read_message_id for read in ChatRead.query.all()}
+    assert marks == {(2, 1): 11, (1, 1): 14, (1, 2): 19}
+    assert ChatRead.unread_counts(2, [1]) == {1: 2}
+    assert ChatRead.unread_counts(1, [1, 2]) == {2: 1}
+    db.session.commit()
+
+    downgrade(revision="0002")
+    counts = db.session.execute(text("SELECT user_id, chat_id, count FROM unread_counts")).all()
+    assert sorted(counts) == [(1, 1, 0), (1, 2, 1), (2, 1, 2), (3, 2, 0)]
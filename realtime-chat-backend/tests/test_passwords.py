@@ -0,0 +1,46 @@
+from werkzeug.security import generate_password_hash
+from app.extensions import db, passwords
+from app.models.user import User
+from app.utils import passwords as passwords_module
+
+def test_login_upgrades_outdated_hash(client):
+    user = User(username='legacy', email='legacy@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256:1000'))
+    db.session.add(user)
+    db.session.commit()
+
+    response = client.post('/api/auth/login', json={'username': 'legacy', 'password': 'password123'})
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.password_hash.startswith('scrypt:')
+    assert passwords.rehashed == 1
+
+    # The new hash still verifies, and is not upgraded again
+    assert client.post('/api/auth/login', json={'username': 'legacy', 'password': 'password123'}).status_code == 200
+    assert passwords.rehashed == 1
+
+def test_failed_login_keeps_hash(client):
+    legacy_hash = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+    db.session.add(User(username='legacy', email='legacy@example.com', password_hash=legacy_hash))
+    db.session.commit()
+
+    assert client.post('/api/auth/login', json={'username': 'legacy', 'password': 'wrong'}).status_code == 401
+    assert User.query.filter_by(username='legacy').one().password_hash == legacy_hash
+
+def test_configured_method(app):
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    passwords.init_app(app)
+    pwhash = passwords.hash('secret')
+    assert pwhash.startswith('pbkdf2:sha256:2000$')
+    assert passwords.verify(pwhash, 'secret')
+    assert not passwords.needs_rehash(pwhash)
+    assert passwords.needs_rehash(generate_password_hash('secret', method='scrypt'))
+
+def test_hashing_goes_to_os_threads_when_patched(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(passwords_module.patcher, 'is_monkey_patched', lambda module: True)
+    monkeypatch.setattr(passwords_module.tpool, 'execute',
+                        lambda func, *args, **kwargs: calls.append(func.__name__) or func(*args, **kwargs))
+
+    assert passwords.verify(passwords.hash('secret'), 'secret')
+    assert calls == ['generate_password_hash', 'check_password_hash']
@@ -0,0 +1,98 @@
+import time
+import pytest
+from app import create_app
+from app.extensions import db, socketio, profiler
+from app.sockets import chat_events
+from tests.conftest import TestConfig
+
+TOKEN = 'profile-secret'
+
+def _spin(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def _folded(path):
+    lines = path.read_text().splitlines()
+    return {line.rsplit(' ', 1)[0]: int(line.rsplit(' ', 1)[1]) for line in lines}
+
+def _profiled_app(tmp_path, **settings):
+    config = type('ProfileConfig', (TestConfig,), dict(PROFILE_DIR=str(tmp_path), PROFILE_INTERVAL=0.001, **settings))
+    app = create_app(config)
+    app.config['TESTING'] = True
+
+    @app.get('/api/test/spin')
+    def spin():
+        _spin()
+        return {}
+
+    return app
+
+@pytest.fixture
+def app(tmp_path):
+    app = _profiled_app(tmp_path, PROFILE_TOKEN=TOKEN)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def test_off_by_default(tmp_path):
+    app = create_app(type('OffConfig', (TestConfig,), {'PROFILE_DIR': str(tmp_path)}))
+    with app.app_context():
+        db.create_all()
+        response = app.test_client().get('/api/health', headers={'X-Profile': TOKEN})
+        db.drop_all()
+    assert 'X-Profile-File' not in response.headers
+    assert profiler.stats()['enabled'] is False
+    assert list(tmp_path.iterdir()) == []
+
+def test_request_profiled_on_demand(client, tmp_path):
+    response = client.get('/api/test/spin', headers={'X-Profile': TOKEN})
+    stacks = _folded(tmp_path / response.headers['X-Profile-File'])
+
+    assert sum(stacks.values()) >= 3
+    assert all(stack.startswith('full_dispatch_request (flask/app.py') for stack in stacks)
+    assert any('spin (tests/test_profiler.py' in stack and '_spin (tests/test_profiler.py' in stack for stack in stacks)
+    assert profiler.stats()['handlers'] == {}
+
+def test_wrong_token_is_not_profiled(client, tmp_path):
+    response = client.get('/api/test/spin', headers={'X-Profile': 'guess'})
+    assert 'X-Profile-File' not in response.headers
+    assert profiler.stats()['profiled'] == 0
+
+def test_sampled_requests_add_up_per_handler(tmp_path):
+    app = _profiled_app(tmp_path, PROFILE_SAMPLE_RATE=1.0)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.get('/api/test/spin')
+        profiler.flush()
+        one = sum(_folded(tmp_path / 'spin.folded').values())
+        client.get('/api/test/spin')
+        profiler.flush()
+        two = sum(_folded(tmp_path / 'spin.folded').values())
+        db.drop_all()
+
+    assert 0 < one < two
+    assert profiler.stats()['profiled'] == 2
+    assert profiler.stats()['handlers'] == {'spin': two}
+
+def test_socket_events_profiled_on_demand(socket_client, tmp_path):
+    socket_client.emit('profile', {'token': 'guess'})
+    assert socket_client.get_received()[0]['args'][0] == {'message': 'Profiling not allowed'}
+
+    socket_client.emit('profile', {'token': TOKEN, 'events': 1})
+    assert socket_client.get_received()[0]['args'][0] == {'events': 1}
+
+    socket_client.emit('send_public_message', {'content': 'profiled'})
+    socket_client.emit('send_public_message', {'content': 'not profiled'})
+    profiled = [event['args'][0] for event in socket_client.get_received() if event['name'] == 'profiled']
+
+    assert [event['event'] for event in profiled] == ['send_public_message']
+    assert (tmp_path / profiled[0]['file']).exists()
+
+def test_every_socket_handler_is_profiled():
+    handlers = [name for name, value in vars(chat_events).items() if name.startswith('handle_') and callable(value)]
+
+    assert len(handlers) == 24
+    assert [name for name in handlers if not getattr(vars(chat_events)[name], 'profiled', False)] == []
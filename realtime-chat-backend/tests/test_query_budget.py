@@ -0,0 +1,132 @@
+import pytest
+from app import create_app
+from app.extensions import db, socketio, query_budget
+from app.models.user import User
+from app.utils.query_budget import QueryCounter, QueryBudgetExceeded
+from tests.conftest import TestConfig
+
+def _lookup_each(user_ids):
+    return [db.session.get(User, user_id) for user_id in user_ids]
+
+def test_counter_reports_repeated_selects_with_call_sites(app):
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+    db.session.expunge_all()
+
+    with QueryCounter() as outer:
+        with QueryCounter() as inner:
+            _lookup_each(user_ids)
+        User.query.count()
+
+    assert inner.count == 3 and outer.count == 4
+    [(statement, times, sites)] = inner.repeated()
+    assert statement.startswith('SELECT') and times == 3
+    assert sites == [site for site in sites if 'test_query_budget.py' not in site]
+    assert '3x SELECT' in inner.report()
+
+def test_limit_raises_in_raise_mode(app):
+    @query_budget.limit(1)
+    def two_queries():
+        User.query.count()
+        User.query.count()
+
+    assert two_queries.query_budget == 1
+    with pytest.raises(QueryBudgetExceeded, match='two_queries exceeded its query budget of 1'):
+        two_queries()
+    assert query_budget.stats() == {'mode': 'raise', 'exceeded': 1}
+
+@pytest.fixture
+def log_app():
+    class LogConfig(TestConfig):
+        QUERY_BUDGET_MODE = 'log'
+
+    app = create_app(LogConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def test_limit_logs_in_log_mode(log_app, capsys):
+    @query_budget.limit(0)
+    def one_query():
+        return User.query.count()
+
+    assert one_query() == 0
+    assert 'WARNING: one_query exceeded its query budget of 0' in capsys.readouterr().out
+
+def test_requests_report_their_query_count(client, auth_headers):
+    response = client.get('/api/chats', headers=auth_headers)
+    assert int(response.headers['X-Query-Count']) >= 1
+
+def test_repeated_queries_in_a_request_are_logged(log_app, capsys):
+    @log_app.get('/api/test/lookups')
+    def lookups():
+        users = User.query.all()
+        db.session.expunge_all()
+        return {"users": [db.session.get(User, user.id).username for user in users]}
+
+    db.session.add_all([User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(3)])
+    db.session.commit()
+    log_app.test_client().get('/api/test/lookups')
+
+    out = capsys.readouterr().out
+    assert 'Repeated queries in GET /api/test/lookups: 4 queries' in out
+    assert '3x SELECT' in out
+
+def test_budgets_off_by_default():
+    app = create_app(type('OffConfig', (TestConfig,), {'QUERY_BUDGET_MODE': 'off'}))
+    with app.app_context():
+        db.create_all()
+        response = app.test_client().get('/api/health')
+        assert 'X-Query-Count' not in response.headers
+        db.drop_all()
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        create_app(type('BadConfig', (TestConfig,), {'QUERY_BUDGET_MODE': 'loud'}))
+
+def test_chat_list_queries_do_not_grow_with_chats(client, auth_headers, register):
+    def chat_list_queries():
+        response = client.get('/api/chats', headers=auth_headers)
+        assert response.status_code == 200
+        return int(response.headers['X-Query-Count']), len(response.get_json()['chats'])
+
+    for name in ('bob', 'carol'):
+        other_id, _ = register(name)
+        client.post(f'/api/messages/private/{other_id}', json={'content': f'hi {name}'}, headers=auth_headers)
+    few = chat_list_queries()
+
+    for name in ('dave', 'erin', 'frank', 'grace'):
+        other_id, _ = register(name)
+        client.post(f'/api/messages/private/{other_id}', json={'content': f'hi {name}'}, headers=auth_headers)
+    many = chat_list_queries()
+
+    assert (few[1], many[1]) == (2, 6)
+    assert few[0] == many[0]
+
+def test_file_batch_queries_do_not_grow_with_files(client, auth_headers):
+    message_id = client.post('/api/messages', json={'content': 'Album'}, headers=auth_headers).get_json()['id']
+
+    def upload(count):
+        files = [{'filename': f'photo{i}.jpg', 'file_url': f'http://example.com/photo{i}.jpg',
+                  'file_size': 1000, 'file_type': 'image/jpeg'} for i in range(count)]
+        response = client.post('/api/files/batch', json={'public_message_id': message_id, 'files': files},
+                               headers=auth_headers)
+        assert response.status_code == 201
+        return int(response.headers['X-Query-Count'])
+
+    assert upload(2) == upload(8)
+
+def test_private_file_events_stay_within_budget(app, client, socket_client, register):
+    other_id, _ = register('bob')
+    descriptor = {'filename': 'notes.pdf', 'file_url': 'http://example.com/notes.pdf', 'file_size': 1000,
+                  'file_type': 'application/pdf'}
+
+    socket_client.emit('send_private_file', dict(descriptor, other_user_id=other_id))
+    socket_client.emit('send_private_files', {'other_user_id': other_id, 'files': [descriptor] * 3})
+
+    names = [event['name'] for event in socket_client.get_received()]
+    assert 'error' not in names
+    assert query_budget.stats()['exceeded'] == 0
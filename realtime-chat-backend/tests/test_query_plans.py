@@ -0,0 +1,219 @@
+import os
+import re
+import pytest
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db, migrate, membership, room_history, message_cache, user_purger
+from tests.conftest import TestConfig
+
+# Full table (or full index) scans; the plans are checked with SQLite's default estimates,
+# which assume large tables, i.e. the shape of the plan at production size. Only these SQLite
+# plans are enforced by a plain test run: the Postgres ones, on the migrated schema and with
+# enable_seqscan off, are skipped unless TEST_POSTGRES_URL points at a scratch database.
+SCAN = {"sqlite": re.compile(r"\bSCAN (\w+)"), "postgresql": re.compile(r"Seq Scan on (\w+)")}
+
+@pytest.fixture
+def app(request):
+    """The conftest app, or with ``postgresql`` an app on TEST_POSTGRES_URL with the schema made by the migrations"""
+    if getattr(request, "param", "sqlite") == "sqlite":
+        app = create_app(TestConfig)
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+        return
+
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    from flask_migrate import upgrade, downgrade
+
+    class PostgresConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = url
+
+    app = create_app(PostgresConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        migrate.load(app)
+        upgrade()
+        yield app
+        db.session.remove()
+        downgrade(revision="base")
+
+def _capture(action, tables=None):
+    """Statements (but INSERTs) an action runs, optionally only those reading the given tables"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith(("SELECT", "UPDATE", "DELETE")) and (
+            tables is None or any(f"FROM {table}" in statement for table in tables)
+        ):
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+def _explain(statements):
+    engine = db.engine
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # Small test tables make a sequential scan the cheapest plan; ask whether an index *can* be used
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            return [
+                " | ".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters))
+                for statement, parameters in statements
+            ]
+        return [
+            " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            for statement, parameters in statements
+        ]
+
+def _plans(client, headers, url):
+    """EXPLAIN QUERY PLAN of every SELECT on the files/users tables an endpoint runs"""
+    def request():
+        assert client.get(url, headers=headers).status_code == 200
+
+    return _explain([
+        (statement, parameters) for statement, parameters in _capture(request, ("files", "users"))
+        if statement.lstrip().startswith("SELECT")
+    ])
+
+def _scans(statements, allowed=()):
+    """(table, statement) of every full scan in the plans of ``statements``, but of ``allowed`` tables"""
+    pattern = SCAN[db.engine.dialect.name]
+    return [
+        (table, statement)
+        for (statement, _), plan in zip(statements, _explain(statements))
+        for table in pattern.findall(plan)
+        if table not in allowed
+    ]
+
+def _listing_plan(client, auth_headers, url):
+    plans = [plan for plan in _plans(client, auth_headers, url) if "files" in plan]
+    assert plans
+    return plans[0]
+
+def test_uploader_listing_uses_index(client, auth_headers):
+    plan = _listing_plan(client, auth_headers, '/api/files/?cursor=100')
+    assert 'ix_files_uploader_id_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_gallery_listing_uses_category_index(client, auth_headers):
+    plan = _listing_plan(client, auth_headers, '/api/files/private/1?type=image&cursor=100')
+    assert 'ix_files_private_chat_id_category_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_public_message_files_use_index(client, auth_headers):
+    plan = _listing_plan(client, auth_headers, '/api/files/public/1')
+    assert 'ix_files_public_message_id' in plan
+
+def test_user_listing_is_a_primary_key_range(client, auth_headers):
+    plans = [plan for plan in _plans(client, auth_headers, '/api/users/?cursor=0') if 'users' in plan]
+    assert any('INTEGER PRIMARY KEY' in plan and 'rowid>?' in plan for plan in plans)
+
+def test_user_search_uses_username_index(client, auth_headers):
+    plans = [plan for plan in _plans(client, auth_headers, '/api/users/search?prefix=ab') if 'users' in plan]
+    assert any('ix_users_username_lower' in plan for plan in plans)
+
+@pytest.fixture
+def seeded(app, client, auth_headers, register):
+    """testuser with public, channel, direct and group messages; caches emptied so every read hits the DB"""
+    user_id = client.get('/api/users/auth-user', headers=auth_headers).get_json()['user']['id']
+    other_id, other_headers = register('other')
+    for i in range(3):
+        client.post('/api/messages', json={'content': f'public {i}'}, headers=auth_headers)
+        client.post(f'/api/messages/private/{other_id}', json={'content': f'direct {i}'}, headers=auth_headers)
+    channel_id = client.post('/api/channels', json={'name': 'random'}, headers=auth_headers).get_json()['id']
+    client.post(f'/api/channels/{channel_id}/messages', json={'content': 'in random'}, headers=auth_headers)
+    group_id = client.post('/api/groups', json={'name': 'Team', 'member_ids': [other_id]},
+                           headers=auth_headers).get_json()['chat_id']
+    client.post(f'/api/groups/{group_id}/messages', json={'content': 'team'}, headers=other_headers)
+    chat_id = client.get('/api/chats', headers=auth_headers).get_json()['chats'][0]['chat_id']
+    cursor = client.get('/api/sync', headers=auth_headers).get_json()['cursor']
+
+    for cache in (message_cache, room_history, membership):
+        cache.clear()
+    return {'user_id': user_id, 'other_id': other_id, 'other_headers': other_headers, 'channel_id': channel_id,
+            'group_id': group_id, 'chat_id': chat_id, 'cursor': cursor}
+
+# (method, url, json body, tables that may be scanned in full)
+HOT_ROUTES = [
+    ('GET', '/api/messages', None, ()),
+    ('GET', '/api/messages?before_id=1000', None, ()),
+    ('POST', '/api/messages', {'content': 'hi'}, ()),
+    ('GET', '/api/messages/private/{other_id}', None, ()),
+    ('POST', '/api/messages/private/{other_id}', {'content': 'hi'}, ()),
+    ('GET', '/api/chats', None, ()),
+    ('POST', '/api/chats/{chat_id}/read', None, ()),
+    ('GET', '/api/chats/{chat_id}/reads', None, ()),
+    ('GET', '/api/sync?since={cursor}', None, ()),
+    ('GET', '/api/channels', None, ('channels',)),  # the listing returns every channel
+    ('GET', '/api/channels/{channel_id}/messages', None, ()),
+    ('POST', '/api/channels/{channel_id}/messages', {'content': 'hi'}, ()),
+    ('POST', '/api/channels/{channel_id}/read', None, ()),
+    ('GET', '/api/groups', None, ()),
+    ('GET', '/api/groups/{group_id}', None, ()),
+    ('GET', '/api/groups/{group_id}/messages', None, ()),
+    ('POST', '/api/groups/{group_id}/messages', {'content': 'hi'}, ()),
+    ('POST', '/api/groups/{group_id}/read', None, ()),
+    ('GET', '/api/files/', None, ()),
+    ('GET', '/api/files/private/{chat_id}', None, ()),
+    ('GET', '/api/users/{other_id}', None, ()),
+    ('GET', '/api/users/search?prefix=ot', None, ()),
+    ('DELETE', '/api/users/{user_id}', None, ()),
+]
+
+# (event, payload, tables that may be scanned in full)
+HOT_EVENTS = [
+    ('join_channel', {'channel_id': '{channel_id}', 'history': True}, ()),
+    ('send_public_message', {'content': 'hi'}, ()),
+    ('join_private', {'other_user_id': '{other_id}', 'history': True}, ()),
+    ('send_private_message', {'other_user_id': '{other_id}', 'content': 'hi'}, ()),
+    ('mark_chat_read', {'chat_id': '{chat_id}'}, ()),
+    ('mark_public_read', {'channel_id': '{channel_id}'}, ()),
+    ('join_group', {'chat_id': '{group_id}', 'history': True}, ()),
+    ('send_group_message', {'chat_id': '{group_id}', 'content': 'hi'}, ()),
+]
+
+@pytest.mark.parametrize('app', ['sqlite', 'postgresql'], indirect=True)
+@pytest.mark.parametrize('method, url, body, allowed', HOT_ROUTES, ids=[f'{r[0]} {r[1]}' for r in HOT_ROUTES])
+def test_hot_route_does_not_scan(client, auth_headers, seeded, method, url, body, allowed):
+    def request():
+        response = client.open(url.format(**seeded), method=method, json=body, headers=auth_headers)
+        assert response.status_code < 300, response.get_json()
+
+    statements = _capture(request)
+    assert statements
+    assert _scans(statements, allowed) == []
+
+@pytest.mark.parametrize('app', ['sqlite', 'postgresql'], indirect=True)
+@pytest.mark.parametrize('name, payload, allowed', HOT_EVENTS, ids=[e[0] for e in HOT_EVENTS])
+def test_hot_socket_event_does_not_scan(socket_client, seeded, name, payload, allowed):
+    data = {key: int(value.format(**seeded)) if isinstance(value, str) and '{' in value else value
+            for key, value in payload.items()}
+    socket_client.emit('join_public', {})
+
+    def emit():
+        socket_client.emit(name, data)
+        assert not [event for event in socket_client.get_received() if event['name'] == 'error']
+
+    statements = _capture(emit)
+    assert statements
+    assert _scans(statements, allowed) == []
+
+@pytest.mark.parametrize('app', ['sqlite', 'postgresql'], indirect=True)
+def test_user_purge_does_not_scan(client, seeded):
+    # "other" has a direct chat, a group membership and a group message
+    user_id = seeded['other_id']
+    assert client.delete(f'/api/users/{user_id}', headers=seeded['other_headers']).status_code == 202
+
+    statements = _capture(user_purger.run_pending)
+    assert _scans(statements) == []
+    purge = client.get(f'/api/users/{user_id}/purge', headers=seeded['other_headers']).get_json()['purge']
+    assert purge['status'] == 'done'
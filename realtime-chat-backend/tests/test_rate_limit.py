@@ -0,0 +1,87 @@
+import pytest
+from app import create_app
+from app.extensions import db, socketio
+from app.models.message import Message
+from app.utils.rate_limit import LocalBucketStore
+from tests.conftest import TestConfig
+
+class RateLimitedConfig(TestConfig):
+    RATE_LIMITS = {
+        "send_public_message": (0.001, 2),
+        "api.auth.login": (0.001, 2),
+    }
+
+@pytest.fixture
+def app():
+    app = create_app(RateLimitedConfig)
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_burst_and_refill():
+    clock = FakeClock()
+    store = LocalBucketStore(clock=clock)
+    assert store.consume(['k'], rate=1, burst=2) == 0
+    assert store.consume(['k'], rate=1, burst=2) == 0
+    assert store.consume(['k'], rate=1, burst=2) == pytest.approx(1)
+
+    clock.now = 1.0
+    assert store.consume(['k'], rate=1, burst=2) == 0
+
+def test_rejected_call_spends_no_bucket():
+    clock = FakeClock()
+    store = LocalBucketStore(clock=clock)
+    assert store.consume(['sid:a', 'user:1'], rate=1, burst=2) == 0
+    assert store.consume(['sid:a', 'user:1'], rate=1, burst=2) == 0
+
+    # The user's bucket is empty: the new connection's bucket stays full
+    assert store.consume(['sid:b', 'user:1'], rate=1, burst=2) == pytest.approx(1)
+    assert store._buckets['sid:b'][0] == 2
+
+def test_bucket_store_is_bounded():
+    store = LocalBucketStore(max_keys=10)
+    for i in range(100):
+        store.consume([f'k{i}'], rate=1, burst=1)
+    assert len(store._buckets) == 10
+
+def test_rest_route_returns_429(client, auth_headers):
+    # auth_headers already used one of the two login tokens
+    response = client.post('/api/auth/login', json={'username': 'testuser', 'password': 'password123'})
+    assert response.status_code == 200
+
+    response = client.post('/api/auth/login', json={'username': 'testuser', 'password': 'password123'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_socket_event_rejected_before_db_work(socket_client):
+    socket_client.emit('join_public')
+    for i in range(4):
+        socket_client.emit('send_public_message', {'content': f'spam {i}'})
+
+    rejected = [e['args'][0] for e in socket_client.get_received() if e['name'] == 'rate_limited']
+    assert [e['event'] for e in rejected] == ['send_public_message', 'send_public_message']
+    assert Message.query.count() == 2
+
+def test_limit_is_shared_by_a_users_connections(app, client, auth_headers, socket_client):
+    token = auth_headers['Authorization'].split()[1]
+    second_tab = socketio.test_client(app, flask_test_client=client, query_string=f'token={token}')
+
+    socket_client.emit('join_public')
+    second_tab.emit('join_public')
+    socket_client.emit('send_public_message', {'content': 'one'})
+    second_tab.emit('send_public_message', {'content': 'two'})
+    second_tab.get_received()
+    second_tab.emit('send_public_message', {'content': 'three'})
+
+    assert [e['name'] for e in second_tab.get_received()].count('rate_limited') == 1
+    assert Message.query.count() == 2
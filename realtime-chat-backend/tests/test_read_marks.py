@@ -0,0 +1,144 @@
+import pytest
+from app.extensions import socketio
+from app.models.channel import Channel
+from app.utils.query_budget import QueryCounter
+
+def _connect(app, client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'password123'
+    })
+    data = client.post('/api/auth/login', json={'username': username, 'password': 'password123'}).get_json()
+    socket_client = socketio.test_client(app, flask_test_client=client,
+                                         query_string=f"token={data['access_token']}")
+    socket_client.get_received()
+    return data['user']['id'], {'Authorization': f"Bearer {data['access_token']}"}, socket_client
+
+def _events(socket_client, name):
+    return [event['args'][0] for event in socket_client.get_received() if event['name'] == name]
+
+@pytest.fixture
+def pair(app, client):
+    """alice and bob, connected, with three messages from alice to bob"""
+    alice = _connect(app, client, 'alice')
+    bob = _connect(app, client, 'bob')
+    ids = [
+        client.post(f'/api/messages/private/{bob[0]}', json={'content': f'hi {i}'}, headers=alice[1]).get_json()['id']
+        for i in range(3)
+    ]
+    yield alice, bob, ids
+    for _, _, socket_client in (alice, bob):
+        if socket_client.is_connected():
+            socket_client.disconnect()
+
+def _unread(client, headers):
+    return {chat['chat_id']: chat['unread_count'] for chat in client.get('/api/chats', headers=headers).get_json()['chats']}
+
+def test_unread_counts_follow_the_read_mark(client, pair):
+    alice, bob, ids = pair
+    [chat_id] = _unread(client, bob[1])
+    assert _unread(client, bob[1]) == {chat_id: 3}
+    assert _unread(client, alice[1]) == {chat_id: 0}
+
+    response = client.post(f'/api/chats/{chat_id}/read', json={'last_read_message_id': ids[0]}, headers=bob[1])
+    assert response.get_json()['last_read_message_id'] == ids[0]
+    assert _unread(client, bob[1]) == {chat_id: 2}
+
+    assert client.post(f'/api/chats/{chat_id}/read', headers=bob[1]).get_json()['last_read_message_id'] == ids[2]
+    assert _unread(client, bob[1]) == {chat_id: 0}
+
+    # An older mark never moves it back
+    client.post(f'/api/chats/{chat_id}/read', json={'last_read_message_id': ids[0]}, headers=bob[1])
+    assert _unread(client, bob[1]) == {chat_id: 0}
+
+    client.post(f'/api/messages/private/{bob[0]}', json={'content': 'one more'}, headers=alice[1])
+    assert _unread(client, bob[1]) == {chat_id: 1}
+
+def test_invalid_read_mark_is_rejected(client, pair):
+    _, bob, _ = pair
+    [chat_id] = _unread(client, bob[1])
+    response = client.post(f'/api/chats/{chat_id}/read', json={'last_read_message_id': 'latest'}, headers=bob[1])
+    assert response.status_code == 400
+
+def test_sending_writes_no_read_state(client, pair):
+    alice, bob, _ = pair
+    with QueryCounter() as queries:
+        client.post(f'/api/messages/private/{bob[0]}', json={'content': 'quiet'}, headers=alice[1])
+        alice[2].emit('send_private_message', {'other_user_id': bob[0], 'content': 'quiet too'})
+    assert not [statement for statement, _ in queries.statements if 'chat_reads' in statement and 'SELECT' not in statement]
+
+def test_unread_count_updates_are_derived(client, pair):
+    alice, bob, _ = pair
+    [chat_id] = _unread(client, bob[1])
+    client.post(f'/api/chats/{chat_id}/read', headers=bob[1])
+    bob[2].get_received()
+
+    for content in ('one', 'two'):
+        alice[2].emit('send_private_message', {'other_user_id': bob[0], 'content': content})
+    assert [update['unread_count'] for update in _events(bob[2], 'unread_count_update')] == [1, 2]
+
+def test_mark_chat_read_sends_a_receipt_with_the_mark(client, pair):
+    alice, bob, ids = pair
+    [chat_id] = _unread(client, bob[1])
+    alice[2].get_received()
+
+    bob[2].emit('mark_chat_read', {'chat_id': chat_id, 'last_read_message_id': ids[1]})
+    assert _events(bob[2], 'chat_marked_read') == [{'chat_id': chat_id, 'last_read_message_id': ids[1]}]
+    [receipt] = _events(alice[2], 'message_read_receipt')
+    assert (receipt['reader_id'], receipt['last_read_message_id']) == (bob[0], ids[1])
+
+    # Nothing new read: no receipt
+    bob[2].emit('mark_chat_read', {'chat_id': chat_id, 'last_read_message_id': ids[0]})
+    assert _events(alice[2], 'message_read_receipt') == []
+
+    reads = client.get(f'/api/chats/{chat_id}/reads', headers=alice[1]).get_json()['reads']
+    assert reads == [{'user_id': alice[0], 'last_read_message_id': 0},
+                     {'user_id': bob[0], 'last_read_message_id': ids[1]}]
+
+def test_read_marks_are_only_for_members(app, client, pair):
+    _, bob, _ = pair
+    [chat_id] = _unread(client, bob[1])
+    carol = _connect(app, client, 'carol')
+
+    assert client.get(f'/api/chats/{chat_id}/reads', headers=carol[1]).status_code == 404
+    carol[2].emit('mark_chat_read', {'chat_id': chat_id})
+    assert _events(carol[2], 'error') == [{'message': 'Chat not found'}]
+    carol[2].disconnect()
+
+def test_group_receipts_and_reads(client, pair):
+    alice, bob, _ = pair
+    chat_id = client.post('/api/groups', json={'name': 'Team', 'member_ids': [bob[0]]},
+                          headers=alice[1]).get_json()['chat_id']
+    for _, _, socket_client in (alice, bob):
+        socket_client.emit('join_group', {'chat_id': chat_id})
+        socket_client.get_received()
+    alice[2].emit('send_group_message', {'chat_id': chat_id, 'content': 'hello team'})
+    alice[2].get_received()
+
+    bob[2].emit('mark_chat_read', {'chat_id': chat_id})
+    [receipt] = _events(alice[2], 'message_read_receipt')
+    assert receipt['reader_id'] == bob[0]
+
+    reads = client.get(f'/api/chats/{chat_id}/reads', headers=alice[1]).get_json()['reads']
+    assert {read['user_id']: read['last_read_message_id'] for read in reads} == {
+        alice[0]: 0, bob[0]: receipt['last_read_message_id']
+    }
+
+def test_mark_public_read_moves_the_general_channel_mark(client, pair):
+    alice, bob, _ = pair
+    for content in ('one', 'two'):
+        client.post('/api/messages', json={'content': content}, headers=alice[1])
+
+    def general_unread():
+        channels = client.get('/api/channels', headers=bob[1]).get_json()['channels']
+        return next(channel['unread_count'] for channel in channels if channel['id'] == Channel.DEFAULT_ID)
+
+    assert general_unread() == 2
+    bob[2].emit('mark_public_read')
+    [marked] = _events(bob[2], 'public_chat_marked_read')
+    assert marked['channel_id'] == Channel.DEFAULT_ID
+    assert general_unread() == 0
+
+    bob[2].emit('mark_public_read', {'channel_id': 999})
+    assert _events(bob[2], 'error') == [{'message': 'Channel not found'}]
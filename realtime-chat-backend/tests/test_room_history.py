@@ -0,0 +1,115 @@
+import pytest
+from app.extensions import room_history
+from app.utils.room_history import RoomHistory
+
+def _received(socket_client, name):
+    return [event['args'][0] for event in socket_client.get_received() if event['name'] == name]
+
+def test_window_is_bounded():
+    history = RoomHistory(window=3)
+    history.recent('room')
+    history.prime('room', [])
+    for i in range(1, 6):
+        history.append('room', i, 1, b'{}')
+    assert [message_id for message_id, _ in history.recent('room')] == [3, 4, 5]
+    assert history.total_bytes == 6
+
+def test_idle_rooms_evicted_when_over_budget():
+    history = RoomHistory(window=10, max_bytes=10)
+    for room in ('a', 'b', 'c'):
+        history.recent(room)
+        history.prime(room, [(1, 1, b'12345')])
+    assert 'a' not in history
+    assert 'b' in history and 'c' in history
+    assert history.total_bytes == 10
+
+def test_prime_keeps_messages_sent_while_loading():
+    history = RoomHistory(window=10)
+    assert history.recent('room') is None
+    history.append('room', 3, 1, b'"3"')
+    history.prime('room', [(1, 1, b'"1"'), (2, 1, b'"2"')])
+    assert [message_id for message_id, _ in history.recent('room')] == [1, 2, 3]
+
+def test_failed_prime_leaves_the_room_cold(app):
+    from app.utils.message_cache import PUBLIC
+    from app.utils.rooms import recent_window
+
+    class FailingQuery:
+        def limit(self, n):
+            raise RuntimeError('database gone')
+
+    with pytest.raises(RuntimeError):
+        recent_window('room', PUBLIC, FailingQuery())
+    assert room_history.stats()['priming'] == 0
+    assert room_history.recent('room') is None  # cold again: this caller primes it
+
+def test_join_public_returns_recent_window(client, auth_headers, socket_client):
+    for i in range(3):
+        client.post('/api/messages', json={'content': f'old {i}'}, headers=auth_headers)
+
+    socket_client.emit('join_public', {'history': True})
+    payload = _received(socket_client, 'public_history')[0]
+    assert [m['content'] for m in payload['messages']] == ['old 0', 'old 1', 'old 2']
+
+    socket_client.emit('send_public_message', {'content': 'fresh'})
+    socket_client.emit('leave_public')
+    socket_client.emit('join_public', {'history': True})
+    payload = _received(socket_client, 'public_history')[0]
+    assert payload['messages'][-1]['content'] == 'fresh'
+    assert payload['before_id'] == payload['messages'][0]['id']
+
+def test_join_private_includes_recent_window(client, auth_headers, socket_client, register):
+    friend_id, _ = register('friend')
+
+    client.post(f'/api/messages/private/{friend_id}', json={'content': 'hey'}, headers=auth_headers)
+
+    socket_client.emit('join_private', {'other_user_id': friend_id, 'history': True})
+    payload = _received(socket_client, 'joined_private')[0]
+    assert [m['content'] for m in payload['messages']] == ['hey']
+
+def test_deleted_message_leaves_window(client, auth_headers, socket_client):
+    socket_client.emit('join_public', {'history': True})
+    socket_client.emit('send_public_message', {'content': 'oops'})
+    message_id = _received(socket_client, 'new_public_message')[0]['id']
+
+    client.delete(f'/api/messages/{message_id}', headers=auth_headers)
+    assert room_history.recent('public_chat') == []
+
+def test_older_pages_from_rest(client, auth_headers):
+    ids = [
+        client.post('/api/messages', json={'content': f'msg {i}'}, headers=auth_headers).get_json()['id']
+        for i in range(5)
+    ]
+    response = client.get(f'/api/messages?before_id={ids[3]}&limit=2', headers=auth_headers)
+    assert [m['content'] for m in response.get_json()['messages']] == ['msg 1', 'msg 2']
+
+def test_deleted_channel_message_leaves_its_channel_window(client, auth_headers):
+    channel_id = client.post('/api/channels', json={'name': 'side'}, headers=auth_headers).get_json()['id']
+    assert room_history.recent(f'channel_{channel_id}') is None
+    room_history.prime(f'channel_{channel_id}', [])
+    message_id = client.post(f'/api/channels/{channel_id}/messages', json={'content': 'oops'},
+                             headers=auth_headers).get_json()['id']
+    assert [entry[0] for entry in room_history.recent(f'channel_{channel_id}')] == [message_id]
+
+    client.delete(f'/api/messages/{message_id}', headers=auth_headers)
+    assert room_history.recent(f'channel_{channel_id}') == []
+
+def test_without_sticky_rooms_windows_come_from_the_db(client, auth_headers, socket_client, monkeypatch):
+    from app.extensions import message_cache
+    monkeypatch.setattr(room_history, 'enabled', False)
+    monkeypatch.setattr(message_cache, 'enabled', False)
+
+    socket_client.emit('join_public', {'history': True})
+    socket_client.emit('send_public_message', {'content': 'here'})
+    socket_client.emit('leave_public')
+    # Sent and deleted through another worker: nothing of this one is told
+    client.post('/api/messages', json={'content': 'elsewhere'}, headers=auth_headers)
+    with monkeypatch.context() as m:
+        m.setattr(room_history, 'discard', lambda room, message_id: None)
+        here = _received(socket_client, 'new_public_message')[0]['id']
+        client.delete(f'/api/messages/{here}', headers=auth_headers)
+
+    socket_client.emit('join_public', {'history': True})
+    payload = _received(socket_client, 'public_history')[0]
+    assert [m['content'] for m in payload['messages']] == ['elsewhere']
+    assert room_history.stats()['rooms'] == 0 and len(message_cache) == 0
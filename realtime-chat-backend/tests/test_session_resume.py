@@ -0,0 +1,103 @@
+import pytest
+from app.extensions import socketio, session_resume
+from app.utils.session_resume import SessionResume
+
+def _connect(app, client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'password123'
+    })
+    data = client.post('/api/auth/login', json={'username': username, 'password': 'password123'}).get_json()
+    socket_client = socketio.test_client(app, flask_test_client=client,
+                                         query_string=f"token={data['access_token']}")
+    return data, socket_client
+
+def _events(socket_client, name):
+    return [event['args'] for event in socket_client.get_received() if event['name'] == name]
+
+def test_since_returns_missed_events():
+    log = SessionResume(buffer_size=10)
+    first = log.record('room', 'evt', 1)
+    log.record('room', 'evt', 2)
+    log.record('other', 'evt', 3)
+    assert [args for _, _, args in log.since('room', first)] == [(2,)]
+
+def test_since_reports_gap_once_buffer_rolled_over():
+    log = SessionResume(buffer_size=2)
+    for i in range(4):
+        log.record('room', 'evt', i)
+    assert log.since('room', 1) is None
+    assert len(log.since('room', 2)) == 2
+
+def test_connected_event_carries_session(app, client):
+    _, fresh = _connect(app, client, 'newcomer')
+    connected = _events(fresh, 'connected')[0][0]
+    assert connected['session']
+    assert connected['seq'] == session_resume.seq
+
+def test_resume_replays_missed_events(app, client):
+    alice, alice_socket = _connect(app, client, 'alice')
+    bob, bob_socket = _connect(app, client, 'bob')
+    session = _events(alice_socket, 'connected')[0][0]
+
+    alice_socket.emit('join_public')
+    bob_socket.emit('join_public')
+    alice_socket.disconnect()
+
+    bob_socket.emit('send_public_message', {'content': 'while you were away'})
+    bob_socket.emit('send_private_message', {'other_user_id': alice['user']['id'], 'content': 'psst'})
+
+    _, alice_socket = _connect(app, client, 'alice')
+    alice_socket.get_received()
+    alice_socket.emit('resume', {
+        'session': session['session'],
+        'cursors': {'public_chat': session['seq'], f"user_{alice['user']['id']}": session['seq']}
+    })
+    received = alice_socket.get_received()
+    names = [event['name'] for event in received]
+    assert names[-1] == 'resumed'
+    assert 'new_public_message' in names
+    assert 'unread_count_update' in names
+
+    replayed = next(event['args'] for event in received if event['name'] == 'new_public_message')
+    assert replayed[0]['content'] == 'while you were away'
+    assert replayed[1]['room'] == 'public_chat'
+    assert received[-1]['args'][0]['resync'] == []
+
+    # The session's rooms are rejoined: live traffic flows again
+    bob_socket.emit('send_public_message', {'content': 'welcome back'})
+    assert _events(alice_socket, 'new_public_message')[0][0]['content'] == 'welcome back'
+
+def test_resume_after_grace_period_fails(app, client):
+    _, alice_socket = _connect(app, client, 'alice')
+    session = _events(alice_socket, 'connected')[0][0]['session']
+    alice_socket.disconnect()
+
+    session_resume.grace = -1
+    _, alice_socket = _connect(app, client, 'alice')
+    alice_socket.get_received()
+    alice_socket.emit('resume', {'session': session})
+    assert _events(alice_socket, 'resume_failed')
+
+def test_resume_rejects_other_users_session(app, client):
+    _, alice_socket = _connect(app, client, 'alice')
+    session = _events(alice_socket, 'connected')[0][0]['session']
+    alice_socket.disconnect()
+
+    _, mallory_socket = _connect(app, client, 'mallory')
+    mallory_socket.get_received()
+    mallory_socket.emit('resume', {'session': session})
+    assert _events(mallory_socket, 'resume_failed')
+
+def test_logged_event_payload_is_unchanged(app, client):
+    alice, alice_socket = _connect(app, client, 'alice')
+    alice_socket.emit('join_public')
+    alice_socket.get_received()
+    alice_socket.emit('send_public_message', {'content': 'hello'})
+    headers = {'Authorization': f"Bearer {alice['access_token']}"}
+
+    # The message as the REST API returns it, then the room and seq as an extra argument
+    payload, meta = _events(alice_socket, 'new_public_message')[0]
+    assert payload == client.get('/api/messages', headers=headers).get_json()['messages'][-1]
+    assert set(meta) == {'room', 'seq'}
@@ -0,0 +1,89 @@
+import threading
+import time
+import eventlet
+import pytest
+from sqlalchemy import event
+from app.extensions import db, socketio, socket_auth, handshakes
+from app.utils.admission import HandshakeAdmission, HandshakeRejected
+
+def _connect(app, client, auth_headers):
+    token = auth_headers['Authorization'].split()[1]
+    return socketio.test_client(app, flask_test_client=client, query_string=f'token={token}')
+
+def _user_queries(app, client, auth_headers):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        socket_client = _connect(app, client, auth_headers)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert socket_client.is_connected()
+    welcome = socket_client.get_received()[0]['args'][0]['message']
+    socket_client.disconnect()
+    return len([s for s in statements if 'FROM users' in s]), welcome
+
+def test_reconnect_with_same_token_skips_user_query(app, client, auth_headers):
+    assert _user_queries(app, client, auth_headers) == (1, 'Welcome testuser!')
+    assert _user_queries(app, client, auth_headers) == (0, 'Welcome testuser!')
+    assert socket_auth.stats()['hits'] == 1
+
+def test_profile_update_invalidates_cached_user(app, client, auth_headers):
+    _user_queries(app, client, auth_headers)
+    client.put('/api/users/auth-user', json={'username': 'renamed'}, headers=auth_headers)
+    assert _user_queries(app, client, auth_headers) == (1, 'Welcome renamed!')
+
+def test_invalid_token_is_refused(app, client):
+    socket_client = socketio.test_client(app, flask_test_client=client, query_string='token=garbage')
+    assert not socket_client.is_connected()
+    assert socket_auth.stats()['entries'] == 0
+
+def test_handshake_over_budget_is_refused(app, client, auth_headers):
+    handshakes.concurrency = 0
+    handshakes.max_queue = 0
+    socket_client = _connect(app, client, auth_headers)
+    assert not socket_client.is_connected()
+    assert handshakes.stats()['rejected'] == 1
+
+def test_admission_queues_then_refuses():
+    admission = HandshakeAdmission(concurrency=1, max_queue=1, max_wait=5.0, retry_after=1.0)
+    holding, release = threading.Event(), threading.Event()
+    admitted = []
+
+    def first():
+        with admission.admit():
+            holding.set()
+            release.wait(5)
+
+    def second():
+        with admission.admit():
+            admitted.append(True)
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    threads[0].start()
+    holding.wait(5)
+    threads[1].start()
+    deadline = time.monotonic() + 5
+    while admission.waiting < 1:
+        assert time.monotonic() < deadline, 'second handshake never queued'
+        eventlet.sleep(0)
+
+    # Slot taken and queue full: refused with a jittered hint scaled by the backlog (2 per slot)
+    with pytest.raises(HandshakeRejected) as rejected:
+        with admission.admit():
+            pass
+    assert 1.0 <= rejected.value.retry_after <= 3.0
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert admitted == [True]
+    stats = admission.stats()
+    assert (stats['admitted'], stats['rejected'], stats['max_waiting'], stats['active']) == (2, 1, 1, 0)
+
+def test_admission_wait_times_out():
+    admission = HandshakeAdmission(concurrency=0, max_queue=10, max_wait=0.05)
+    with pytest.raises(HandshakeRejected):
+        with admission.admit():
+            pass
+    assert admission.waiting == 0
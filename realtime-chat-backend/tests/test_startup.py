@@ -0,0 +1,87 @@
+import subprocess
+import sys
+import pytest
+from app import create_app
+from app.extensions import db, warmup, room_history, membership
+from app.models.user import User
+from app.models.message import Message
+from app.models.private_chat import PrivateChat
+from app.models.private_message import PrivateMessage
+from app.models.chat_member import ChatMember
+from app.utils.warmup import prewarm_pool
+from tests.conftest import TestConfig
+
+class WarmupConfig(TestConfig):
+    WARMUP_ON_START = True
+
+@pytest.fixture
+def warm_app():
+    app = create_app(WarmupConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def _seed():
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(3)]
+    db.session.add_all(users)
+    db.session.flush()
+    direct = PrivateChat(user1_id=users[0].id, user2_id=users[1].id)
+    group = PrivateChat(user1_id=users[0].id, user2_id=users[0].id, is_group=True, name='team', created_by=users[0].id)
+    db.session.add_all([direct, group])
+    db.session.flush()
+    db.session.add_all([ChatMember(chat_id=group.id, user_id=user.id) for user in users])
+    db.session.add_all([Message(content=f'hello {i}', user_id=users[0].id, channel_id=1) for i in range(3)])
+    db.session.add(PrivateMessage(content='hi', sender_id=users[0].id, chat_id=direct.id))
+    db.session.add(PrivateMessage(content='hi all', sender_id=users[1].id, chat_id=group.id))
+    db.session.commit()
+    return direct.id, group.id
+
+def test_importing_the_app_does_not_import_alembic():
+    code = "import sys, app; app.create_app(); print('alembic' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            env={'DATABASE_URL': 'sqlite://', 'PATH': ''})
+    assert result.stdout.strip() == 'False', result.stderr
+
+def test_db_commands_load_flask_migrate_on_demand(app):
+    result = app.test_cli_runner().invoke(args=['db', '--help'])
+    assert result.exit_code == 0
+    assert 'upgrade' in result.output and '--directory' in result.output
+    assert 'migrate' in app.extensions
+
+def test_ready_without_warmup(client):
+    assert client.get('/api/health').status_code == 200
+    response = client.get('/api/ready')
+    assert response.status_code == 200
+    assert 'create_app' in response.get_json()['phases']
+
+def test_not_ready_until_warmup_has_run(warm_app):
+    client = warm_app.test_client()
+    direct_id, group_id = _seed()
+    assert client.get('/api/ready').status_code == 503
+
+    warmup.run(warm_app)
+
+    response = client.get('/api/ready')
+    assert response.status_code == 200
+    assert response.get_json()['error'] is None
+    assert warmup.warmed['channels'] == 1
+    assert warmup.warmed['private_chats'] == 2
+    assert [entry[0] for entry in room_history.recent('public_chat')] == [1, 2, 3]
+    assert 'private_chat_%d' % direct_id in room_history
+    assert 'private_chat_%d' % group_id in room_history
+    assert membership.stats()['chats'] == 1
+
+def test_failed_warmup_goes_ready_cold(warm_app):
+    db.drop_all()
+    warmup.run(warm_app)
+    db.create_all()
+    assert warmup.ready
+    assert warmup.error
+
+def test_prewarm_pool_is_capped_by_pool_size(tmp_path):
+    engine = db.create_engine(f'sqlite:///{tmp_path}/pool.db', pool_size=3)
+    assert prewarm_pool(engine, 10) == 3
+    assert engine.pool.checkedin() == 3
+    engine.dispose()
@@ -0,0 +1,114 @@
+import pytest
+from datetime import datetime, timedelta
+from app.extensions import db, sweeper
+from app.models.message import Message
+from app.models.sync_event import SyncEvent
+
+def test_sync_without_cursor_returns_current_cursor(client, auth_headers):
+    client.post('/api/messages', json={'content': 'before'}, headers=auth_headers)
+    response = client.get('/api/sync', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['cursor'] == '1.0.0'
+
+def test_sync_invalid_cursor(client, auth_headers):
+    response = client.get('/api/sync?since=nope', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_sync_returns_only_new_public_messages(client, auth_headers):
+    client.post('/api/messages', json={'content': 'seen'}, headers=auth_headers)
+    cursor = client.get('/api/sync', headers=auth_headers).get_json()['cursor']
+    client.post('/api/messages', json={'content': 'new'}, headers=auth_headers)
+
+    data = client.get(f'/api/sync?since={cursor}', headers=auth_headers).get_json()
+    assert [m['content'] for m in data['public']['messages']] == ['new']
+    assert data['has_more'] is False
+
+    data = client.get(f"/api/sync?since={data['cursor']}", headers=auth_headers).get_json()
+    assert data['public']['messages'] == []
+
+def test_sync_private_messages_tombstones_and_unread(client, auth_headers, register):
+    friend_id, friend_headers = register('friend')
+    cursor = client.get('/api/sync', headers=friend_headers).get_json()['cursor']
+
+    first = client.post(f'/api/messages/private/{friend_id}', json={'content': 'one'}, headers=auth_headers).get_json()
+    client.post(f'/api/messages/private/{friend_id}', json={'content': 'two'}, headers=auth_headers)
+
+    data = client.get(f'/api/sync?since={cursor}', headers=friend_headers).get_json()
+    assert [m['content'] for m in data['private']['messages']] == ['one', 'two']
+    assert data['chats'][0]['unread_count'] == 2
+    assert data['chats'][0]['other_user']['username'] == 'testuser'
+    cursor = data['cursor']
+
+    client.delete(f"/api/messages/private/{friend_id}/{first['id']}", headers=auth_headers)
+    client.post(f"/api/chats/{first['chat_id']}/read", headers=friend_headers)
+
+    data = client.get(f'/api/sync?since={cursor}', headers=friend_headers).get_json()
+    assert data['private']['messages'] == []
+    assert data['private']['deleted'] == [{'chat_id': first['chat_id'], 'id': first['id']}]
+    assert data['chats'] == [{'chat_id': first['chat_id'], 'unread_count': 0}]
+
+def test_sync_hides_other_users_private_chats(client, auth_headers, register):
+    _, outsider_headers = register('outsider')
+    friend_id, _ = register('friend')
+    cursor = client.get('/api/sync', headers=outsider_headers).get_json()['cursor']
+
+    client.post(f'/api/messages/private/{friend_id}', json={'content': 'secret'}, headers=auth_headers)
+
+    data = client.get(f'/api/sync?since={cursor}', headers=outsider_headers).get_json()
+    assert data['private']['messages'] == []
+    assert data['chats'] == []
+
+def test_sync_only_returns_followed_channels(client, auth_headers):
+    cursor = client.get('/api/sync', headers=auth_headers).get_json()['cursor']
+    followed = client.post('/api/channels', json={'name': 'followed'}, headers=auth_headers).get_json()['id']
+    other = client.post('/api/channels', json={'name': 'other'}, headers=auth_headers).get_json()['id']
+    client.post(f'/api/channels/{followed}/read', headers=auth_headers)
+
+    for channel_id in (followed, other):
+        client.post(f'/api/channels/{channel_id}/messages', json={'content': f'in {channel_id}'}, headers=auth_headers)
+    client.post('/api/messages', json={'content': 'general'}, headers=auth_headers)
+
+    data = client.get(f'/api/sync?since={cursor}', headers=auth_headers).get_json()
+    assert [m['content'] for m in data['public']['messages']] == [f'in {followed}', 'general']
+
+def test_sync_sends_unsettled_rows_again(app, client, auth_headers):
+    client.post('/api/messages', json={'content': 'old'}, headers=auth_headers)
+    Message.query.update({Message.timestamp: datetime.utcnow() - timedelta(minutes=1)})
+    db.session.commit()
+    app.config['SYNC_SETTLE'] = 10
+
+    cursor = client.get('/api/sync', headers=auth_headers).get_json()['cursor']
+    assert cursor == '1.0.0'
+    client.post('/api/messages', json={'content': 'new'}, headers=auth_headers)
+
+    # A row with a lower id could still commit: the cursor stays before the new message
+    data = client.get(f'/api/sync?since={cursor}', headers=auth_headers).get_json()
+    assert [m['content'] for m in data['public']['messages']] == ['new']
+    assert (data['cursor'], data['has_more']) == (cursor, False)
+
+    Message.query.update({Message.timestamp: datetime.utcnow() - timedelta(minutes=1)})
+    db.session.commit()
+    data = client.get(f'/api/sync?since={cursor}', headers=auth_headers).get_json()
+    assert [m['content'] for m in data['public']['messages']] == ['new']
+    assert data['cursor'] == '2.0.0'
+
+def test_sync_cursor_past_retention_needs_resync(client, auth_headers, register):
+    friend_id, friend_headers = register('friend')
+    cursor = client.get('/api/sync', headers=friend_headers).get_json()['cursor']
+    for content in ('one', 'two', 'three'):
+        message = client.post(f'/api/messages/private/{friend_id}', json={'content': content},
+                              headers=auth_headers).get_json()
+        client.delete(f"/api/messages/private/{friend_id}/{message['id']}", headers=auth_headers)
+
+    SyncEvent.query.update({SyncEvent.created_at: datetime.utcnow() - timedelta(days=31)})
+    db.session.commit()
+    swept = sweeper.run_once(client.application.config)
+    assert swept['sync_events'] > 0
+    assert SyncEvent.query.count() == 1  # the newest is kept
+
+    response = client.get(f'/api/sync?since={cursor}', headers=friend_headers)
+    assert response.status_code == 410
+    assert response.get_json()['resync'] is True
+
+    cursor = client.get('/api/sync', headers=friend_headers).get_json()['cursor']
+    assert client.get(f'/api/sync?since={cursor}', headers=friend_headers).status_code == 200
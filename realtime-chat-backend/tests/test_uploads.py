@@ -0,0 +1,240 @@
+import hashlib
+import io
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import create_app
+from app.extensions import db, sweeper
+from app.models.upload import Upload
+from app.utils.storage import LocalStorage, StorageOffsetMismatch, StorageLengthMismatch
+from tests.conftest import TestConfig
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+@pytest.fixture
+def app(tmp_path):
+    class UploadConfig(TestConfig):
+        STORAGE_ROOT = str(tmp_path)
+        FILE_MAX_SIZE = 64 * 1024
+
+    app = create_app(UploadConfig)
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def _start(client, auth_headers, size=len(CONTENT), **extra):
+    response = client.post('/api/files/uploads', json=dict(
+        {'filename': 'photo.png', 'file_size': size, 'file_type': 'image/png'}, **extra
+    ), headers=auth_headers)
+    return response
+
+def _put(client, auth_headers, upload_id, start, chunk, total=len(CONTENT)):
+    headers = dict(auth_headers, **{'Content-Range': f'bytes {start}-{start + len(chunk) - 1}/{total}'})
+    return client.put(f'/api/files/uploads/{upload_id}', data=chunk, headers=headers)
+
+def _message_id(client, auth_headers):
+    return client.post('/api/messages', json={'content': 'pic'}, headers=auth_headers).get_json()['id']
+
+def test_chunked_upload_resume_and_download(client, auth_headers):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    upload_id = _start(client, auth_headers, sha256=sha256).get_json()['upload_id']
+
+    assert _put(client, auth_headers, upload_id, 0, CONTENT[:4096]).get_json()['offset'] == 4096
+
+    # A retried or out-of-order chunk is refused with the offset to resume from
+    response = _put(client, auth_headers, upload_id, 0, CONTENT[:4096])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 4096
+    assert client.get(f'/api/files/uploads/{upload_id}', headers=auth_headers).get_json()['offset'] == 4096
+
+    response = client.post(f'/api/files/uploads/{upload_id}/complete',
+                           json={'public_message_id': _message_id(client, auth_headers)}, headers=auth_headers)
+    assert response.status_code == 409
+
+    _put(client, auth_headers, upload_id, 4096, CONTENT[4096:])
+    response = client.post(f'/api/files/uploads/{upload_id}/complete',
+                           json={'public_message_id': _message_id(client, auth_headers)}, headers=auth_headers)
+    assert response.status_code == 201
+    file_data = response.get_json()
+    assert file_data['file_size'] == len(CONTENT)
+    assert file_data['file_url'] == f"/api/files/{file_data['id']}/content"
+
+    download = client.get(file_data['file_url'], headers=auth_headers)
+    assert download.status_code == 200
+    assert download.data == CONTENT
+
+    partial = client.get(file_data['file_url'], headers=dict(auth_headers, Range='bytes=100-199'))
+    assert partial.status_code == 206
+    assert partial.data == CONTENT[100:200]
+
+def test_checksum_mismatch_is_rejected(client, auth_headers):
+    upload_id = _start(client, auth_headers).get_json()['upload_id']
+    _put(client, auth_headers, upload_id, 0, CONTENT)
+    response = client.post(f'/api/files/uploads/{upload_id}/complete', json={
+        'public_message_id': _message_id(client, auth_headers), 'sha256': '0' * 64
+    }, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Checksum mismatch'
+
+def test_streaming_limit(client, auth_headers):
+    assert _start(client, auth_headers, size=65 * 1024).status_code == 413
+
+    # Bytes beyond the declared size are refused while streaming
+    upload_id = _start(client, auth_headers, size=100).get_json()['upload_id']
+    response = _put(client, auth_headers, upload_id, 0, CONTENT, total=100)
+    assert response.status_code == 413
+    assert response.get_json()['offset'] == 0
+
+def _upload(client, auth_headers, content=CONTENT):
+    upload_id = _start(client, auth_headers, size=len(content)).get_json()['upload_id']
+    _put(client, auth_headers, upload_id, 0, content, total=len(content))
+    return client.post(f'/api/files/uploads/{upload_id}/complete',
+                       json={'public_message_id': _message_id(client, auth_headers)},
+                       headers=auth_headers).get_json()['id']
+
+def test_deleting_file_removes_stored_object(app, client, auth_headers, tmp_path):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    file_id = _upload(client, auth_headers)
+    assert any(tmp_path.rglob(sha256))
+
+    client.delete(f'/api/files/{file_id}', headers=auth_headers)
+    assert any(tmp_path.rglob(sha256))  # left to the sweeper
+    assert sweeper.run_once(app.config)['blobs'] == 1
+    assert not any(tmp_path.rglob(sha256))
+
+def test_identical_uploads_share_one_stored_object(app, client, auth_headers, tmp_path):
+    from app.models.blob import Blob
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    first, second = _upload(client, auth_headers), _upload(client, auth_headers)
+    assert first != second
+    assert len([p for p in tmp_path.rglob('*') if p.is_file()]) == 1
+    assert db.session.get(Blob, sha256).ref_count == 2
+
+    # The object stays until the last file pointing at it is gone
+    client.delete(f'/api/files/{first}', headers=auth_headers)
+    assert client.get(f'/api/files/{second}/content', headers=auth_headers).data == CONTENT
+    client.delete(f'/api/files/{second}', headers=auth_headers)
+    sweeper.run_once(app.config)
+    assert not any(tmp_path.rglob(sha256))
+    assert db.session.get(Blob, sha256) is None
+
+def test_known_content_skips_the_upload(app, client, auth_headers):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    assert client.get(f'/api/files/blobs/{sha256}', headers=auth_headers).status_code == 404
+    _upload(client, auth_headers)
+    assert client.get(f'/api/files/blobs/{sha256}', headers=auth_headers).get_json() == {
+        'sha256': sha256, 'size': len(CONTENT)
+    }
+
+    response = _start(client, auth_headers, sha256=sha256)
+    assert response.get_json()['offset'] == len(CONTENT)
+    upload_id = response.get_json()['upload_id']
+    response = client.post(f'/api/files/uploads/{upload_id}/complete',
+                           json={'public_message_id': _message_id(client, auth_headers)},
+                           headers=auth_headers)
+    assert response.status_code == 201
+    file_id = response.get_json()['id']
+    assert client.get(f'/api/files/{file_id}/content', headers=auth_headers).data == CONTENT
+
+def test_released_blob_taken_back_before_the_sweep_is_kept(app, client, auth_headers, tmp_path):
+    from app.models.blob import Blob
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    client.delete(f'/api/files/{_upload(client, auth_headers)}', headers=auth_headers)
+    assert db.session.get(Blob, sha256).ref_count == 0
+
+    # A new upload of the same content sends its bytes and points at the released blob again
+    upload_id = _start(client, auth_headers, sha256=sha256).get_json()['upload_id']
+    assert _put(client, auth_headers, upload_id, 0, CONTENT).status_code == 200
+    response = client.post(f'/api/files/uploads/{upload_id}/complete',
+                           json={'public_message_id': _message_id(client, auth_headers)},
+                           headers=auth_headers)
+    assert response.status_code == 201
+    assert sweeper.run_once(app.config)['blobs'] == 0
+    assert len([p for p in tmp_path.rglob('*') if p.is_file()]) == 1
+    assert client.get(f"/api/files/{response.get_json()['id']}/content", headers=auth_headers).data == CONTENT
+
+def test_knowing_a_hash_is_no_proof_of_having_the_content(app, client, auth_headers, register, tmp_path):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    _upload(client, auth_headers)
+    _, mallory_headers = register('mallory')
+    assert client.get(f'/api/files/blobs/{sha256}', headers=mallory_headers).status_code == 404
+
+    response = _start(client, mallory_headers, sha256=sha256)
+    assert response.get_json()['offset'] == 0
+    complete = f"/api/files/uploads/{response.get_json()['upload_id']}/complete"
+    response = client.post(complete, json={'public_message_id': _message_id(client, mallory_headers)},
+                           headers=mallory_headers)
+    assert (response.status_code, response.get_json()['offset']) == (409, 0)
+
+def test_skipped_upload_of_a_swept_blob_must_send_its_bytes(app, client, auth_headers, tmp_path):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    file_id = _upload(client, auth_headers)
+    upload_id = _start(client, auth_headers, sha256=sha256).get_json()['upload_id']
+    client.delete(f'/api/files/{file_id}', headers=auth_headers)
+    sweeper.run_once(app.config)
+
+    complete = f'/api/files/uploads/{upload_id}/complete'
+    body = {'public_message_id': _message_id(client, auth_headers)}
+    response = client.post(complete, json=body, headers=auth_headers)
+    assert (response.status_code, response.get_json()['offset']) == (409, 0)
+    assert _put(client, auth_headers, upload_id, 0, CONTENT).status_code == 200
+    assert client.post(complete, json=body, headers=auth_headers).status_code == 201
+    assert any(tmp_path.rglob(sha256))
+
+def test_known_hash_with_wrong_size_must_upload(app, client, auth_headers):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    _upload(client, auth_headers)
+    response = _start(client, auth_headers, size=len(CONTENT) - 1, sha256=sha256)
+    assert response.get_json()['offset'] == 0
+
+def test_aborted_upload(client, auth_headers, tmp_path):
+    upload_id = _start(client, auth_headers).get_json()['upload_id']
+    _put(client, auth_headers, upload_id, 0, CONTENT[:100])
+    assert client.delete(f'/api/files/uploads/{upload_id}', headers=auth_headers).status_code == 200
+    assert client.get(f'/api/files/uploads/{upload_id}', headers=auth_headers).status_code == 404
+    assert not any(tmp_path.rglob(upload_id))
+
+def test_chunk_must_match_its_content_range(client, auth_headers):
+    upload_id = _start(client, auth_headers).get_json()['upload_id']
+
+    response = _put(client, auth_headers, upload_id, 0, CONTENT[:100], total=len(CONTENT) + 1)
+    assert response.status_code == 400
+    headers = dict(auth_headers, **{'Content-Range': f'bytes 0-199/{len(CONTENT)}'})
+    response = client.put(f'/api/files/uploads/{upload_id}', data=CONTENT[:100], headers=headers)
+    assert response.status_code == 400
+    assert client.get(f'/api/files/uploads/{upload_id}', headers=auth_headers).get_json()['offset'] == 0
+
+def test_refused_chunk_stores_nothing(tmp_path):
+    storage = LocalStorage(str(tmp_path), block_size=16)
+    assert storage.append('u', io.BytesIO(b'x' * 40), 0, 40) == 40
+
+    with pytest.raises(StorageOffsetMismatch) as mismatch:
+        storage.append('u', io.BytesIO(b'y' * 10), 0, 10)
+    assert mismatch.value.size == 40
+    for body in (b'y' * 5, b'y' * 50):
+        with pytest.raises(StorageLengthMismatch):
+            storage.append('u', io.BytesIO(body), 40, 10)
+        assert storage.size('u') == 40
+
+def test_abandoned_uploads_are_swept(app, client, auth_headers, tmp_path):
+    upload_id = _start(client, auth_headers).get_json()['upload_id']
+    _put(client, auth_headers, upload_id, 0, CONTENT[:100])
+    fresh_id = _start(client, auth_headers).get_json()['upload_id']
+    _put(client, auth_headers, fresh_id, 0, CONTENT[:100])
+    orphan = tmp_path / 'partial' / 'orphan'
+    orphan.write_bytes(b'left behind')
+
+    Upload.query.filter_by(id=upload_id).update({Upload.created_at: datetime.utcnow() - timedelta(days=2)})
+    db.session.commit()
+    old = time.time() - 2 * 86400
+    os.utime(tmp_path / 'partial' / upload_id, (old, old))
+    os.utime(orphan, (old, old))
+
+    swept = sweeper.run_once(app.config)
+    assert (swept['uploads'], swept['partials']) == (1, 1)
+    assert client.get(f'/api/files/uploads/{upload_id}', headers=auth_headers).status_code == 404
+    assert sorted(path.name for path in (tmp_path / 'partial').iterdir()) == [fresh_id]
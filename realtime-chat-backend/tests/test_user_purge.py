@@ -0,0 +1,177 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from app.extensions import db, socketio, socket_auth, sweeper, user_purger
+from app.models.chat_member import ChatMember
+from app.models.file import File
+from app.models.message import Message
+from app.models.private_chat import PrivateChat
+from app.models.private_message import PrivateMessage
+from app.models.sync_event import SyncEvent
+from app.models.upload import Upload
+from app.models.user import User
+from app.models.user_purge import UserPurge
+from tests.conftest import TestConfig
+
+CONTENT = b'purge me' * 100
+
+@pytest.fixture
+def app(tmp_path):
+    class PurgeConfig(TestConfig):
+        STORAGE_ROOT = str(tmp_path)
+        USER_PURGE_BATCH_SIZE = 2
+
+    app = create_app(PurgeConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def _stored_file(client, headers, message_id):
+    upload_id = client.post('/api/files/uploads', json={
+        'filename': 'photo.png', 'file_size': len(CONTENT), 'file_type': 'image/png'
+    }, headers=headers).get_json()['upload_id']
+    client.put(f'/api/files/uploads/{upload_id}', data=CONTENT,
+               headers=dict(headers, **{'Content-Range': f'bytes 0-{len(CONTENT) - 1}/{len(CONTENT)}'}))
+    return client.post(f'/api/files/uploads/{upload_id}/complete', json={'public_message_id': message_id},
+                       headers=headers).get_json()['id']
+
+def test_delete_locks_the_user_out_at_once(client, register):
+    alice_id, alice_headers = register('alice')
+    _, bob_headers = register('bob')
+
+    assert client.delete(f'/api/users/{alice_id}', headers=bob_headers).status_code == 403
+    response = client.delete(f'/api/users/{alice_id}', headers=alice_headers)
+    assert response.status_code == 202
+    purge = response.get_json()['purge']
+    assert (purge['status'], purge['step'], purge['steps_done'], purge['rows_purged']) == ('queued', 'uploads', 0, 0)
+
+    assert client.post('/api/auth/login', json={'username': 'alice', 'password': 'password123'}).status_code == 401
+    assert client.get('/api/chats', headers=alice_headers).status_code == 401
+    assert client.get(f'/api/users/{alice_id}').status_code == 404
+    assert client.get('/api/users/search?prefix=deleted', headers=bob_headers).get_json()['users'] == []
+    assert [user['username'] for user in client.get('/api/users/').get_json()['users']] == ['bob']
+
+    # Alice's token went with her account, but still follows the purge
+    assert client.delete(f'/api/users/{alice_id}', headers=alice_headers).status_code == 401
+    assert client.get(f'/api/users/{alice_id}/purge', headers=alice_headers).get_json()['purge'] == purge
+    assert client.get(f'/api/users/{alice_id}/purge', headers=bob_headers).status_code == 403
+    assert client.get(f'/api/users/{alice_id}/purge').status_code == 401
+
+def test_purge_removes_the_users_data(app, client, tmp_path, register):
+    alice_id, alice_headers = register('alice')
+    bob_id, bob_headers = register('bob')
+    carol_id, _ = register('carol')
+
+    public_ids = [client.post('/api/messages', json={'content': f'public {i}'}, headers=alice_headers).get_json()['id']
+                  for i in range(3)]
+    _stored_file(client, alice_headers, public_ids[0])
+    kept_id = client.post('/api/messages', json={'content': 'from bob'}, headers=bob_headers).get_json()['id']
+
+    for headers, other_id in ((alice_headers, bob_id), (bob_headers, alice_id), (alice_headers, bob_id)):
+        client.post(f'/api/messages/private/{other_id}', json={'content': 'direct'}, headers=headers)
+    direct_id = PrivateChat.get_chat_between_users(alice_id, bob_id).id
+    client.post(f'/api/chats/{direct_id}/read', headers=bob_headers)
+
+    group_id = client.post('/api/groups', json={'name': 'Team', 'member_ids': [bob_id, carol_id]},
+                           headers=alice_headers).get_json()['chat_id']
+    group_ids = [client.post(f'/api/groups/{group_id}/messages', json={'content': f'team {i}'},
+                             headers=headers).get_json()['id']
+                 for i, headers in enumerate((alice_headers, bob_headers, alice_headers))]
+    client.post('/api/files/uploads', json={'filename': 'half.png', 'file_size': 10, 'file_type': 'image/png'},
+                headers=alice_headers)
+    cursor = client.get('/api/sync', headers=bob_headers).get_json()['cursor']
+
+    client.delete(f'/api/users/{alice_id}', headers=alice_headers)
+    assert user_purger.run_pending() > 0
+
+    assert Message.query.filter_by(user_id=alice_id).count() == 0
+    assert db.session.get(Message, kept_id) is not None
+    assert db.session.get(PrivateChat, direct_id) is None
+    assert PrivateMessage.query.filter_by(sender_id=alice_id).count() == 0
+    assert [m.id for m in PrivateMessage.query.filter_by(chat_id=group_id)] == [group_ids[1]]
+    assert ChatMember.member_ids(group_id) == {bob_id, carol_id}
+    assert File.query.filter_by(uploader_id=alice_id).count() == 0
+    assert Upload.query.filter_by(uploader_id=alice_id).count() == 0
+    sweeper.run_once(app.config)
+    assert not [path for path in tmp_path.rglob('*') if path.is_file()]
+    assert SyncEvent.query.filter_by(user_id=alice_id).count() == 0
+
+    purge = client.get(f'/api/users/{alice_id}/purge', headers=alice_headers).get_json()['purge']
+    assert (purge['status'], purge['step'], purge['steps_done']) == ('done', None, purge['steps'])
+    assert purge['rows_purged'] > 0
+
+    changes = client.get(f'/api/sync?since={cursor}', headers=bob_headers).get_json()
+    assert changes['private']['deleted_chats'] == [direct_id]
+    assert sorted(changes['public']['deleted']) == public_ids
+    assert changes['private']['deleted'] == [{'chat_id': group_id, 'id': group_ids[0]},
+                                             {'chat_id': group_id, 'id': group_ids[2]}]
+
+def test_purge_resumes_where_it_stopped(app, client, register):
+    alice_id, alice_headers = register('alice')
+    for i in range(5):
+        client.post('/api/messages', json={'content': f'public {i}'}, headers=alice_headers)
+    client.delete(f'/api/users/{alice_id}', headers=alice_headers)
+
+    # Two batches of two, then the worker goes away
+    assert user_purger.run_pending(max_batches=2) == 2
+    purge = db.session.get(UserPurge, alice_id)
+    assert (purge.step, purge.rows_purged, purge.status) == ('messages', 4, 'queued')
+    assert Message.query.filter_by(user_id=alice_id).count() == 1
+
+    db.session.remove()
+    assert user_purger.run_pending() == 2  # the last message, then the empty steps left
+    assert Message.query.filter_by(user_id=alice_id).count() == 0
+    assert db.session.get(UserPurge, alice_id).rows_purged == 5
+    assert SyncEvent.query.filter_by(event=SyncEvent.MESSAGE_DELETED).count() == 5
+
+def test_purge_leased_by_another_worker_is_left_alone(app, client, register):
+    alice_id, alice_headers = register('alice')
+    client.post('/api/messages', json={'content': 'hi'}, headers=alice_headers)
+    client.delete(f'/api/users/{alice_id}', headers=alice_headers)
+
+    purge = db.session.get(UserPurge, alice_id)
+    purge.lease_until = datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+    assert client.get(f'/api/users/{alice_id}/purge', headers=alice_headers).get_json()['purge']['status'] == 'running'
+    assert user_purger.run_pending() == 0
+
+    # Its worker died: the lease runs out and the purge is taken over
+    purge.lease_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert user_purger.run_pending() > 0
+    assert db.session.get(UserPurge, alice_id).status == 'done'
+
+def test_deleted_users_sockets_are_closed_and_refused(app, client, auth_headers, socket_client):
+    user_id = client.get('/api/users/auth-user', headers=auth_headers).get_json()['user']['id']
+    client.delete(f'/api/users/{user_id}', headers=auth_headers)
+    assert not socket_client.is_connected()
+
+    token = auth_headers['Authorization'].split()[1]
+    assert not socketio.test_client(app, flask_test_client=client, query_string=f'token={token}').is_connected()
+
+def test_sockets_of_other_workers_close_on_their_next_event(client, auth_headers, socket_client, monkeypatch):
+    socket_client.emit('join_public', {})
+    socket_client.get_received()
+
+    # Deleted by another worker: this one's connections are still open
+    user = User.query.filter_by(username='testuser').one()
+    user.mark_deleted()
+    db.session.commit()
+    socket_client.emit('send_public_message', {'content': 'still cached'})
+    assert socket_client.is_connected()
+
+    monkeypatch.setattr(socket_auth, 'ttl', 0)
+    socket_client.emit('send_public_message', {'content': 'too late'})
+    assert not socket_client.is_connected()
+    assert Message.query.filter_by(content='too late').count() == 0
+
+def test_deleted_user_cannot_be_joined(client, socket_client, register):
+    bob_id, bob_headers = register('bob')
+    client.delete(f'/api/users/{bob_id}', headers=bob_headers)
+
+    socket_client.emit('join_private', {'other_user_id': bob_id})
+    errors = [e['args'][0]['message'] for e in socket_client.get_received() if e['name'] == 'error']
+    assert errors == ['User not found']
+    assert PrivateChat.query.count() == 0
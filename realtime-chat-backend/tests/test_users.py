@@ -18,4 +18,56 @@ def test_get_users(client, auth_headers):
     data = response.get_json()
     assert 'users' in data
     assert isinstance(data['users'], list)
-    assert len(data['users']) >= 2  # At least the test user and the new ones
\ No newline at end of file
+    assert len(data['users']) >= 2  # At least the test user and the new ones
+
+def _search(client, auth_headers, prefix, **params):
+    response = client.get('/api/users/search', query_string=dict(params, prefix=prefix), headers=auth_headers)
+    assert response.status_code == 200
+    return [user['username'] for user in response.get_json()['users']]
+
+def test_search_users_by_prefix(client, auth_headers, register):
+    for username in ('alice', 'Alicia', 'alfred', 'al', 'bob', 'al_x', 'alz'):
+        register(username)
+    assert _search(client, auth_headers, 'AL') == ['al', 'al_x', 'alfred', 'alice', 'Alicia', 'alz']
+    assert _search(client, auth_headers, 'ali') == ['alice', 'Alicia']
+    assert _search(client, auth_headers, 'al', limit=2) == ['al', 'al_x']
+    assert _search(client, auth_headers, 'zz') == []
+
+    user = client.get('/api/users/search?prefix=bob', headers=auth_headers).get_json()['users'][0]
+    assert 'email' not in user
+    assert client.get('/api/users/search?prefix=', headers=auth_headers).status_code == 400
+
+@pytest.fixture
+def trie_app():
+    from app import create_app
+    from app.extensions import db
+    from tests.conftest import TestConfig
+
+    class TrieConfig(TestConfig):
+        USER_SEARCH_TRIE = True
+
+    app = create_app(TrieConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def test_search_trie_follows_register_update_and_delete(trie_app, register):
+    client = trie_app.test_client()
+    _, headers = register('testuser', client=client)
+
+    _, carol_headers = register('carol', client=client)
+    register('Carl', client=client)
+    assert _search(client, headers, 'car') == ['Carl', 'carol']
+
+    register('carmen', client=client)
+    assert _search(client, headers, 'car') == ['Carl', 'carmen', 'carol']
+
+    client.put('/api/users/auth-user', json={'username': 'cart'}, headers=headers)
+    assert _search(client, headers, 'cart') == ['cart']
+    assert _search(client, headers, 'test') == []
+
+    carol_id = next(u['id'] for u in client.get('/api/users/').get_json()['users'] if u['username'] == 'carol')
+    client.delete(f'/api/users/{carol_id}', headers=carol_headers)
+    assert _search(client, headers, 'car') == ['Carl', 'carmen', 'cart']
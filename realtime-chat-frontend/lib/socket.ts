@@ -4,6 +4,18 @@ const SOCKET_URL = process.env.NEXT_PUBLIC_SOCKET_URL || 'http://localhost:5000'
 
 let socket: Socket | null = null;
 
+// Session resume: the session token of the first connection and the last seq
+// seen per room, sent back after a reconnect so the server replays what was missed
+let sessionToken: string | null = null;
+let pendingSession: string | null = null;
+let roomSeqs: Record<string, number> = {};
+
+const resetSession = () => {
+  sessionToken = null;
+  pendingSession = null;
+  roomSeqs = {};
+};
+
 export const initializeSocket = (): Socket => {
   if (!socket) {
     const token = localStorage.getItem('token');
@@ -33,6 +45,47 @@ export const initializeSocket = (): Socket => {
     socket.on('error', (error) => {
       console.error('🔴 Socket error event:', error);
     });
+
+    socket.on('rate_limited', (data) => {
+      console.warn(`⚠️ ${data.event} rate limited, retry in ${data.retry_after}s`);
+    });
+
+    // Logged events carry a trailing { room, seq } argument after their payload
+    socket.onAny((_event, ...args) => {
+      const meta = args.length > 1 ? args[args.length - 1] : null;
+      if (meta && typeof meta.room === 'string' && typeof meta.seq === 'number') {
+        roomSeqs[meta.room] = Math.max(roomSeqs[meta.room] ?? 0, meta.seq);
+      }
+    });
+
+    socket.on('connected', (data) => {
+      if (!data?.session) {
+        return;
+      }
+      if (!sessionToken) {
+        sessionToken = data.session;
+        return;
+      }
+      // A reconnect: resume the old session instead of the one just opened
+      pendingSession = data.session;
+      console.log('📤 Resuming session');
+      socket?.emit('resume', { session: sessionToken, cursors: roomSeqs });
+    });
+
+    socket.on('resumed', (data) => {
+      pendingSession = null;
+      console.log('✅ Session resumed, replayed events:', data.replayed);
+      if (data.resync?.length) {
+        console.warn('⚠️ Missed events no longer kept, reload these rooms:', data.resync);
+      }
+    });
+
+    socket.on('resume_failed', () => {
+      console.warn('⚠️ Session expired, continuing with a new one');
+      sessionToken = pendingSession;
+      pendingSession = null;
+      roomSeqs = {};
+    });
   } else {
     console.log('⚠️ Socket already initialized, returning existing instance');
   }
@@ -48,6 +101,7 @@ export const disconnectSocket = () => {
   if (socket) {
     socket.disconnect();
     socket = null;
+    resetSession();
   }
 };
 